@@ -0,0 +1,205 @@
+"""
+Structured output for the `analyze_message` step
+
+The analysis completion used to be free text that `process_chat_message`
+searched for JSON by stripping prefixes, cutting code fences, matching braces
+and finally a regex; when all of that failed the message silently became a
+pig-latin reply after a full LLM call.
+
+The request now carries Ollama's `format` parameter with `ANALYSIS_SCHEMA`,
+so generation is constrained to a JSON object with exactly the expected
+fields. The schema lists `tools` and `response_type` before `reasoning`, and
+the completion is streamed through `IncrementalJSONParser`: as soon as both
+decision fields are complete `read_analysis` returns and the stream is closed,
+so tool execution starts without waiting for the reasoning text.
+
+OLLAMA_STRUCTURED_OUTPUT selects the mode: "schema" (default, Ollama 0.5+),
+"json" (plain JSON mode for older servers) or "off".
+"""
+
+import json
+import logging
+import os
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOOLS = ("search_database", "custom_query", "pig_latin", "store_message")
+RESPONSE_TYPES = ("pig_latin", "search", "custom", "chat")
+# Fields that decide what runs; the rest of the completion is not waited for
+DECISION_FIELDS = ("tools", "response_type")
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tools": {"type": "array", "items": {"type": "string", "enum": list(TOOLS)}},
+        "response_type": {"type": "string", "enum": list(RESPONSE_TYPES)},
+        "reasoning": {"type": "string"},
+    },
+    "required": ["tools", "response_type", "reasoning"],
+}
+
+STRUCTURED_OUTPUT = os.getenv("OLLAMA_STRUCTURED_OUTPUT", "schema").lower()
+ANALYSIS_FORMAT = {"schema": ANALYSIS_SCHEMA, "json": "json"}.get(STRUCTURED_OUTPUT)
+
+DEFAULT_TOOLS = ["pig_latin", "store_message"]
+
+
+@dataclass
+class Analysis:
+    tools: List[str] = field(default_factory=lambda: list(DEFAULT_TOOLS))
+    response_type: str = "pig_latin"
+    reasoning: str = ""
+    # "stream": decided from the streamed fields, "text": parsed from the full completion,
+    # "default": nothing usable came back
+    source: str = "default"
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, Any], source: str) -> "Analysis":
+        tools = fields.get("tools")
+        if not isinstance(tools, list):
+            tools = []
+        known = [tool for tool in tools if tool in TOOLS or tool == "convert_pig_latin"]
+        response_type = fields.get("response_type")
+        reasoning = fields.get("reasoning")
+        return cls(
+            tools=known or list(DEFAULT_TOOLS),
+            response_type=response_type if response_type in RESPONSE_TYPES else "pig_latin",
+            reasoning=reasoning if isinstance(reasoning, str) else "",
+            source=source,
+        )
+
+
+class IncrementalJSONParser:
+    """Parses a streamed JSON object, yielding each top-level field once its value is complete
+
+    Text before the opening brace is skipped. Nested values are decoded
+    with `json.loads` when their closing bracket brings the scanner back to
+    the top level, so a field is available before the object is closed.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._key: Optional[str] = None
+        self._token_start: Optional[int] = None
+        self._expect_value = False
+
+    def has(self, *names: str) -> bool:
+        return all(name in self.fields for name in names)
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Add text; returns the (key, value) pairs completed by it"""
+        self.buffer += chunk
+        completed = []
+        text = self.buffer
+        while self._pos < len(text) and not self.done:
+            char = text[self._pos]
+            index = self._pos
+            self._pos += 1
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        completed.extend(self._close_token(index + 1))
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._token_start = index
+            elif char in "[{":
+                if self._depth == 1:
+                    self._token_start = index
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 1:
+                    completed.extend(self._close_token(index + 1))
+                elif self._depth == 0:
+                    completed.extend(self._close_scalar(index))
+                    self.done = True
+            elif self._depth == 1:
+                if char == ":":
+                    self._expect_value = True
+                    self._token_start = None
+                elif char == ",":
+                    completed.extend(self._close_scalar(index))
+                elif not char.isspace() and self._token_start is None and self._expect_value:
+                    # Start of a number, true, false or null
+                    self._token_start = index
+        return completed
+
+    def _close_token(self, end: int) -> List[Tuple[str, Any]]:
+        """A string, array or object ended at the top level: it is either a key or a value"""
+        raw = self.buffer[self._token_start:end]
+        self._token_start = None
+        if not self._expect_value:
+            self._key = json.loads(raw)
+            return []
+        return self._set(raw)
+
+    def _close_scalar(self, end: int) -> List[Tuple[str, Any]]:
+        if self._token_start is None or not self._expect_value:
+            return []
+        raw = self.buffer[self._token_start:end].strip()
+        self._token_start = None
+        return self._set(raw)
+
+    def _set(self, raw: str) -> List[Tuple[str, Any]]:
+        self._expect_value = False
+        key, self._key = self._key, None
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.debug(f"Unparseable value for {key!r}: {raw[:80]}")
+            return []
+        self.fields[key] = value
+        return [(key, value)]
+
+
+def parse_analysis(text: str) -> Analysis:
+    """Analysis from a complete completion, tolerating text around the JSON object"""
+    start = text.find("{")
+    while start != -1:
+        try:
+            fields, _ = json.JSONDecoder().raw_decode(text, start)
+            if isinstance(fields, dict) and "tools" in fields:
+                return Analysis.from_fields(fields, "text")
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    logger.warning(f"No analysis JSON in model output, defaulting to pig latin: {text[:200]!r}")
+    return Analysis()
+
+
+async def read_analysis(chunks: AsyncIterator[str]) -> Analysis:
+    """Consume a streamed completion until the decision fields are known, then close the stream"""
+    parser = IncrementalJSONParser()
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            parser.feed(chunk)
+            if parser.has(*DECISION_FIELDS):
+                return Analysis.from_fields(parser.fields, "stream")
+    if parser.has("tools"):
+        return Analysis.from_fields(parser.fields, "stream")
+    return parse_analysis(parser.buffer)
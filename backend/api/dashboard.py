@@ -4,12 +4,11 @@ Dashboard API endpoints for real-time analytics and visualization
 import asyncio
 import json
 import logging
+from contextvars import ContextVar
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from fastapi import APIRouter, HTTPException
 from concurrent.futures import ThreadPoolExecutor
-import redis
-from falkordb import FalkorDB
 
 logger = logging.getLogger(__name__)
 
@@ -19,11 +18,99 @@ router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 CACHE_TTL = 60  # 60 seconds cache for dashboard data
 redis_client = None
 
+# When set, queries skip the cache read but still refresh the cached value.
+# The change feed uses this so it always sees fresh aggregates.
+bypass_cache_read: ContextVar[bool] = ContextVar("bypass_cache_read", default=False)
+
+# Every query the dashboard runs, by cache key (also used by tools/graph_query_benchmark.py)
+QUERIES: Dict[str, str] = {
+    "dashboard:overview:counts": """
+    MATCH (p:Person) WITH COUNT(p) as total_employees
+    MATCH (t:Team) WITH total_employees, COUNT(t) as total_teams
+    MATCH (g:Group) WITH total_employees, total_teams, COUNT(g) as total_groups
+    MATCH (pol:Policy) WITH total_employees, total_teams, total_groups, COUNT(pol) as total_policies
+    MATCH (pr:Project) WHERE pr.status = 'active' WITH total_employees, total_teams, total_groups, total_policies, COUNT(pr) as active_projects
+    MATCH (o:Office) WITH total_employees, total_teams, total_groups, total_policies, active_projects, COUNT(o) as total_offices
+    MATCH (s:Skill) WITH total_employees, total_teams, total_groups, total_policies, active_projects, total_offices, COUNT(DISTINCT s) as total_skills
+    RETURN total_employees, total_teams, total_groups, total_policies, active_projects, total_offices, total_skills
+    """,
+    # Simulated - in a real system would have Incident nodes. For now, count critical policies
+    "dashboard:overview:incidents": """
+    MATCH (p:Policy) WHERE p.severity = 'critical'
+    RETURN COUNT(p) as critical_incidents
+    """,
+    "dashboard:offices": """
+    MATCH (o:Office)
+    OPTIONAL MATCH (p:Person)-[:WORKS_IN]->(o)
+    WITH o, COUNT(DISTINCT p) as employee_count
+    OPTIONAL MATCH (lead:Person)-[:WORKS_IN]->(o) WHERE lead.role CONTAINS 'Lead' OR lead.role CONTAINS 'Manager'
+    WITH o, employee_count, COLLECT(DISTINCT lead) as office_leads
+    RETURN o.name as office_name, 
+           o.location as location, 
+           o.timezone as timezone,
+           employee_count,
+           [l IN office_leads | {name: l.name, role: l.role, email: l.email}] as on_call_staff
+    ORDER BY o.name
+    """,
+    "dashboard:incidents": """
+    MATCH (p:Policy)
+    OPTIONAL MATCH (person:Person)-[:RESPONSIBLE_FOR]->(p)
+    WITH p, COLLECT(DISTINCT person)[0] as assignee
+    RETURN p.name as title,
+           p.severity as severity,
+           p.category as category,
+           assignee.name as assignee_name,
+           assignee.email as assignee_email,
+           p.name as id
+    ORDER BY 
+        CASE p.severity 
+            WHEN 'critical' THEN 1
+            WHEN 'high' THEN 2
+            WHEN 'medium' THEN 3
+            WHEN 'low' THEN 4
+            ELSE 5
+        END
+    """,
+    "dashboard:teams": """
+    MATCH (t:Team)
+    OPTIONAL MATCH (p:Person)-[:MEMBER_OF]->(t)
+    WITH t, COUNT(DISTINCT p) as member_count
+    RETURN t.name as team_name,
+           t.department as department,
+           t.focus_area as focus_area,
+           member_count
+    ORDER BY member_count DESC
+    """,
+    "dashboard:departments": """
+    MATCH (p:Person)
+    RETURN p.department as department, COUNT(p) as count
+    ORDER BY count DESC
+    """,
+    "dashboard:skills": """
+    MATCH (p:Person)-[:HAS_SKILL]->(s:Skill)
+    RETURN s.name as skill, COUNT(DISTINCT p) as count
+    ORDER BY count DESC
+    LIMIT 10
+    """,
+    "dashboard:visas": """
+    MATCH (p:Person) WHERE p.visa_status IS NOT NULL AND p.visa_status <> 'Citizen'
+    RETURN p.name as employee_name,
+           p.department as department,
+           p.office as office,
+           p.visa_status as visa_type,
+           p.hire_date as hire_date,
+           p.email as email
+    ORDER BY p.hire_date DESC
+    LIMIT 50
+    """,
+}
+
 def get_redis_client():
     """Get or create Redis client for caching"""
     global redis_client
     if redis_client is None:
         try:
+            import redis  # Imported on first use to keep cold start fast
             redis_client = redis.Redis(host='redis', port=6380, decode_responses=True)
             redis_client.ping()
         except Exception as e:
@@ -34,6 +121,7 @@ def get_redis_client():
 def get_falkor_client():
     """Create FalkorDB client"""
     try:
+        from falkordb import FalkorDB
         return FalkorDB(host="falkordb", port=6379)
     except Exception as e:
         logger.error(f"Failed to connect to FalkorDB: {e}")
@@ -48,7 +136,7 @@ async def execute_query_with_cache(
     """Execute FalkorDB query with Redis caching"""
     # Try to get from cache first
     cache = get_redis_client()
-    if cache:
+    if cache and not bypass_cache_read.get():
         try:
             cached = cache.get(cache_key)
             if cached:
@@ -103,28 +191,9 @@ async def execute_query_with_cache(
 async def get_dashboard_overview() -> Dict[str, Any]:
     """Get global metrics summary including total employees, teams, policies, and system health"""
     
-    # Query for basic counts
-    counts_query = """
-    MATCH (p:Person) WITH COUNT(p) as total_employees
-    MATCH (t:Team) WITH total_employees, COUNT(t) as total_teams
-    MATCH (g:Group) WITH total_employees, total_teams, COUNT(g) as total_groups
-    MATCH (pol:Policy) WITH total_employees, total_teams, total_groups, COUNT(pol) as total_policies
-    MATCH (pr:Project) WHERE pr.status = 'active' WITH total_employees, total_teams, total_groups, total_policies, COUNT(pr) as active_projects
-    MATCH (o:Office) WITH total_employees, total_teams, total_groups, total_policies, active_projects, COUNT(o) as total_offices
-    MATCH (s:Skill) WITH total_employees, total_teams, total_groups, total_policies, active_projects, total_offices, COUNT(DISTINCT s) as total_skills
-    RETURN total_employees, total_teams, total_groups, total_policies, active_projects, total_offices, total_skills
-    """
-    
-    # Query for active incidents (simulated - in real system would have Incident nodes)
-    # For now, we'll count critical policies as potential incidents
-    incidents_query = """
-    MATCH (p:Policy) WHERE p.severity = 'critical'
-    RETURN COUNT(p) as critical_incidents
-    """
-    
     # Execute queries
-    counts = await execute_query_with_cache("dashboard:overview:counts", counts_query)
-    incidents = await execute_query_with_cache("dashboard:overview:incidents", incidents_query)
+    counts = await execute_query_with_cache("dashboard:overview:counts", QUERIES["dashboard:overview:counts"])
+    incidents = await execute_query_with_cache("dashboard:overview:incidents", QUERIES["dashboard:overview:incidents"])
     
     # Build response
     overview = {
@@ -146,21 +215,7 @@ async def get_dashboard_overview() -> Dict[str, Any]:
 async def get_office_status() -> List[Dict[str, Any]]:
     """Get office status with on-call data and employee counts"""
     
-    query = """
-    MATCH (o:Office)
-    OPTIONAL MATCH (p:Person)-[:WORKS_IN]->(o)
-    WITH o, COUNT(DISTINCT p) as employee_count
-    OPTIONAL MATCH (lead:Person)-[:WORKS_IN]->(o) WHERE lead.role CONTAINS 'Lead' OR lead.role CONTAINS 'Manager'
-    WITH o, employee_count, COLLECT(DISTINCT lead) as office_leads
-    RETURN o.name as office_name, 
-           o.location as location, 
-           o.timezone as timezone,
-           employee_count,
-           [l IN office_leads | {name: l.name, role: l.role, email: l.email}] as on_call_staff
-    ORDER BY o.name
-    """
-    
-    offices_data = await execute_query_with_cache("dashboard:offices", query)
+    offices_data = await execute_query_with_cache("dashboard:offices", QUERIES["dashboard:offices"])
     
     # Process and enhance office data
     offices = []
@@ -189,27 +244,7 @@ async def get_active_incidents() -> Dict[str, List[Dict[str, Any]]]:
     """Get active incidents grouped by severity (simulated using policy violations)"""
     
     # In a real system, we'd have Incident nodes. For now, simulate with policies
-    query = """
-    MATCH (p:Policy)
-    OPTIONAL MATCH (person:Person)-[:RESPONSIBLE_FOR]->(p)
-    WITH p, COLLECT(DISTINCT person)[0] as assignee
-    RETURN p.name as title,
-           p.severity as severity,
-           p.category as category,
-           assignee.name as assignee_name,
-           assignee.email as assignee_email,
-           p.name as id
-    ORDER BY 
-        CASE p.severity 
-            WHEN 'critical' THEN 1
-            WHEN 'high' THEN 2
-            WHEN 'medium' THEN 3
-            WHEN 'low' THEN 4
-            ELSE 5
-        END
-    """
-    
-    incidents_data = await execute_query_with_cache("dashboard:incidents", query)
+    incidents_data = await execute_query_with_cache("dashboard:incidents", QUERIES["dashboard:incidents"])
     
     # Group by severity and simulate incident data
     incidents_by_severity = {
@@ -297,36 +332,9 @@ async def get_performance_metrics() -> Dict[str, Any]:
 async def get_team_distribution() -> Dict[str, Any]:
     """Get team distribution data across offices and departments"""
     
-    # Query for team distribution
-    teams_query = """
-    MATCH (t:Team)
-    OPTIONAL MATCH (p:Person)-[:MEMBER_OF]->(t)
-    WITH t, COUNT(DISTINCT p) as member_count
-    RETURN t.name as team_name,
-           t.department as department,
-           t.focus_area as focus_area,
-           member_count
-    ORDER BY member_count DESC
-    """
-    
-    # Query for department distribution
-    dept_query = """
-    MATCH (p:Person)
-    RETURN p.department as department, COUNT(p) as count
-    ORDER BY count DESC
-    """
-    
-    # Query for skills distribution
-    skills_query = """
-    MATCH (p:Person)-[:HAS_SKILL]->(s:Skill)
-    RETURN s.name as skill, COUNT(DISTINCT p) as count
-    ORDER BY count DESC
-    LIMIT 10
-    """
-    
-    teams_data = await execute_query_with_cache("dashboard:teams", teams_query)
-    dept_data = await execute_query_with_cache("dashboard:departments", dept_query)
-    skills_data = await execute_query_with_cache("dashboard:skills", skills_query)
+    teams_data = await execute_query_with_cache("dashboard:teams", QUERIES["dashboard:teams"])
+    dept_data = await execute_query_with_cache("dashboard:departments", QUERIES["dashboard:departments"])
+    skills_data = await execute_query_with_cache("dashboard:skills", QUERIES["dashboard:skills"])
     
     return {
         "teams": [
@@ -360,21 +368,8 @@ async def get_team_distribution() -> Dict[str, Any]:
 async def get_visa_timeline() -> Dict[str, Any]:
     """Get visa expiry timeline data for employees"""
     
-    # Query for visa expiry data
     # In this simulation, we'll use hire_date + random offset as visa expiry
-    query = """
-    MATCH (p:Person) WHERE p.visa_status IS NOT NULL AND p.visa_status <> 'Citizen'
-    RETURN p.name as employee_name,
-           p.department as department,
-           p.office as office,
-           p.visa_status as visa_type,
-           p.hire_date as hire_date,
-           p.email as email
-    ORDER BY p.hire_date DESC
-    LIMIT 50
-    """
-    
-    visa_data = await execute_query_with_cache("dashboard:visas", query)
+    visa_data = await execute_query_with_cache("dashboard:visas", QUERIES["dashboard:visas"])
     
     # Process visa data and simulate expiry dates
     current_date = datetime.utcnow()
@@ -424,4 +419,14 @@ async def get_visa_timeline() -> Dict[str, Any]:
             "expiring_180_days": expiring_180_days[:5]
         },
         "by_visa_type": {}  # Could add breakdown by visa type
-    }
\ No newline at end of file
+    }
+
+# Panel name -> aggregate builder, shared with the WebSocket change feed
+DASHBOARD_PANELS = {
+    "overview": get_dashboard_overview,
+    "offices": get_office_status,
+    "incidents": get_active_incidents,
+    "metrics": get_performance_metrics,
+    "teams": get_team_distribution,
+    "visas": get_visa_timeline,
+}
@@ -0,0 +1,289 @@
+"""
+Dashboard change feed for push-based WebSocket updates
+
+Periodically recomputes the dashboard aggregates, detects which panels changed
+and pushes only those panels to subscribed clients. Each client acknowledges
+the version it has applied, and deltas are computed against that version so a
+client that missed an update still converges on the next push.
+
+Versions are counted per process. Every message carries the feed's epoch, a
+random id picked at startup, and a client that subscribes with a version from
+another epoch (server restart, another worker) gets the full state again.
+
+Protocol (client -> server):
+    {"type": "dashboard_subscribe", "version": <last applied version or 0>, "epoch": <epoch or null>}
+    {"type": "dashboard_ack", "version": <applied version>}
+    {"type": "dashboard_unsubscribe"}
+
+Protocol (server -> client):
+    {"type": "dashboard_update", "epoch": E, "version": V, "base_version": B,
+     "panels": {"<panel>": {"op": "replace", "data": ...} |
+                           {"op": "patch", "set": {...}, "unset": [...]}}}
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from api.dashboard import DASHBOARD_PANELS, bypass_cache_read
+
+logger = logging.getLogger(__name__)
+
+# Seconds between change checks while at least one client is subscribed
+FEED_INTERVAL = float(os.getenv("DASHBOARD_FEED_INTERVAL", 5))
+# Number of past versions kept per panel for computing deltas
+FEED_HISTORY = 16
+# Fields that change on every computation and must not count as a change
+VOLATILE_FIELDS = {"last_updated", "updated_at", "created_at", "timestamps"}
+
+
+def parse_version(value: Any) -> Optional[int]:
+    """Version number from a client frame, or None when it is not a non-negative integer"""
+    if isinstance(value, bool):
+        return None
+    try:
+        version = int(value or 0)
+    except (TypeError, ValueError):
+        return None
+    return version if version >= 0 else None
+
+
+def _strip_volatile(value: Any) -> Any:
+    """Remove volatile fields recursively so digests only reflect real changes"""
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def panel_digest(data: Any) -> str:
+    """Stable content hash of a panel, ignoring volatile fields"""
+    canonical = json.dumps(_strip_volatile(data), sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def diff_panel(old: Any, new: Any) -> Dict[str, Any]:
+    """Build a panel delta; dicts are patched per top-level key, anything else is replaced"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+        removed = [k for k in old if k not in new]
+        # Fall back to a full replace when the patch would not be smaller
+        if len(changed) + len(removed) < len(new):
+            return {"op": "patch", "set": changed, "unset": removed}
+    return {"op": "replace", "data": new}
+
+
+class PanelState:
+    """Current value of one panel plus a short history of previous versions"""
+
+    def __init__(self, history: int = FEED_HISTORY):
+        self.data: Any = None
+        self.digest: Optional[str] = None
+        self.version = 0
+        self.history: Deque[Tuple[int, Any]] = deque(maxlen=history)
+
+    def update(self, data: Any, digest: str, version: int):
+        self.data = data
+        self.digest = digest
+        self.version = version
+        self.history.append((version, data))
+
+    def data_at(self, version: int) -> Tuple[bool, Any]:
+        """Return (known, data) for the panel as of the given version"""
+        if version <= 0:
+            return False, None
+        # Versions older than the retained history cannot be reconstructed
+        found, value = False, None
+        for entry_version, entry_data in self.history:
+            if entry_version > version:
+                break
+            found, value = True, entry_data
+        return found, value
+
+
+class DashboardChangeFeed:
+    """Detects dashboard aggregate changes and pushes per-client deltas"""
+
+    def __init__(
+        self,
+        panels: Optional[Dict[str, Callable[[], Awaitable[Any]]]] = None,
+        interval: float = FEED_INTERVAL,
+        history: int = FEED_HISTORY,
+    ):
+        self.panels = panels if panels is not None else DASHBOARD_PANELS
+        self.interval = interval
+        self.history = history
+        # Versions are only comparable within one epoch (one process lifetime)
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        self.state: Dict[str, PanelState] = {name: PanelState(history) for name in self.panels}
+        # Connection -> last version acknowledged by the client
+        self.subscribers: Dict[Any, int] = {}
+        # Connection -> last version pushed, so unacknowledged clients are not re-sent the same update
+        self._sent: Dict[Any, int] = {}
+        # Delivery callback: (message, connections) -> None
+        self._broadcast: Optional[Callable[[Dict[str, Any], Iterable[Any]], Awaitable[None]]] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    # --- lifecycle -------------------------------------------------------
+
+    def start(self, broadcast: Callable[[Dict[str, Any], Iterable[Any]], Awaitable[None]]):
+        """Start the background change detection loop"""
+        self._broadcast = broadcast
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_refresh(self):
+        """Wake the feed immediately, e.g. after a write that affects the dashboard"""
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                if self.subscribers:
+                    await self.refresh()
+                    await self.publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Dashboard change feed iteration failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    # --- change detection ------------------------------------------------
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Recompute every panel and apply the ones whose content changed"""
+        names = list(self.panels)
+
+        async def build(name):
+            token = bypass_cache_read.set(True)
+            try:
+                return await self.panels[name]()
+            finally:
+                bypass_cache_read.reset(token)
+
+        results = await asyncio.gather(*(build(name) for name in names), return_exceptions=True)
+
+        changes = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Dashboard panel '{name}' refresh failed: {result}")
+                continue
+            if panel_digest(result) != self.state[name].digest:
+                changes[name] = result
+        if changes:
+            self.apply_changes(changes)
+        return changes
+
+    def apply_changes(self, changes: Dict[str, Any], version: Optional[int] = None) -> int:
+        """Record new panel values under a new version and return it"""
+        self.version = version if version is not None else self.version + 1
+        for name, data in changes.items():
+            if name not in self.state:
+                self.state[name] = PanelState(self.history)
+            self.state[name].update(data, panel_digest(data), self.version)
+        logger.info(f"Dashboard feed v{self.version}: changed panels {sorted(changes)}")
+        return self.version
+
+    def build_delta(self, since_version: int) -> Optional[Dict[str, Any]]:
+        """Build the update message for a client that has applied since_version"""
+        if since_version >= self.version:
+            return None
+        panels = {}
+        for name, panel in self.state.items():
+            if panel.version <= since_version or panel.digest is None:
+                continue
+            known, old = panel.data_at(since_version)
+            panels[name] = diff_panel(old, panel.data) if known else {"op": "replace", "data": panel.data}
+        if not panels:
+            return None
+        return {
+            "epoch": self.epoch,
+            "version": self.version,
+            "base_version": since_version,
+            "timestamp": datetime.utcnow().isoformat(),
+            "panels": panels,
+        }
+
+    # --- subscribers -----------------------------------------------------
+
+    async def subscribe(self, websocket, version: Any = 0, epoch: Optional[str] = None):
+        """Register a client and bring it up to date immediately"""
+        version = parse_version(version)
+        if version is None or (version and epoch != self.epoch) or version > self.version:
+            # Malformed, or client state from another server lifetime or worker; start over
+            version = 0
+        self.subscribers[websocket] = version
+        self._sent[websocket] = version
+        self.request_refresh()
+        if self.version == 0:
+            # Nothing computed yet; the next refresh will push the full state
+            return
+        message = self.build_delta(version)
+        if message and self._broadcast:
+            self._sent[websocket] = self.version
+            await self._broadcast(message, [websocket])
+
+    def acknowledge(self, websocket, version: Any):
+        # Acks arrive on the connection that received the update, so they are always from this epoch
+        version = parse_version(version)
+        if version is None:
+            return
+        if websocket in self.subscribers and version <= self.version:
+            self.subscribers[websocket] = max(self.subscribers[websocket], version)
+
+    def unsubscribe(self, websocket):
+        self.subscribers.pop(websocket, None)
+        self._sent.pop(websocket, None)
+
+    async def publish(self):
+        """Push deltas to every subscriber that is behind the current version"""
+        if not self._broadcast:
+            return
+        async with self._lock:
+            # Clients that acknowledged the same version share one message
+            by_version: Dict[int, list] = {}
+            for websocket, acked in list(self.subscribers.items()):
+                if self._sent.get(websocket, acked) < self.version:
+                    by_version.setdefault(acked, []).append(websocket)
+
+            for acked, clients in by_version.items():
+                message = self.build_delta(acked)
+                if not message:
+                    continue
+                for websocket in clients:
+                    self._sent[websocket] = self.version
+                await self._broadcast(message, clients)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "epoch": self.epoch,
+            "version": self.version,
+            "subscribers": len(self.subscribers),
+            "panel_versions": {name: panel.version for name, panel in self.state.items()},
+        }
+
+
+# Global instance
+dashboard_feed = DashboardChangeFeed()
@@ -0,0 +1,188 @@
+"""
+Benchmark Harness with Stored Baselines
+
+Times a callable over repeated rounds and compares the fastest round against a
+JSON baseline file, so the pytest benchmark suite (tests/test_benchmarks.py) fails
+when something gets slower. It replaces the one-off timing loops in
+test_scale_performance.py and tools/performance_benchmark.py for anything
+that does not need a live model.
+
+Fast callables are batched: each round calls the function enough times to
+take at least BENCHMARK_MIN_ROUND_MS, and the per-call time is reported.
+That keeps timer resolution and scheduler noise out of sub-millisecond
+numbers. As with timeit, garbage collection is paused while timing and the
+minimum is what gets compared: noise from other processes only ever adds
+time, so the fastest round is the most repeatable figure. The median and p95
+are stored alongside it for reading.
+
+Baselines are machine-specific, so the default file is git-ignored: record
+it once with BENCHMARK_UPDATE=1 on the machine that runs the suite (CI keeps
+its own reference file and points BENCHMARK_BASELINES at it). A benchmark
+without a stored baseline fails rather than passing against itself;
+BENCHMARK_UPDATE=1 records missing entries and re-records existing ones
+(after an intended slowdown, or on a new reference machine).
+
+Environment:
+    BENCHMARKS=1                 run the suite (it is skipped otherwise)
+    BENCHMARK_BASELINES          baseline file (default tests/benchmark_baselines.json)
+    BENCHMARK_THRESHOLD          allowed regression (default 0.30 = 30%)
+    BENCHMARK_UPDATE=1           record missing and overwrite existing baselines with this run
+    BENCHMARK_MIN_ROUND_MS       minimum duration of one timed round (default 5)
+"""
+
+import gc
+import json
+import logging
+import os
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BENCHMARKS_ENABLED = os.getenv("BENCHMARKS", "").lower() in ("1", "true", "yes")
+BENCHMARK_BASELINES = os.getenv(
+    "BENCHMARK_BASELINES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "benchmark_baselines.json"),
+)
+BENCHMARK_THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", "0.30"))
+BENCHMARK_UPDATE = os.getenv("BENCHMARK_UPDATE", "").lower() in ("1", "true", "yes")
+BENCHMARK_MIN_ROUND_MS = float(os.getenv("BENCHMARK_MIN_ROUND_MS", "5"))
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summary of per-call timings in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "rounds": len(samples),
+        "min_ms": round(ordered[0], 4),
+        "median_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "max_ms": round(ordered[-1], 4),
+    }
+
+
+def calibrate(fn: Callable[[], Any], min_round_ms: float) -> int:
+    """Calls per round so that one round takes at least `min_round_ms`"""
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= min_round_ms or calls >= 1_000_000:
+            return calls
+        # Aim a little past the target so the next round usually settles it
+        calls = max(calls * 2, int(calls * min_round_ms * 1.2 / max(elapsed_ms, 1e-3)))
+
+
+def measure(fn: Callable[[], Any], rounds: int = 20, warmup: int = 2,
+            min_round_ms: Optional[float] = None) -> Dict[str, float]:
+    """Per-call timing summary of `fn` over `rounds` batched rounds"""
+    min_round_ms = BENCHMARK_MIN_ROUND_MS if min_round_ms is None else min_round_ms
+    for _ in range(warmup):
+        fn()
+    calls = calibrate(fn, min_round_ms)
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(calls):
+                fn()
+            samples.append((time.perf_counter() - started) * 1000 / calls)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    summary = summarize(samples)
+    summary["calls_per_round"] = calls
+    return summary
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    summary: Dict[str, float]
+    baseline_ms: Optional[float] = None
+    change: Optional[float] = None
+    status: str = "recorded"  # recorded, ok, regression, missing
+
+    @property
+    def regressed(self) -> bool:
+        return self.status == "regression"
+
+    @property
+    def failed(self) -> bool:
+        """Slower than the baseline, or nothing stored to compare against"""
+        return self.status in ("regression", "missing")
+
+    def describe(self) -> str:
+        current = self.summary["min_ms"]
+        if self.status == "missing":
+            return f"{self.name}: {current:.4f} ms, no baseline stored (record one with BENCHMARK_UPDATE=1)"
+        if self.baseline_ms is None:
+            return f"{self.name}: {current:.4f} ms (new baseline)"
+        return (f"{self.name}: {current:.4f} ms vs baseline {self.baseline_ms:.4f} ms "
+                f"({self.change:+.1%}) {self.status.upper()}")
+
+
+@dataclass
+class BaselineStore:
+    """Timing summaries per benchmark name, persisted as JSON"""
+
+    path: str = BENCHMARK_BASELINES
+    threshold: float = BENCHMARK_THRESHOLD
+    update: bool = BENCHMARK_UPDATE
+    entries: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.entries = json.load(f).get("benchmarks", {})
+
+    def check(self, name: str, summary: Dict[str, float]) -> BenchmarkResult:
+        """Compare `summary` against the stored baseline; only `update` records it"""
+        previous = self.entries.get(name)
+        if self.update:
+            self.record(name, summary)
+            return BenchmarkResult(name, summary)
+        if previous is None:
+            return BenchmarkResult(name, summary, status="missing")
+
+        baseline_ms = previous["min_ms"]
+        change = (summary["min_ms"] - baseline_ms) / baseline_ms if baseline_ms else 0.0
+        status = "regression" if change > self.threshold else "ok"
+        return BenchmarkResult(name, summary, baseline_ms, change, status)
+
+    def record(self, name: str, summary: Dict[str, float]):
+        self.entries[name] = {**summary, "recorded": datetime.now().isoformat(timespec="seconds")}
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump({"threshold": self.threshold, "benchmarks": dict(sorted(self.entries.items()))}, f, indent=2)
+            f.write("\n")
+
+
+class BenchmarkRunner:
+    """Measures named benchmarks and checks each against the baseline store"""
+
+    def __init__(self, store: Optional[BaselineStore] = None):
+        self.store = store or BaselineStore()
+        self.results: List[BenchmarkResult] = []
+
+    def run(self, name: str, fn: Callable[[], Any], **kwargs) -> BenchmarkResult:
+        return self.check(name, measure(fn, **kwargs))
+
+    def check(self, name: str, summary: Dict[str, float]) -> BenchmarkResult:
+        result = self.store.check(name, summary)
+        self.results.append(result)
+        logger.info(result.describe())
+        return result
+
+    def report(self) -> str:
+        return "\n".join(result.describe() for result in self.results)
@@ -0,0 +1,204 @@
+"""
+Per-connection WebSocket send queues
+
+Each connection gets a bounded outbound queue drained by its own writer task,
+so a broadcast only enqueues (no awaits per client) and one slow client can no
+longer stall delivery to everyone else. When a client's queue is full, a
+slow-consumer policy decides what happens:
+
+- drop_oldest: discard the oldest pending message
+- coalesce:    replace a pending message with the same coalesce key, otherwise drop oldest
+- disconnect:  close the connection
+
+Replies to the client's own requests go through the same queue, so there is
+only one sender per socket and they stay in order with broadcasts. They are
+never dropped or coalesced: `send()` waits until the writer has sent the
+frame, which paces the request handler to the client instead.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SlowConsumerPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+# Defaults, overridable via environment
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 100))
+SLOW_CONSUMER_POLICY = SlowConsumerPolicy(os.getenv("WS_SLOW_CONSUMER_POLICY", "coalesce"))
+# Weight of the newest sample in the moving lag average
+LAG_EWMA_ALPHA = 0.2
+
+
+class ClientSendQueue:
+    """Bounded outbound queue with a dedicated writer task for one WebSocket"""
+
+    def __init__(
+        self,
+        websocket,
+        maxsize: int = SEND_QUEUE_SIZE,
+        policy: SlowConsumerPolicy = SLOW_CONSUMER_POLICY,
+        on_failure: Optional[Callable[[Any], None]] = None,
+    ):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = SlowConsumerPolicy(policy)
+        self.on_failure = on_failure
+        # Pending entries: [coalesce_key, message_json, enqueued_at, sent future (replies only)]
+        self._pending: Deque[list] = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+
+        # Metrics
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.send_errors = 0
+        self.last_lag_ms = 0.0
+        self.avg_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._writer())
+
+    def put(self, message_json: str, coalesce_key: Optional[str] = None) -> bool:
+        """Enqueue a message without waiting; returns False if it was not accepted"""
+        if self.closed:
+            return False
+
+        now = time.monotonic()
+        if coalesce_key is not None and self.policy == SlowConsumerPolicy.COALESCE:
+            for entry in self._pending:
+                if entry[0] == coalesce_key:
+                    # Newer message supersedes the pending one but keeps its queue position
+                    # and original enqueue time, so lag reflects how long the client waited
+                    entry[1] = message_json
+                    self.coalesced += 1
+                    return True
+
+        if len(self._pending) >= self.maxsize:
+            if self.policy == SlowConsumerPolicy.DISCONNECT:
+                logger.warning(f"Disconnecting slow WebSocket consumer ({len(self._pending)} messages pending)")
+                self._fail()
+                return False
+            self.dropped += 1
+            # Replies are never dropped; with only replies pending the new message goes
+            oldest = next((entry for entry in self._pending if entry[3] is None), None)
+            if oldest is None:
+                return False
+            self._pending.remove(oldest)
+
+        self._pending.append([coalesce_key, message_json, now, None])
+        self._ready.set()
+        return True
+
+    async def send(self, message_json: str):
+        """Send a reply frame in order with queued messages and wait until it is sent
+
+        Raises ConnectionError when the connection is (or gets) closed first.
+        """
+        if self.closed:
+            raise ConnectionError("WebSocket send queue is closed")
+        sent = asyncio.get_running_loop().create_future()
+        self._pending.append([None, message_json, time.monotonic(), sent])
+        self._ready.set()
+        await sent
+
+    async def _writer(self):
+        try:
+            while not self.closed:
+                if not self._pending:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                _, message_json, enqueued_at, sent = self._pending.popleft()
+                try:
+                    await self.websocket.send_text(message_json)
+                except Exception as e:
+                    self.send_errors += 1
+                    logger.debug(f"WebSocket send failed: {e}")
+                    if sent is not None and not sent.done():
+                        sent.set_exception(ConnectionError(f"WebSocket send failed: {e}"))
+                    self._fail()
+                    return
+                if sent is not None and not sent.done():
+                    sent.set_result(None)
+                self.sent += 1
+                self._record_lag((time.monotonic() - enqueued_at) * 1000)
+        except asyncio.CancelledError:
+            pass
+
+    def _record_lag(self, lag_ms: float):
+        self.last_lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        if self.sent == 1:
+            self.avg_lag_ms = lag_ms
+        else:
+            self.avg_lag_ms += LAG_EWMA_ALPHA * (lag_ms - self.avg_lag_ms)
+
+    def _fail(self):
+        self.close()
+        if self.on_failure:
+            self.on_failure(self.websocket)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for entry in self._pending:
+            if entry[3] is not None and not entry[3].done():
+                entry[3].set_exception(ConnectionError("WebSocket send queue is closed"))
+        self._pending.clear()
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def drain(self, timeout: float = 5.0):
+        """Wait until everything queued so far has been sent (used on shutdown and in tests)"""
+        deadline = time.monotonic() + timeout
+        while self._pending and not self.closed and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+    def stats(self) -> Dict[str, Any]:
+        oldest_age_ms = (time.monotonic() - self._pending[0][2]) * 1000 if self._pending else 0.0
+        return {
+            "queue_depth": len(self._pending),
+            "oldest_pending_ms": round(oldest_age_ms, 2),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "send_errors": self.send_errors,
+            "last_lag_ms": round(self.last_lag_ms, 2),
+            "avg_lag_ms": round(self.avg_lag_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2),
+        }
+
+
+class QueuedWebSocket:
+    """WebSocket proxy for request handlers whose sends go through the connection's queue"""
+
+    def __init__(self, websocket, queue: ClientSendQueue):
+        self._websocket = websocket
+        self.queue = queue
+
+    async def send_text(self, text: str):
+        await self.queue.send(text)
+
+    @property
+    def raw_websocket(self):
+        """The connection this proxy sends on"""
+        return self._websocket
+
+    def __getattr__(self, name):
+        return getattr(self._websocket, name)
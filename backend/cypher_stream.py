@@ -0,0 +1,225 @@
+"""
+Early-exit Cypher extraction from a streamed completion
+
+`generate_query` completions were read in full and then searched for a code
+fence, although models often keep explaining after the query is written and
+every one of those tokens delays execution. The completion is now streamed
+through `extract_statement`, which reports the query as soon as it is
+provably complete; the stream is then closed, which stops generation.
+
+A statement is complete, outside strings and with balanced brackets, at:
+
+- a closing code fence (or any fence after a bare query)
+- a `;`
+- `LIMIT n` in the final RETURN part, once the next word is not UNION
+- a line break after RETURN when the next line starts with prose rather
+  than a Cypher keyword or a column expression (`p.name`, `p,`, `count(p)`,
+  `p AS x`), or a blank line; a line ending in RETURN, DISTINCT or another
+  word that needs an operand never ends the statement
+
+Completions that never show such a boundary are taken whole when the stream
+ends, as before. STREAMING_CYPHER=false restores the non-streamed call.
+"""
+
+import logging
+import os
+import re
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STREAMING_CYPHER = os.getenv("STREAMING_CYPHER", "true").lower() in ("1", "true", "yes")
+
+# Where a bare (unfenced) query starts; upper case only so prose like "with" does not match
+_START = re.compile(r"\b(?:OPTIONAL\s+MATCH|MATCH|WITH|UNWIND|CALL|CREATE|MERGE)\b")
+_RETURN = re.compile(r"RETURN\b", re.IGNORECASE)
+_LIMIT = re.compile(r"LIMIT\s+\d+", re.IGNORECASE)
+_NEXT_WORD = re.compile(r"[ \t]*([A-Za-z_]+)(?=[^A-Za-z_0-9])")
+
+# Words that may start a continuation line of a multi-line query
+CONTINUATION_WORDS = {
+    "AND", "AS", "ASC", "ASCENDING", "BY", "CALL", "CASE", "CONTAINS", "DESC", "DESCENDING",
+    "DISTINCT", "ELSE", "END", "ENDS", "IN", "IS", "LIMIT", "MATCH", "NOT", "NULL", "OPTIONAL",
+    "OR", "ORDER", "RETURN", "SKIP", "STARTS", "THEN", "UNION", "UNWIND", "WHEN", "WHERE",
+    "WITH", "XOR",
+}
+# A line ending with one of these continues on the next line
+_CONTINUES = (",", "+", "-", "*", "/", "=", "<", ">", "(", "[", "{", ":", "|")
+_OPEN_WORD = re.compile(
+    r"\b(?:RETURN|DISTINCT|AND|OR|XOR|NOT|WHERE|ORDER|BY|AS|IN|IS|CONTAINS|STARTS|ENDS|WITH"
+    r"|CASE|WHEN|THEN|ELSE|SKIP|LIMIT|UNION)$",
+    re.IGNORECASE,
+)
+# A line that starts like a column expression rather than prose: p.name, p, count(p), p AS x
+_EXPRESSION_LINE = re.compile(r"[ \t]*[A-Za-z_]\w*(?:\.|[ \t]*[,(\[]|[ \t]+AS\b)", re.IGNORECASE)
+
+FENCE = "```"
+
+
+def _clean(statement: str) -> str:
+    return statement.strip().rstrip(";").strip()
+
+
+def _limit_end(text: str, pos: int, final: bool):
+    """End of a `LIMIT n` at `pos` if it ends the statement, None if not, False if undecided yet"""
+    match = _LIMIT.match(text, pos)
+    if not match:
+        return None
+    end = match.end()
+    rest = text[end:].lstrip()
+    if end == len(text) or not rest:
+        return end if final else False
+    if rest[:5].upper() == "UNION":
+        return None
+    if "UNION".startswith(rest[:5].upper()) and len(rest) < 5 and not final:
+        return False
+    return end
+
+
+def _line_break_ends(text: str, pos: int, final: bool):
+    """True if the line break at `pos` (after RETURN) ends the statement; False if undecided"""
+    line = text[:pos].rstrip()
+    if line.endswith(_CONTINUES) or _OPEN_WORD.search(line):
+        return None
+    rest = text[pos + 1:]
+    stripped = rest.lstrip(" \t")
+    if stripped.startswith("\n") or stripped.startswith(FENCE):
+        return True
+    if not stripped:
+        return True if final else False
+    word = _NEXT_WORD.match(rest)
+    if word is None:
+        if stripped[0].isalpha() or stripped[0] == "_":
+            # The next word is still being streamed
+            return True if final else False
+        return None
+    if word.group(1).upper() in CONTINUATION_WORDS or _EXPRESSION_LINE.match(rest):
+        return None
+    after = rest[word.end():]
+    if not final and "\n" not in after and "AS".startswith(after.strip().upper()):
+        # Could still become "p AS x"
+        return False
+    return True
+
+
+def extract_statement(text: str, final: bool = False) -> Optional[str]:
+    """The complete Cypher statement in `text`, or None while it may still be growing
+
+    With `final=True` the end of the text also ends the statement.
+    """
+    fence = text.find(FENCE)
+    start = _START.search(text)
+    if fence != -1 and (start is None or fence < start.start()):
+        newline = text.find("\n", fence)
+        if newline == -1:
+            return None if not final else ""
+        body = newline + 1
+    elif start is not None:
+        body = start.start()
+    else:
+        return _clean(text) if final else None
+
+    depth = 0
+    quote = None
+    seen_return = False
+    pos = body
+    while pos < len(text):
+        char = text[pos]
+        if quote:
+            if char == "\\":
+                pos += 2
+                continue
+            if char == quote:
+                quote = None
+        elif text.startswith(FENCE, pos):
+            return _clean(text[body:pos])
+        elif char in "'\"`":
+            quote = char
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif depth == 0:
+            word_start = pos == 0 or not (text[pos - 1].isalnum() or text[pos - 1] == "_")
+            if char == ";":
+                return _clean(text[body:pos])
+            if word_start and _RETURN.match(text, pos):
+                seen_return = True
+            elif seen_return and word_start and char in "Ll":
+                end = _limit_end(text, pos, final)
+                if end is False:
+                    return None
+                if end is not None:
+                    return _clean(text[body:end])
+            elif seen_return and char == "\n":
+                ends = _line_break_ends(text, pos, final)
+                if ends is False:
+                    return None
+                if ends:
+                    return _clean(text[body:pos])
+        pos += 1
+    return _clean(text[body:]) if final else None
+
+
+class StreamingCypherExtractor:
+    """Accumulates streamed text until it contains a complete statement"""
+
+    def __init__(self):
+        self.text = ""
+        self.query: Optional[str] = None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.text += chunk
+        self.query = extract_statement(self.text)
+        return self.query
+
+    def finish(self) -> str:
+        return extract_statement(self.text, final=True) or ""
+
+
+class ExtractionStats:
+    """How often generation was cut short, and the time to a usable query"""
+
+    def __init__(self):
+        self.early = 0
+        self.full = 0
+        self.early_ms = 0.0
+        self.full_ms = 0.0
+
+    def record(self, early: bool, elapsed_ms: float):
+        if early:
+            self.early += 1
+            self.early_ms += elapsed_ms
+        else:
+            self.full += 1
+            self.full_ms += elapsed_ms
+
+    def stats(self):
+        total = self.early + self.full
+        return {
+            "queries": total,
+            "early_exit": self.early,
+            "early_exit_share": round(self.early / total, 3) if total else None,
+            "avg_early_ms": round(self.early_ms / self.early, 1) if self.early else None,
+            "avg_full_ms": round(self.full_ms / self.full, 1) if self.full else None,
+        }
+
+
+extraction_stats = ExtractionStats()
+
+
+async def read_cypher(chunks: AsyncIterator[str]) -> Tuple[str, bool]:
+    """(query, stopped early) from a streamed completion; the stream is closed once the query is complete"""
+    extractor = StreamingCypherExtractor()
+    started = time.perf_counter()
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            query = extractor.feed(chunk)
+            if query is not None:
+                extraction_stats.record(True, (time.perf_counter() - started) * 1000)
+                logger.debug(f"Cypher complete after {len(extractor.text)} chars, generation stopped")
+                return query, True
+    extraction_stats.record(False, (time.perf_counter() - started) * 1000)
+    return extractor.finish(), False
@@ -0,0 +1,695 @@
+"""
+In-memory fuzzy index of entity names for "did you mean?" and name resolution
+
+QueryErrorHandler used to run difflib over a short hardcoded word list, once
+for every word of a failed question times every entity type, and knew nothing
+about the people, teams and policies actually in the graph. This index holds
+the real names (Person, Team, Group, Policy, Skill, Office) next to that
+built-in vocabulary and answers fuzzy lookups in well under a millisecond at
+100k+ names:
+
+- names are normalized (lowercase, punctuation dropped) and split into words;
+  each distinct word is indexed by its padded character trigrams, bucketed by
+  word length
+- a one-word lookup counts shared trigrams over the words whose length can
+  still reach the cutoff, and only the best few are scored with difflib's
+  ratio, so scores keep the scale the error handler's cutoffs were written for
+- a multi-word lookup matches each word, intersects the names containing the
+  matched words and scores what is left
+
+EntityIndexRefresher reloads the names from FalkorDB in the background (every
+ENTITY_INDEX_REFRESH seconds, and soon after a graph write is announced) and
+swaps in a rebuilt index only when the names changed. resolve_names() rewrites
+confidently misspelled names in a question before pattern matching and query
+generation (ENTITY_RESOLUTION=false turns it off). It does not use the
+shortlists above: every name within its edit budget is scored by edit distance
+(transpositions count once), a rewrite needs a clear margin over the
+runner-up, and plurals, ties and partial matches of full names are left as
+written.
+"""
+
+import asyncio
+import difflib
+import hashlib
+import heapq
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between reloads of the entity names
+ENTITY_INDEX_REFRESH = float(os.getenv("ENTITY_INDEX_REFRESH", 300))
+# Minimum seconds between reloads, however often graph writes are announced
+ENTITY_INDEX_MIN_INTERVAL = float(os.getenv("ENTITY_INDEX_MIN_INTERVAL", 10))
+# Rewrite misspelled entity names in questions before generating a query
+ENTITY_RESOLUTION = os.getenv("ENTITY_RESOLUTION", "true").lower() in ("1", "true", "yes")
+# Similarity (1 - edits / length) a misspelled name needs before the question is rewritten
+ENTITY_RESOLVE_CUTOFF = float(os.getenv("ENTITY_RESOLVE_CUTOFF", 0.85))
+# How much closer than any other name the best name must be
+ENTITY_RESOLVE_MARGIN = float(os.getenv("ENTITY_RESOLVE_MARGIN", 0.05))
+
+# Node label -> entity type, as used by the error handler's vocabulary
+ENTITY_LABELS = {
+    "Person": "people",
+    "Team": "teams",
+    "Group": "groups",
+    "Policy": "policies",
+    "Skill": "skills",
+    "Office": "offices",
+}
+ENTITY_NAMES_QUERY = "MATCH (n:{label}) WHERE n.name IS NOT NULL RETURN DISTINCT n.name"
+GRAPH_SOURCE = "graph"
+
+# Words per lookup scored with difflib after trigram counting
+WORD_SHORTLIST = 12
+# Trigram postings counted per word lookup before common trigrams are skipped
+POSTINGS_BUDGET = 2000
+# Each word of a multi-word lookup must be at least this close to a name word
+NAME_WORD_CUTOFF = 0.6
+# Word pairs up to this many words apart are indexed ("Sarah Chen" finds "Sarah J. Chen")
+PAIR_SPAN = 2
+# Words per name word scored with difflib in a multi-word lookup
+NAME_WORD_SHORTLIST = 6
+# Word matches within these distances of each word's best match are tried in turn
+NAME_WORD_SLACK = (0.05, 0.2, 1.0)
+# Names per multi-word lookup scored with difflib
+NAME_SHORTLIST = 32
+# Longest run of words resolve_names tries as one name
+MAX_NAME_WORDS = 4
+# Edits resolve_names allows within one word: one per this many letters, at most MAX_WORD_EDITS
+LETTERS_PER_EDIT = 4
+MAX_WORD_EDITS = 2
+# Words for the kinds of entity; their plurals are never names to correct
+ENTITY_WORDS = frozenset(
+    word for label, entity_type in ENTITY_LABELS.items() for word in (label.lower(), entity_type)
+) | {"person", "member", "manager", "employee", "department", "project", "role"}
+# Question words that never start or end a name
+STOPWORDS = frozenset(
+    "a about all an and any are as at be by can do does find for from get give has have how i in is it list "
+    "me my of on or our show tell that the their them there these this those to us was we what when where "
+    "which who whom whose why with".split()
+)
+
+_WORD = re.compile(r"[^\W_]+")
+# Words in a question, keeping apostrophes and hyphens inside names
+_TOKEN = re.compile(r"[^\W_]+(?:['’-][^\W_]+)*")
+_APOSTROPHES = str.maketrans("", "", "'’")
+ALL = -1
+
+
+def name_words(text: str) -> List[str]:
+    """Words of a name in their original case ("O'Brien-Smith" -> ["OBrien", "Smith"])"""
+    return _WORD.findall(text.translate(_APOSTROPHES))
+
+
+def normalize(text: str) -> str:
+    """Lookup key of a name: lowercase words separated by single spaces"""
+    return " ".join(word.lower() for word in name_words(text))
+
+
+def trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (a transposition is one edit); limit + 1 once above `limit`
+
+    Only the diagonal band of width 2 * limit + 1 is filled in; cells outside
+    it are already more than `limit` edits away.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    previous2: List[int] = []
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        row_best = current[0]
+        for j in range(low, high + 1):
+            best = previous[j - 1] + (a[i - 1] != b[j - 1])
+            if previous[j] + 1 < best:
+                best = previous[j] + 1
+            if current[j - 1] + 1 < best:
+                best = current[j - 1] + 1
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1] and previous2[j - 2] + 1 < best:
+                best = previous2[j - 2] + 1
+            current[j] = best if best < over else over
+            if best < row_best:
+                row_best = best
+        if row_best > limit:
+            return over
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def word_budget(word: str, budget: int) -> int:
+    """Edits allowed within one word of a name: one per LETTERS_PER_EDIT letters (at least one from 3 letters)"""
+    if len(word) < 3:
+        return 0
+    return min(budget, MAX_WORD_EDITS, max(1, len(word) // LETTERS_PER_EDIT))
+
+
+def inflection_bases(word: str) -> List[str]:
+    """Possible base forms of a plural or inflected word ("policies" -> "policy", "teams" -> "team")"""
+    bases = []
+    if word.endswith("ies") and len(word) > 4:
+        bases.append(word[:-3] + "y")
+    if word.endswith("es") and len(word) > 3:
+        bases.append(word[:-2])
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        bases.append(word[:-1])
+    if word.endswith("ed") and len(word) > 4:
+        bases.extend((word[:-2], word[:-1]))
+    if word.endswith("ing") and len(word) > 5:
+        bases.extend((word[:-3], word[:-3] + "e"))
+    return bases
+
+
+def length_range(length: int, cutoff: float) -> range:
+    """Word lengths that can still reach `cutoff`: ratio is at most 2*min/(a+b)"""
+    return range(math.ceil(length * cutoff / (2 - cutoff)), math.floor(length * (2 - cutoff) / cutoff) + 1)
+
+
+@dataclass
+class EntityMatch:
+    name: str
+    score: float
+    entity_type: str
+
+
+@dataclass
+class Resolution:
+    """A span of a question replaced by the entity name it most likely meant"""
+    text: str
+    name: str
+    entity_type: str
+    score: float
+    start: int
+    end: int
+
+
+@dataclass
+class _Snapshot:
+    """One immutable build of the index; searches read whichever snapshot is current"""
+    keys: List[str] = field(default_factory=list)
+    display: List[str] = field(default_factory=list)
+    type_masks: List[int] = field(default_factory=list)
+    source_masks: List[int] = field(default_factory=list)
+    key_ids: Dict[str, int] = field(default_factory=dict)
+    # (word length, trigram) -> ids of one-word keys
+    word_grams: Dict[Tuple[int, str], List[int]] = field(default_factory=dict)
+    # word length -> ids of one-word keys
+    word_lengths: Dict[int, List[int]] = field(default_factory=dict)
+    # (word id, word id) for words at most PAIR_SPAN apart -> ids of the multi-word keys
+    word_pairs: Dict[Tuple[int, int], List[int]] = field(default_factory=dict)
+    # multi-word key id -> ids of its words
+    name_word_ids: Dict[int, Tuple[int, ...]] = field(default_factory=dict)
+    type_bits: Dict[str, int] = field(default_factory=dict)
+    source_bits: Dict[str, int] = field(default_factory=dict)
+    names: int = 0
+
+    def add(self, key: str, display: str, type_bit: int, source_bit: int) -> Tuple[int, bool]:
+        kid = self.key_ids.get(key)
+        if kid is not None:
+            self.type_masks[kid] |= type_bit
+            self.source_masks[kid] |= source_bit
+            return kid, False
+        kid = len(self.keys)
+        self.key_ids[key] = kid
+        self.keys.append(key)
+        self.display.append(display)
+        self.type_masks.append(type_bit)
+        self.source_masks.append(source_bit)
+        return kid, True
+
+    def type_of(self, kid: int, type_mask: int) -> str:
+        mask = self.type_masks[kid] & type_mask
+        return next(name for name, bit in self.type_bits.items() if mask & bit)
+
+
+def build_snapshot(entries: Iterable[Tuple[str, str, str]]) -> _Snapshot:
+    """Index (name, entity type, source) entries"""
+    snapshot = _Snapshot()
+    for name, entity_type, source in entries:
+        words = name_words(name)
+        if not words:
+            continue
+        type_bit = snapshot.type_bits.setdefault(entity_type, 1 << len(snapshot.type_bits))
+        source_bit = snapshot.source_bits.setdefault(source, 1 << len(snapshot.source_bits))
+        key = " ".join(word.lower() for word in words)
+        kid, _ = snapshot.add(key, name.strip(), type_bit, source_bit)
+        snapshot.names += 1
+        if len(words) == 1:
+            continue
+        word_ids = [snapshot.add(word.lower(), word, type_bit, source_bit)[0] for word in words if len(word) >= 2]
+        snapshot.name_word_ids[kid] = tuple(word_ids)
+        for i, first in enumerate(word_ids):
+            for second in word_ids[i + 1:i + 1 + PAIR_SPAN]:
+                containing = snapshot.word_pairs.setdefault((first, second), [])
+                if not containing or containing[-1] != kid:
+                    containing.append(kid)
+
+    # Trigram postings for every one-word key, including one-word names
+    for wid, key in enumerate(snapshot.keys):
+        if " " not in key:
+            snapshot.word_lengths.setdefault(len(key), []).append(wid)
+            for gram in trigrams(key):
+                snapshot.word_grams.setdefault((len(key), gram), []).append(wid)
+    return snapshot
+
+
+class EntityIndex:
+    """Fuzzy lookup of entity names, kept per source and rebuilt as a whole on change"""
+
+    def __init__(self):
+        self._sources: Dict[str, List[Tuple[str, str]]] = {}
+        self._snapshot = _Snapshot()
+        self.build_ms = 0.0
+
+    def replace(self, source: str, entries: Iterable[Tuple[str, str]]):
+        """Replace the (name, entity type) entries of one source and swap in a rebuilt index"""
+        self._sources[source] = list(entries)
+        started = time.perf_counter()
+        snapshot = build_snapshot(
+            (name, entity_type, source_name)
+            for source_name, source_entries in list(self._sources.items())
+            for name, entity_type in source_entries
+        )
+        self._snapshot = snapshot
+        self.build_ms = (time.perf_counter() - started) * 1000
+
+    def contains(self, term: str, source: Optional[str] = None) -> bool:
+        snapshot = self._snapshot
+        kid = snapshot.key_ids.get(normalize(term))
+        if kid is None:
+            return False
+        return source is None or bool(snapshot.source_masks[kid] & snapshot.source_bits.get(source, 0))
+
+    def search(self, term: str, entity_type: Optional[str] = None, limit: int = 3, cutoff: float = 0.6,
+               source: Optional[str] = None) -> List[EntityMatch]:
+        """Names closest to `term` with a difflib ratio of at least `cutoff`, best first
+
+        An unknown `entity_type` searches all types, like the old hardcoded lists did.
+        """
+        snapshot = self._snapshot
+        query = normalize(term)
+        if not query:
+            return []
+        type_mask = snapshot.type_bits.get(entity_type, ALL) if entity_type else ALL
+        source_mask = snapshot.source_bits.get(source, 0) if source else ALL
+        if sum(len(word) >= 2 for word in query.split()) >= 2:
+            scored = self._similar_names(snapshot, query, cutoff, type_mask, source_mask, {}, limit)
+        else:
+            scored = self._similar_words(snapshot, max(query.split(), key=len), cutoff, type_mask, source_mask)
+        scored.sort(key=lambda item: (-item[0], snapshot.keys[item[1]]))
+        return [
+            EntityMatch(snapshot.display[kid], score, snapshot.type_of(kid, type_mask))
+            for score, kid in scored[:limit]
+        ]
+
+    def _similar_words(self, snapshot: _Snapshot, word: str, cutoff: float, type_mask: int = ALL,
+                       source_mask: int = ALL, shortlist: int = WORD_SHORTLIST) -> List[Tuple[float, int]]:
+        lengths = length_range(len(word), cutoff)
+        postings_by_gram = []
+        for gram in trigrams(word):
+            postings = [postings for length in lengths for postings in (snapshot.word_grams.get((length, gram)),)
+                        if postings]
+            if postings:
+                postings_by_gram.append((sum(map(len, postings)), postings))
+        # Rarest trigrams first; the most common ones (usually the padded first
+        # letter) are skipped once half of the trigrams have been counted
+        postings_by_gram.sort(key=itemgetter(0))
+        counts = Counter()
+        counted = 0
+        for i, (size, postings) in enumerate(postings_by_gram):
+            if counted + size > POSTINGS_BUDGET and i >= (len(postings_by_gram) + 1) // 2:
+                break
+            for ids in postings:
+                counts.update(ids)
+            counted += size
+        if not counts:
+            return []
+        items = counts.items()
+        if type_mask != ALL or source_mask != ALL:
+            # Filter before shortlisting so other types cannot crowd out the wanted one
+            items = [(kid, count) for kid, count in items
+                     if snapshot.type_masks[kid] & type_mask and snapshot.source_masks[kid] & source_mask]
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(word)
+        return self._score(snapshot, matcher, (kid for kid, _ in heapq.nlargest(shortlist, items, key=itemgetter(1))),
+                           cutoff)
+
+    def _similar_names(self, snapshot: _Snapshot, query: str, cutoff: float, type_mask: int, source_mask: int,
+                       word_cache: Dict[str, List[Tuple[float, int]]], limit: int) -> List[Tuple[float, int]]:
+        words = [word for word in query.split() if len(word) >= 2]
+        for word in words:
+            if word not in word_cache:
+                word_cache[word] = sorted(
+                    self._similar_words(snapshot, word, NAME_WORD_CUTOFF, shortlist=NAME_WORD_SHORTLIST), reverse=True
+                )
+            if not word_cache[word]:
+                return []
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(query)
+        seen = set()
+        scored = []
+        exact = snapshot.key_ids.get(query)
+        if exact is not None:
+            seen.add(exact)
+            if snapshot.type_masks[exact] & type_mask and snapshot.source_masks[exact] & source_mask:
+                scored = self._score(snapshot, matcher, [exact], cutoff)
+        if len(words) < 2:
+            return scored
+        # Names made of each word's closest matches are scored first; looser word
+        # matches only widen the search while fewer than `limit` names qualify
+        for slack in NAME_WORD_SLACK:
+            if len(scored) >= limit or len(seen) >= NAME_SHORTLIST:
+                break
+            matched = []
+            for word in words:
+                matches = word_cache[word]
+                matched.append([wid for score, wid in matches if score >= matches[0][0] - slack])
+            # Names holding a match of the first two words close together, then
+            # checked for the remaining words
+            rest = [set(ids) for ids in matched[2:]]
+            fresh = []
+            for first in matched[0]:
+                for second in matched[1]:
+                    for kid in snapshot.word_pairs.get((first, second), ()):
+                        if kid in seen:
+                            continue
+                        seen.add(kid)
+                        contained = snapshot.name_word_ids[kid]
+                        if (snapshot.type_masks[kid] & type_mask and snapshot.source_masks[kid] & source_mask
+                                and all(not ids.isdisjoint(contained) for ids in rest)):
+                            fresh.append(kid)
+            scored.extend(self._score(snapshot, matcher, fresh[:NAME_SHORTLIST], cutoff))
+        return scored
+
+    @staticmethod
+    def _score(snapshot: _Snapshot, matcher: difflib.SequenceMatcher, kids: Iterable[int],
+               cutoff: float) -> List[Tuple[float, int]]:
+        scored = []
+        for kid in kids:
+            matcher.set_seq1(snapshot.keys[kid])
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                score = matcher.ratio()
+                if score >= cutoff:
+                    scored.append((score, kid))
+        return scored
+
+    def _words_within(self, snapshot: _Snapshot, word: str, budget: int, source_mask: int) -> Dict[int, int]:
+        """Every one-word key within `budget` edits of `word`, as {word id: edits}
+
+        One edit changes at most four of a word's padded trigrams, so a word
+        within `budget` edits shares all but 4 * budget of them. Postings are
+        counted in full, with no shortlist; words too short for that bound are
+        compared with every word of a possible length.
+        """
+        if budget == 0:
+            wid = snapshot.key_ids.get(word)
+            return {wid: 0} if wid is not None and snapshot.source_masks[wid] & source_mask else {}
+        lengths = range(max(1, len(word) - budget), len(word) + budget + 1)
+        grams = trigrams(word)
+        required = len(grams) - 4 * budget
+        if required <= 0:
+            candidates = [wid for length in lengths for wid in snapshot.word_lengths.get(length, ())]
+        else:
+            counts = Counter()
+            for gram in grams:
+                for length in lengths:
+                    postings = snapshot.word_grams.get((length, gram))
+                    if postings:
+                        counts.update(postings)
+            candidates = [wid for wid, count in counts.items() if count >= required]
+        found = {}
+        for wid in candidates:
+            if snapshot.source_masks[wid] & source_mask:
+                edits = edit_distance(word, snapshot.keys[wid], budget)
+                if edits <= budget:
+                    found[wid] = edits
+        return found
+
+    def _names_within(self, snapshot: _Snapshot, words: List[str], budget: int, source_mask: int) -> Dict[int, int]:
+        """Every name of as many words within `budget` edits of the query, as {key id: edits}"""
+        matches = []
+        for word in words:
+            found = self._words_within(snapshot, word, word_budget(word, budget), source_mask)
+            if not found:
+                return {}
+            matches.append(found)
+
+        query = " ".join(words)
+        names: Dict[int, int] = {}
+        for first, first_edits in matches[0].items():
+            for second, second_edits in matches[1].items():
+                if first_edits + second_edits > budget:
+                    continue
+                for kid in snapshot.word_pairs.get((first, second), ()):
+                    if kid in names or not snapshot.source_masks[kid] & source_mask:
+                        continue
+                    ids = snapshot.name_word_ids[kid]
+                    # Word by word: the name's words are the matched words, in the same order
+                    if (len(ids) != len(words) or ids[0] != first or ids[1] != second
+                            or any(wid not in found for wid, found in zip(ids[2:], matches[2:]))):
+                        continue
+                    edits = edit_distance(query, snapshot.keys[kid], budget)
+                    if edits <= budget:
+                        names[kid] = edits
+        return names
+
+    def _is_inflection(self, snapshot: _Snapshot, word: str) -> bool:
+        """A plural or inflected form of a known word or entity kind ("Teams", "Engineers", "Policies")"""
+        if word in snapshot.key_ids:
+            return False
+        return word in ENTITY_WORDS or any(
+            base in snapshot.key_ids or base in ENTITY_WORDS for base in inflection_bases(word)
+        )
+
+    def resolve_names(self, text: str, cutoff: float = ENTITY_RESOLVE_CUTOFF, margin: float = ENTITY_RESOLVE_MARGIN,
+                      source: str = GRAPH_SOURCE) -> Tuple[str, List[Resolution]]:
+        """Rewrite misspelled entity names in a question; returns (text, resolutions)
+
+        Runs of up to MAX_NAME_WORDS words are tried longest first. A run that is
+        already a known name is left alone, and so is a run holding a plural or
+        inflected form of a known word. Otherwise every name with as many words
+        within the edit budget is scored by similarity (1 - edits / length), and
+        the run is replaced when the best name is at least `cutoff` similar and
+        at least `margin` ahead of every other name. A run that names close to it
+        exist for but that none wins is left alone as a whole. Single words are
+        only considered when capitalized and not part of a longer capitalized
+        run, so ordinary words are never "corrected" into surnames and one word
+        of an unknown full name is not swapped for another person's.
+        """
+        snapshot = self._snapshot
+        source_mask = snapshot.source_bits.get(source, 0)
+        if not source_mask:
+            return text, []
+
+        tokens = []
+        for match in _TOKEN.finditer(text):
+            start, end = match.span()
+            if match.group().lower().endswith(("'s", "’s")):
+                end -= 2
+            tokens.append((start, end))
+
+        def capitalized(k: int) -> bool:
+            word = text[tokens[k][0]:tokens[k][1]]
+            return word[:1].isupper() and word.lower() not in STOPWORDS
+
+        def joined(k: int) -> bool:
+            # Tokens k - 1 and k read as one name: both capitalized, separated by spaces only,
+            # and the first is not just the capitalized opening word of a sentence
+            if not 1 <= k < len(tokens) or not (capitalized(k - 1) and capitalized(k)):
+                return False
+            if text[tokens[k - 1][1]:tokens[k][0]].strip():
+                return False
+            return k > 1 and not text[:tokens[k - 1][0]].rstrip().endswith((".", "?", "!"))
+
+        threshold = cutoff - margin
+        resolutions = []
+        i = 0
+        while i < len(tokens):
+            consumed = 1
+            for n in range(min(MAX_NAME_WORDS, len(tokens) - i), 0, -1):
+                start, end = tokens[i][0], tokens[i + n - 1][1]
+                span = text[start:end]
+                first, last = text[tokens[i][0]:tokens[i][1]], text[tokens[i + n - 1][0]:end]
+                if first.lower() in STOPWORDS or last.lower() in STOPWORDS:
+                    continue
+                query = normalize(span)
+                kid = snapshot.key_ids.get(query)
+                if kid is not None and snapshot.source_masks[kid] & source_mask:
+                    consumed = n
+                    break
+                words = query.split()
+                if any(len(word) < 2 or self._is_inflection(snapshot, word) for word in words):
+                    continue
+                # Edits that keep a name at least `threshold` similar, so every possible runner-up is scored
+                budget = int(len(query) * (1 - threshold) / threshold + 1e-9)
+                if len(words) == 1:
+                    if not (span[:1].isupper() and len(query) >= 4):
+                        continue
+                    if joined(i) or joined(i + 1):
+                        # Part of a longer name that matched nothing as a whole
+                        continue
+                    candidates = self._words_within(snapshot, query, word_budget(query, budget), source_mask)
+                else:
+                    candidates = self._names_within(snapshot, words, budget, source_mask)
+                if not candidates:
+                    continue
+                scored = sorted(
+                    ((1 - edits / max(len(query), len(snapshot.keys[kid])), kid) for kid, edits in candidates.items()),
+                    key=itemgetter(0), reverse=True,
+                )
+                score, kid = scored[0]
+                if score >= cutoff and (len(scored) == 1 or scored[1][0] <= score - margin + 1e-9):
+                    resolutions.append(Resolution(span, snapshot.display[kid], snapshot.type_of(kid, ALL),
+                                                  score, start, end))
+                    consumed = n
+                    break
+                if n > 1:
+                    # Names close to the whole run exist but none clearly wins; correcting
+                    # single words of it would only pick one of them arbitrarily
+                    consumed = n
+                    break
+            i += consumed
+
+        for resolution in reversed(resolutions):
+            text = text[:resolution.start] + resolution.name + text[resolution.end:]
+        return text, resolutions
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "names": snapshot.names,
+            "keys": len(snapshot.keys),
+            "sources": {name: len(entries) for name, entries in self._sources.items()},
+            "build_ms": round(self.build_ms, 1),
+        }
+
+
+def names_digest(entries: List[Tuple[str, str]]) -> str:
+    """Order-independent hash of (name, entity type) entries"""
+    digest = hashlib.sha1()
+    for name, entity_type in sorted(entries):
+        digest.update(f"{entity_type}\t{name}\n".encode())
+    return digest.hexdigest()
+
+
+class EntityIndexRefresher:
+    """Reloads entity names from FalkorDB and rebuilds the index when they changed"""
+
+    def __init__(
+        self,
+        index: EntityIndex,
+        graph_factory: Callable[[], Any],
+        interval: float = ENTITY_INDEX_REFRESH,
+        min_interval: float = ENTITY_INDEX_MIN_INTERVAL,
+        labels: Optional[Dict[str, str]] = None,
+    ):
+        # graph_factory returns a FalkorDB graph; it is called from the executor
+        self.index = index
+        self.graph_factory = graph_factory
+        self.interval = interval
+        self.min_interval = min_interval
+        self.labels = labels if labels is not None else ENTITY_LABELS
+        self._digest: Optional[str] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.last_refresh_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    # --- lifecycle -------------------------------------------------------
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_refresh(self):
+        """Reload soon, e.g. after a write that may have added or renamed entities"""
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Entity index refresh failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Writes are announced in bursts; reloading once per burst is enough
+            remaining = self.min_interval - (time.monotonic() - started)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+
+    # --- loading ---------------------------------------------------------
+
+    async def refresh(self) -> bool:
+        """Reload the names; returns True when they changed and the index was rebuilt"""
+        loop = asyncio.get_event_loop()
+        started = time.perf_counter()
+        entries, digest = await loop.run_in_executor(None, self._load)
+        changed = digest != self._digest
+        if changed:
+            await loop.run_in_executor(None, self.index.replace, GRAPH_SOURCE, entries)
+            self._digest = digest
+            self.rebuilds += 1
+            logger.info(f"Entity index rebuilt with {len(entries)} names in {self.index.build_ms:.0f} ms")
+        self.refreshes += 1
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+        self.last_error = None
+        return changed
+
+    def _load(self) -> Tuple[List[Tuple[str, str]], str]:
+        graph = self.graph_factory()
+        entries = []
+        for label, entity_type in self.labels.items():
+            result = graph.ro_query(ENTITY_NAMES_QUERY.format(label=label))
+            entries.extend((row[0], entity_type) for row in result.result_set if isinstance(row[0], str))
+        return entries, names_digest(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.index.stats(),
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "last_refresh_ms": round(self.last_refresh_ms, 1),
+            "last_error": self.last_error,
+        }
+
+
+# Shared by the error handler and the chat query path; graph names are added by EntityIndexRefresher
+entity_index = EntityIndex()
@@ -6,18 +6,24 @@ and "did you mean?" functionality for failed queries.
 """
 
 import re
-import difflib
 from typing import Dict, List, Optional, Tuple
 import logging
 
+from entity_index import EntityIndex, entity_index
+
 logger = logging.getLogger(__name__)
 
 class QueryErrorHandler:
     """Handles query errors and provides helpful suggestions"""
     
-    def __init__(self):
+    def __init__(self, index: Optional[EntityIndex] = None):
         self.common_entities = self._load_common_entities()
         self.error_mappings = self._initialize_error_mappings()
+        # Fuzzy lookups run against this vocabulary plus the names loaded from the graph
+        self.index = index if index is not None else entity_index
+        self.index.replace("builtin", [
+            (name, entity_type) for entity_type, names in self.common_entities.items() for name in names
+        ])
         
     def _load_common_entities(self) -> Dict[str, List[str]]:
         """Load common entity names that users might search for"""
@@ -67,32 +73,10 @@ class QueryErrorHandler:
     
     def find_similar_entities(self, search_term: str, entity_type: str = None) -> List[Tuple[str, float]]:
         """Find similar entity names using fuzzy matching"""
-        candidates = []
-        
-        if entity_type and entity_type in self.common_entities:
-            candidates = self.common_entities[entity_type]
-        else:
-            # Search across all entity types
-            for entities in self.common_entities.values():
-                candidates.extend(entities)
-        
-        # Use difflib to find close matches
-        close_matches = difflib.get_close_matches(
-            search_term.lower(), 
-            [c.lower() for c in candidates], 
-            n=3, 
-            cutoff=0.6
-        )
-        
-        # Calculate similarity scores
-        results = []
-        for match in close_matches:
-            ratio = difflib.SequenceMatcher(None, search_term.lower(), match).ratio()
-            # Find original case version
-            original = next((c for c in candidates if c.lower() == match), match)
-            results.append((original, ratio))
-        
-        return sorted(results, key=lambda x: x[1], reverse=True)
+        return [
+            (match.name, match.score)
+            for match in self.index.search(search_term, entity_type, limit=3, cutoff=0.6)
+        ]
     
     def parse_falkor_error(self, error_message: str) -> Dict[str, any]:
         """Parse FalkorDB error message and return structured error info"""
@@ -203,12 +187,12 @@ class QueryErrorHandler:
         # Add "did you mean?" suggestions if we can identify typos
         did_you_mean = []
         words = re.findall(r'\b\w+\b', user_query.lower())
-        for word in words:
-            if len(word) > 3:  # Only check longer words
-                for entity_type, entities in self.common_entities.items():
-                    similar = self.find_similar_entities(word, entity_type)
-                    if similar and similar[0][1] > 0.8:  # High similarity
-                        did_you_mean.append(f"Did you mean '{similar[0][0]}' instead of '{word}'?")
+        for word in dict.fromkeys(words):
+            # Only check longer words that are not already a known name
+            if len(word) > 3 and not self.index.contains(word):
+                similar = self.find_similar_entities(word)
+                if similar and similar[0][1] > 0.8:  # High similarity
+                    did_you_mean.append(f"Did you mean '{similar[0][0]}' instead of '{word}'?")
         
         if did_you_mean:
             response["help"]["did_you_mean"] = did_you_mean[:2]
@@ -0,0 +1,329 @@
+"""
+Retrieval-based few-shot selection for the `generate_query` prompt
+
+`prompts/generate_query.txt` (~36 KB: full schema, rules and ~80 worked
+examples) used to be sent whole for every question, and its prefill
+dominated generation time on 8B models. This module parses that file once
+into its parts and builds a smaller prompt per question:
+
+* the instructions (semantic rules, generation rules, special cases) are
+  always kept verbatim
+* the top-k examples are picked with BM25 over the example titles,
+  questions and the labels/relationships their queries use; questions that
+  produced results in production (the successful-query log) are indexed
+  too
+* only the schema lines for the labels involved (labels in the question
+  and in the picked examples, plus Person) and the relationships between
+  them are included
+
+The prompt file stays the single source of truth; edits are picked up on
+the next call. Enabled with FEW_SHOT_RETRIEVAL=true. Compare accuracy with
+`tools/comprehensive_model_evaluation.py --prompt retrieval`.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+FEW_SHOT_RETRIEVAL = os.getenv("FEW_SHOT_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+FEW_SHOT_K = int(os.getenv("FEW_SHOT_K", 8))
+# JSON lines of {"question", "query"} for generated queries that returned rows;
+# without it, successful queries are only indexed for the life of the process
+SUCCESSFUL_QUERY_LOG = os.getenv("SUCCESSFUL_QUERY_LOG", "")
+# Logged examples kept in the index (oldest dropped first)
+MAX_LOGGED_EXAMPLES = int(os.getenv("FEW_SHOT_MAX_LOGGED", 500))
+
+_SECTION = re.compile(r"^[A-Z0-9][A-Z0-9 /&()'-]*:$")
+_NODE_LINE = re.compile(r"^- (\w+): ")
+_REL_LINE = re.compile(r"^- \((\w+)\)-\[:(\w+)[^\]]*\]->\((\w+)\)")
+_QUERY_LABEL = re.compile(r"\(\s*\w*\s*:\s*([A-Z]\w*)")
+_QUERY_REL = re.compile(r"\[\s*\w*\s*:\s*([A-Z_]+)")
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i in is it me my of on or our show
+that the their there these this to us what when where which who whom whose why with find list
+all get give tell any some are was were will would should could
+""".split())
+
+# Question words that point at a label without naming it
+LABEL_SYNONYMS = {
+    "employee": "Person", "staff": "Person", "people": "Person", "engineer": "Person",
+    "developer": "Person", "manager": "Person", "report": "Person", "mentor": "Person",
+    "customer": "Client", "revenue": "Client", "mrr": "Client",
+    "oncall": "Schedule", "call": "Schedule", "coverage": "Schedule", "rotation": "Schedule",
+    "outage": "Incident", "p0": "Incident", "p1": "Incident",
+    "gdpr": "Compliance", "hipaa": "Compliance", "sox": "Compliance", "audit": "Compliance",
+    "residency": "DataResidency", "region": "CloudRegion", "cloud": "CloudRegion",
+    "component": "PlatformComponent", "service": "Metric", "latency": "Metric", "sla": "Metric",
+    "availability": "Metric", "timezone": "Office", "city": "Office", "country": "Office",
+    "speak": "Language", "sprint": "Sprint", "velocity": "Sprint", "skill": "Skill",
+    "expert": "Skill", "visa": "Visa", "sponsorship": "Visa",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, with a light plural strip"""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _split_camel(name: str) -> str:
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", name).replace("_", " ")
+
+
+@dataclass
+class Example:
+    title: str
+    question: str
+    query: str
+    category: str = ""
+    labels: Set[str] = field(default_factory=set)
+
+    def __post_init__(self):
+        if not self.labels:
+            self.labels = set(_QUERY_LABEL.findall(self.query))
+
+    def search_text(self) -> str:
+        relations = " ".join(_split_camel(r) for r in _QUERY_REL.findall(self.query))
+        labels = " ".join(_split_camel(label) for label in self.labels)
+        return f"{self.title} {self.question} {labels} {relations}"
+
+    def render(self) -> str:
+        title = self.title if self.title.endswith(":") else f"{self.title}:"
+        return f'{title}\n- Question: "{self.question}"\n- Query: {self.query}'
+
+
+@dataclass
+class PromptParts:
+    header: str
+    nodes: Dict[str, str]
+    relationships: List[Tuple[str, str, str]]
+    instructions: List[str]
+    examples: List[Example]
+    footer: str
+
+
+def parse_prompt(text: str) -> PromptParts:
+    """Split generate_query.txt into header, schema, instruction sections and examples"""
+    lines = text.splitlines()
+    header: List[str] = []
+    nodes: Dict[str, str] = {}
+    relationships: List[Tuple[str, str, str]] = []
+    instructions: List[str] = []
+    examples: List[Example] = []
+    footer = ""
+
+    section: Optional[str] = None
+    section_lines: List[str] = []
+    section_examples = 0
+
+    def close_section():
+        # Sections made only of worked examples are replaced by the retrieved ones
+        if section and section != "SCHEMA:" and section_examples == 0:
+            instructions.append("\n".join([section, *section_lines]).strip())
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if stripped.startswith("REMEMBER:"):
+            footer = stripped
+        elif _SECTION.match(stripped):
+            close_section()
+            section, section_lines, section_examples = stripped, [], 0
+        elif section is None:
+            header.append(line)
+        elif section == "SCHEMA:":
+            node = _NODE_LINE.match(stripped)
+            relation = _REL_LINE.match(stripped)
+            if relation:
+                relationships.append((relation.group(1), stripped, relation.group(3)))
+            elif node:
+                nodes[node.group(1)] = stripped
+        elif (stripped.endswith(":") and i + 2 < len(lines)
+              and lines[i + 1].strip().startswith("- Question:")
+              and lines[i + 2].strip().startswith("- Query:")):
+            question = lines[i + 1].strip()[len("- Question:"):].strip().strip('"')
+            query = lines[i + 2].strip()[len("- Query:"):].strip()
+            examples.append(Example(stripped, question, query, category=section.rstrip(":")))
+            section_examples += 1
+            i += 3
+            continue
+        else:
+            section_lines.append(line)
+        i += 1
+    close_section()
+
+    return PromptParts("\n".join(header).strip(), nodes, relationships, instructions, examples, footer)
+
+
+class BM25Index:
+    """Okapi BM25 over small documents; pure Python, fine for a few thousand examples"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: List[Counter] = []
+        self.lengths: List[int] = []
+        self.df: Counter = Counter()
+
+    def add(self, tokens: List[str]):
+        counts = Counter(tokens)
+        self.docs.append(counts)
+        self.lengths.append(len(tokens))
+        self.df.update(counts.keys())
+
+    def scores(self, query_tokens: List[str]) -> List[float]:
+        n = len(self.docs)
+        if not n:
+            return []
+        avg_len = sum(self.lengths) / n or 1.0
+        idf = {t: math.log(1 + (n - self.df[t] + 0.5) / (self.df[t] + 0.5)) for t in set(query_tokens) if self.df[t]}
+        results = []
+        for counts, length in zip(self.docs, self.lengths):
+            score = 0.0
+            for token, weight in idf.items():
+                tf = counts.get(token)
+                if tf:
+                    score += weight * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_len))
+            results.append(score)
+        return results
+
+    def top(self, query_tokens: List[str], k: int) -> List[int]:
+        scored = [(s, i) for i, s in enumerate(self.scores(query_tokens)) if s > 0]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [i for _, i in scored[:k]]
+
+
+class FewShotSelector:
+    """Builds per-question generate_query prompts from retrieved examples"""
+
+    def __init__(self, prompt_path: str = "prompts/generate_query.txt",
+                 log_path: Optional[str] = SUCCESSFUL_QUERY_LOG, k: int = FEW_SHOT_K):
+        self.prompt_path = Path(prompt_path)
+        self.log_path = Path(log_path) if log_path else None
+        self.k = k
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self.parts: Optional[PromptParts] = None
+        self.logged: List[Example] = []
+        self._logged_questions: Set[str] = set()
+        self.index = BM25Index()
+        self.examples: List[Example] = []
+        self._load_log()
+
+    def _load_log(self):
+        if not self.log_path or not self.log_path.exists():
+            return
+        try:
+            with open(self.log_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._remember(entry.get("question", ""), entry.get("query", ""))
+        except OSError as e:
+            logger.warning(f"Cannot read successful query log {self.log_path}: {e}")
+
+    def _remember(self, question: str, query: str) -> bool:
+        key = " ".join(tokenize(question))
+        if not key or not query or key in self._logged_questions:
+            return False
+        self._logged_questions.add(key)
+        self.logged.append(Example(question, question, query, category="LOGGED"))
+        if len(self.logged) > MAX_LOGGED_EXAMPLES:
+            dropped = self.logged.pop(0)
+            self._logged_questions.discard(" ".join(tokenize(dropped.question)))
+        return True
+
+    def _refresh(self):
+        """(Re)parse the prompt file when it changed and rebuild the index"""
+        mtime = self.prompt_path.stat().st_mtime
+        if self.parts is not None and mtime == self._mtime:
+            return
+        self.parts = parse_prompt(self.prompt_path.read_text())
+        self._mtime = mtime
+        self._rebuild()
+
+    def _rebuild(self):
+        self.examples = list(self.parts.examples) + list(self.logged)
+        self.index = BM25Index()
+        for example in self.examples:
+            self.index.add(tokenize(example.search_text()))
+
+    def record_success(self, question: str, query: str):
+        """Add a generated query that returned rows to the index and the log"""
+        with self._lock:
+            if not self._remember(question, query):
+                return
+            if self.parts is not None:
+                self._rebuild()
+            if self.log_path:
+                try:
+                    self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.log_path, "a") as f:
+                        f.write(json.dumps({"question": question, "query": query}) + "\n")
+                except OSError as e:
+                    logger.warning(f"Cannot write successful query log {self.log_path}: {e}")
+
+    def select(self, question: str, k: Optional[int] = None) -> List[Example]:
+        with self._lock:
+            self._refresh()
+            picked = [self.examples[i] for i in self.index.top(self._query_tokens(question), k or self.k)]
+        if not picked:
+            # Nothing matched lexically: fall back to the first (most general) examples
+            picked = self.parts.examples[:k or self.k]
+        return picked
+
+    def _query_tokens(self, question: str) -> List[str]:
+        tokens = tokenize(question)
+        # Synonyms also match the label names that examples are indexed with
+        extra = [t for token in tokens if token in LABEL_SYNONYMS
+                 for t in tokenize(_split_camel(LABEL_SYNONYMS[token]))]
+        return tokens + extra
+
+    def labels_for(self, question: str, examples: List[Example]) -> Set[str]:
+        labels = {"Person"}
+        for example in examples:
+            labels |= example.labels
+        tokens = set(tokenize(question))
+        for label in self.parts.nodes:
+            if set(tokenize(_split_camel(label))) & tokens:
+                labels.add(label)
+        labels |= {LABEL_SYNONYMS[t] for t in tokens if t in LABEL_SYNONYMS}
+        return labels & set(self.parts.nodes)
+
+    def build_prompt(self, question: str, k: Optional[int] = None) -> str:
+        """Compact generate_query prompt (without the trailing Question/Query lines)"""
+        examples = self.select(question, k)
+        parts = self.parts
+        labels = self.labels_for(question, examples)
+
+        node_lines = [line for label, line in parts.nodes.items() if label in labels]
+        rel_lines = [line for src, line, dst in parts.relationships if src in labels and dst in labels]
+        sections = [
+            parts.header,
+            "SCHEMA:\n\nNodes:\n" + "\n".join(node_lines) + "\n\nRelationships:\n" + "\n".join(rel_lines),
+            *parts.instructions,
+            "RELEVANT EXAMPLES:\n\n" + "\n\n".join(example.render() for example in examples),
+        ]
+        if parts.footer:
+            sections.append(parts.footer)
+        return "\n\n".join(section for section in sections if section)
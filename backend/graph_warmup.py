@@ -0,0 +1,328 @@
+"""
+Background graph warm-up and readiness tracking
+
+Application startup used to seed FalkorDB synchronously, so an empty graph
+held `/health` (and every other route) hostage for minutes. The warm-up job
+now runs after the server is accepting connections:
+
+    connecting -> checking -> seeding (only if SeedStats is missing)
+               -> indexing -> ready
+
+Progress is exposed through `progress()` for the `/ready` endpoint, and
+routes that need the graph answer with a quick "warming up" reply until
+`is_ready` is true. Connection attempts are retried until FalkorDB comes up.
+
+With several workers or replicas, every one of them finds the same empty
+graph. Seeding is therefore done under a Redis lock (`SET NX PX`, renewed
+while seeding runs): the worker holding it seeds, and the others poll the
+seed status until it is done. A holder that dies lets the lock expire and
+another worker takes over.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds between FalkorDB connection attempts while it is still starting
+WARMUP_RETRY_DELAY = float(os.getenv("WARMUP_RETRY_DELAY", 2.0))
+
+WARMUP_STEPS = ["starting", "connecting", "checking", "seeding", "indexing", "ready"]
+
+# Redis service shared by all workers, and the lock that lets only one of them seed
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6380))
+SEED_LOCK_KEY = "graph_warmup:seed_lock"
+# Milliseconds the lock lives without renewal; the holder renews it every third of that
+SEED_LOCK_TTL_MS = int(os.getenv("SEED_LOCK_TTL_MS", 30000))
+
+# Delete the lock only if this worker still holds it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("del", KEYS[1]) end
+return 0
+"""
+_EXTEND_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("pexpire", KEYS[1], ARGV[2]) end
+return 0
+"""
+
+
+class RedisSeedLock:
+    """Cross-worker seeding lock in Redis; blocking, called from the executor
+
+    When Redis is unavailable the lock is always granted, which is exactly the
+    single-worker behaviour.
+    """
+
+    def __init__(self, host: str = REDIS_HOST, port: int = REDIS_PORT, key: str = SEED_LOCK_KEY,
+                 ttl_ms: int = SEED_LOCK_TTL_MS):
+        self.host = host
+        self.port = port
+        self.key = key
+        self.ttl_ms = ttl_ms
+        self.token = uuid.uuid4().hex
+        self._redis = None
+
+    def _client(self):
+        if self._redis is None:
+            import redis  # Imported on first use to keep cold start fast
+            self._redis = redis.Redis(host=self.host, port=self.port, decode_responses=True)
+        return self._redis
+
+    def acquire(self) -> bool:
+        try:
+            return bool(self._client().set(self.key, self.token, nx=True, px=self.ttl_ms))
+        except Exception as e:
+            logger.warning(f"Seed lock unavailable, seeding without it: {e}")
+            return True
+
+    def extend(self) -> bool:
+        try:
+            return bool(self._client().eval(_EXTEND_SCRIPT, 1, self.key, self.token, self.ttl_ms))
+        except Exception as e:
+            logger.warning(f"Could not renew the seed lock: {e}")
+            return False
+
+    def release(self):
+        try:
+            self._client().eval(_RELEASE_SCRIPT, 1, self.key, self.token)
+        except Exception as e:
+            logger.warning(f"Could not release the seed lock: {e}")
+
+
+class ProgressGraph:
+    """Graph proxy that counts writes so seeding progress can be reported"""
+
+    def __init__(self, graph, warmup: "GraphWarmup"):
+        self._graph = graph
+        self._warmup = warmup
+
+    def query(self, q, *args, **kwargs):
+        self._warmup.record_query(q)
+        return self._graph.query(q, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._graph, name)
+
+
+class ProgressClient:
+    """FalkorDB client proxy whose graphs report seeding progress"""
+
+    def __init__(self, client, warmup: "GraphWarmup"):
+        self._client = client
+        self._warmup = warmup
+
+    def select_graph(self, name):
+        return ProgressGraph(self._client.select_graph(name), self._warmup)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class GraphWarmup:
+    """Runs seeding and index creation in the background and tracks readiness"""
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        seed_fn: Optional[Callable[[Any], Any]] = None,
+        index_fn: Optional[Callable[[Any], Any]] = None,
+        graph_name: str = "agent_poc",
+        retry_delay: float = WARMUP_RETRY_DELAY,
+        seed_lock: Optional[Any] = None,
+    ):
+        # All callables are blocking and run in the executor
+        self.client_factory = client_factory
+        self.seed_fn = seed_fn
+        self.index_fn = index_fn
+        self.graph_name = graph_name
+        self.retry_delay = retry_delay
+        # acquire() / extend() / release(), shared with the other workers; None seeds unconditionally
+        self.seed_lock = seed_lock
+
+        self.step = "starting"
+        self.message = "Waiting for warm-up to start"
+        self.error: Optional[str] = None
+        self.seeded_now = False
+        self.connect_attempts = 0
+        self.seed_queries = 0
+        self.seed_current = ""
+        self.started_at = time.monotonic()
+        self.ready_at: Optional[float] = None
+        self.step_started_at = self.started_at
+
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._on_ready: List[Callable[[], Any]] = []
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def warming_up(self) -> bool:
+        """True while the warm-up job has been started but has not finished"""
+        return self._task is not None and not self.is_ready
+
+    def on_ready(self, callback: Callable[[], Any]):
+        """Run `callback` (sync or async) once the graph is ready"""
+        self._on_ready.append(callback)
+
+    # --- lifecycle -------------------------------------------------------
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _set_step(self, step: str, message: str):
+        self.step = step
+        self.message = message
+        self.step_started_at = time.monotonic()
+        logger.info(f"Graph warm-up: {message}")
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+
+        # FalkorDB may still be starting alongside us; keep trying
+        self._set_step("connecting", "Connecting to FalkorDB")
+        while True:
+            self.connect_attempts += 1
+            try:
+                client = await loop.run_in_executor(None, self.client_factory)
+                break
+            except Exception as e:
+                self.error = str(e)
+                self.message = f"Waiting for FalkorDB (attempt {self.connect_attempts})"
+                await asyncio.sleep(self.retry_delay)
+        self.error = None
+
+        try:
+            self._set_step("checking", "Checking seed status")
+            seeded = await loop.run_in_executor(None, self._is_seeded, client)
+
+            if not seeded and self.seed_fn:
+                await self._seed_once(client)
+
+            if self.index_fn:
+                self._set_step("indexing", "Creating indexes")
+                await loop.run_in_executor(None, self.index_fn, client)
+        except Exception as e:
+            # Serve anyway: a partially seeded graph is more useful than none
+            self.error = str(e)
+            logger.error(f"Graph warm-up failed during {self.step}: {e}")
+
+        self._set_step("ready", "Graph ready" if not self.error else f"Graph ready with errors: {self.error}")
+        self.ready_at = time.monotonic()
+        self._ready.set()
+
+        for callback in self._on_ready:
+            try:
+                result = callback()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Warm-up ready callback failed: {e}")
+
+    async def _seed_once(self, client):
+        """Seed unless another worker does; waits for that worker to finish"""
+        loop = asyncio.get_event_loop()
+        lock = self.seed_lock
+        if lock is not None and not await loop.run_in_executor(None, lock.acquire):
+            self._set_step("seeding", "Another worker is seeding the graph, waiting for it")
+            while True:
+                await asyncio.sleep(self.retry_delay)
+                if await loop.run_in_executor(None, self._is_seeded, client):
+                    return
+                if await loop.run_in_executor(None, lock.acquire):
+                    break
+
+        keepalive = asyncio.create_task(self._keep_lock()) if lock is not None else None
+        try:
+            # The previous holder may have finished while we waited for the lock
+            if lock is not None and await loop.run_in_executor(None, self._is_seeded, client):
+                return
+            self._set_step("seeding", "Database is empty, seeding with test data")
+            await loop.run_in_executor(None, self.seed_fn, ProgressClient(client, self))
+            self.seeded_now = True
+        finally:
+            if keepalive is not None:
+                keepalive.cancel()
+                await loop.run_in_executor(None, lock.release)
+
+    async def _keep_lock(self):
+        """Renew the seed lock until seeding finishes"""
+        loop = asyncio.get_event_loop()
+        interval = getattr(self.seed_lock, "ttl_ms", SEED_LOCK_TTL_MS) / 3000
+        while True:
+            await asyncio.sleep(interval)
+            if not await loop.run_in_executor(None, self.seed_lock.extend):
+                logger.warning("Lost the seed lock while seeding; another worker may start seeding too")
+                return
+
+    def _is_seeded(self, client) -> bool:
+        db = client.select_graph(self.graph_name)
+        try:
+            result = db.query("MATCH (s:SeedStats) RETURN s.people_count, s.teams_count")
+        except Exception:
+            return False  # Graph might not exist yet
+        if result.result_set:
+            stats = result.result_set[0]
+            self.message = f"Database already seeded with {stats[0]} people, {stats[1]} teams"
+            return True
+        return False
+
+    def record_query(self, query: str):
+        """Called from the seeding thread for every write"""
+        self.seed_queries += 1
+        # "CREATE (p:Person {...})" -> "Person"
+        head = query.lstrip()[:80]
+        if ":" in head:
+            label = head.split(":", 1)[1]
+            label = label.split(" ", 1)[0].split("{", 1)[0].split(")", 1)[0].split("(", 1)[0]
+            if label:
+                self.seed_current = label
+
+    def progress(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        index = WARMUP_STEPS.index(self.step) if self.step in WARMUP_STEPS else 0
+        progress = {
+            "ready": self.is_ready,
+            "step": self.step,
+            "step_number": index,
+            "total_steps": len(WARMUP_STEPS) - 1,
+            "message": self.message,
+            "elapsed_seconds": round((self.ready_at or now) - self.started_at, 2),
+            "step_elapsed_seconds": round(now - self.step_started_at, 2),
+            "connect_attempts": self.connect_attempts,
+            "error": self.error,
+        }
+        if self.step == "seeding" or self.seeded_now:
+            progress["seed_queries"] = self.seed_queries
+            progress["seed_current"] = self.seed_current
+        return progress
+
+    def warming_up_message(self) -> str:
+        detail = self.message
+        if self.step == "seeding":
+            detail = f"seeding test data ({self.seed_queries} writes so far, now {self.seed_current or 'starting'})"
+        return f"⏳ The knowledge graph is still warming up: {detail}. Please try again in a moment."
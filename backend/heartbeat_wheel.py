@@ -0,0 +1,161 @@
+"""
+Shared WebSocket heartbeat scheduler based on a hashed timer wheel
+
+Instead of one sleeping asyncio task per connection, a single task advances a
+wheel of `interval / tick` slots. Each connection lives in one slot and is
+pinged whenever the cursor passes it, i.e. once per `interval`. All pings due
+in a tick share one serialized frame. Liveness is tracked in a flat array of
+last-seen timestamps; connections silent for longer than `timeout` are evicted.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Ping every 30 seconds (same cadence as the old per-connection loop)
+HEARTBEAT_INTERVAL = 30.0
+# Wheel resolution; pings are batched per tick
+HEARTBEAT_TICK = 1.0
+# Evict peers that have not sent anything (pong or message) for 3 intervals
+HEARTBEAT_TIMEOUT = 90.0
+
+
+class HeartbeatWheel:
+    """Single-task heartbeat scheduler for all WebSocket connections"""
+
+    def __init__(
+        self,
+        send: Callable[[Any, str], Any],
+        on_dead: Callable[[Any], Any],
+        interval: float = HEARTBEAT_INTERVAL,
+        tick: float = HEARTBEAT_TICK,
+        timeout: float = HEARTBEAT_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.send = send
+        self.on_dead = on_dead
+        self.tick = tick
+        self.timeout = timeout
+        self.clock = clock
+        self.slot_count = max(1, int(round(interval / tick)))
+        self.slots: List[Set[Any]] = [set() for _ in range(self.slot_count)]
+        self.cursor = 0
+
+        # Compact liveness storage: connection -> (slot, index into _last_seen)
+        self._slot_of: Dict[Any, int] = {}
+        self._index_of: Dict[Any, int] = {}
+        self._last_seen = array("d")
+        self._free: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.ticks = 0
+        self.pings_sent = 0
+        self.evicted = 0
+        self.last_tick_ms = 0.0
+        self.max_tick_ms = 0.0
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    # --- registration ----------------------------------------------------
+
+    def register(self, websocket):
+        """Schedule heartbeats for a connection; first ping after one full interval"""
+        if websocket in self._slot_of:
+            return
+        slot = (self.cursor - 1) % self.slot_count
+        self.slots[slot].add(websocket)
+        self._slot_of[websocket] = slot
+
+        if self._free:
+            index = self._free.pop()
+            self._last_seen[index] = self.clock()
+        else:
+            index = len(self._last_seen)
+            self._last_seen.append(self.clock())
+        self._index_of[websocket] = index
+
+    def unregister(self, websocket):
+        slot = self._slot_of.pop(websocket, None)
+        if slot is None:
+            return
+        self.slots[slot].discard(websocket)
+        self._free.append(self._index_of.pop(websocket))
+
+    def touch(self, websocket):
+        """Record that the peer is alive (pong or any other inbound frame)"""
+        index = self._index_of.get(websocket)
+        if index is not None:
+            self._last_seen[index] = self.clock()
+
+    # --- scheduling ------------------------------------------------------
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.tick
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            try:
+                self.advance()
+            except Exception as e:
+                logger.warning(f"Heartbeat tick failed: {e}")
+
+    def advance(self):
+        """Process the slot under the cursor and move the cursor one slot forward"""
+        started = time.perf_counter()
+        now = self.clock()
+        due = self.slots[self.cursor]
+        self.cursor = (self.cursor + 1) % self.slot_count
+
+        if due:
+            dead = [ws for ws in due if now - self._last_seen[self._index_of[ws]] > self.timeout]
+            for websocket in dead:
+                self.unregister(websocket)
+                self.evicted += 1
+                self.on_dead(websocket)
+
+            if due:
+                # One frame for every ping due in this tick
+                ping_json = json.dumps({"type": "ping", "timestamp": datetime.now().isoformat()})
+                # Copy: a failed send may unregister the connection mid-iteration
+                batch = list(due)
+                for websocket in batch:
+                    self.send(websocket, ping_json)
+                self.pings_sent += len(batch)
+
+        self.ticks += 1
+        self.last_tick_ms = (time.perf_counter() - started) * 1000
+        self.max_tick_ms = max(self.max_tick_ms, self.last_tick_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self),
+            "slots": self.slot_count,
+            "tick_seconds": self.tick,
+            "ticks": self.ticks,
+            "pings_sent": self.pings_sent,
+            "evicted": self.evicted,
+            "last_tick_ms": round(self.last_tick_ms, 3),
+            "max_tick_ms": round(self.max_tick_ms, 3),
+        }
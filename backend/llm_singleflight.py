@@ -0,0 +1,137 @@
+"""
+Single-flight coalescing of identical LLM requests
+
+When several users ask the same question at once, or the same results are
+formatted for more than one connection, each caller used to send its own
+identical request to Ollama and the GPU worked through them one after the
+other. Requests are now keyed by (model, hash of the rendered prompt): the
+first caller starts the Ollama call and later identical callers await the
+same call and share its result or its exception.
+
+Cancellation is per waiter. A caller that is cancelled (its WebSocket closed,
+its task timed out) stops waiting, but the shared call keeps running while
+any other waiter remains; it is cancelled only when the last waiter leaves.
+
+With LLM_RESPONSE_CACHE_TTL > 0, successful responses are also kept for that
+many seconds (up to LLM_RESPONSE_CACHE_SIZE entries) so a repeat shortly
+after the call finished is answered without a request. Errors are never
+cached.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+# Seconds a response is reused after its call finished; 0 disables the cache
+LLM_RESPONSE_CACHE_TTL = float(os.getenv("LLM_RESPONSE_CACHE_TTL", 0))
+LLM_RESPONSE_CACHE_SIZE = int(os.getenv("LLM_RESPONSE_CACHE_SIZE", 256))
+
+_MISS = object()
+
+
+def prompt_key(model: str, prompt_text: str) -> Tuple[str, str]:
+    return model, hashlib.sha256(prompt_text.encode()).hexdigest()
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Shares one in-flight call (and optionally its cached result) per key"""
+
+    def __init__(self, enabled: bool = LLM_SINGLE_FLIGHT, cache_ttl: float = LLM_RESPONSE_CACHE_TTL,
+                 cache_size: int = LLM_RESPONSE_CACHE_SIZE):
+        self.enabled = enabled
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._cache: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.abandoned = 0
+
+    def _cached(self, key: Hashable) -> Any:
+        entry = self._cache.get(key)
+        if entry is None:
+            return _MISS
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._cache[key]
+            return _MISS
+        self._cache.move_to_end(key)
+        return value
+
+    def _store(self, key: Hashable, value: Any):
+        self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _finish(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        # Retrieved here so a failure nobody awaited any more is not logged as unhandled
+        error = task.exception()
+        if error is None and self.cache_ttl > 0:
+            self._store(key, task.result())
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of `call()`, shared with concurrent callers using the same key"""
+        if not self.enabled:
+            self.calls += 1
+            return await call()
+
+        if self.cache_ttl > 0:
+            cached = self._cached(key)
+            if cached is not _MISS:
+                self.cache_hits += 1
+                return cached
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight, task))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # Shielded: cancelling one waiter must not cancel the call the others wait for
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Last waiter left; later identical requests start a fresh call
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                flight.task.cancel()
+                self.abandoned += 1
+                logger.debug(f"Cancelled shared call {key!r}: no waiters left")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._inflight),
+            "waiting": sum(flight.waiters for flight in self._inflight.values()),
+            "cache_ttl": self.cache_ttl,
+            "cached": len(self._cache),
+        }
@@ -1,24 +1,48 @@
+# Must come first so the import hook can time every module below (STARTUP_PROFILE=1)
+import startup_profiler
+startup_profiler.install_from_env()
+
 import asyncio
 import json
 import os
 import traceback
+import time
 from datetime import datetime
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-import falkordb
 import re
-import httpx
-from jinja2 import Template
 from pathlib import Path
+from types import SimpleNamespace
 from dotenv import load_dotenv
 from datetime import datetime
 # from seed_data import seed_database  # Commented out - seed_data is in scripts folder
 import logging
 from query_patterns import match_and_generate_query
 from error_handler import handle_query_error
+from query_validator import is_write_query
+from entity_index import ENTITY_RESOLUTION, EntityIndexRefresher, entity_index
 from streaming_utils import ResponseStreamer, StreamingFormatter, create_progress_messages
 from api.dashboard import router as dashboard_router
-from typing import Set
+from api.dashboard_feed import dashboard_feed
+from connection_queue import ClientSendQueue, QueuedWebSocket
+from ws_broker import RedisBroadcastBroker
+from heartbeat_wheel import HeartbeatWheel
+from message_tasks import ConnectionTaskManager
+from message_store import MessageWriteBehindQueue, STORE_MESSAGES_QUERY
+from message_retention import MessageRetentionManager
+from graph_warmup import GraphWarmup, RedisSeedLock
+from result_rendering import QueryResultSet, log_result_set, setup_results_logging, stop_results_logging
+from result_pagination import RESULT_PAGE_SIZE, ResultCursorStore, paginate_query, split_page
+from result_compaction import RESULT_SUMMARY_MAX_ROWS, ResultSummarizer, compact_for_prompt
+from result_formatters import format_locally, formatting_stats
+from ollama_prefix_cache import OLLAMA_WARMUP, OllamaPrefixCache
+from few_shot_retrieval import FEW_SHOT_RETRIEVAL, FewShotSelector
+from model_router import ModelRouter
+from llm_singleflight import SingleFlight, prompt_key
+from analysis_output import ANALYSIS_FORMAT, read_analysis
+from cypher_stream import STREAMING_CYPHER, extraction_stats, read_cypher
+from fastapi.responses import JSONResponse
+from typing import Iterable, Optional, Set
 
 # Load environment variables from .env file
 load_dotenv()
@@ -27,76 +51,155 @@ load_dotenv()
 class WebSocketManager:
     def __init__(self):
         self.active_connections: Set[WebSocket] = set()
-        self.heartbeat_tasks: dict[WebSocket, asyncio.Task] = {}
+        # Outbound queue + writer task per connection; the only sender on each socket
+        self.send_queues: dict[WebSocket, ClientSendQueue] = {}
+        # One shared scheduler pings every connection and evicts dead peers
+        self.heartbeat = HeartbeatWheel(
+            send=lambda ws, ping_json: self.enqueue(ws, ping_json, coalesce_key="ping"),
+            on_dead=self._evict
+        )
     
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.add(websocket)
+        queue = ClientSendQueue(websocket, on_failure=self.disconnect)
+        queue.start()
+        self.send_queues[websocket] = queue
         logging.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
         
-        # Start heartbeat task for this connection
-        heartbeat_task = asyncio.create_task(self._heartbeat_loop(websocket))
-        self.heartbeat_tasks[websocket] = heartbeat_task
+        # Schedule heartbeats for this connection
+        self.heartbeat.register(websocket)
+        self.heartbeat.start()
     
     def disconnect(self, websocket: WebSocket):
+        if websocket not in self.active_connections:
+            return
         self.active_connections.discard(websocket)
+        dashboard_feed.unsubscribe(websocket)
         
-        # Cancel heartbeat task
-        if websocket in self.heartbeat_tasks:
-            task = self.heartbeat_tasks[websocket]
-            task.cancel()
-            del self.heartbeat_tasks[websocket]
+        queue = self.send_queues.pop(websocket, None)
+        if queue:
+            queue.close()
+        
+        # Stop heartbeats
+        self.heartbeat.unregister(websocket)
         
         logging.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
     
-    async def _heartbeat_loop(self, websocket: WebSocket):
-        """Send periodic ping frames to keep connection alive"""
-        try:
-            while True:
-                await asyncio.sleep(30)  # Send ping every 30 seconds
-                try:
-                    # Send ping frame
-                    await websocket.send_text(json.dumps({
-                        "type": "ping",
-                        "timestamp": datetime.now().isoformat()
-                    }))
-                except Exception as e:
-                    logging.debug(f"Heartbeat failed: {e}")
-                    break
-        except asyncio.CancelledError:
-            logging.debug("Heartbeat task cancelled")
-            pass
+    def enqueue(self, websocket: WebSocket, message_json: str, coalesce_key: Optional[str] = None) -> bool:
+        """Queue a message for a connection's writer task without waiting for the send"""
+        queue = self.send_queues.get(websocket)
+        return queue.put(message_json, coalesce_key) if queue else False
     
-    async def broadcast_dashboard_update(self, message: dict):
-        """Broadcast dashboard updates to all connected clients"""
-        if not self.active_connections:
-            return
+    def _evict(self, websocket: WebSocket):
+        """Drop a peer that stopped answering heartbeats"""
+        logging.info("Evicting unresponsive WebSocket")
+        self.disconnect(websocket)
         
-        message_json = json.dumps({"type": "dashboard_update", **message})
-        disconnected = set()
-        
-        for connection in self.active_connections:
+        async def close():
             try:
-                await connection.send_text(message_json)
-            except Exception as e:
-                logging.warning(f"Failed to send dashboard update: {e}")
-                disconnected.add(connection)
+                await websocket.close(code=1001)
+            except Exception:
+                pass
+        asyncio.create_task(close())
+    
+    async def broadcast_dashboard_update(self, message: dict, connections: Optional[Iterable[WebSocket]] = None):
+        """Broadcast dashboard updates to the given clients (default: all connected clients)
+        
+        The payload is serialized once and enqueued on every target's send queue, so
+        fan-out cost does not depend on how fast each client reads.
+        """
+        targets = [c for c in connections if c in self.active_connections] if connections is not None \
+            else list(self.active_connections)
+        if not targets:
+            return
         
-        # Remove disconnected clients
-        for conn in disconnected:
-            self.disconnect(conn)
+        message_json = json.dumps({"type": "dashboard_update", **message}, default=str)
+        for connection in targets:
+            # Later dashboard deltas supersede earlier undelivered ones
+            self.enqueue(connection, message_json, coalesce_key="dashboard_update")
+    
+    def connection_stats(self) -> dict:
+        """Per-connection send queue and lag metrics plus aggregates"""
+        per_connection = []
+        for websocket, queue in self.send_queues.items():
+            client = getattr(websocket, "client", None)
+            per_connection.append({
+                "client": f"{client.host}:{client.port}" if client else None,
+                **queue.stats()
+            })
+        lags = sorted(c["last_lag_ms"] for c in per_connection)
+        return {
+            "connections": len(per_connection),
+            "total_queued": sum(c["queue_depth"] for c in per_connection),
+            "total_dropped": sum(c["dropped"] for c in per_connection),
+            "total_coalesced": sum(c["coalesced"] for c in per_connection),
+            "p50_lag_ms": lags[len(lags) // 2] if lags else 0.0,
+            "p99_lag_ms": lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0,
+            "max_lag_ms": max((c["max_lag_ms"] for c in per_connection), default=0.0),
+            "per_connection": per_connection
+        }
 
 # Initialize WebSocket manager
 manager = WebSocketManager()
 
+# Open result cursors (query text + offset only), bounded per connection
+result_cursors = ResultCursorStore()
+
+# Relays broadcasts between uvicorn workers so `--workers N` reaches every socket
+broker = RedisBroadcastBroker()
+
+async def _on_dashboard_broadcast(payload: dict):
+    """Apply a dashboard update received from any worker to this worker's change feed"""
+    panel = payload.get("panel")
+    if panel and payload.get("data") is not None:
+        dashboard_feed.apply_changes({panel: payload["data"]})
+        await dashboard_feed.publish()
+    else:
+        dashboard_feed.request_refresh()
+    # Dashboard updates follow graph writes, which may add or rename entities
+    entity_refresher.request_refresh()
+
+broker.register("dashboard", _on_dashboard_broadcast)
+
+async def broadcast_dashboard_update(update_type: str = None, data: dict = None):
+    """
+    Push a dashboard panel update to subscribed WebSocket clients on every worker
+    
+    Each worker applies it to its own change feed, whose versions are scoped to
+    that worker by the feed epoch.
+    
+    Args:
+        update_type: Panel name (e.g., 'incidents', 'metrics', 'teams'); omit to recompute every panel
+        data: New panel contents; when omitted the panel is recomputed by the change feed
+    """
+    await broker.publish("dashboard", {"panel": update_type, "data": data})
+
+startup_profiler.mark("imports_done")
+
 app = FastAPI()
 
-# Set global logging level
-logging.basicConfig(level=logging.DEBUG)
+# Log level is configurable; DEBUG logs every Ollama payload and is opt-in
+logging.basicConfig(level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO))
 
 # Include routers
 app.include_router(dashboard_router)
 
+@app.middleware("http")
+async def warming_up_gate(request, call_next):
+    """Answer dashboard API calls immediately while the graph is still warming up"""
+    if request.url.path.startswith("/api/dashboard") and graph_warmup.warming_up:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": "5"},
+            content={
+                "status": "warming_up",
+                "message": graph_warmup.warming_up_message(),
+                "progress": graph_warmup.progress()
+            }
+        )
+    return await call_next(request)
+
 # Add CORS middleware to allow frontend connections
 app.add_middleware(
     CORSMiddleware,
@@ -106,16 +209,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+startup_profiler.mark("app_created")
+
 @app.on_event("startup")
 async def startup_event():
-    """Ensure database is seeded on application startup"""
-    print("🚀 Starting application and checking database...")
-    try:
-        ensure_database_seeded()
-        print("✅ Database initialization completed")
-    except Exception as e:
-        print(f"❌ Database initialization failed: {e}")
-        # Don't raise to prevent app from failing to start
+    """Start background services; seeding runs in the background so startup returns at once"""
+    print("🚀 Starting application, graph warm-up runs in the background...")
+    # Query result tables are formatted and written on a background logging thread
+    setup_results_logging()
+    
+    with startup_profiler.phase("graph_warmup.start"):
+        graph_warmup.start()
+    
+    with startup_profiler.phase("broker.start"):
+        await broker.start()
+    with startup_profiler.phase("message_store.start"):
+        message_store.start()
+    
+    # Load the model and prime static prompt prefixes without delaying startup
+    with startup_profiler.phase("ollama_prefixes.register"):
+        ollama_prefixes.register_prompts()
+    if OLLAMA_WARMUP:
+        ollama_warmup_task = asyncio.create_task(ollama_prefixes.warm_up())
+        background_tasks.add(ollama_warmup_task)
+        ollama_warmup_task.add_done_callback(background_tasks.discard)
+    
+    startup_profiler.mark("startup_complete")
+    if startup_profiler.PROFILE_ENABLED:
+        startup_profiler.print_report()
+        startup_profiler.write_report()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in list(background_tasks):
+        task.cancel()
+    await graph_warmup.stop()
+    # Drain buffered chat messages before the process exits
+    await message_store.stop()
+    await message_retention.stop()
+    await manager.heartbeat.stop()
+    await broker.stop()
+    await dashboard_feed.stop()
+    await entity_refresher.stop()
+    stop_results_logging()
 
 def get_ollama_client():
     """Get Ollama client and configuration"""
@@ -123,11 +259,26 @@ def get_ollama_client():
     model = os.getenv('OLLAMA_MODEL', 'granite-3.3:8b')
     return host, model
 
+# Top-k example retrieval for generate_query (FEW_SHOT_RETRIEVAL=true)
+few_shot_selector = FewShotSelector()
+
+# Keep-alive, warm-up and (with OLLAMA_PREFIX_CACHE=true) reuse of static prompt prefixes
+ollama_prefixes = OllamaPrefixCache(get_ollama_client)
+background_tasks = set()
+
+# Per-task models and the small-to-large cascade for query generation (MODEL_CASCADE=true)
+model_router = ModelRouter(lambda: get_ollama_client()[1])
+
+# Identical concurrent prompts share one Ollama call (and, with LLM_RESPONSE_CACHE_TTL, its result)
+llm_flights = SingleFlight()
+
 def get_falkor_client():
     host = os.getenv('FALKOR_HOST', 'falkordb')  # Use Docker service name
     port = int(os.getenv('FALKOR_PORT', 6379))
     
     try:
+        import falkordb  # Imported on first use to keep cold start fast
+        
         # Add connection timeout to prevent hanging
         falkor_client = falkordb.FalkorDB(host=host, port=port, socket_connect_timeout=10, socket_timeout=10)
         
@@ -141,31 +292,170 @@ def get_falkor_client():
         print("Make sure FalkorDB is running and accessible")
         raise e
 
-def ensure_database_seeded():
-    """Ensure database is seeded on startup"""
+async def run_graph_query(cypher_query, params=None, timeout=15):
+    """Run a Cypher query in the executor; cancellation also aborts the query
+    
+    The query carries a server-side timeout so FalkorDB stops the work itself.
+    If the awaiting task is cancelled (client sent a cancel frame or went away),
+    the client's sockets are closed so the executor thread unblocks instead of
+    waiting for a result nobody will read.
+    """
+    falkor_holder = {}
+    
+    def execute_query():
+        falkor = get_falkor_client()
+        falkor_holder["client"] = falkor
+        db = falkor.select_graph("agent_poc")
+        return db.query(cypher_query, params, timeout=int(timeout * 1000))
+    
     try:
-        falkor_client = get_falkor_client()
-        db = falkor_client.select_graph("agent_poc")
-        
-        # Check if database needs seeding
-        try:
-            result = db.query("MATCH (s:SeedStats) RETURN s.people_count, s.teams_count")
-            if not result.result_set:
-                print("Database is empty, seeding with test data...")
-                seed_database(falkor_client)
-            else:
-                stats = result.result_set[0]
-                print(f"Database already seeded with {stats[0]} people, {stats[1]} teams")
-        except Exception as e:
-            print(f"Error checking seed status: {e}")
-            print("Attempting to seed database...")
+        result = await asyncio.wait_for(
+            asyncio.get_event_loop().run_in_executor(None, execute_query),
+            timeout=timeout
+        )
+    except asyncio.CancelledError:
+        falkor = falkor_holder.get("client")
+        if falkor is not None:
             try:
-                seed_database(falkor_client)
-            except Exception as seed_error:
-                print(f"Error seeding database: {seed_error}")
-                
+                falkor.connection.connection_pool.disconnect()
+            except Exception as e:
+                logging.debug(f"Failed to abort cancelled FalkorDB query: {e}")
+        raise
+    
+    # Dashboards and entity names on every worker follow writes to the graph
+    if is_write_query(cypher_query):
+        await broadcast_dashboard_update()
+    return result
+
+def slice_page(result_set, offset, page_size):
+    """One page of an in-memory result; returns (QueryResultSet, has_more)"""
+    rows = result_set.rows
+    return QueryResultSet(result_set.columns, rows[offset:offset + page_size]), len(rows) > offset + page_size
+
+async def run_query_page(cypher_query, offset=0, page_size=RESULT_PAGE_SIZE, timeout=15):
+    """Run one page of a read query; returns (QueryResultSet, has_more, buffered)
+    
+    Pageable queries get a stable ORDER BY and SKIP/LIMIT with one look-ahead
+    row, so at most page_size + 1 rows are ever held. Queries that can't be
+    rewritten safely (UNION, RETURN *, writes, a parameter LIMIT, an ORDER BY
+    before the final RETURN) run once; `buffered` is then the whole result,
+    which the cursor keeps so later pages are sliced from it instead of
+    re-running the query. It is None for paged queries.
+    """
+    paged_query = paginate_query(cypher_query, offset, page_size + 1)
+    if paged_query is None:
+        buffered = QueryResultSet.from_graph_result(await run_graph_query(cypher_query, timeout=timeout))
+        return (*slice_page(buffered, offset, page_size), buffered)
+    
+    result_set = QueryResultSet.from_graph_result(await run_graph_query(paged_query, timeout=timeout))
+    rows, has_more = split_page(result_set.rows, page_size)
+    return QueryResultSet(result_set.columns, rows), has_more, None
+
+async def summarize_remaining_rows(cypher_query, offset, summarizer, buffered=None):
+    """Feed rows past the first page into the summarizer (one bounded query, rows not kept)"""
+    remaining = RESULT_SUMMARY_MAX_ROWS - offset
+    if remaining <= 0:
+        summarizer.complete = False
+        return
+    if buffered is not None:
+        rest, more = slice_page(buffered, offset, remaining)
+        summarizer.add_records(rest.records)
+        summarizer.complete = not more
+        return
+    try:
+        rest, more, _ = await run_query_page(cypher_query, offset, remaining)
+        summarizer.add_records(rest.records)
+        summarizer.complete = not more
     except Exception as e:
-        print(f"Failed to ensure database seeded: {e}")
+        logging.warning(f"Could not scan remaining rows for the result summary: {e}")
+        summarizer.complete = False
+
+def connection_of(websocket):
+    """The underlying connection (per-request TaggedWebSocket and QueuedWebSocket wrappers share it)"""
+    while hasattr(websocket, "raw_websocket"):
+        websocket = websocket.raw_websocket
+    return websocket
+
+async def fetch_result_page(cursor_id, websocket):
+    """Answer a fetch_page frame with the next page of an open result cursor"""
+    cursor = result_cursors.get(connection_of(websocket), str(cursor_id or ""))
+    if cursor is None:
+        await websocket.send_text(json.dumps({
+            "type": "error",
+            "cursor": cursor_id,
+            "message": "This result set has expired, please run the query again"
+        }))
+        return
+    
+    offset = cursor.next_offset
+    try:
+        if cursor.buffered is not None:
+            result_set, has_more = slice_page(cursor.buffered, offset, cursor.page_size)
+        else:
+            result_set, has_more, _ = await run_query_page(cursor.query, offset, cursor.page_size)
+    except Exception as e:
+        result_cursors.close(cursor.cursor_id)
+        await websocket.send_text(json.dumps({
+            "type": "error",
+            "cursor": cursor_id,
+            "message": f"Failed to fetch more results: {e}"
+        }))
+        return
+    
+    result_cursors.advance(cursor, len(result_set), has_more)
+    payload = result_set.payload(max_rows=cursor.page_size, offset=offset, has_more=has_more)
+    payload.update({
+        "type": "results_page",
+        "page": cursor.page,
+        "page_size": cursor.page_size,
+        "has_more": has_more,
+        "cursor": cursor.cursor_id if has_more else None
+    })
+    await websocket.send_text(json.dumps(payload, default=str))
+
+def store_messages_batch(rows):
+    """Write a batch of buffered chat messages with a single UNWIND query"""
+    falkor = get_falkor_client()
+    db = falkor.select_graph("agent_poc")
+    return db.query(STORE_MESSAGES_QUERY, {"rows": rows})
+
+# Write-behind buffer: store_message acknowledges at once, batches are flushed in the background
+message_store = MessageWriteBehindQueue(store_messages_batch)
+
+# TTL sweeper for old Message nodes (MESSAGE_RETENTION_DAYS, optional MESSAGE_ARCHIVE_DIR)
+message_retention = MessageRetentionManager(lambda: get_falkor_client().select_graph("agent_poc"))
+
+# Keeps the fuzzy entity name index (error suggestions, name resolution) in sync with the graph
+entity_refresher = EntityIndexRefresher(entity_index, lambda: get_falkor_client().select_graph("agent_poc"))
+
+def seed_graph(falkor_client):
+    """Seed the graph with test data (runs in the warm-up job's executor thread)"""
+    # Imported lazily: the seeder pulls in Faker and is only needed for an empty graph
+    from scripts.seed_data import seed_database
+    seed_database(falkor_client)
+
+def create_graph_indexes(falkor_client):
+    """Create any missing indexes on the warm-up's graph; existing ones are left untouched"""
+    from scripts.data_generators.database import IndexCreator
+    # IndexCreator only needs the connection's graph
+    IndexCreator(SimpleNamespace(db=falkor_client.select_graph("agent_poc"))).create_all_indexes()
+
+# Seeds and indexes the graph in the background; gates chat and dashboard until ready
+graph_warmup = GraphWarmup(get_falkor_client, seed_fn=seed_graph, index_fn=create_graph_indexes,
+                           seed_lock=RedisSeedLock())
+
+async def _start_graph_services():
+    """Services that query the graph start only once warm-up has finished"""
+    print("✅ Graph warm-up completed")
+    # Push dashboard changes to subscribed WebSocket clients
+    dashboard_feed.start(manager.broadcast_dashboard_update)
+    message_retention.start()
+    entity_refresher.start()
+    if graph_warmup.seeded_now:
+        # Other workers may have started their feeds against the empty graph
+        await broadcast_dashboard_update()
+
+graph_warmup.on_ready(_start_graph_services)
 
 def to_pig_latin(text):
     """Convert text to pig latin"""
@@ -215,79 +505,190 @@ def to_pig_latin(text):
     
     return ' '.join(pig_latin_words)
 
+# prompt name -> (file mtime, compiled template); compiled on first use
+_prompt_templates = {}
+
 def load_prompt(prompt_name, **kwargs):
     """Load and interpolate a prompt file"""
+    from jinja2 import Template
+    
     prompt_path = Path(f"prompts/{prompt_name}.txt")
     if not prompt_path.exists():
         raise FileNotFoundError(f"Prompt file not found: {prompt_path}")
     
-    with open(prompt_path, 'r') as f:
-        template_content = f.read()
+    mtime = prompt_path.stat().st_mtime
+    cached = _prompt_templates.get(prompt_name)
+    if cached is None or cached[0] != mtime:
+        with open(prompt_path, 'r') as f:
+            template_content = f.read()
+        cached = (mtime, Template(template_content))
+        _prompt_templates[prompt_name] = cached
     
-    template = Template(template_content)
-    rendered = template.render(**kwargs)
+    rendered = cached[1].render(**kwargs)
     return rendered
 
-async def call_ai_model(prompt_text, websocket=None, timeout=60):
-    """Call Ollama HTTP API direct for chat completions, handling streaming response"""
-    host, model = get_ollama_client()
+async def request_ollama(prompt_text, model, timeout=60, task=None, tier=None):
+    """Send one /api/generate request and return the response text"""
+    import httpx
+    
+    host = get_ollama_client()[0]
     url = f"{host}/api/generate"
-    full_response = ""
+    started = time.perf_counter()
     try:
         async with httpx.AsyncClient(timeout=timeout) as client:
+            # No history is kept: context is empty, or only the cached static prompt prefix
+            fields, prefix_name, reused = ollama_prefixes.prepare(model, prompt_text)
             payload = {
                 "model": model,
-                "prompt": prompt_text,
                 "stream": False,  # Disable streaming from Ollama
-                "context": []  # Force empty context for each call - no history maintained
+                **fields
             }
-            logging.debug(f"Sending request to Ollama: {payload}")
+            logging.debug(f"Sending request to {model} (prefix {prefix_name}, reused={reused})")
             resp = await client.post(url, json=payload)
             
             # Check for non-200 responses
             if resp.status_code != 200:
                 error_content = await resp.aread()
                 logging.error(f"Ollama API returned status {resp.status_code}: {error_content.decode()}")
-                if websocket:
-                    try:
-                        await websocket.send_text(json.dumps({
-                            "type": "error", 
-                            "message": f"AI request failed with status {resp.status_code}",
-                            "debug": error_content.decode()
-                        }))
-                    except (WebSocketDisconnect, ConnectionError):
-                        logging.warning("WebSocket disconnected while sending error")
                 resp.raise_for_status() # Will raise an exception
 
             data = resp.json()
-            logging.debug(f"Received response from Ollama: {data}")
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            ollama_prefixes.record(model, prefix_name, data, elapsed_ms, reused)
+            model_router.record(task, tier, model, elapsed_ms, data)
+            logging.debug(f"Received response from Ollama: {data.get('response')}")
             
             # Extract content from the non-streaming response
             if data.get('response'):
-                full_response = data['response']
-            else:
-                logging.warning("Ollama response did not contain expected content.")
-                full_response = "" # Return empty string if no content found
-
-        return full_response
-
+                return data['response']
+            logging.warning("Ollama response did not contain expected content.")
+            return "" # Return empty string if no content found
     except httpx.ReadTimeout:
         logging.error(f"Timeout error calling Ollama at {url}")
-        if websocket:
-            try:
-                await websocket.send_text(json.dumps({"type": "error", "message": "AI request timed out after 60 seconds."}))
-            except (WebSocketDisconnect, ConnectionError):
-                logging.warning("WebSocket disconnected while sending timeout error")
+        model_router.record(task, tier, model, (time.perf_counter() - started) * 1000, error=True)
         raise
     except Exception as e:
-        tb = traceback.format_exc()
-        logging.error(f"Error calling Ollama HTTP API at {url}: {e}\n{tb}")
-        if websocket:
-            try:
-                await websocket.send_text(json.dumps({"type": "error", "message": f"AI request failed: {e}", "debug": tb}))
-            except (WebSocketDisconnect, ConnectionError):
-                logging.warning("WebSocket disconnected while sending error")
-        raise e
+        logging.error(f"Error calling Ollama HTTP API at {url}: {e}\n{traceback.format_exc()}")
+        model_router.record(task, tier, model, (time.perf_counter() - started) * 1000, error=True)
+        raise
+
+async def send_ai_error(websocket, error, timeout=60):
+    """Tell the client an AI request failed"""
+    import httpx
+    
+    if not websocket:
+        return
+    if isinstance(error, httpx.HTTPStatusError):
+        frame = {
+            "type": "error",
+            "message": f"AI request failed with status {error.response.status_code}",
+            "debug": error.response.text
+        }
+    elif isinstance(error, httpx.ReadTimeout):
+        frame = {"type": "error", "message": f"AI request timed out after {timeout} seconds."}
+    else:
+        frame = {"type": "error", "message": f"AI request failed: {error}", "debug": traceback.format_exc()}
+    try:
+        await websocket.send_text(json.dumps(frame))
+    except (WebSocketDisconnect, ConnectionError):
+        logging.warning("WebSocket disconnected while sending error")
+
+async def call_ai_model(prompt_text, websocket=None, timeout=60, model=None, task=None, tier=None):
+    """Call Ollama HTTP API direct for chat completions, reporting failures to the websocket
+    
+    `task` selects the model through the router unless `model` is given.
+    Concurrent calls with the same model and prompt share one Ollama request
+    (the first caller's timeout applies to it).
+    """
+    model = model or model_router.model_for(task)
+    try:
+        return await llm_flights.run(
+            prompt_key(model, prompt_text),
+            lambda: request_ollama(prompt_text, model, timeout, task, tier)
+        )
+    except Exception as e:
+        await send_ai_error(websocket, e, timeout)
+        raise
+
+async def stream_ai_model(prompt_text, model, timeout=60, response_format=None, task=None, tier=None):
+    """Yield response text chunks from a streaming Ollama request
+    
+    Closing the generator early closes the connection, which stops generation.
+    """
+    import httpx
+    
+    host = get_ollama_client()[0]
+    url = f"{host}/api/generate"
+    fields, prefix_name, reused = ollama_prefixes.prepare(model, prompt_text)
+    payload = {"model": model, "stream": True, **fields}
+    if response_format is not None:
+        payload["format"] = response_format
+    started = time.perf_counter()
+    data = {}
+    failed = True
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            async with client.stream("POST", url, json=payload) as resp:
+                if resp.status_code != 200:
+                    error_content = await resp.aread()
+                    logging.error(f"Ollama API returned status {resp.status_code}: {error_content.decode()}")
+                    resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(data["error"])
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        break
+        failed = False
+    except (GeneratorExit, asyncio.CancelledError):
+        # Consumer stopped reading or was cancelled: not a model failure
+        failed = False
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        ollama_prefixes.record(model, prefix_name, data, elapsed_ms, reused)
+        model_router.record(task, tier, model, elapsed_ms, data, error=failed)
+
+async def analyze_message(prompt_text, websocket=None, timeout=60):
+    """Decide the tools for a message; returns as soon as `tools` and `response_type` are streamed"""
+    model = model_router.model_for("analyze")
+    try:
+        analysis = await read_analysis(
+            stream_ai_model(prompt_text, model, timeout, ANALYSIS_FORMAT, task="analyze")
+        )
+    except Exception as e:
+        logging.error(f"Error analyzing message with {model}: {e}")
+        await send_ai_error(websocket, e, timeout)
+        raise
+    logging.debug(f"Analysis ({analysis.source}): tools={analysis.tools} type={analysis.response_type}")
+    return analysis
+
+async def generate_cypher(prompt_text, websocket=None, timeout=60, model=None, task=None, tier=None):
+    """Stream a query-generating prompt and return the Cypher statement
+    
+    Generation is stopped as soon as the statement is complete
+    (STREAMING_CYPHER=false waits for the full completion instead).
+    """
+    if not STREAMING_CYPHER:
+        return clean_ai_generated_query(
+            await call_ai_model(prompt_text, websocket, timeout, model=model, task=task, tier=tier)
+        )
+    model = model or model_router.model_for(task)
+    
+    async def stream_query():
+        query, _ = await read_cypher(stream_ai_model(prompt_text, model, timeout, task=task, tier=tier))
+        return query
+    
+    try:
+        return await llm_flights.run(("cypher",) + prompt_key(model, prompt_text), stream_query)
+    except Exception as e:
+        logging.error(f"Error generating query with {model}: {e}")
+        await send_ai_error(websocket, e, timeout)
+        raise
 
 async def get_database_context():
     """Get sample data from the database to provide context"""
@@ -455,84 +856,17 @@ async def search_database(query, websocket=None):
             "messages": []
         }
 
-def log_query_results(cypher_query, result, websocket=None):
-    """Log query results in a formatted table similar to how the query is displayed"""
-    try:
-        if not result.result_set:
-            table_output = "**Query Results:** No results returned"
-        else:
-            # Get column headers
-            columns = [col[1] for col in result.header] if result.header else []
-            if not columns:
-                # Fallback for queries without headers
-                columns = [f"col_{i}" for i in range(len(result.result_set[0]))]
-            
-            # Calculate column widths
-            col_widths = [len(col) for col in columns]
-            for row in result.result_set:
-                for i, cell in enumerate(row):
-                    if i < len(col_widths):
-                        cell_str = str(cell) if cell is not None else "NULL"
-                        col_widths[i] = max(col_widths[i], len(cell_str))
-            
-            # Limit column width for readability
-            max_width = 50
-            col_widths = [min(w, max_width) for w in col_widths]
-            
-            # Build table
-            lines = []
-            
-            # Header row
-            header_row = "| " + " | ".join(col.ljust(col_widths[i]) for i, col in enumerate(columns)) + " |"
-            lines.append(header_row)
-            
-            # Separator row
-            separator = "|" + "|".join("-" * (w + 2) for w in col_widths) + "|"
-            lines.append(separator)
-            
-            # Data rows
-            for row in result.result_set:
-                row_cells = []
-                for i, cell in enumerate(row):
-                    if i < len(col_widths):
-                        cell_str = str(cell) if cell is not None else "NULL"
-                        # Truncate if too long
-                        if len(cell_str) > max_width:
-                            cell_str = cell_str[:max_width-3] + "..."
-                        row_cells.append(cell_str.ljust(col_widths[i]))
-                data_row = "| " + " | ".join(row_cells) + " |"
-                lines.append(data_row)
-            
-            table_output = f"**Query Results:** ({len(result.result_set)} rows)\n\n```\n" + "\n".join(lines) + "\n```"
-        
-        # Log to console
-        print(f"\n=== QUERY RESULTS ===")
-        print(f"Query: {cypher_query}")
-        print(table_output.replace("**Query Results:**", "Results:").replace("```", ""))
-        print("=" * 50)
-        
-        # Send to websocket if available
-        if websocket:
-            import asyncio
-            import json
-            # Create a future to send the table output
-            loop = asyncio.get_event_loop()
-            loop.create_task(websocket.send_text(json.dumps({
-                "type": "results",
-                "message": table_output
-            })))
-            
-    except Exception as e:
-        error_msg = f"Error formatting query results: {str(e)}"
-        print(error_msg)
-        if websocket:
-            import asyncio
-            import json
-            loop = asyncio.get_event_loop()
-            loop.create_task(websocket.send_text(json.dumps({
-                "type": "error", 
-                "message": error_msg
-            })))
+async def log_query_results(cypher_query, result_set, websocket=None, cursor=None, has_more=False):
+    """Log a summary (table rendering is deferred to the log thread) and send a structured results frame"""
+    log_result_set(cypher_query, result_set)
+    
+    if websocket:
+        try:
+            payload = result_set.payload(has_more=has_more)
+            payload.update({"page": 1, "page_size": RESULT_PAGE_SIZE, "has_more": has_more, "cursor": cursor})
+            await websocket.send_text(json.dumps(payload, default=str))
+        except Exception as e:
+            logging.warning(f"Failed to send query results: {e}")
 
 def analyze_query_reasoning(user_message):
     """Analyze user message to determine query reasoning and applicable policies"""
@@ -583,14 +917,36 @@ def analyze_query_reasoning(user_message):
     
     return reasoning, applicable_policy
 
+def clean_ai_generated_query(response_text):
+    """Clean up an AI-generated query (strip whitespace, extract it from code blocks)"""
+    cypher_query = response_text.strip()
+    if "```" in cypher_query:
+        # Extract query from code blocks
+        start = cypher_query.find("```")
+        if start >= 0:
+            start = cypher_query.find("\n", start) + 1
+            end = cypher_query.find("```", start)
+            if end > start:
+                cypher_query = cypher_query[start:end].strip()
+    return cypher_query
+
 async def execute_custom_query(user_message, websocket=None, enable_streaming=True):
     """Generate and execute a custom Cypher query based on user request"""
     try:
         # Initialize streamer if websocket is available
         streamer = ResponseStreamer(websocket) if websocket and enable_streaming else None
+        # Correct misspelled people, team, policy... names before matching and generation
+        if ENTITY_RESOLUTION:
+            user_message, resolutions = entity_index.resolve_names(user_message)
+            if resolutions and websocket:
+                await websocket.send_text(json.dumps({
+                    "type": "info",
+                    "message": "🔎 Interpreting " + ", ".join(f"'{r.text}' as '{r.name}'" for r in resolutions)
+                }))
         # First, try to match against pre-compiled patterns
         cypher_query = match_and_generate_query(user_message)
         pattern_matched = cypher_query is not None
+        generated_tier = None
         
         if pattern_matched:
             # Pattern matched - use pre-compiled query
@@ -615,24 +971,19 @@ async def execute_custom_query(user_message, websocket=None, enable_streaming=Tr
                     "message": message
                 }))
             
-            # Get AI model to generate the Cypher query
-            prompt = load_prompt("generate_query", user_message=user_message)
+            # Get AI model to generate the Cypher query; with retrieval only the
+            # relevant examples and schema are sent instead of the full prompt
+            if FEW_SHOT_RETRIEVAL:
+                prompt = few_shot_selector.build_prompt(user_message)
+            else:
+                prompt = load_prompt("generate_query", user_message=user_message)
             
             # Add the user's question to the prompt
             prompt += f"\n\nQuestion: \"{user_message}\"\nQuery:"
             
-            cypher_query = await call_ai_model(prompt, websocket)
-            
-            # Clean up the AI-generated query (remove any extra text)
-            cypher_query = cypher_query.strip()
-            if "```" in cypher_query:
-                # Extract query from code blocks
-                start = cypher_query.find("```")
-                if start >= 0:
-                    start = cypher_query.find("\n", start) + 1
-                    end = cypher_query.find("```", start)
-                    if end > start:
-                        cypher_query = cypher_query[start:end].strip()
+            cypher_query, generated_tier = await model_router.generate(
+                "generate_query", prompt, generate_cypher, websocket=websocket
+            )
         
         if websocket:
             await websocket.send_text(json.dumps({
@@ -642,16 +993,29 @@ async def execute_custom_query(user_message, websocket=None, enable_streaming=Tr
         
         # Execute the query
         
-        def execute_query():
-            falkor = get_falkor_client()
-            db = falkor.select_graph("agent_poc")
-            return db.query(cypher_query)
-        
         try:
-            result = await asyncio.wait_for(
-                asyncio.get_event_loop().run_in_executor(None, execute_query),
-                timeout=15
-            )
+            try:
+                # Only the first page is fetched; later pages are pulled through the cursor
+                result_set, has_more, buffered = await run_query_page(cypher_query)
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                # A small-model query that FalkorDB rejects is regenerated once by the larger model
+                escalation = generated_tier and model_router.next_tier("generate_query", generated_tier)
+                if not escalation:
+                    raise
+                model_router.record_escalation("generate_query", generated_tier, "query error")
+                generated_tier, model = escalation
+                logging.info(f"Generated query failed ({e}); regenerating with {model}")
+                cypher_query = await generate_cypher(
+                    prompt, websocket, model=model, task="generate_query", tier=generated_tier
+                )
+                if websocket:
+                    await websocket.send_text(json.dumps({
+                        "type": "query",
+                        "message": f"**Database Query:** `{cypher_query}`"
+                    }))
+                result_set, has_more, buffered = await run_query_page(cypher_query)
         except asyncio.TimeoutError:
             error_msg = f"Database query timeout after 15 seconds: {cypher_query}"
             if websocket:
@@ -684,19 +1048,10 @@ async def execute_custom_query(user_message, websocket=None, enable_streaming=Tr
             
             raise Exception(error_response["message"])
         
-        # Format results
-        results = []
-        if result.result_set:
-            columns = [col[1] for col in result.header] if result.header else []
-            for row in result.result_set:
-                if len(columns) > 0:
-                    row_data = dict(zip(columns, row))
-                else:
-                    row_data = {"result": row[0] if len(row) == 1 else row}
-                results.append(row_data)
+        results = result_set.records
         
         # Check if we need to retry with a fallback query
-        if not result.result_set:  # No results found
+        if not len(result_set):  # No results found
             if websocket:
                 await websocket.send_text(json.dumps({
                     "type": "info",
@@ -705,17 +1060,9 @@ async def execute_custom_query(user_message, websocket=None, enable_streaming=Tr
             
             # Generate fallback query
             fallback_prompt = load_prompt("fallback_query", user_message=user_message, previous_query=cypher_query)
-            fallback_query = await call_ai_model(fallback_prompt, websocket)
-            
-            # Clean up fallback query
-            fallback_query = fallback_query.strip()
-            if "```" in fallback_query:
-                start = fallback_query.find("```")
-                if start >= 0:
-                    start = fallback_query.find("\n", start) + 1
-                    end = fallback_query.find("```", start)
-                    if end > start:
-                        fallback_query = fallback_query[start:end].strip()
+            fallback_query, _ = await model_router.generate(
+                "fallback_query", fallback_prompt, generate_cypher, websocket=websocket
+            )
             
             if websocket:
                 await websocket.send_text(json.dumps({
@@ -724,31 +1071,14 @@ async def execute_custom_query(user_message, websocket=None, enable_streaming=Tr
                 }))
             
             # Execute fallback query
-            def execute_fallback_query():
-                falkor = get_falkor_client()
-                db = falkor.select_graph("agent_poc")
-                return db.query(fallback_query)
-            
             try:
-                fallback_result = await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(None, execute_fallback_query),
-                    timeout=15
-                )
+                fallback_set, fallback_has_more, fallback_buffered = await run_query_page(fallback_query)
                 
                 # Use fallback results if they exist
-                if fallback_result.result_set:
-                    result = fallback_result
+                if len(fallback_set):
+                    result_set, has_more, buffered = fallback_set, fallback_has_more, fallback_buffered
                     cypher_query = fallback_query  # Update for logging
-                    
-                    # Re-format results with fallback data
-                    results = []
-                    columns = [col[1] for col in result.header] if result.header else []
-                    for row in result.result_set:
-                        if len(columns) > 0:
-                            row_data = dict(zip(columns, row))
-                        else:
-                            row_data = {"result": row[0] if len(row) == 1 else row}
-                        results.append(row_data)
+                    results = result_set.records
                     
                     if websocket:
                         await websocket.send_text(json.dumps({
@@ -770,13 +1100,30 @@ async def execute_custom_query(user_message, websocket=None, enable_streaming=Tr
                         "message": "⚠️ Fallback query also failed, showing original results"
                     }))
         
-        # Log results in tabular form
-        log_query_results(cypher_query, result, websocket)
+        # Generated queries that found something become retrieval examples
+        if not pattern_matched and len(result_set):
+            few_shot_selector.record_success(user_message, cypher_query)
+        
+        # Log results and send the first page; the cursor lets the client pull the rest
+        cursor = None
+        if has_more and websocket:
+            cursor = result_cursors.create(connection_of(websocket), cypher_query, len(result_set), RESULT_PAGE_SIZE,
+                                           buffered=buffered)
+        await log_query_results(cypher_query, result_set, websocket, cursor=cursor, has_more=has_more)
+        
+        # Statistics for the formatting prompt cover the whole result, not just the first page
+        summarizer = None
+        if has_more:
+            summarizer = ResultSummarizer()
+            summarizer.add_records(results)
+            await summarize_remaining_rows(cypher_query, len(result_set), summarizer, buffered)
         
         return {
             "query": cypher_query,
             "results": results,
-            "count": len(results)
+            "count": len(results),
+            "has_more": has_more,
+            "summarizer": summarizer
         }
         
     except Exception as e:
@@ -818,313 +1165,309 @@ async def execute_tools(tools, user_message, websocket):
             results["pig_latin"] = pig_latin
             
         elif tool == "store_message":
-            try:
-                
-                def store_message_in_db():
-                    falkor = get_falkor_client()
-                    db = falkor.select_graph("agent_poc")
-                    pig_latin = results.get("pig_latin", to_pig_latin(user_message))
-                    
-                    # Create message node with timestamp
-                    from datetime import datetime
-                    timestamp = datetime.now().isoformat()
-                    
-                    # Use parameterized query to avoid escaping issues
-                    cypher_query = "CREATE (m:Message {original: $original, pig_latin: $pig_latin, timestamp: $timestamp})"
-                    params = {
-                        "original": user_message,
-                        "pig_latin": pig_latin,
-                        "timestamp": timestamp
-                    }
-                    return db.query(cypher_query, params)
-                
-                await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(None, store_message_in_db),
-                    timeout=10
-                )
-                
-                results["stored"] = True
-                # Message storage confirmation not needed for user
-            except Exception as e:
-                results["stored"] = False
-                if websocket:
-                    await websocket.send_text(json.dumps({
-                        "type": "error",
-                        "message": f"Message storage error: {str(e)}"
-                    }))
-                print(f"Message storage error: {str(e)}")
+            pig_latin = results.get("pig_latin", to_pig_latin(user_message))
+            # Buffered and written in batches off the request path
+            message_store.enqueue(user_message, pig_latin, datetime.now().isoformat())
+            results["stored"] = True
     
     return results
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up and serving, whether or not the graph is ready"""
     return {"status": "healthy"}
 
+@app.get("/debug/startup")
+async def startup_profile():
+    """Import and init timings recorded when started with STARTUP_PROFILE=1"""
+    return startup_profiler.report()
+
+@app.get("/debug/formatting")
+async def debug_formatting():
+    """Share of responses formatted by local rules instead of an LLM call"""
+    return formatting_stats.stats()
+
+@app.get("/debug/models")
+async def debug_models():
+    """Model per task, cascade escalations, latency/tokens/cost per tier and early query exits"""
+    return {**model_router.stats(), "cypher_extraction": extraction_stats.stats()}
+
+@app.get("/debug/ollama")
+async def debug_ollama():
+    """Warm-up state, cached prompt prefixes, per-prompt timings and request coalescing"""
+    return {**ollama_prefixes.stats(), "coalescing": llm_flights.stats()}
+
+@app.get("/debug/entity-index")
+async def debug_entity_index():
+    """Size, build time and refresh state of the fuzzy entity name index"""
+    return entity_refresher.stats()
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once the graph is seeded and indexed, 503 with progress until then"""
+    progress = graph_warmup.progress()
+    if graph_warmup.is_ready:
+        return {"status": "ready", **progress}
+    return JSONResponse(status_code=503, content={"status": "warming_up", **progress})
+
+@app.get("/messages/recent")
+async def recent_messages(hours: float = 24, limit: int = 50):
+    """Latest stored chat messages; only the time buckets in the window are scanned"""
+    try:
+        messages = await message_retention.recent_messages(hours=hours, limit=limit)
+        return {"messages": messages, "count": len(messages)}
+    except Exception as e:
+        return {"messages": [], "count": 0, "error": str(e)}
+
+@app.get("/messages/retention")
+async def message_retention_stats():
+    return {
+        "retention": message_retention.stats(),
+        "write_buffer": message_store.stats()
+    }
+
+@app.get("/ws/stats")
+async def websocket_stats():
+    """WebSocket fan-out metrics: queue depth, drops and send lag per connection"""
+    return {
+        **manager.connection_stats(),
+        "dashboard_feed": dashboard_feed.stats(),
+        "broker": broker.stats(),
+        "heartbeat": manager.heartbeat.stats(),
+        "message_store": message_store.stats(),
+        "result_cursors": result_cursors.stats()
+    }
+
+async def process_chat_message(data: str, websocket):
+    """Run the full analyze -> tools -> format pipeline for one chat message
+    
+    `websocket` may be a TaggedWebSocket so frames carry the request id.
+    Cancelling the surrounding task aborts the pending Ollama request and
+    FalkorDB query.
+    """
+    try:
+        
+        # Wrap the entire processing pipeline in a timeout
+        async def process_message():
+            # Get database context with timeout
+            db_context = await asyncio.wait_for(get_database_context(), timeout=20)
+            
+            # Load and call AI model to analyze the message
+            prompt = load_prompt("analyze_message", user_message=data, database_context=db_context)
+            return await analyze_message(prompt, websocket)
+        
+        # Apply timeout to the entire processing pipeline
+        # Increased timeout to 120 seconds to handle complex queries
+        analysis = await asyncio.wait_for(process_message(), timeout=120)
+        
+        # The response is constrained to the analysis schema; tools come before the reasoning
+        tools_to_execute = analysis.tools
+        response_type = analysis.response_type
+        
+        # Execute the tools Claude recommended
+        try:
+            results = await execute_tools(tools_to_execute, data, websocket)
+        except Exception as tool_error:
+            # Tool execution failed (e.g., query error), error already sent
+            # Don't send any additional response
+            return
+        
+        # Prepare final response based on response type
+        final_response = ""
+        if response_type == "pig_latin" and "pig_latin" in results:
+            # Format pig latin response in markdown
+            final_response = f"**Pig Latin Translation:**\n\n{results['pig_latin']}"
+        elif response_type == "search" and "search_results" in results:
+            # Simple result shapes are formatted locally; the AI model handles the rest
+            final_response = format_locally("search", results["search_results"])
+            if final_response is None:
+                format_prompt = load_prompt("format_results", 
+                                          user_message=data, 
+                                          results=results["search_results"])
+                final_response = await call_ai_model(format_prompt, websocket, task="format_results")
+        elif response_type == "custom" and "custom_results" in results:
+            # Use AI model to format custom query results
+            custom_data = results["custom_results"]
+            if custom_data.get("error"):
+                final_response = f"Query error: {custom_data['error']}"
+            elif custom_data.get("results") or custom_data.get("count") == 0:
+                # Counts, short lists and small tables are formatted locally
+                final_response = format_locally("custom", custom_data)
+                if final_response is None:
+                    # Include query context; large results are summarized to fit the prompt
+                    result_context = compact_for_prompt(
+                        custom_data.get("query", ""),
+                        custom_data.get("results", []),
+                        custom_data.get("summarizer")
+                    )
+                    format_prompt = load_prompt("format_results", 
+                                              user_message=data, 
+                                              results=result_context)
+                    final_response = await call_ai_model(format_prompt, websocket, task="format_results")
+            else:
+                final_response = "An error occurred while executing the query."
+        else:
+            # Check if we have any database results to format
+            has_db_results = (
+                ("search_results" in results and any(results["search_results"].values())) or
+                ("custom_results" in results and results["custom_results"].get("results"))
+            )
+            
+            if has_db_results:
+                # Format any database results we have
+                # Formatting results
+                
+                # Combine all available results
+                all_results = {}
+                if "search_results" in results:
+                    all_results.update(results["search_results"])
+                if "custom_results" in results:
+                    custom_data = results["custom_results"]
+                    all_results["custom_query"] = compact_for_prompt(
+                        custom_data.get("query", ""),
+                        custom_data.get("results", []),
+                        custom_data.get("summarizer")
+                    )
+                
+                formatting_stats.record_llm("combined")
+                format_prompt = load_prompt("format_results", 
+                                          user_message=data, 
+                                          results=all_results)
+                final_response = await call_ai_model(format_prompt, websocket, task="format_results")
+            else:
+                # Default to pig latin if no database results
+                pig_latin_text = to_pig_latin(data)
+                final_response = f"**Pig Latin Translation:**\n\n{pig_latin_text}"
+        
+        # Send final response
+        try:
+            await websocket.send_text(final_response)
+        except (WebSocketDisconnect, ConnectionError) as e:
+            logging.warning(f"Failed to send response, client disconnected: {e}")
+            return
+        
+    except asyncio.TimeoutError:
+        await websocket.send_text(json.dumps({
+            "type": "error",
+            "message": "⏱️ AI processing is taking longer than usual. Please try a simpler query or try again in a moment."
+        }))
+        
+        # Fallback to pig latin on timeout
+        pig_latin_response = to_pig_latin(data)
+        final_response = f"**Pig Latin Translation (timeout fallback):**\n\n{pig_latin_response}"
+        await websocket.send_text(final_response)
+        
+    except Exception as e:
+        # Detailed error logging with timestamp and traceback
+        import traceback
+        from datetime import datetime
+        ts = datetime.utcnow().isoformat()
+        tb = traceback.format_exc()
+        print(f"[{ts}] WebSocket exception processing message '{data}': {e}\n{tb}")
+        
+        # Send concise error notice to client with debug details
+        await websocket.send_text(json.dumps({
+            "type": "error",
+            "message": "An unexpected error occurred while processing your request.",
+            "debug": {
+                "timestamp": ts,
+                "error": str(e),
+                "recent_trace": tb.splitlines()[-3:]
+            }
+        }))
+        
+        # Guide user on next steps
+        await websocket.send_text(json.dumps({
+            "type": "error",
+            "message": "Please check your query or try again later. If the issue persists, contact support with the above error details."
+        }))
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
+    # Replies share the connection's send queue with broadcasts and heartbeats, but are never dropped
+    replies = QueuedWebSocket(websocket, manager.send_queues[websocket])
+    # Concurrency is limited per user (optional ?user= query param, else per connection)
+    user_key = websocket.query_params.get("user") or f"conn:{id(websocket)}"
+    tasks = ConnectionTaskManager(replies, user_key)
     
     try:
         while True:
             try:
                 data = await websocket.receive_text()
+                # Any inbound frame proves the peer is alive
+                manager.heartbeat.touch(websocket)
+                request_id = None
                 
                 # Handle pong messages (client responding to our ping)
                 try:
                     message = json.loads(data)
-                    if message.get("type") == "pong":
+                    message_type = message.get("type") if isinstance(message, dict) else None
+                    if message_type == "pong":
                         # Client is alive, continue to next message
                         continue
+                    
+                    # Dashboard change feed control frames
+                    if message_type == "dashboard_subscribe":
+                        await dashboard_feed.subscribe(websocket, message.get("version"), message.get("epoch"))
+                        continue
+                    if message_type == "dashboard_ack":
+                        dashboard_feed.acknowledge(websocket, message.get("version"))
+                        continue
+                    if message_type == "dashboard_unsubscribe":
+                        dashboard_feed.unsubscribe(websocket)
+                        continue
+                    
+                    # Next page of a paginated result set
+                    if message_type == "fetch_page":
+                        tasks.submit(fetch_result_page, message.get("cursor"), message.get("id"))
+                        continue
+                    
+                    # Cancel one in-flight request (or all of them without an id)
+                    if message_type == "cancel":
+                        if not tasks.cancel(message.get("id")):
+                            await replies.send_text(json.dumps({
+                                "type": "info",
+                                "id": message.get("id"),
+                                "message": "Nothing to cancel"
+                            }))
+                        continue
+                    
+                    # Tagged chat message: every response frame carries the same id
+                    if message_type == "message" and "text" in message:
+                        request_id = str(message.get("id") or "")
+                        data = str(message["text"])
                 except json.JSONDecodeError:
                     # Not JSON, treat as regular message
                     pass
                 
-                # Message received, begin processing
-                
-            except asyncio.TimeoutError:
-                await websocket.send_text(json.dumps({
-                    "type": "error",
-                    "message": "Connection timeout while waiting for message"
-                }))
-                continue
             except WebSocketDisconnect:
                 logging.info("WebSocket disconnected while receiving")
                 break
-                
-            try:
-                
-                # Wrap the entire processing pipeline in a timeout
-                async def process_message():
-                    # Get database context with timeout
-                    db_context = await asyncio.wait_for(get_database_context(), timeout=20)
-                    
-                    # Load and call AI model to analyze the message
-                    prompt = load_prompt("analyze_message", user_message=data, database_context=db_context)
-                    ai_response = await call_ai_model(prompt, websocket)
-                    return ai_response
-                
-                # Apply timeout to the entire processing pipeline
-                # Increased timeout to 120 seconds to handle complex queries
-                ai_response = await asyncio.wait_for(process_message(), timeout=120)
-                
-                # Parse AI model's response
-                try:
-                    # Try to extract JSON from AI model's response
-                    # AI model might wrap JSON in markdown code blocks or add extra text
-                    response_text = ai_response.strip()
-                    
-                    # Remove common prefixes
-                    prefixes_to_remove = [
-                        "Here's the JSON response:",
-                        "Here is the JSON:",
-                        "Response:",
-                        "JSON:",
-                    ]
-                    for prefix in prefixes_to_remove:
-                        if response_text.startswith(prefix):
-                            response_text = response_text[len(prefix):].strip()
-                    
-                    # Look for JSON in markdown code blocks
-                    if "```json" in response_text:
-                        start = response_text.find("```json") + 7
-                        end = response_text.find("```", start)
-                        if end > start:
-                            response_text = response_text[start:end].strip()
-                    elif "```" in response_text:
-                        start = response_text.find("```") + 3
-                        end = response_text.find("```", start)
-                        if end > start:
-                            response_text = response_text[start:end].strip()
-                    
-                    # Try to find JSON within the response
-                    if not response_text.startswith("{"):
-                        # Look for the first { and last }
-                        start = response_text.find("{")
-                        end = response_text.rfind("}") + 1
-                        if start >= 0 and end > start:
-                            response_text = response_text[start:end]
-                    
-                    # Clean up any trailing text after the JSON
-                    if response_text.endswith("}") and response_text.count("}") > response_text.count("{"):
-                        # Find the last complete JSON object
-                        brace_count = 0
-                        last_valid_pos = -1
-                        for i, char in enumerate(response_text):
-                            if char == "{":
-                                brace_count += 1
-                            elif char == "}":
-                                brace_count -= 1
-                                if brace_count == 0:
-                                    last_valid_pos = i + 1
-                                    break
-                        if last_valid_pos > 0:
-                            response_text = response_text[:last_valid_pos]
-                    
-                    analysis = json.loads(response_text)
-                    tools_to_execute = analysis.get("tools", [])
-                    response_type = analysis.get("response_type", "pig_latin")
-                    reasoning = analysis.get("reasoning", "No reasoning provided")
-                    
-                    # Claude analysis details not needed for user
-                    
-                except (json.JSONDecodeError, ValueError) as e:
-                    # Log the actual response for debugging and try to extract JSON more aggressively
-                    # Trying alternative JSON extraction
-                    
-                    # Try more aggressive JSON extraction
-                    try:
-                        import re
-                        # Look for JSON pattern with regex
-                        json_pattern = r'\{[^{}]*(?:"reasoning"[^{}]*"tools"[^{}]*"response_type"[^{}]*)\}'
-                        match = re.search(json_pattern, ai_response, re.DOTALL)
-                        if match:
-                            json_text = match.group(0)
-                            analysis = json.loads(json_text)
-                            tools_to_execute = analysis.get("tools", [])
-                            response_type = analysis.get("response_type", "pig_latin")
-                            reasoning = analysis.get("reasoning", "Extracted from response")
-                            
-                            # JSON extraction successful
-                        else:
-                            raise ValueError("No JSON pattern found")
-                            
-                    except Exception as fallback_error:
-                        # Final fallback - log the full response and use defaults
-                        # Falling back to default pig latin behavior
-                        tools_to_execute = ["pig_latin", "store_message"]
-                        response_type = "pig_latin"
-                
-                # Execute the tools Claude recommended
-                try:
-                    results = await execute_tools(tools_to_execute, data, websocket)
-                except Exception as tool_error:
-                    # Tool execution failed (e.g., query error), error already sent
-                    # Don't send any additional response
-                    continue
-                
-                # Prepare final response based on response type
-                final_response = ""
-                if response_type == "pig_latin" and "pig_latin" in results:
-                    # Format pig latin response in markdown
-                    final_response = f"**Pig Latin Translation:**\n\n{results['pig_latin']}"
-                elif response_type == "search" and "search_results" in results:
-                    # Use AI model to format search results
-                    # Formatting search results
-                    format_prompt = load_prompt("format_results", 
-                                              user_message=data, 
-                                              results=results["search_results"])
-                    final_response = await call_ai_model(format_prompt, websocket)
-                elif response_type == "custom" and "custom_results" in results:
-                    # Use AI model to format custom query results
-                    custom_data = results["custom_results"]
-                    if custom_data.get("error"):
-                        final_response = f"Query error: {custom_data['error']}"
-                    elif custom_data.get("results") or custom_data.get("count") == 0:
-                        # Formatting results
-                        # Include query context for better formatting
-                        result_context = {
-                            "query": custom_data.get("query", ""),
-                            "count": custom_data.get("count", 0),
-                            "results": custom_data.get("results", [])
-                        }
-                        format_prompt = load_prompt("format_results", 
-                                                  user_message=data, 
-                                                  results=result_context)
-                        final_response = await call_ai_model(format_prompt, websocket)
-                    else:
-                        final_response = "An error occurred while executing the query."
-                else:
-                    # Check if we have any database results to format
-                    has_db_results = (
-                        ("search_results" in results and any(results["search_results"].values())) or
-                        ("custom_results" in results and results["custom_results"].get("results"))
-                    )
-                    
-                    if has_db_results:
-                        # Format any database results we have
-                        # Formatting results
-                        
-                        # Combine all available results
-                        all_results = {}
-                        if "search_results" in results:
-                            all_results.update(results["search_results"])
-                        if "custom_results" in results:
-                            all_results["custom_query"] = results["custom_results"]
-                        
-                        format_prompt = load_prompt("format_results", 
-                                                  user_message=data, 
-                                                  results=all_results)
-                        final_response = await call_ai_model(format_prompt, websocket)
-                    else:
-                        # Default to pig latin if no database results
-                        pig_latin_text = to_pig_latin(data)
-                        final_response = f"**Pig Latin Translation:**\n\n{pig_latin_text}"
-                
-                # Send final response
-                try:
-                    await websocket.send_text(final_response)
-                except (WebSocketDisconnect, ConnectionError) as e:
-                    logging.warning(f"Failed to send response, client disconnected: {e}")
-                    break
-                
-            except asyncio.TimeoutError:
-                await websocket.send_text(json.dumps({
-                    "type": "error",
-                    "message": "⏱️ AI processing is taking longer than usual. Please try a simpler query or try again in a moment."
-                }))
-                
-                # Fallback to pig latin on timeout
-                pig_latin_response = to_pig_latin(data)
-                final_response = f"**Pig Latin Translation (timeout fallback):**\n\n{pig_latin_response}"
-                await websocket.send_text(final_response)
-                
-            except Exception as e:
-                # Detailed error logging with timestamp and traceback
-                import traceback
-                from datetime import datetime
-                ts = datetime.utcnow().isoformat()
-                tb = traceback.format_exc()
-                print(f"[{ts}] WebSocket exception processing message '{data}': {e}\n{tb}")
-                
-                # Send concise error notice to client with debug details
-                await websocket.send_text(json.dumps({
-                    "type": "error",
-                    "message": "An unexpected error occurred while processing your request.",
-                    "debug": {
-                        "timestamp": ts,
-                        "error": str(e),
-                        "recent_trace": tb.splitlines()[-3:]
-                    }
-                }))
-                
-                # Guide user on next steps
-                await websocket.send_text(json.dumps({
-                    "type": "error",
-                    "message": "Please check your query or try again later. If the issue persists, contact support with the above error details."
-                }))
+            
+            # Fast reply instead of a long timeout while seeding is still running
+            if graph_warmup.warming_up:
+                warming_up = {
+                    "type": "server",
+                    "status": "warming_up",
+                    "message": graph_warmup.warming_up_message(),
+                    "progress": graph_warmup.progress()
+                }
+                if request_id is not None:
+                    warming_up["id"] = request_id
+                await replies.send_text(json.dumps(warming_up))
+                continue
+            
+            # Process in the background so the next frame (or a cancel) is read right away
+            tasks.submit(process_chat_message, data, request_id)
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         print("Client disconnected")
-
-async def broadcast_dashboard_update(update_type: str, data: dict = None):
-    """
-    Broadcast dashboard updates to all connected WebSocket clients
-    
-    Args:
-        update_type: Type of update (e.g., 'incidents', 'metrics', 'teams')
-        data: Optional data to include with the update
-    """
-    message = {
-        "update_type": update_type,
-        "timestamp": datetime.utcnow().isoformat(),
-        "data": data or {}
-    }
-    await manager.broadcast_dashboard_update(message)
-
-# Example usage in other parts of the code:
-# await broadcast_dashboard_update("incidents", {"new_incident": incident_data})
-# await broadcast_dashboard_update("metrics", {"updated_metrics": metrics_data})
+    finally:
+        # Also reached when the loop exits via break, so writer tasks never leak
+        await tasks.close()
+        result_cursors.drop_owner(websocket)
+        manager.disconnect(websocket)
 
 if __name__ == "__main__":
     import uvicorn
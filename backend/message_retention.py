@@ -0,0 +1,275 @@
+"""
+Chat message retention and time-bucketed storage
+
+Every chat turn adds a Message node. Without cleanup the graph and the
+all_text_search full-text index grow forever, which slows every full-text and
+count query. This module:
+
+- stamps each Message with a `bucket` (timestamp prefix at day, hour or month
+  granularity) so queries for recent messages filter on a handful of indexed
+  bucket keys instead of scanning all messages
+- runs a background sweep that deletes messages older than the TTL in small
+  batches, yielding between batches so live queries are not starved
+- optionally archives expired messages to gzip-compressed NDJSON files (one per
+  bucket) before deleting them. Archival is at-least-once: if a delete fails
+  after its batch was archived, the batch is archived again on the next sweep.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Messages older than this are expired; 0 disables retention
+MESSAGE_RETENTION_DAYS = float(os.getenv("MESSAGE_RETENTION_DAYS", 30))
+# Seconds between retention sweeps
+MESSAGE_RETENTION_INTERVAL = float(os.getenv("MESSAGE_RETENTION_INTERVAL", 3600))
+# Messages deleted per query; small batches keep each write short
+MESSAGE_RETENTION_BATCH = int(os.getenv("MESSAGE_RETENTION_BATCH", 500))
+# Directory for compressed NDJSON archives; empty disables archival
+MESSAGE_ARCHIVE_DIR = os.getenv("MESSAGE_ARCHIVE_DIR", "")
+# Partition granularity: hour, day or month
+MESSAGE_BUCKET_GRANULARITY = os.getenv("MESSAGE_BUCKET_GRANULARITY", "day")
+
+# Buckets are ISO timestamp prefixes, so they sort chronologically as strings
+BUCKET_PREFIX_LENGTHS = {"hour": 13, "day": 10, "month": 7}
+BUCKET_STEPS = {"hour": timedelta(hours=1), "day": timedelta(days=1), "month": timedelta(days=28)}
+
+
+def message_bucket(timestamp: str, granularity: str = MESSAGE_BUCKET_GRANULARITY) -> str:
+    """Partition key for an ISO timestamp, e.g. '2025-06-22' at day granularity"""
+    return timestamp[:BUCKET_PREFIX_LENGTHS.get(granularity, 10)]
+
+
+def buckets_since(since: datetime, until: Optional[datetime] = None,
+                  granularity: str = MESSAGE_BUCKET_GRANULARITY) -> List[str]:
+    """All bucket keys covering [since, until], oldest first"""
+    until = until or datetime.now()
+    step = BUCKET_STEPS.get(granularity, BUCKET_STEPS["day"])
+    buckets = []
+    current = since
+    while current <= until:
+        bucket = message_bucket(current.isoformat(), granularity)
+        if not buckets or buckets[-1] != bucket:
+            buckets.append(bucket)
+        current += step
+    last = message_bucket(until.isoformat(), granularity)
+    if buckets[-1] != last:
+        buckets.append(last)
+    return buckets
+
+
+RECENT_MESSAGES_QUERY = """
+MATCH (m:Message)
+WHERE m.bucket IN $buckets AND m.timestamp >= $since
+RETURN m.original AS original, m.pig_latin AS pig_latin, m.timestamp AS timestamp
+ORDER BY m.timestamp DESC
+LIMIT $limit
+"""
+
+FETCH_EXPIRED_QUERY = """
+MATCH (m:Message)
+WHERE m.timestamp < $cutoff
+RETURN ID(m) AS id, m.original AS original, m.pig_latin AS pig_latin,
+       m.timestamp AS timestamp, m.bucket AS bucket
+LIMIT $limit
+"""
+
+DELETE_IDS_QUERY = """
+MATCH (m:Message)
+WHERE ID(m) IN $ids
+DELETE m
+"""
+
+DELETE_EXPIRED_QUERY = """
+MATCH (m:Message)
+WHERE m.timestamp < $cutoff
+WITH m LIMIT $limit
+DELETE m
+RETURN count(m) AS deleted
+"""
+
+
+class MessageRetentionManager:
+    """Background TTL sweeper with optional compressed archival"""
+
+    def __init__(
+        self,
+        graph_factory: Callable[[], Any],
+        retention_days: float = MESSAGE_RETENTION_DAYS,
+        interval: float = MESSAGE_RETENTION_INTERVAL,
+        batch_size: int = MESSAGE_RETENTION_BATCH,
+        archive_dir: str = MESSAGE_ARCHIVE_DIR,
+        granularity: str = MESSAGE_BUCKET_GRANULARITY,
+    ):
+        # graph_factory returns a FalkorDB graph; it is called from the executor
+        self.graph_factory = graph_factory
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.granularity = granularity
+        self._task: Optional[asyncio.Task] = None
+        self._indexes_ready = False
+
+        # Metrics
+        self.sweeps = 0
+        self.deleted = 0
+        self.archived = 0
+        self.last_sweep_ms = 0.0
+        self.last_cutoff: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.retention_days > 0
+
+    def bucket(self, timestamp: str) -> str:
+        return message_bucket(timestamp, self.granularity)
+
+    # --- lifecycle -------------------------------------------------------
+
+    def start(self):
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Message retention sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    # --- sweeping --------------------------------------------------------
+
+    def cutoff(self, now: Optional[datetime] = None) -> str:
+        return ((now or datetime.now()) - timedelta(days=self.retention_days)).isoformat()
+
+    async def sweep(self, now: Optional[datetime] = None) -> int:
+        """Delete (and archive) every expired message in batches; returns the count"""
+        loop = asyncio.get_event_loop()
+        started = time.perf_counter()
+        cutoff = self.cutoff(now)
+        graph = await loop.run_in_executor(None, self.graph_factory)
+
+        if not self._indexes_ready:
+            await loop.run_in_executor(None, self._ensure_indexes, graph)
+
+        removed = 0
+        while True:
+            if self.archive_dir:
+                count = await loop.run_in_executor(None, self._archive_and_delete_batch, graph, cutoff)
+            else:
+                count = await loop.run_in_executor(None, self._delete_batch, graph, cutoff)
+            removed += count
+            if count < self.batch_size:
+                break
+            # Let live queries in between batches
+            await asyncio.sleep(0)
+
+        self.sweeps += 1
+        self.deleted += removed
+        self.last_cutoff = cutoff
+        self.last_error = None
+        self.last_sweep_ms = (time.perf_counter() - started) * 1000
+        if removed:
+            logger.info(f"Message retention removed {removed} messages older than {cutoff}")
+        return removed
+
+    def _ensure_indexes(self, graph):
+        for prop in ("timestamp", "bucket"):
+            try:
+                graph.query(f"CREATE INDEX ON :Message({prop})")
+            except Exception:
+                pass  # Index might already exist
+        # Messages written before partitioning have no bucket yet
+        prefix_length = BUCKET_PREFIX_LENGTHS.get(self.granularity, 10)
+        graph.query(
+            "MATCH (m:Message) WHERE m.bucket IS NULL AND m.timestamp IS NOT NULL "
+            "SET m.bucket = substring(m.timestamp, 0, $length)",
+            {"length": prefix_length}
+        )
+        self._indexes_ready = True
+
+    def _delete_batch(self, graph, cutoff: str) -> int:
+        result = graph.query(DELETE_EXPIRED_QUERY, {"cutoff": cutoff, "limit": self.batch_size})
+        return result.result_set[0][0] if result.result_set else 0
+
+    def _archive_and_delete_batch(self, graph, cutoff: str) -> int:
+        result = graph.query(FETCH_EXPIRED_QUERY, {"cutoff": cutoff, "limit": self.batch_size})
+        rows = result.result_set or []
+        if not rows:
+            return 0
+
+        by_bucket: Dict[str, List[Dict[str, Any]]] = {}
+        for node_id, original, pig_latin, timestamp, bucket in rows:
+            record = {"original": original, "pig_latin": pig_latin, "timestamp": timestamp}
+            by_bucket.setdefault(bucket or self.bucket(timestamp or ""), []).append(record)
+        self.write_archive(by_bucket)
+
+        graph.query(DELETE_IDS_QUERY, {"ids": [row[0] for row in rows]})
+        return len(rows)
+
+    def write_archive(self, by_bucket: Dict[str, List[Dict[str, Any]]]):
+        """Append records to one gzip NDJSON file per bucket"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        for bucket, records in by_bucket.items():
+            path = self.archive_dir / f"messages-{bucket or 'unknown'}.ndjson.gz"
+            # Appending adds a new gzip member; readers see one continuous stream
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+            self.archived += len(records)
+
+    # --- reads -----------------------------------------------------------
+
+    async def recent_messages(self, hours: float = 24, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest messages from the last `hours`, touching only the matching buckets"""
+        since = datetime.now() - timedelta(hours=hours)
+        params = {
+            "buckets": buckets_since(since, granularity=self.granularity),
+            "since": since.isoformat(),
+            "limit": limit,
+        }
+
+        def run():
+            graph = self.graph_factory()
+            return graph.query(RECENT_MESSAGES_QUERY, params)
+
+        result = await asyncio.get_event_loop().run_in_executor(None, run)
+        return [
+            {"original": original, "pig_latin": pig_latin, "timestamp": timestamp}
+            for original, pig_latin, timestamp in (result.result_set or [])
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "retention_days": self.retention_days,
+            "granularity": self.granularity,
+            "archive_dir": str(self.archive_dir) if self.archive_dir else None,
+            "sweeps": self.sweeps,
+            "deleted": self.deleted,
+            "archived": self.archived,
+            "last_cutoff": self.last_cutoff,
+            "last_sweep_ms": round(self.last_sweep_ms, 3),
+            "last_error": self.last_error,
+        }
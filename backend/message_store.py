@@ -0,0 +1,179 @@
+"""
+Write-behind buffer for chat Message nodes
+
+`store_message` used to run one CREATE per chat message on the request path.
+Messages are now appended to an in-memory buffer and acknowledged at once; a
+background task writes them in UNWIND batches whenever `batch_size` messages
+are waiting or `flush_interval` seconds have passed. During a FalkorDB outage
+batches stay in the buffer (bounded by `max_pending`, oldest dropped first)
+and are retried with exponential backoff. Shutdown drains what is left.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from message_retention import message_bucket
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_STORE_BATCH_SIZE", 100))
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_STORE_FLUSH_INTERVAL", 1.0))
+MESSAGE_MAX_PENDING = int(os.getenv("MESSAGE_STORE_MAX_PENDING", 10000))
+MESSAGE_DRAIN_TIMEOUT = float(os.getenv("MESSAGE_STORE_DRAIN_TIMEOUT", 10.0))
+
+# Retry backoff while FalkorDB is unreachable
+RETRY_BACKOFF_MIN = 0.5
+RETRY_BACKOFF_MAX = 30.0
+
+STORE_MESSAGES_QUERY = """
+UNWIND $rows AS row
+CREATE (m:Message {original: row.original, pig_latin: row.pig_latin,
+                   timestamp: row.timestamp, bucket: row.bucket})
+"""
+
+
+class MessageWriteBehindQueue:
+    """Buffers Message rows and writes them to the graph in batches"""
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[Dict[str, Any]]], Any],
+        batch_size: int = MESSAGE_BATCH_SIZE,
+        flush_interval: float = MESSAGE_FLUSH_INTERVAL,
+        max_pending: int = MESSAGE_MAX_PENDING,
+    ):
+        # write_batch is blocking (FalkorDB client) and runs in the executor
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._backoff = 0.0
+
+        # Metrics
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_flush_ms = 0.0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def enqueue(self, original: str, pig_latin: str, timestamp: Optional[str] = None) -> bool:
+        """Buffer a message; never blocks. Returns False if an older message was dropped"""
+        timestamp = timestamp or datetime.now().isoformat()
+        row = {
+            "original": original,
+            "pig_latin": pig_latin,
+            "timestamp": timestamp,
+            # Time partition used by retention and recent-message queries
+            "bucket": message_bucket(timestamp),
+        }
+        kept_all = True
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped += 1
+            kept_all = False
+        self.pending.append(row)
+        self.enqueued += 1
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+        return kept_all
+
+    # --- lifecycle -------------------------------------------------------
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = MESSAGE_DRAIN_TIMEOUT):
+        """Stop the flusher and write out everything still buffered"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        deadline = time.monotonic() + drain_timeout
+        while self.pending and time.monotonic() < deadline:
+            if not await self.flush():
+                await asyncio.sleep(min(RETRY_BACKOFF_MIN, max(0.0, deadline - time.monotonic())))
+        if self.pending:
+            logger.warning(f"Message store shutdown lost {len(self.pending)} unwritten messages")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            if self._backoff:
+                await asyncio.sleep(self._backoff)
+            # Keep writing full batches until the buffer is below one batch
+            while self.pending:
+                if not await self.flush():
+                    break
+                if len(self.pending) < self.batch_size:
+                    break
+
+    # --- writing ---------------------------------------------------------
+
+    async def flush(self) -> bool:
+        """Write one batch; on failure the batch goes back to the front of the buffer"""
+        async with self._flush_lock:
+            if not self.pending:
+                return True
+            count = min(self.batch_size, len(self.pending))
+            batch = [self.pending.popleft() for _ in range(count)]
+
+            started = time.perf_counter()
+            try:
+                await asyncio.get_event_loop().run_in_executor(None, self.write_batch, batch)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                self._backoff = min(RETRY_BACKOFF_MAX, max(RETRY_BACKOFF_MIN, self._backoff * 2))
+                # Requeue ahead of newer messages, still honouring the bound
+                room = self.max_pending - len(self.pending)
+                if room < len(batch):
+                    self.dropped += len(batch) - max(0, room)
+                    batch = batch[len(batch) - max(0, room):]
+                self.pending.extendleft(reversed(batch))
+                logger.warning(f"Message batch write failed ({len(self.pending)} pending, "
+                               f"retry in {self._backoff:.1f}s): {e}")
+                return False
+
+            self._backoff = 0.0
+            self.batches += 1
+            self.written += count
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self.pending),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "failures": self.failures,
+            "retry_backoff_seconds": self._backoff,
+            "last_error": self.last_error,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
@@ -0,0 +1,135 @@
+"""
+Per-connection chat message task management
+
+Lets one WebSocket process several chat messages at once (bounded per user)
+and cancel individual in-flight requests.
+
+Client frames:
+    "plain text question"                                 legacy, untagged
+    {"type": "message", "id": "q1", "text": "..."}        tagged request
+    {"type": "cancel", "id": "q1"}                        cancel one request
+    {"type": "cancel"}                                    cancel everything in flight
+
+Frames produced while handling a tagged request carry its "id", so the client
+can tell interleaved responses apart. Untagged requests keep the old framing.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Messages processed concurrently per user; further messages wait their turn
+MAX_CONCURRENT_MESSAGES = int(os.getenv("WS_MAX_CONCURRENT_MESSAGES", 2))
+
+# user key -> semaphore shared by all of that user's connections
+_user_semaphores: Dict[str, asyncio.Semaphore] = {}
+_user_connections: Dict[str, int] = {}
+
+
+def acquire_user_slot(user_key: str) -> asyncio.Semaphore:
+    """Get the concurrency semaphore for a user, shared across their connections"""
+    if user_key not in _user_semaphores:
+        _user_semaphores[user_key] = asyncio.Semaphore(MAX_CONCURRENT_MESSAGES)
+    _user_connections[user_key] = _user_connections.get(user_key, 0) + 1
+    return _user_semaphores[user_key]
+
+
+def release_user_slot(user_key: str):
+    remaining = _user_connections.get(user_key, 1) - 1
+    if remaining <= 0:
+        _user_connections.pop(user_key, None)
+        _user_semaphores.pop(user_key, None)
+    else:
+        _user_connections[user_key] = remaining
+
+
+class TaggedWebSocket:
+    """WebSocket proxy that stamps every outgoing frame with a request id"""
+
+    def __init__(self, websocket, request_id: str):
+        self._websocket = websocket
+        self.request_id = request_id
+
+    async def send_text(self, text: str):
+        try:
+            frame = json.loads(text)
+        except (json.JSONDecodeError, TypeError):
+            frame = None
+        if isinstance(frame, dict):
+            frame["id"] = self.request_id
+        else:
+            # Final markdown answers are sent as plain text on untagged requests
+            frame = {"type": "server", "id": self.request_id, "message": text}
+        await self._websocket.send_text(json.dumps(frame, default=str))
+
+    @property
+    def raw_websocket(self):
+        """The shared connection this wrapper tags frames for"""
+        return self._websocket
+
+    def __getattr__(self, name):
+        return getattr(self._websocket, name)
+
+
+class ConnectionTaskManager:
+    """Tracks in-flight message tasks for one WebSocket connection"""
+
+    def __init__(self, websocket, user_key: str):
+        self.websocket = websocket
+        self.user_key = user_key
+        self.semaphore = acquire_user_slot(user_key)
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, handler: Callable[[str, Any], Awaitable[None]], text: str,
+               request_id: Optional[str] = None) -> str:
+        """Start processing a message; returns the request id used for cancellation"""
+        tagged = request_id is not None
+        request_id = str(request_id) if tagged else uuid.uuid4().hex[:8]
+        if request_id in self.tasks:
+            request_id = f"{request_id}-{uuid.uuid4().hex[:4]}"
+        sink = TaggedWebSocket(self.websocket, request_id) if tagged else self.websocket
+
+        async def run():
+            try:
+                async with self.semaphore:
+                    await handler(text, sink)
+            except asyncio.CancelledError:
+                logger.info(f"Message {request_id} cancelled")
+                try:
+                    await sink.send_text(json.dumps({
+                        "type": "cancelled",
+                        "message": "Request cancelled"
+                    }))
+                except Exception:
+                    pass
+
+        task = asyncio.create_task(run())
+        self.tasks[request_id] = task
+        # Done callback also fires for tasks cancelled before they started running
+        task.add_done_callback(lambda _: self.tasks.pop(request_id, None))
+        return request_id
+
+    def cancel(self, request_id: Optional[str] = None) -> int:
+        """Cancel one request, or all of them when no id is given; returns how many"""
+        if request_id is None:
+            targets = list(self.tasks.values())
+        else:
+            task = self.tasks.get(str(request_id))
+            targets = [task] if task else []
+        for task in targets:
+            task.cancel()
+        return len(targets)
+
+    async def close(self):
+        """Cancel everything in flight when the connection goes away"""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        release_user_slot(self.user_key)
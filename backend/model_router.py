@@ -0,0 +1,190 @@
+"""
+Per-task model routing and small-to-large cascade for Ollama calls
+
+Intent analysis, Cypher generation, fallback generation and result
+formatting all used the single OLLAMA_MODEL, although the model evaluations
+show small models doing well on some of these tasks and poorly on others.
+
+Each task can now name its own model, in `TASK_MODELS` or through
+`OLLAMA_MODEL_<TASK>` (e.g. OLLAMA_MODEL_FORMAT_RESULTS=llama3.2:3b); tasks
+without one use OLLAMA_MODEL.
+
+With MODEL_CASCADE=true the query-generating tasks (`CASCADE_TASKS`) first
+run on OLLAMA_CASCADE_MODEL. Its query is checked with `QueryValidator` and
+the task escalates to the task's regular model when validation fails, the
+small model errors out, or the query fails in FalkorDB.
+
+Every call is recorded per task and tier (calls, errors, escalations,
+latency percentiles, tokens and relative cost) and reported by `stats()`.
+"""
+
+import json
+import logging
+import os
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from query_validator import QueryValidator
+
+logger = logging.getLogger(__name__)
+
+TASKS = ("analyze", "generate_query", "fallback_query", "format_results")
+
+# Code-level task -> model overrides; OLLAMA_MODEL_<TASK> takes precedence
+TASK_MODELS: Dict[str, str] = {}
+
+MODEL_CASCADE = os.getenv("MODEL_CASCADE", "false").lower() in ("1", "true", "yes")
+CASCADE_MODEL = os.getenv("OLLAMA_CASCADE_MODEL", "llama3.2:3b")
+CASCADE_TASKS = tuple(
+    task.strip() for task in os.getenv("CASCADE_TASKS", "generate_query,fallback_query").split(",") if task.strip()
+)
+# JSON object of model -> relative cost per 1K tokens, e.g. {"granite3.3:8b": 1.0, "llama3.2:3b": 0.3}
+MODEL_COSTS: Dict[str, float] = json.loads(os.getenv("MODEL_COST_PER_1K_TOKENS", "{}") or "{}")
+# Latency samples kept per tier for percentiles
+LATENCY_WINDOW = 500
+
+SMALL_TIER = "small"
+LARGE_TIER = "large"
+DEFAULT_TIER = "default"
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+
+
+class _TierStats:
+    def __init__(self, model: str):
+        self.model = model
+        self.calls = 0
+        self.errors = 0
+        self.escalations = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, elapsed_ms: float, data: Optional[Dict[str, Any]], error: bool):
+        self.calls += 1
+        self.errors += int(error)
+        self.latencies.append(elapsed_ms)
+        if data:
+            self.prompt_tokens += data.get("prompt_eval_count") or 0
+            self.output_tokens += data.get("eval_count") or 0
+
+    def summary(self, cost_per_1k: float) -> Dict[str, Any]:
+        latencies = list(self.latencies)
+        tokens = self.prompt_tokens + self.output_tokens
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "errors": self.errors,
+            "escalations": self.escalations,
+            "avg_latency_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "p95_latency_ms": _percentile(latencies, 0.95),
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "relative_cost": round(tokens / 1000 * cost_per_1k, 3),
+        }
+
+
+class ModelRouter:
+    """Chooses the model for each task and runs the validation cascade"""
+
+    def __init__(self, default_model: Callable[[], str], task_models: Optional[Dict[str, str]] = None,
+                 cascade: bool = MODEL_CASCADE, cascade_model: str = CASCADE_MODEL,
+                 cascade_tasks=CASCADE_TASKS, costs: Optional[Dict[str, float]] = None):
+        self.default_model = default_model
+        self.task_models = dict(TASK_MODELS if task_models is None else task_models)
+        self.cascade = cascade
+        self.cascade_model = cascade_model
+        self.cascade_tasks = set(cascade_tasks)
+        self.costs = dict(MODEL_COSTS if costs is None else costs)
+        self.validator = QueryValidator()
+        self.tiers: Dict[Tuple[str, str], _TierStats] = {}
+        self.escalation_reasons: Dict[str, int] = {}
+
+    def model_for(self, task: Optional[str]) -> str:
+        if task:
+            env_model = os.getenv(f"OLLAMA_MODEL_{task.upper()}")
+            if env_model:
+                return env_model
+            if task in self.task_models:
+                return self.task_models[task]
+        return self.default_model()
+
+    def tiers_for(self, task: str) -> List[Tuple[str, str]]:
+        """(tier, model) pairs to try in order; a single tier when the task does not cascade"""
+        model = self.model_for(task)
+        if self.cascade and task in self.cascade_tasks and self.cascade_model != model:
+            return [(SMALL_TIER, self.cascade_model), (LARGE_TIER, model)]
+        return [(DEFAULT_TIER, model)]
+
+    def next_tier(self, task: str, tier: str) -> Optional[Tuple[str, str]]:
+        """(tier, model) to retry with after `tier` produced a failing query, or None at the last tier"""
+        tiers = self.tiers_for(task)
+        names = [name for name, _ in tiers]
+        if tier not in names or names.index(tier) == len(tiers) - 1:
+            return None
+        return tiers[names.index(tier) + 1]
+
+    def check(self, query: str) -> List[str]:
+        """Validation errors for a generated query (empty when it may run)"""
+        if not query.strip():
+            return ["Empty query"]
+        is_valid, errors, _ = self.validator.validate(query)
+        return [] if is_valid else errors
+
+    def record(self, task: Optional[str], tier: Optional[str], model: str, elapsed_ms: float,
+               data: Optional[Dict[str, Any]] = None, error: bool = False):
+        key = (task or "other", tier or DEFAULT_TIER)
+        stats = self.tiers.get(key)
+        if stats is None or stats.model != model:
+            stats = self.tiers[key] = _TierStats(model)
+        stats.add(elapsed_ms, data, error)
+
+    def record_escalation(self, task: str, tier: str, reason: str):
+        key = (task, tier)
+        if key in self.tiers:
+            self.tiers[key].escalations += 1
+        self.escalation_reasons[reason] = self.escalation_reasons.get(reason, 0) + 1
+        logger.info(f"Escalating {task} from {tier} tier: {reason}")
+
+    async def generate(self, task: str, prompt: str, call: Callable, clean: Callable[[str], str] = str.strip,
+                       websocket=None) -> Tuple[str, str]:
+        """Generate a query through the cascade; returns (query, tier)
+
+        `call(prompt, websocket, model=, task=, tier=)` is the model call. Only
+        the last tier reports errors to the websocket; failures of earlier
+        tiers escalate silently.
+        """
+        tiers = self.tiers_for(task)
+        for index, (tier, model) in enumerate(tiers):
+            last = index == len(tiers) - 1
+            if last:
+                return clean(await call(prompt, websocket, model=model, task=task, tier=tier)), tier
+            try:
+                query = clean(await call(prompt, None, model=model, task=task, tier=tier))
+            except Exception as e:
+                self.record_escalation(task, tier, f"model error: {type(e).__name__}")
+                continue
+            errors = self.check(query)
+            if not errors:
+                return query, tier
+            self.record_escalation(task, tier, "validation failed")
+            logger.debug(f"{tier} tier query rejected ({'; '.join(errors)}): {query}")
+        raise RuntimeError(f"No model tier configured for {task}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cascade": self.cascade,
+            "cascade_model": self.cascade_model if self.cascade else None,
+            "cascade_tasks": sorted(self.cascade_tasks) if self.cascade else [],
+            "routes": {task: [model for _, model in self.tiers_for(task)] for task in TASKS},
+            "tiers": {
+                f"{task}/{tier}": stats.summary(self.costs.get(stats.model, 1.0))
+                for (task, tier), stats in self.tiers.items()
+            },
+            "escalation_reasons": dict(self.escalation_reasons),
+        }
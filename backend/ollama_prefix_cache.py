@@ -0,0 +1,237 @@
+"""
+Ollama prompt-prefix reuse and model warm-up
+
+`call_ai_model` used to send every prompt in full with an empty `context`,
+so the ~36 KB static `generate_query` instructions were prefilled again on
+each call, and the model could be unloaded between bursts of traffic.
+
+This module keeps, per model, the `context` (token ids) Ollama returns for
+each long static prompt prefix. When OLLAMA_PREFIX_CACHE is enabled, a prompt
+that starts with a known prefix is sent as `context` + the remaining suffix:
+Ollama matches the identical leading tokens against its KV cache and only
+prefills the suffix. The prefix is sent as its own turn and acknowledged, so
+the model sees the instructions followed by the question.
+
+Independently of that mode, every request carries `keep_alive` so hot models
+stay loaded, and `warm_up()` (run in the background at startup) loads
+OLLAMA_MODEL and primes the prefix contexts before the first user request.
+
+Per-prompt timings from Ollama's response (load, prefill, generation) are
+collected in `stats()`, including the latency of the first call per model.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PREFIX_CACHE_ENABLED = os.getenv("OLLAMA_PREFIX_CACHE", "false").lower() in ("1", "true", "yes")
+# Duration string or seconds; "-1" keeps models loaded indefinitely
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() in ("1", "true", "yes")
+# Static prefixes shorter than this are not worth a cached context
+PREFIX_MIN_CHARS = int(os.getenv("OLLAMA_PREFIX_MIN_CHARS", 2000))
+# Prompts whose static leading text is registered as a prefix
+PREFIX_PROMPTS = ("generate_query", "analyze_message", "format_results", "fallback_query")
+WARMUP_TIMEOUT = float(os.getenv("OLLAMA_WARMUP_TIMEOUT", 300))
+
+# Appended to the prefix in the priming request so it is answered with a short acknowledgement
+PRIMING_SUFFIX = "\n\nReply with READY and wait for the question."
+
+_NS_PER_MS = 1_000_000
+
+
+def static_prefix(template_source: str) -> str:
+    """Leading text of a Jinja template that renders identically for every call"""
+    cut = len(template_source)
+    for tag in ("{{", "{%", "{#"):
+        index = template_source.find(tag)
+        if index != -1:
+            cut = min(cut, index)
+    return template_source[:cut].rstrip()
+
+
+def _default_http_client():
+    import httpx  # Imported on first use to keep cold start fast
+    return httpx.AsyncClient(timeout=WARMUP_TIMEOUT)
+
+
+def prefix_key(model: str, prefix: str) -> Tuple[str, str]:
+    return model, hashlib.sha1(prefix.encode()).hexdigest()[:16]
+
+
+class _TimingStats:
+    def __init__(self):
+        self.calls = 0
+        self.reused = 0
+        self.prompt_tokens = 0
+        self.prefill_ms = 0.0
+        self.load_ms = 0.0
+        self.total_ms = 0.0
+        self.first_call_ms: Optional[float] = None
+
+    def add(self, data: Dict[str, Any], elapsed_ms: float, reused: bool):
+        if self.first_call_ms is None:
+            self.first_call_ms = round(elapsed_ms, 1)
+        self.calls += 1
+        self.reused += int(reused)
+        self.prompt_tokens += data.get("prompt_eval_count") or 0
+        self.prefill_ms += (data.get("prompt_eval_duration") or 0) / _NS_PER_MS
+        self.load_ms += (data.get("load_duration") or 0) / _NS_PER_MS
+        self.total_ms += elapsed_ms
+
+    def summary(self) -> Dict[str, Any]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "prefix_reused": self.reused,
+            "first_call_ms": self.first_call_ms,
+            "avg_latency_ms": round(self.total_ms / calls, 1),
+            "avg_prefill_ms": round(self.prefill_ms / calls, 1),
+            "avg_prompt_tokens": round(self.prompt_tokens / calls, 1),
+            "total_load_ms": round(self.load_ms, 1),
+        }
+
+
+class OllamaPrefixCache:
+    """Cached prefix contexts per model, warm-up, and per-prompt timing stats"""
+
+    def __init__(self, client_config: Callable[[], Tuple[str, str]], prompts_dir: str = "prompts",
+                 enabled: bool = PREFIX_CACHE_ENABLED, keep_alive: str = OLLAMA_KEEP_ALIVE,
+                 min_chars: int = PREFIX_MIN_CHARS, http_client_factory: Callable[[], Any] = _default_http_client):
+        self.client_config = client_config
+        self.http_client_factory = http_client_factory
+        self.prompts_dir = Path(prompts_dir)
+        self.enabled = enabled
+        self.keep_alive = keep_alive
+        self.min_chars = min_chars
+        self.prefixes: Dict[str, str] = {}
+        self.contexts: Dict[Tuple[str, str], List[int]] = {}
+        self._priming: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.timings: Dict[Tuple[str, str], _TimingStats] = {}
+        self.warmup: Dict[str, Any] = {"status": "not_started"}
+
+    def register_prompts(self, names=PREFIX_PROMPTS):
+        """Read the static prefix of each prompt file; short prefixes are skipped"""
+        for name in names:
+            path = self.prompts_dir / f"{name}.txt"
+            try:
+                prefix = static_prefix(path.read_text())
+            except OSError as e:
+                logger.warning(f"Cannot read prompt {path}: {e}")
+                continue
+            if len(prefix) >= self.min_chars:
+                self.prefixes[name] = prefix
+        return self.prefixes
+
+    def match(self, prompt_text: str) -> Optional[str]:
+        """Name of the registered prefix this prompt starts with"""
+        for name, prefix in self.prefixes.items():
+            if len(prompt_text) > len(prefix) and prompt_text.startswith(prefix):
+                return name
+        return None
+
+    def prepare(self, model: str, prompt_text: str) -> Tuple[Dict[str, Any], Optional[str], bool]:
+        """Request fields for a prompt: (payload fields, matched prefix name, context reused)"""
+        name = self.match(prompt_text)
+        fields: Dict[str, Any] = {"prompt": prompt_text, "context": [], "keep_alive": self.keep_alive}
+        if not self.enabled or name is None:
+            return fields, name, False
+
+        prefix = self.prefixes[name]
+        key = prefix_key(model, prefix)
+        context = self.contexts.get(key)
+        if context is None:
+            # Sent in full this time; prime the context in the background for the next call
+            self._schedule_priming(model, name)
+            return fields, name, False
+        fields["prompt"] = prompt_text[len(prefix):].lstrip("\n")
+        fields["context"] = context
+        return fields, name, True
+
+    def record(self, model: str, prompt_name: Optional[str], data: Dict[str, Any],
+               elapsed_ms: float, reused: bool):
+        key = (model, prompt_name or "other")
+        self.timings.setdefault(key, _TimingStats()).add(data, elapsed_ms, reused)
+
+    async def prime(self, client, model: str, name: str) -> bool:
+        """Prefill one prefix and keep the context Ollama returns for it"""
+        host, _ = self.client_config()
+        prefix = self.prefixes[name]
+        started = time.perf_counter()
+        resp = await client.post(f"{host}/api/generate", json={
+            "model": model,
+            "prompt": prefix + PRIMING_SUFFIX,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {"num_predict": 4},
+        })
+        resp.raise_for_status()
+        data = resp.json()
+        self.record(model, f"{name}:prime", data, (time.perf_counter() - started) * 1000, False)
+        if data.get("context"):
+            self.contexts[prefix_key(model, prefix)] = data["context"]
+            return True
+        logger.warning(f"Ollama returned no context for prefix {name}; prefix reuse disabled for it")
+        return False
+
+    def _schedule_priming(self, model: str, name: str):
+        key = prefix_key(model, self.prefixes[name])
+        if key in self._priming and not self._priming[key].done():
+            return
+
+        async def run():
+            try:
+                async with self.http_client_factory() as client:
+                    await self.prime(client, model, name)
+            except Exception as e:
+                logger.warning(f"Priming prefix {name} for {model} failed: {e}")
+
+        try:
+            self._priming[key] = asyncio.get_running_loop().create_task(run())
+        except RuntimeError:
+            pass
+
+    async def warm_up(self):
+        """Load the model (and prime prefix contexts when enabled) before the first request"""
+        host, model = self.client_config()
+        self.warmup = {"status": "running", "model": model}
+        started = time.perf_counter()
+        try:
+            async with self.http_client_factory() as client:
+                # A request without a prompt only loads the model
+                resp = await client.post(f"{host}/api/generate", json={"model": model, "keep_alive": self.keep_alive})
+                resp.raise_for_status()
+                self.warmup["load_ms"] = round((resp.json().get("load_duration") or 0) / _NS_PER_MS, 1)
+                primed = []
+                if self.enabled:
+                    for name in self.prefixes:
+                        if await self.prime(client, model, name):
+                            primed.append(name)
+                self.warmup.update({
+                    "status": "done",
+                    "primed": primed,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                })
+                logger.info(f"Ollama warm-up done for {model} in {self.warmup['elapsed_ms']} ms (primed: {primed})")
+        except asyncio.CancelledError:
+            self.warmup["status"] = "cancelled"
+            raise
+        except Exception as e:
+            self.warmup.update({"status": "failed", "error": str(e)})
+            logger.warning(f"Ollama warm-up failed for {model}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "prefix_cache": self.enabled,
+            "keep_alive": self.keep_alive,
+            "prefixes": {name: len(prefix) for name, prefix in self.prefixes.items()},
+            "cached_contexts": len(self.contexts),
+            "warmup": dict(self.warmup),
+            "prompts": {f"{model}/{name}": timing.summary() for (model, name), timing in self.timings.items()},
+        }
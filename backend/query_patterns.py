@@ -380,8 +380,20 @@ class EnhancedQueryPatternMatcher:
             "List principal engineers"
         ]
 
-# Global instance
-enhanced_query_matcher = EnhancedQueryPatternMatcher()
+# Global instance, built on first use so importing this module stays cheap
+_enhanced_query_matcher: Optional[EnhancedQueryPatternMatcher] = None
+
+def get_enhanced_query_matcher() -> EnhancedQueryPatternMatcher:
+    global _enhanced_query_matcher
+    if _enhanced_query_matcher is None:
+        _enhanced_query_matcher = EnhancedQueryPatternMatcher()
+    return _enhanced_query_matcher
+
+def __getattr__(name):
+    # Keeps `from query_patterns import enhanced_query_matcher` working
+    if name == "enhanced_query_matcher":
+        return get_enhanced_query_matcher()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def match_and_generate_query(user_message: str) -> Optional[str]:
     """
@@ -390,7 +402,7 @@ def match_and_generate_query(user_message: str) -> Optional[str]:
     Returns:
         Cypher query string if matched, None otherwise
     """
-    result = enhanced_query_matcher.match_query(user_message)
+    result = get_enhanced_query_matcher().match_query(user_message)
     if result:
         cypher_query, _ = result
         return cypher_query
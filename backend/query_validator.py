@@ -9,6 +9,11 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Clauses that change the graph; property names such as n.set do not count
+WRITE_CLAUSES = re.compile(r"(?<![.\w`])(CREATE|MERGE|SET|DELETE|REMOVE)\b", re.IGNORECASE)
+# String literals, blanked out before looking for clauses
+STRING_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+
 
 class QueryValidator:
     """Validates Cypher queries for FalkorDB compatibility"""
@@ -177,9 +182,16 @@ class QueryValidator:
         # Extract defined variables
         defined_vars = set()
         
-        # Variables from MATCH
-        match_vars = re.findall(r'MATCH.*?\(([a-zA-Z_]\w*)(?::|(?:\s|$))', query, re.IGNORECASE)
-        defined_vars.update(match_vars)
+        # Variables from node patterns anywhere in a path, e.g. (p:Person)-[:R]->(t:Team)
+        # (an opening parenthesis after a word is a function call, not a node)
+        node_vars = re.findall(r'(?<![\w])\(\s*([a-zA-Z_]\w*)\s*(?::|\)|\{)', query)
+        defined_vars.update(node_vars)
+        
+        # Aliases (UNWIND ... AS x, RETURN ... AS x) and list comprehension variables
+        alias_vars = re.findall(r'\bAS\s+([a-zA-Z_]\w*)', query, re.IGNORECASE)
+        defined_vars.update(alias_vars)
+        comprehension_vars = re.findall(r'[\[(]\s*([a-zA-Z_]\w*)\s+IN\b', query, re.IGNORECASE)
+        defined_vars.update(comprehension_vars)
         
         # Variables from WITH
         with_vars = re.findall(r'WITH.*?(?:^|,)\s*(?:[^,\s]+\s+as\s+)?([a-zA-Z_]\w*)(?:\s|,|$)', query, re.IGNORECASE)
@@ -277,6 +289,19 @@ def validate_query(query: str) -> Tuple[bool, List[str], List[str]]:
     return validator.validate(query)
 
 
+def is_write_query(query: str) -> bool:
+    """
+    Check whether a query creates, changes or deletes anything in the graph
+    
+    Args:
+        query: The Cypher query to check
+        
+    Returns:
+        True if the query contains a write clause outside string literals
+    """
+    return bool(WRITE_CLAUSES.search(STRING_LITERALS.sub("''", query)))
+
+
 def validate_and_log(query: str) -> bool:
     """
     Validate a query and log any issues
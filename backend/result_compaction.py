@@ -0,0 +1,191 @@
+"""
+Result compaction for the `format_results` prompt
+
+The formatting prompt used to receive every result row rendered inline, so a
+large answer (an org hierarchy, a long semantic list) became a prompt that
+was slow to prefill and could overflow the model context. Results are now
+summarized locally: per-column statistics, top values with counts (a
+group-by summary for categorical columns), a few sample rows and the total
+row count. Only that summary, trimmed to `RESULT_SUMMARY_TOKEN_BUDGET`, goes
+to the model; the client still receives the table itself through the
+`results` frames.
+
+Small results that already fit the budget are passed through unchanged so
+the model keeps seeing exact rows when it can afford to.
+"""
+
+import json
+import logging
+import os
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from result_rendering import json_cell
+
+logger = logging.getLogger(__name__)
+
+# Approximate prompt tokens allowed for the results section
+RESULT_SUMMARY_TOKEN_BUDGET = int(os.getenv("RESULT_SUMMARY_TOKEN_BUDGET", 1500))
+# Rows scanned for statistics (the first page plus one bounded follow-up query)
+RESULT_SUMMARY_MAX_ROWS = int(os.getenv("RESULT_SUMMARY_MAX_ROWS", 1000))
+RESULT_SUMMARY_TOP_K = int(os.getenv("RESULT_SUMMARY_TOP_K", 5))
+RESULT_SUMMARY_SAMPLE_ROWS = int(os.getenv("RESULT_SUMMARY_SAMPLE_ROWS", 10))
+# Distinct values counted per column before a column is treated as high-cardinality
+MAX_TRACKED_VALUES = 200
+# Sample cells longer than this are cut
+MAX_SAMPLE_CELL = 120
+
+
+def estimate_tokens(value: Any) -> int:
+    """Rough token count of a value as Jinja renders it (str()), ~4 chars per token"""
+    return len(str(value)) // 4 + 1
+
+
+def flatten_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-safe record with node, edge and map properties spread into `column.property` keys"""
+    flat = {}
+    for column, value in record.items():
+        cell = json_cell(value)
+        if isinstance(cell, dict):
+            for prop, prop_value in cell.items():
+                if not prop.startswith("_"):
+                    flat[f"{column}.{prop}"] = prop_value
+        else:
+            flat[column] = cell
+    return flat
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, sort_keys=True, default=str)[:MAX_SAMPLE_CELL]
+    return value
+
+
+def _shorten(value: Any, limit: int) -> Any:
+    if isinstance(value, str) and len(value) > limit:
+        return value[:limit - 3] + "..."
+    if isinstance(value, list):
+        if len(value) > 10:
+            return [_shorten(v, limit) for v in value[:10]] + [f"... {len(value) - 10} more"]
+        return [_shorten(v, limit) for v in value]
+    return value
+
+
+class ColumnStats:
+    """Streaming statistics for one column"""
+
+    def __init__(self):
+        self.non_null = 0
+        self.numeric = 0
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.values: Counter = Counter()
+        self.overflow = False
+
+    def add(self, value: Any):
+        if value is None:
+            return
+        self.non_null += 1
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.numeric += 1
+            self.total += value
+            self.minimum = value if self.minimum is None else min(self.minimum, value)
+            self.maximum = value if self.maximum is None else max(self.maximum, value)
+        key = _hashable(value)
+        if key in self.values or len(self.values) < MAX_TRACKED_VALUES:
+            self.values[key] += 1
+        else:
+            self.overflow = True
+
+    def summary(self, top_k: int) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "non_null": self.non_null,
+            "distinct": f">{MAX_TRACKED_VALUES}" if self.overflow else len(self.values),
+        }
+        if self.numeric and self.numeric == self.non_null:
+            stats.update({
+                "min": self.minimum,
+                "max": self.maximum,
+                "mean": round(self.total / self.numeric, 2),
+            })
+        elif top_k and self.values:
+            top = self.values.most_common(top_k)
+            if top[0][1] > 1:
+                # Values repeat: a group-by count is more useful than listing rows
+                stats["top_values"] = [[_shorten(value, MAX_SAMPLE_CELL), count] for value, count in top]
+        return stats
+
+
+class ResultSummarizer:
+    """Accumulates statistics and sample rows without keeping the rows"""
+
+    def __init__(self, sample_rows: int = RESULT_SUMMARY_SAMPLE_ROWS):
+        self.sample_rows = sample_rows
+        self.rows_seen = 0
+        self.complete = True
+        self.columns: Dict[str, ColumnStats] = {}
+        self.samples: List[Dict[str, Any]] = []
+
+    def add_records(self, records: Iterable[Dict[str, Any]]):
+        for record in records:
+            flat = flatten_record(record)
+            self.rows_seen += 1
+            for column, value in flat.items():
+                self.columns.setdefault(column, ColumnStats()).add(value)
+            if len(self.samples) < self.sample_rows:
+                self.samples.append(flat)
+
+    def summary(self, top_k: int = RESULT_SUMMARY_TOP_K, sample_rows: Optional[int] = None,
+                cell_limit: int = MAX_SAMPLE_CELL) -> Dict[str, Any]:
+        sample_rows = self.sample_rows if sample_rows is None else sample_rows
+        return {
+            "total_count": self.rows_seen if self.complete else f"more than {self.rows_seen}",
+            "columns": {name: stats.summary(top_k) for name, stats in self.columns.items()},
+            "sample_rows": [
+                {k: _shorten(v, cell_limit) for k, v in row.items()}
+                for row in self.samples[:sample_rows]
+            ],
+        }
+
+
+def compact_for_prompt(query: str, records: List[Dict[str, Any]], summarizer: Optional[ResultSummarizer] = None,
+                       budget: int = RESULT_SUMMARY_TOKEN_BUDGET) -> Dict[str, Any]:
+    """Results section for the formatting prompt, bounded by `budget` tokens
+
+    `summarizer` covers rows beyond `records` (the first page) when the
+    result was paginated; without it the statistics cover `records` only.
+    """
+    if summarizer is None or (summarizer.complete and summarizer.rows_seen == len(records)):
+        full = {"query": query, "count": len(records), "results": records}
+        if estimate_tokens(full) <= budget:
+            return full
+    if summarizer is None:
+        summarizer = ResultSummarizer()
+        summarizer.add_records(records)
+
+    # Shrink the summary step by step until it fits the budget
+    attempts = [
+        (RESULT_SUMMARY_TOP_K, summarizer.sample_rows, MAX_SAMPLE_CELL),
+        (RESULT_SUMMARY_TOP_K, 5, 80),
+        (3, 3, 60),
+        (3, 1, 40),
+        (0, 0, 0),
+    ]
+    for top_k, sample_rows, cell_limit in attempts:
+        compacted = {"query": query, "summarized": True, **summarizer.summary(top_k, sample_rows, cell_limit)}
+        if estimate_tokens(compacted) <= budget:
+            break
+    else:
+        # Very wide result: keep the statistics of as many columns as fit
+        columns = compacted["columns"]
+        kept = {}
+        for name, stats in columns.items():
+            if estimate_tokens(kept) + estimate_tokens(stats) > budget * 0.8:
+                break
+            kept[name] = stats
+        compacted["columns"] = kept
+        compacted["omitted_columns"] = len(columns) - len(kept)
+
+    logger.debug(f"Compacted {summarizer.rows_seen} result rows to ~{estimate_tokens(compacted)} prompt tokens")
+    return compacted
@@ -0,0 +1,342 @@
+"""
+Deterministic result formatting
+
+Every `custom` and `search` response used to end with a `format_results`
+LLM call, even for a single count or a short list of people. This module
+recognizes common result shapes and renders the final markdown locally:
+
+    empty           no rows
+    scalar          one row, one value (counts, totals)
+    hierarchy       person -> manager pairs (reporting lines)
+    policy_list     policies, optionally with the team/group that owns them
+    person_list     people with role / email / department
+    group_counts    a label column and a number column (count per department, ...)
+    table           a small table of plain values
+    search          full-text search hits that are only people, teams, groups and policies
+
+Rules are tried in registration order; the first one that matches renders
+the response. Anything no rule handles (large, nested or mixed results)
+still goes to the LLM. `formatting_stats` reports how many responses were
+served without a model call.
+"""
+
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from result_compaction import flatten_record
+from result_rendering import json_cell
+
+logger = logging.getLogger(__name__)
+
+DETERMINISTIC_FORMATTING = os.getenv("DETERMINISTIC_FORMATTING", "true").lower() in ("1", "true", "yes")
+# Longer lists read better when the model summarizes them
+MAX_LIST_ROWS = int(os.getenv("DETERMINISTIC_MAX_LIST_ROWS", 25))
+MAX_TABLE_ROWS = 15
+MAX_TABLE_COLUMNS = 5
+
+PERSON_FIELDS = ("email", "role", "department", "title")
+POLICY_FIELDS = ("severity", "category")
+SEVERITY_ICONS = {"critical": "🔴", "high": "🟠", "medium": "🟡"}
+
+Rule = Callable[[List[Dict[str, Any]], Dict[str, Any]], Optional[str]]
+_custom_rules: "OrderedDict[str, Rule]" = OrderedDict()
+
+
+def custom_rule(shape: str):
+    """Register a formatter for custom query results; returns markdown or None if the shape doesn't fit"""
+    def register(func: Rule) -> Rule:
+        _custom_rules[shape] = func
+        return func
+    return register
+
+
+def _field(column: str) -> str:
+    """`p.name` -> `name`; aliases like `manager_name` are kept"""
+    return column.rsplit(".", 1)[-1].lower()
+
+
+def _alias(column: str) -> str:
+    return column.split(".", 1)[0] if "." in column else ""
+
+
+def _humanize(column: str) -> str:
+    return _field(column).replace("_", " ").strip().capitalize()
+
+
+def _is_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:,.2f}".rstrip("0").rstrip(".")
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}"
+    return str(value).replace("|", "\\|")
+
+
+def _by_field(row: Dict[str, Any], alias: Optional[str] = None) -> Dict[str, Any]:
+    """Row keyed by bare property name, optionally only the columns of one alias"""
+    fields = {}
+    for column, value in row.items():
+        if alias is not None and _alias(column) != alias:
+            continue
+        if _field(column) in ("id", "labels") or value is None:
+            continue
+        fields.setdefault(_field(column), value)
+    return fields
+
+
+def _person_line(person: Dict[str, Any]) -> str:
+    line = f"* **{person.get('name', 'Unknown')}**"
+    role = person.get("role") or person.get("title")
+    if role:
+        line += f" — {role}"
+    if person.get("department"):
+        line += f", {person['department']}"
+    if person.get("email"):
+        line += f" (`{person['email']}`)"
+    return line
+
+
+@custom_rule("empty")
+def format_empty(rows, context):
+    if rows:
+        return None
+    return ("I couldn't find anything in the organization data matching that request.\n\n"
+            "> Try a broader search term, or check the spelling of names, teams and policies.")
+
+
+@custom_rule("scalar")
+def format_scalar(rows, context):
+    if len(rows) != 1 or len(rows[0]) != 1:
+        return None
+    column, value = next(iter(rows[0].items()))
+    if not _is_scalar(value) or isinstance(value, str) and len(value) > 200:
+        return None
+    return f"**{_humanize(column)}:** {_text(value)}"
+
+
+@custom_rule("hierarchy")
+def format_hierarchy(rows, context):
+    if len(rows) > MAX_LIST_ROWS * 2 or context.get("has_more"):
+        return None
+    fields = rows[0].keys()
+    if "manager_name" not in {_field(c) for c in fields}:
+        return None
+
+    managers: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for row in rows:
+        manager_name = next((v for c, v in row.items() if _field(c) == "manager_name"), None)
+        manager = managers.setdefault(manager_name or "Unknown", {"reports": []})
+        manager["role"] = next((v for c, v in row.items() if _field(c) == "manager_role"), None)
+        report = {_field(c): v for c, v in row.items() if not _field(c).startswith("manager_") and v is not None}
+        if report.get("name"):
+            manager["reports"].append(report)
+
+    lines = ["## Reporting Lines", ""]
+    for name, manager in managers.items():
+        heading = f"**{name}**" + (f" — {manager['role']}" if manager.get("role") else "")
+        lines.append(f"{heading} ({len(manager['reports'])} direct report{'s' if len(manager['reports']) != 1 else ''})")
+        lines.extend("  " + _person_line(report) for report in manager["reports"])
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
+@custom_rule("policy_list")
+def format_policy_list(rows, context):
+    if len(rows) > MAX_LIST_ROWS or context.get("has_more"):
+        return None
+    # The policy is the alias whose columns include severity or category
+    policy_alias = next(
+        (_alias(c) for c in rows[0] if _field(c) in POLICY_FIELDS),
+        None
+    )
+    if policy_alias is None:
+        return None
+
+    owner_alias = next((_alias(c) for c in rows[0] if _alias(c) not in ("", policy_alias)), None)
+
+    policies: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for row in rows:
+        policy = _by_field(row, policy_alias)
+        if not policy.get("name"):
+            return None
+        entry = policies.setdefault(policy["name"], {**policy, "owners": []})
+        owner = _by_field(row, owner_alias) if owner_alias is not None else {}
+        if owner.get("name") and owner["name"] not in entry["owners"]:
+            entry["owners"].append(owner["name"])
+
+    severity_rank = {"critical": 0, "high": 1, "medium": 2}
+    ordered = sorted(policies.values(), key=lambda p: severity_rank.get(str(p.get("severity", "")).lower(), 3))
+
+    lines = ["## Relevant Policies", ""]
+    for policy in ordered:
+        severity = str(policy.get("severity", "")).lower()
+        icon = SEVERITY_ICONS.get(severity, "🟢")
+        line = f"{icon} **{policy['name']}**"
+        details = [str(policy[k]).capitalize() if k == "severity" else str(policy[k])
+                   for k in ("category", "severity") if policy.get(k)]
+        if details:
+            line += f" ({', '.join(details)})"
+        lines.append(line)
+        if policy.get("description"):
+            lines.append(f"   - {policy['description']}")
+        if policy["owners"]:
+            lines.append(f"   - Owned by: {', '.join(f'**{o}**' for o in policy['owners'])}")
+    return "\n".join(lines)
+
+
+@custom_rule("person_list")
+def format_person_list(rows, context):
+    if len(rows) > MAX_LIST_ROWS or context.get("has_more"):
+        return None
+    aliases = {_alias(c) for c in rows[0] if _field(c) != "labels"}
+    if len(aliases) != 1:
+        return None
+    people = [_by_field(row) for row in rows]
+    if not all(p.get("name") for p in people) or not any(f in people[0] for f in PERSON_FIELDS):
+        return None
+
+    lines = [f"## People ({len(people)})", ""]
+    lines.extend(_person_line(person) for person in people)
+    departments = Counter(p.get("department") for p in people if p.get("department"))
+    if len(departments) > 1:
+        top = ", ".join(f"{dept} ({count})" for dept, count in departments.most_common(3))
+        lines.extend(["", f"> By department: {top}."])
+    return "\n".join(lines)
+
+
+@custom_rule("group_counts")
+def format_group_counts(rows, context):
+    if len(rows) > MAX_LIST_ROWS or context.get("has_more") or len(rows[0]) != 2:
+        return None
+    label_column, count_column = list(rows[0].keys())
+    if not all(_is_scalar(r[label_column]) and _is_number(r[count_column]) for r in rows):
+        return None
+    total = sum(r[count_column] for r in rows)
+    lines = [f"| {_humanize(label_column)} | {_humanize(count_column)} |", "|---|---:|"]
+    lines.extend(f"| {_text(r[label_column] if r[label_column] is not None else 'None')} | {_text(r[count_column])} |"
+                 for r in rows)
+    lines.extend(["", f"**Total:** {_text(total)} across {len(rows)} groups"])
+    return "\n".join(lines)
+
+
+@custom_rule("table")
+def format_table(rows, context):
+    if len(rows) > MAX_TABLE_ROWS or context.get("has_more"):
+        return None
+    columns = list(rows[0].keys())
+    if len(columns) > MAX_TABLE_COLUMNS:
+        return None
+    if not all(_is_scalar(row.get(c)) and len(str(row.get(c))) <= 80 for row in rows for c in columns):
+        return None
+    lines = [
+        "| " + " | ".join(_humanize(c) for c in columns) + " |",
+        "|" + "|".join("---" for _ in columns) + "|",
+    ]
+    lines.extend("| " + " | ".join(_text(row.get(c)) if row.get(c) is not None else "" for c in columns) + " |"
+                 for row in rows)
+    lines.extend(["", f"Found **{len(rows)}** result{'s' if len(rows) != 1 else ''}."])
+    return "\n".join(lines)
+
+
+def format_custom_results(custom_data: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """(shape, markdown) for custom query results, or None when the LLM should format them"""
+    records = custom_data.get("results") or []
+    rows = [flatten_record(record) for record in records]
+    for shape, rule in _custom_rules.items():
+        try:
+            markdown = rule(rows, custom_data)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.debug(f"Formatter {shape} skipped: {e}")
+            continue
+        if markdown is not None:
+            return shape, markdown
+    return None
+
+
+SEARCH_SECTIONS = ("people", "teams", "groups", "policies")
+
+
+def format_search_results(search_results: Dict[str, List[Any]]) -> Optional[Tuple[str, str]]:
+    """(shape, markdown) for full-text search hits made only of people, teams, groups and policies"""
+    found = {kind: [json_cell(node) for node in nodes] for kind, nodes in search_results.items() if nodes}
+    if not found or any(kind not in SEARCH_SECTIONS for kind in found):
+        return None
+    if sum(len(nodes) for nodes in found.values()) > MAX_LIST_ROWS:
+        return None
+    if not all(isinstance(node, dict) and node.get("name") for nodes in found.values() for node in nodes):
+        return None
+
+    sections = []
+    if "people" in found:
+        sections.append("\n".join([f"## People ({len(found['people'])})", ""] +
+                                  [_person_line(person) for person in found["people"]]))
+    for kind in ("teams", "groups"):
+        if kind in found:
+            lines = [f"## {kind.capitalize()} ({len(found[kind])})", ""]
+            for node in found[kind]:
+                line = f"* **{node['name']}**"
+                if node.get("description"):
+                    line += f" — {node['description']}"
+                lines.append(line)
+            sections.append("\n".join(lines))
+    if "policies" in found:
+        rows = [{f"p.{k}": v for k, v in node.items() if not k.startswith("_")} for node in found["policies"]]
+        sections.append(format_policy_list(rows, {}) or "")
+    return "search", "\n\n".join(section for section in sections if section)
+
+
+class FormattingStats:
+    """How many responses were formatted locally vs by the LLM"""
+
+    def __init__(self):
+        self.local: Counter = Counter()
+        self.llm: Counter = Counter()
+        self.local_seconds = 0.0
+
+    def record_local(self, shape: str, seconds: float):
+        self.local[shape] += 1
+        self.local_seconds += seconds
+
+    def record_llm(self, kind: str):
+        self.llm[kind] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        local, llm = sum(self.local.values()), sum(self.llm.values())
+        total = local + llm
+        return {
+            "enabled": DETERMINISTIC_FORMATTING,
+            "responses": total,
+            "formatted_locally": local,
+            "formatted_by_llm": llm,
+            "local_share": round(local / total, 3) if total else 0.0,
+            "local_avg_us": round(self.local_seconds / local * 1e6, 1) if local else 0.0,
+            "by_shape": dict(self.local),
+            "llm_by_kind": dict(self.llm),
+        }
+
+
+formatting_stats = FormattingStats()
+
+
+def format_locally(kind: str, data: Dict[str, Any]) -> Optional[str]:
+    """Markdown for `custom` or `search` results if a rule handles them; records the outcome either way"""
+    if DETERMINISTIC_FORMATTING:
+        started = time.perf_counter()
+        formatter = format_custom_results if kind == "custom" else format_search_results
+        formatted = formatter(data)
+        if formatted is not None:
+            shape, markdown = formatted
+            formatting_stats.record_local(shape, time.perf_counter() - started)
+            return markdown
+    formatting_stats.record_llm(kind)
+    return None
@@ -0,0 +1,224 @@
+"""
+Cursor-based pagination for custom query results
+
+Generated queries used to run unbounded: every matching row was pulled into
+memory, converted, and sent at once. Queries now run one page at a time by
+appending SKIP/LIMIT to the final RETURN clause (generated queries have
+arbitrary shapes and no common key, so keyset pagination on `id` is not
+generally available). Each page fetches one extra row to learn whether more
+exist, so memory is bounded by the page size however many rows match.
+
+FalkorDB does not guarantee a row order, so a query without ORDER BY is
+ordered by every returned column before it is paged; rows that tie are
+identical, so pages never repeat or skip rows. Queries that can't be rewritten
+(UNION, RETURN *, writes, SKIP/LIMIT given as parameters, an ORDER BY before
+the final RETURN) are run once and paged in memory by the caller.
+
+Cursor protocol over the chat WebSocket:
+
+    server: {"type": "results", ..., "cursor": "c1a2", "has_more": true, "page": 1}
+    client: {"type": "fetch_page", "cursor": "c1a2"}
+    server: {"type": "results_page", ..., "cursor": "c1a2", "has_more": false, "page": 2}
+
+A cursor stores only the query text and the next offset, plus the whole result
+for queries that had to be run once and paged in memory. Cursors expire
+after `RESULT_CURSOR_TTL` seconds and each connection keeps at most
+`MAX_CURSORS_PER_CONNECTION` (oldest evicted first).
+"""
+
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from query_validator import STRING_LITERALS, is_write_query
+
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", 50))
+RESULT_CURSOR_TTL = float(os.getenv("RESULT_CURSOR_TTL", 300))
+MAX_CURSORS_PER_CONNECTION = int(os.getenv("MAX_CURSORS_PER_CONNECTION", 8))
+
+# Trailing "SKIP n" and/or "LIMIT n" on the final RETURN clause
+_TRAILING_BOUNDS = re.compile(
+    r"(?:\s+SKIP\s+(?P<skip>\d+))?(?:\s+LIMIT\s+(?P<limit>\d+))?\s*$",
+    re.IGNORECASE,
+)
+# Clauses that may follow RETURN and would make appending SKIP/LIMIT unsafe
+_AFTER_RETURN = re.compile(r"\b(UNION|MATCH|WITH|CALL|CREATE|MERGE|SET|DELETE|UNWIND)\b", re.IGNORECASE)
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+# SKIP/LIMIT left after the literal bounds are taken off: a parameter or an expression
+_OTHER_BOUNDS = re.compile(r"\b(SKIP|LIMIT)\b", re.IGNORECASE)
+# "expr AS alias" at the end of a RETURN item
+_ALIAS = re.compile(r"\s+AS\s+(`[^`]+`|\w+)$", re.IGNORECASE)
+_IDENTIFIER = re.compile(r"^[A-Za-z_]\w*$")
+
+
+def _split_items(projection: str) -> List[str]:
+    """Split a RETURN projection at top-level commas (not inside brackets or strings)"""
+    items, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(projection):
+        if quote:
+            if ch == quote and projection[i - 1] != "\\":
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        elif ch in "([{":
+            depth += 1
+        elif ch in ")]}":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            items.append(projection[start:i].strip())
+            start = i + 1
+    items.append(projection[start:].strip())
+    return items
+
+
+def order_by_columns(body: str, return_end: int) -> Optional[str]:
+    """Order a query by every returned column; None if the projection can't be referenced
+
+    Unaliased expressions get an alias equal to their own text, so the column
+    names stay the same and ORDER BY also works after aggregation.
+    """
+    projection = body[return_end:]
+    distinct = re.match(r"\s*DISTINCT\b", projection, re.IGNORECASE)
+    if distinct:
+        projection = projection[distinct.end():]
+
+    items, keys = [], []
+    for item in _split_items(projection):
+        alias = _ALIAS.search(item)
+        if alias:
+            key = alias.group(1)
+        elif _IDENTIFIER.match(item):
+            key = item
+        elif not item or item == "*" or "`" in item:
+            return None
+        else:
+            key = f"`{' '.join(item.split())}`"
+            item = f"{item} AS {key}"
+        items.append(item)
+        keys.append(key)
+
+    head = body[:return_end] + (" DISTINCT" if distinct else "")
+    return f"{head} {', '.join(items)} ORDER BY {', '.join(keys)}"
+
+
+def paginate_query(cypher_query: str, offset: int, limit: int) -> Optional[str]:
+    """Rewrite a read query to return rows [offset, offset + limit); None if not pageable
+
+    An existing trailing SKIP/LIMIT is respected: pages are taken from inside
+    the original window and never extend past its end; one given as a
+    parameter or expression makes the query unpageable. An ORDER BY on the
+    final RETURN is kept. A query ordered only before it (WITH ... ORDER BY)
+    is unpageable, since ordering by the returned columns would replace the
+    query's own order; a query with no ORDER BY is ordered by its columns.
+    """
+    query = cypher_query.strip().rstrip(";").strip()
+    returns = list(re.finditer(r"\bRETURN\b", query, re.IGNORECASE))
+    if not returns or is_write_query(query):
+        return None
+    tail = query[returns[-1].end():]
+    if _AFTER_RETURN.search(tail) or re.search(r"\bUNION\b", query, re.IGNORECASE):
+        return None
+
+    bounds = _TRAILING_BOUNDS.search(query)
+    body = query[:bounds.start()] if bounds else query
+    if _OTHER_BOUNDS.search(STRING_LITERALS.sub("''", body[returns[-1].end():])):
+        return None
+    if not _ORDER_BY.search(STRING_LITERALS.sub("''", tail)):
+        if _ORDER_BY.search(STRING_LITERALS.sub("''", query)):
+            return None
+        body = order_by_columns(body, returns[-1].end())
+        if body is None:
+            return None
+    base_skip = int(bounds.group("skip") or 0) if bounds else 0
+    base_limit = int(bounds.group("limit")) if bounds and bounds.group("limit") else None
+
+    if base_limit is not None:
+        limit = min(limit, base_limit - offset)
+        if limit <= 0:
+            limit = 0
+    return f"{body} SKIP {base_skip + offset} LIMIT {limit}"
+
+
+@dataclass
+class ResultCursor:
+    cursor_id: str
+    owner: int
+    query: str
+    next_offset: int
+    page_size: int
+    page: int = 1
+    # Whole result of a query that can't be paged in the database
+    buffered: Any = None
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ResultCursorStore:
+    """Open result cursors for all connections, bounded per connection"""
+
+    def __init__(self, ttl: float = RESULT_CURSOR_TTL, max_per_owner: int = MAX_CURSORS_PER_CONNECTION):
+        self.ttl = ttl
+        self.max_per_owner = max_per_owner
+        self._cursors: Dict[str, ResultCursor] = {}
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._cursors)
+
+    def create(self, owner: Any, query: str, next_offset: int, page_size: int, buffered: Any = None) -> str:
+        self.expire()
+        owner_id = id(owner)
+        mine = sorted(
+            (c for c in self._cursors.values() if c.owner == owner_id),
+            key=lambda c: c.last_used
+        )
+        while len(mine) >= self.max_per_owner:
+            oldest = mine.pop(0)
+            del self._cursors[oldest.cursor_id]
+            self.evicted += 1
+
+        cursor_id = uuid.uuid4().hex[:12]
+        self._cursors[cursor_id] = ResultCursor(cursor_id, owner_id, query, next_offset, page_size,
+                                                buffered=buffered)
+        return cursor_id
+
+    def get(self, owner: Any, cursor_id: str) -> Optional[ResultCursor]:
+        """Look up a live cursor; cursors are only visible to the connection that opened them"""
+        self.expire()
+        cursor = self._cursors.get(cursor_id)
+        if cursor is None or cursor.owner != id(owner):
+            return None
+        cursor.last_used = time.monotonic()
+        return cursor
+
+    def advance(self, cursor: ResultCursor, rows_returned: int, has_more: bool):
+        cursor.next_offset += rows_returned
+        cursor.page += 1
+        if not has_more:
+            self._cursors.pop(cursor.cursor_id, None)
+
+    def close(self, cursor_id: str):
+        self._cursors.pop(cursor_id, None)
+
+    def drop_owner(self, owner: Any):
+        owner_id = id(owner)
+        for cursor_id in [c.cursor_id for c in self._cursors.values() if c.owner == owner_id]:
+            del self._cursors[cursor_id]
+
+    def expire(self):
+        cutoff = time.monotonic() - self.ttl
+        stale = [c.cursor_id for c in self._cursors.values() if c.last_used < cutoff]
+        for cursor_id in stale:
+            del self._cursors[cursor_id]
+        self.expired += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"open": len(self._cursors), "expired": self.expired, "evicted": self.evicted}
+
+
+def split_page(rows, page_size: int) -> Tuple[list, bool]:
+    """Trim the look-ahead row fetched to detect whether another page exists"""
+    return list(rows[:page_size]), len(rows) > page_size
@@ -0,0 +1,218 @@
+"""
+Query result rendering
+
+Converts a FalkorDB result set once into column names, rows and dict records,
+and renders the text table only when something actually reads it, and only
+for the first `RESULT_PREVIEW_ROWS` rows. The table used to be built (two
+passes over every row) and printed on every query regardless of size.
+
+Result logging goes through a QueueHandler whose records are formatted on the
+listener thread, so neither rendering nor stdout writes happen on the event
+loop. The client receives a structured payload (columns, preview rows, total
+count) next to the markdown preview it already knows how to display.
+"""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Rows included in the rendered table and the structured payload
+RESULT_PREVIEW_ROWS = int(os.getenv("RESULT_PREVIEW_ROWS", 50))
+# Cells wider than this are truncated in the text table
+MAX_CELL_WIDTH = 50
+# DEBUG logs the preview table of every query, INFO only a one-line summary
+RESULT_LOG_LEVEL = os.getenv("RESULT_LOG_LEVEL", "DEBUG").upper()
+
+# Dedicated logger for result tables; handlers are attached by setup_results_logging()
+results_logger = logging.getLogger("query_results")
+
+
+def json_cell(value: Any) -> Any:
+    """Make a graph value JSON-serializable (nodes and edges become plain dicts)"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [json_cell(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): json_cell(v) for k, v in value.items()}
+    properties = getattr(value, "properties", None)
+    if isinstance(properties, dict):
+        cell = {k: json_cell(v) for k, v in properties.items()}
+        labels = getattr(value, "labels", None)
+        relation = getattr(value, "relation", None)
+        if labels:
+            cell["_labels"] = list(labels)
+        if relation:
+            cell["_relation"] = relation
+        return cell
+    return str(value)
+
+
+def _cell_text(value: Any) -> str:
+    text = str(value) if value is not None else "NULL"
+    if len(text) > MAX_CELL_WIDTH:
+        text = text[:MAX_CELL_WIDTH - 3] + "..."
+    return text
+
+
+class QueryResultSet:
+    """A query result converted once and rendered on demand"""
+
+    def __init__(self, columns: Sequence[str], rows: Sequence[Sequence[Any]]):
+        self.columns = list(columns)
+        self.rows = rows
+        self._records: Optional[List[Dict[str, Any]]] = None
+        self._tables: Dict[int, str] = {}
+
+    @classmethod
+    def from_graph_result(cls, result) -> "QueryResultSet":
+        rows = result.result_set or []
+        columns = [col[1] for col in result.header] if result.header else []
+        return cls(columns, rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        """Rows as dicts keyed by column; single unnamed columns become {"result": value}"""
+        if self._records is None:
+            if self.columns:
+                columns = self.columns
+                self._records = [dict(zip(columns, row)) for row in self.rows]
+            else:
+                self._records = [{"result": row[0] if len(row) == 1 else row} for row in self.rows]
+        return self._records
+
+    def render_table(self, max_rows: int = RESULT_PREVIEW_ROWS) -> str:
+        """Padded text table of the first `max_rows` rows (cached per row limit)"""
+        if max_rows in self._tables:
+            return self._tables[max_rows]
+        if not self.rows:
+            return "No results returned"
+
+        columns = self.columns or [f"col_{i}" for i in range(len(self.rows[0]))]
+        preview = [[_cell_text(cell) for cell in row[:len(columns)]] for row in self.rows[:max_rows]]
+        widths = [len(col) for col in columns]
+        for cells in preview:
+            for i, text in enumerate(cells):
+                if len(text) > widths[i]:
+                    widths[i] = len(text)
+        widths = [min(w, MAX_CELL_WIDTH) for w in widths]
+
+        lines = [
+            "| " + " | ".join(col.ljust(widths[i]) for i, col in enumerate(columns)) + " |",
+            "|" + "|".join("-" * (w + 2) for w in widths) + "|",
+        ]
+        lines.extend("| " + " | ".join(text.ljust(widths[i]) for i, text in enumerate(cells)) + " |"
+                     for cells in preview)
+        if len(self.rows) > max_rows:
+            lines.append(f"... {len(self.rows) - max_rows} more rows")
+
+        table = "\n".join(lines)
+        self._tables[max_rows] = table
+        return table
+
+    def markdown(self, max_rows: int = RESULT_PREVIEW_ROWS, offset: int = 0, has_more: bool = False) -> str:
+        """Markdown preview; a page of a larger result (offset or has_more) is labelled with its row range"""
+        if not self.rows:
+            return "**Query Results:** No results returned" if offset == 0 else "*No more rows*"
+        shown = min(len(self.rows), max_rows)
+        table = f"```\n{self.render_table(max_rows)}\n```"
+        if offset == 0 and not has_more:
+            count = f"{len(self.rows)} rows" if shown == len(self.rows) else f"showing {shown} of {len(self.rows)} rows"
+            return f"**Query Results:** ({count})\n\n{table}"
+        span = f"rows {offset + 1}-{offset + shown}" + (", more available" if has_more else "")
+        # Later pages are appended below the first one, which already carries the header
+        if offset == 0:
+            return f"**Query Results:** ({span})\n\n{table}"
+        return f"*{span[0].upper()}{span[1:]}*\n\n{table}"
+
+    def payload(self, max_rows: int = RESULT_PREVIEW_ROWS, offset: int = 0, has_more: bool = False) -> Dict[str, Any]:
+        """Structured `results` frame: preview rows plus the markdown fallback
+
+        `total_rows` is only set once the last page is known; pages report
+        their position as `first_row`/`last_row` (1-based).
+        """
+        columns = self.columns or ["result"]
+        shown = min(len(self.rows), max_rows)
+        return {
+            "type": "results",
+            "message": self.markdown(max_rows, offset, has_more),
+            "columns": columns,
+            "rows": [[json_cell(cell) for cell in row] for row in self.rows[:max_rows]],
+            "first_row": offset + 1 if shown else None,
+            "last_row": offset + shown if shown else None,
+            "total_rows": None if has_more else offset + len(self.rows),
+            "truncated": len(self.rows) > max_rows,
+        }
+
+
+class LazyTable:
+    """Log argument that renders the table only when the record is formatted"""
+
+    def __init__(self, result_set: QueryResultSet, max_rows: int = RESULT_PREVIEW_ROWS):
+        self.result_set = result_set
+        self.max_rows = max_rows
+
+    def __str__(self):
+        return self.result_set.render_table(self.max_rows)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread
+
+    The stock handler formats the message in the caller's thread, which
+    would render the table on the event loop.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+def setup_results_logging(level: str = RESULT_LOG_LEVEL) -> QueueListener:
+    """Route `query_results` records through a queue to a stdout handler thread"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    _queue_handler = DeferredQueueHandler(log_queue)
+    results_logger.addHandler(_queue_handler)
+    results_logger.setLevel(level)
+    results_logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(stop_results_logging)
+    return _listener
+
+
+def stop_results_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        results_logger.removeHandler(_queue_handler)
+        results_logger.propagate = True
+        _queue_handler = None
+
+
+def log_result_set(cypher_query: str, result_set: QueryResultSet):
+    """Queue a summary line (INFO) and the lazily rendered table (DEBUG)"""
+    results_logger.info("=== QUERY RESULTS === %s -> %d rows", cypher_query, len(result_set))
+    if results_logger.isEnabledFor(logging.DEBUG) and len(result_set):
+        results_logger.debug("%s", LazyTable(result_set))
@@ -17,6 +17,7 @@ class IndexCreator:
         indexes = [
             # Basic entity indexes
             ("Message", "timestamp"),
+            ("Message", "bucket"),
             ("Person", "name"),
             ("Team", "name"),
             ("Group", "name"),
@@ -3042,6 +3042,7 @@ def seed_database(falkor_client):
     # Create indexes for better performance
     try:
         db.query("CREATE INDEX ON :Message(timestamp)")
+        db.query("CREATE INDEX ON :Message(bucket)")
         db.query("CREATE INDEX ON :Person(name)")
         db.query("CREATE INDEX ON :Team(name)")
         db.query("CREATE INDEX ON :Group(name)")
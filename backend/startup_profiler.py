@@ -0,0 +1,158 @@
+"""
+Startup-time profiling for the API process
+
+Set STARTUP_PROFILE=1 to record how long each module takes to import (self
+and cumulative time, like `python -X importtime`) and how long each named
+initialization phase takes. The report is printed when startup completes,
+served at /debug/startup, and written as JSON to STARTUP_PROFILE_OUTPUT if
+that is set.
+
+Must be imported before anything heavy so the import hook sees everything:
+
+    import startup_profiler
+    startup_profiler.install_from_env()
+"""
+
+import builtins
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+PROFILE_ENABLED = os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_OUTPUT = os.getenv("STARTUP_PROFILE_OUTPUT", "")
+# Rows shown in the printed report
+PROFILE_TOP = int(os.getenv("STARTUP_PROFILE_TOP", 25))
+
+_original_import = builtins.__import__
+_stack = threading.local()
+_process_start = time.perf_counter()
+
+# module name -> {"self_ms", "cumulative_ms", "order"}
+import_times: Dict[str, Dict[str, float]] = {}
+phase_times: List[Dict[str, Any]] = []
+milestones: Dict[str, float] = {}
+_totals = {"import_ms": 0.0}
+
+
+def _resolve(name: str, globals_: Optional[dict], level: int) -> str:
+    if level == 0:
+        return name
+    package = (globals_ or {}).get("__package__") or ""
+    try:
+        return importlib.util.resolve_name("." * level + name, package)
+    except (ImportError, ValueError):
+        return name
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    module_name = _resolve(name, globals, level)
+    if module_name in sys.modules:
+        # Already imported: nothing to measure, keep the fast path fast
+        return _original_import(name, globals, locals, fromlist, level)
+
+    stack = getattr(_stack, "frames", None)
+    if stack is None:
+        stack = _stack.frames = []
+    stack.append(0.0)
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - started
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        else:
+            # Outermost import: nested imports are already included
+            _totals["import_ms"] += elapsed * 1000
+        if module_name not in import_times:
+            import_times[module_name] = {
+                "self_ms": (elapsed - children) * 1000,
+                "cumulative_ms": elapsed * 1000,
+                "order": len(import_times),
+            }
+
+
+def install():
+    """Start timing imports; safe to call more than once"""
+    if builtins.__import__ is not _timed_import:
+        builtins.__import__ = _timed_import
+
+
+def uninstall():
+    builtins.__import__ = _original_import
+
+
+def install_from_env() -> bool:
+    if PROFILE_ENABLED:
+        install()
+    return PROFILE_ENABLED
+
+
+@contextmanager
+def phase(name: str):
+    """Time an initialization step; a no-op unless profiling is enabled"""
+    if not PROFILE_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase_times.append({
+            "phase": name,
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+            "at_ms": round((started - _process_start) * 1000, 3),
+        })
+
+
+def mark(name: str):
+    """Record a point in time since this module was imported (e.g. 'app_created')"""
+    milestones[name] = round((time.perf_counter() - _process_start) * 1000, 3)
+
+
+def report(top: Optional[int] = None) -> Dict[str, Any]:
+    ranked = sorted(import_times.items(), key=lambda item: item[1]["cumulative_ms"], reverse=True)
+    if top:
+        ranked = ranked[:top]
+    return {
+        "enabled": PROFILE_ENABLED,
+        "modules_imported": len(import_times),
+        "milestones_ms": dict(milestones),
+        "phases": list(phase_times),
+        "imports": [
+            {
+                "module": name,
+                "self_ms": round(stats["self_ms"], 3),
+                "cumulative_ms": round(stats["cumulative_ms"], 3),
+            }
+            for name, stats in ranked
+        ],
+        "total_import_ms": round(_totals["import_ms"], 3),
+    }
+
+
+def print_report(top: int = PROFILE_TOP):
+    data = report(top)
+    print(f"\n⏱️  Startup profile ({data['modules_imported']} modules, "
+          f"{data['total_import_ms']:.1f} ms importing)")
+    for name, at_ms in data["milestones_ms"].items():
+        print(f"   {name:<32} {at_ms:>10.1f} ms")
+    if data["phases"]:
+        print(f"\n   {'init phase':<32} {'ms':>10}")
+        for entry in data["phases"]:
+            print(f"   {entry['phase']:<32} {entry['ms']:>10.1f}")
+    print(f"\n   {'module':<40} {'self ms':>9} {'cumul ms':>9}")
+    for entry in data["imports"]:
+        print(f"   {entry['module']:<40} {entry['self_ms']:>9.1f} {entry['cumulative_ms']:>9.1f}")
+
+
+def write_report(path: str = PROFILE_OUTPUT):
+    if path:
+        with open(path, "w") as f:
+            json.dump(report(), f, indent=2)
@@ -6,7 +6,6 @@ allowing for progressive display of results and better perceived performance.
 """
 
 import json
-import asyncio
 from typing import Dict, Any, Optional, AsyncGenerator, List
 from dataclasses import dataclass
 import logging
@@ -48,7 +47,6 @@ class ResponseStreamer:
                 data={"part": part, "progress": (i + 1) / len(query_parts)},
                 metadata={"total_parts": len(query_parts)}
             ))
-            await asyncio.sleep(0.1)  # Small delay for visual effect
             
     async def stream_results(self, results: List[Dict], total_count: int):
         """Stream results in chunks"""
@@ -66,10 +64,6 @@ class ResponseStreamer:
                 data={"results": chunk, "start_index": i, "end_index": min(i + self.chunk_size, len(results))},
                 metadata={"chunk_number": i // self.chunk_size + 1}
             ))
-            
-            # Small delay between chunks for better UX
-            if i + self.chunk_size < len(results):
-                await asyncio.sleep(0.05)
                 
         # Send completion signal
         await self.send_chunk(StreamChunk(
@@ -2,6 +2,10 @@
 """
 Performance and scale testing for global operations
 Tests query performance with current data volume
+
+For regression-checked timings of the core graph queries use the FalkorDB
+benchmarks in tests/test_benchmarks.py instead; tools/graph_query_benchmark.py
+measures how the full query catalog scales with graph size.
 """
 
 import json
@@ -0,0 +1,97 @@
+"""
+Tests for the structured analyze_message output and incremental JSON parsing
+"""
+import json
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_output import (
+    ANALYSIS_SCHEMA, Analysis, IncrementalJSONParser, parse_analysis, read_analysis
+)
+
+COMPLETION = json.dumps({
+    "tools": ["custom_query", "store_message"],
+    "response_type": "custom",
+    "reasoning": "Task-oriented question about \"SOX\" {controls}, needs policy owners.",
+})
+
+
+async def stream(text, size=3, log=None):
+    """Async generator yielding `text` in small chunks, noting how far it was read"""
+    try:
+        for i in range(0, len(text), size):
+            if log is not None:
+                log["read"] = i + size
+            yield text[i:i + size]
+    finally:
+        if log is not None:
+            log["closed"] = True
+
+
+class TestIncrementalJSONParser:
+    def test_fields_complete_as_soon_as_their_value_ends(self):
+        parser = IncrementalJSONParser()
+        events = []
+        for i in range(0, len(COMPLETION), 4):
+            for key, _ in parser.feed(COMPLETION[i:i + 4]):
+                events.append((key, parser.buffer.count('"reasoning"')))
+        # tools and response_type are complete before the reasoning key is streamed
+        assert events[:2] == [("tools", 0), ("response_type", 0)]
+        assert events[2][0] == "reasoning"
+        assert parser.done
+        assert parser.fields == json.loads(COMPLETION)
+
+    def test_scalars_nested_values_and_escapes(self):
+        text = 'Sure: {"a": 12, "b": true, "c": {"d": [1, "]}"]}, "e": "x\\"y", "f": null}'
+        parser = IncrementalJSONParser()
+        for char in text:
+            parser.feed(char)
+        assert parser.fields == {"a": 12, "b": True, "c": {"d": [1, "]}"]}, "e": 'x"y', "f": None}
+
+    def test_partial_input_has_no_incomplete_fields(self):
+        parser = IncrementalJSONParser()
+        parser.feed('{"tools": ["search_database", "cust')
+        assert parser.fields == {}
+        assert not parser.done
+
+
+class TestAnalysis:
+    def test_schema_orders_decision_fields_first(self):
+        assert list(ANALYSIS_SCHEMA["properties"])[:2] == ["tools", "response_type"]
+
+    def test_unknown_tools_and_types_are_dropped(self):
+        analysis = Analysis.from_fields({"tools": ["rm_rf", "search_database"], "response_type": "poem"}, "text")
+        assert analysis.tools == ["search_database"]
+        assert analysis.response_type == "pig_latin"
+
+    def test_parse_analysis_tolerates_surrounding_text(self):
+        analysis = parse_analysis("Here is the JSON:\n```json\n" + COMPLETION + "\n```")
+        assert analysis.tools == ["custom_query", "store_message"]
+        assert analysis.source == "text"
+
+    def test_parse_analysis_defaults(self):
+        analysis = parse_analysis("I cannot help with that")
+        assert analysis.source == "default"
+        assert analysis.tools == ["pig_latin", "store_message"]
+
+
+class TestReadAnalysis:
+    @pytest.mark.asyncio
+    async def test_stream_is_closed_once_decision_fields_are_known(self):
+        log = {}
+        analysis = await read_analysis(stream(COMPLETION, log=log))
+        assert analysis.source == "stream"
+        assert analysis.tools == ["custom_query", "store_message"]
+        assert analysis.response_type == "custom"
+        assert log["closed"]
+        assert log["read"] < len(COMPLETION)
+
+    @pytest.mark.asyncio
+    async def test_unstructured_completion_falls_back_to_text_parsing(self):
+        text = "The answer is {not json} then " + COMPLETION
+        analysis = await read_analysis(stream(text))
+        assert analysis.response_type == "custom"
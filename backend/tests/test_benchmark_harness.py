@@ -0,0 +1,67 @@
+"""
+Tests for benchmark timing and baseline regression checks
+"""
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_harness import BaselineStore, BenchmarkRunner, calibrate, measure, summarize
+
+
+def summary(min_ms):
+    return {"rounds": 5, "min_ms": min_ms, "median_ms": min_ms * 1.1, "p95_ms": min_ms * 1.3, "max_ms": min_ms * 1.5}
+
+
+class TestMeasure:
+    def test_summary_statistics(self):
+        stats = summarize([float(i) for i in range(1, 21)])
+        assert (stats["min_ms"], stats["median_ms"], stats["p95_ms"], stats["max_ms"]) == (1.0, 10.5, 20.0, 20.0)
+
+    def test_fast_calls_are_batched(self):
+        calls = []
+        stats = measure(lambda: calls.append(1), rounds=3, warmup=1, min_round_ms=1)
+        assert stats["calls_per_round"] > 1
+        assert stats["rounds"] == 3
+        assert stats["min_ms"] < 1
+        assert calibrate(lambda: None, 0) == 1
+
+
+class TestBaselineStore:
+    def test_missing_entries_fail_unless_updating(self, tmp_path):
+        path = str(tmp_path / "baselines.json")
+        missing = BaselineStore(path).check("validator", summary(2.0))
+        assert missing.status == "missing" and missing.failed and not missing.regressed
+        assert "BENCHMARK_UPDATE=1" in missing.describe()
+        assert not os.path.exists(path)
+
+        recorded = BaselineStore(path, update=True).check("validator", summary(2.0))
+        assert recorded.status == "recorded" and not recorded.failed
+        with open(path) as f:
+            assert json.load(f)["benchmarks"]["validator"]["min_ms"] == 2.0
+
+    def test_regression_beyond_threshold_fails(self, tmp_path):
+        path = str(tmp_path / "baselines.json")
+        BaselineStore(path).record("validator", summary(2.0))
+
+        store = BaselineStore(path, threshold=0.25)
+        assert store.check("validator", summary(2.4)).status == "ok"
+        slower = store.check("validator", summary(2.6))
+        assert slower.regressed and slower.failed
+        assert "+30.0%" in slower.describe()
+        # A failing run leaves the baseline alone
+        assert BaselineStore(path).entries["validator"]["min_ms"] == 2.0
+
+    def test_update_rerecords(self, tmp_path):
+        path = str(tmp_path / "baselines.json")
+        BaselineStore(path).record("validator", summary(2.0))
+        assert not BaselineStore(path, update=True).check("validator", summary(9.0)).regressed
+        assert BaselineStore(path).entries["validator"]["min_ms"] == 9.0
+
+    def test_runner_reports_every_benchmark(self, tmp_path):
+        runner = BenchmarkRunner(BaselineStore(str(tmp_path / "baselines.json")))
+        runner.run("noop", lambda: None, rounds=2, warmup=0, min_round_ms=0.1)
+        runner.check("fixed", summary(1.0))
+        assert [line.split(":")[0] for line in runner.report().splitlines()] == ["noop", "fixed"]
@@ -0,0 +1,190 @@
+"""
+Benchmark suite with regression baselines
+
+Skipped unless BENCHMARKS=1. Micro-benchmarks cover the CPU-bound pipeline
+stages; macro-benchmarks run read queries against a local FalkorDB
+(FALKOR_HOST/FALKOR_PORT, graph FALKOR_BENCHMARK_GRAPH) and skip when it is
+unreachable or empty. See benchmark_harness.py for baseline handling.
+
+    BENCHMARKS=1 BENCHMARK_UPDATE=1 python -m pytest -q tests/test_benchmarks.py  # record
+    BENCHMARKS=1 python -m pytest -q tests/test_benchmarks.py                     # compare
+"""
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_harness import BENCHMARKS_ENABLED, BenchmarkRunner
+
+pytestmark = pytest.mark.skipif(not BENCHMARKS_ENABLED, reason="set BENCHMARKS=1 to run benchmarks")
+
+QUESTIONS = [
+    "who's on the mobile team?",
+    "find Sarah's manager",
+    "show me all engineers",
+    "who are the team leads?",
+    "who owns security policy?",
+    "members of the engineering team",
+    "who reports to the CTO?",
+    "what teams work on mobile apps and have more than 5 members?",
+    "show me people who joined in the last 6 months",
+    "which department has the most team leads?",
+]
+
+QUERIES = [
+    "MATCH (p:Person)-[:MEMBER_OF]->(t:Team {name: 'Mobile'}) RETURN p.name, p.role ORDER BY p.name",
+    "MATCH (p:Person) WHERE lower(p.department) = 'engineering' RETURN p.name LIMIT 25",
+    "MATCH (p:Person)-[:REPORTS_TO*1..3]->(m:Person {name: 'Sarah Chen'}) RETURN p.name, m.name",
+    "MATCH (t:Team)-[:RESPONSIBLE_FOR]->(pol:Policy) WITH t, COUNT(pol) AS policies "
+    "RETURN t.name, policies ORDER BY policies DESC LIMIT 10",
+    "MATCH (p:Person)-[:HAS_SKILL]->(s:Skill) WHERE s.name IN ['Python', 'Go'] "
+    "RETURN s.name, collect(p.name)[0..5] AS people",
+    "MATCH (p:Person {id: 'person_1'}) RETURN p.name, size(p.email)",
+]
+
+ERRORS = [
+    ("Invalid input 'RETRUN': expected RETURN", "who is on the mobil team?"),
+    ("Variable `m` not defined", "find Sarah's manager"),
+    ("Property 'title' not found", "show me all enginers"),
+    ("Label 'Department' not found", "people in the securty department"),
+    ("Query timed out after 30000ms", "everyone connected to the CTO"),
+]
+
+
+def person_rows(count):
+    return [
+        {"p.id": i, "p.name": f"Person {i}", "p.email": f"person{i}@example.com",
+         "p.department": "Engineering", "p.role": "Engineer", "labels": ["Person"]}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(scope="module")
+def bench():
+    runner = BenchmarkRunner()
+    yield runner
+    print("\n" + runner.report())
+
+
+def assert_no_regression(result):
+    assert not result.failed, result.describe()
+
+
+class TestMicroBenchmarks:
+    """CPU-bound pipeline stages, timed per call over a fixed input set"""
+
+    def test_pattern_matcher(self, bench):
+        from query_patterns import match_and_generate_query
+
+        assert match_and_generate_query(QUESTIONS[0]) is not None
+        assert_no_regression(bench.run("pattern_matcher", lambda: [match_and_generate_query(q) for q in QUESTIONS]))
+
+    def test_validator(self, bench):
+        from query_validator import QueryValidator
+
+        validator = QueryValidator()
+        assert_no_regression(bench.run("validator", lambda: [validator.validate(q) for q in QUERIES]))
+
+    def test_processor(self, bench):
+        from query_processor import process_query
+
+        assert "toLower(" in process_query(QUERIES[1])
+        assert_no_regression(bench.run("processor", lambda: [process_query(q) for q in QUERIES]))
+
+    def test_error_handler(self, bench):
+        from error_handler import handle_query_error
+
+        def handle_all():
+            return [handle_query_error(Exception(error), question, QUERIES[0]) for error, question in ERRORS]
+
+        assert all(response["error"] for response in handle_all())
+        assert_no_regression(bench.run("error_handler", handle_all))
+
+    def test_entity_index(self, bench):
+        from faker import Faker
+        from entity_index import GRAPH_SOURCE, EntityIndex
+
+        fake = Faker()
+        fake.seed_instance(42)
+        names = [(fake.name(), "people") for _ in range(100_000)] + [(fake.job(), "skills") for _ in range(2_000)]
+        index = EntityIndex()
+        index.replace(GRAPH_SOURCE, names)
+        typos = ["Jonathon Smtih", "chirstopher johnson", "willaims", "Kubernets", "micheal", names[7][0][:-1]]
+
+        assert index.search(names[7][0][:-1])
+        result = bench.run("entity_index_lookup", lambda: [index.search(term) for term in typos])
+        assert_no_regression(result)
+        # Fuzzy lookups stay under a millisecond each at 100k+ names
+        assert result.summary["min_ms"] / len(typos) < 1.0
+
+    def test_seeder_generation(self, bench):
+        from scripts.data_generators.entities import PeopleGenerator, SkillsGenerator, TeamsGenerator
+        from scripts.data_generators.relationships import PersonSkillGenerator, PersonTeamMembershipGenerator
+
+        def generate():
+            people = PeopleGenerator(seed=42).generate()
+            teams = TeamsGenerator(seed=42).generate()
+            skills = SkillsGenerator(seed=42).generate()
+            return (PersonTeamMembershipGenerator(people, teams).generate(),
+                    PersonSkillGenerator(people, skills).generate())
+
+        assert_no_regression(bench.run("seeder_generation", generate, rounds=10, warmup=1))
+
+    def test_result_formatting(self, bench):
+        from result_compaction import compact_for_prompt
+        from result_formatters import format_custom_results
+
+        small, large = person_rows(10), person_rows(500)
+        assert format_custom_results({"results": small})[0] == "person_list"
+        assert_no_regression(bench.run("result_formatting", lambda: format_custom_results({"results": small})))
+        assert_no_regression(bench.run("result_compaction", lambda: compact_for_prompt(QUERIES[0], large)))
+
+
+MACRO_QUERIES = {
+    "count_nodes": "MATCH (n) RETURN count(n) AS total_nodes",
+    "count_relationships": "MATCH ()-[r]->() RETURN count(r) AS total_relationships",
+    "team_members": "MATCH (t:Team) OPTIONAL MATCH (p:Person)-[:MEMBER_OF]->(t) "
+                    "WITH t, COUNT(DISTINCT p) AS member_count RETURN t.name, member_count ORDER BY member_count DESC",
+    "department_counts": "MATCH (p:Person) RETURN p.department AS department, COUNT(p) AS count ORDER BY count DESC",
+    "top_skills": "MATCH (p:Person)-[:HAS_SKILL]->(s:Skill) RETURN s.name AS skill, COUNT(DISTINCT p) AS count "
+                  "ORDER BY count DESC LIMIT 10",
+    "two_hop_network": "MATCH (p1:Person {id: 'person_1'})-[*2]-(p2:Person) WHERE p1 <> p2 "
+                       "RETURN count(DISTINCT p2) AS connected_people",
+    "reporting_depth": "MATCH (p:Person) OPTIONAL MATCH path = (p)-[:REPORTS_TO*]->(:Person) "
+                       "WITH p, max(length(path)) AS depth RETURN depth, count(p) ORDER BY depth",
+    "policy_coverage": "MATCH (p:Policy) OPTIONAL MATCH (t:Team)-[:RESPONSIBLE_FOR]->(p) "
+                       "OPTIONAL MATCH (g:Group)-[:RESPONSIBLE_FOR]->(p) "
+                       "WITH p, count(DISTINCT t) AS teams, count(DISTINCT g) AS groups "
+                       "RETURN p.severity, count(p), avg(teams + groups)",
+}
+
+
+@pytest.fixture(scope="module")
+def graph():
+    import falkordb
+
+    host = os.getenv("FALKOR_HOST", "localhost")
+    port = int(os.getenv("FALKOR_PORT", 6379))
+    try:
+        client = falkordb.FalkorDB(host=host, port=port, socket_timeout=5)
+        db = client.select_graph(os.getenv("FALKOR_BENCHMARK_GRAPH", "agent_poc"))
+        people = db.ro_query("MATCH (p:Person) RETURN count(p)").result_set[0][0]
+    except Exception as e:
+        pytest.skip(f"FalkorDB not available at {host}:{port}: {e}")
+    if not people:
+        pytest.skip("Benchmark graph has no Person nodes; seed it first")
+    return db
+
+
+class TestFalkorDBBenchmarks:
+    """Read queries against a seeded local FalkorDB, one baseline per query"""
+
+    @pytest.mark.parametrize("name", list(MACRO_QUERIES))
+    def test_query(self, bench, graph, name):
+        query = MACRO_QUERIES[name]
+        graph.ro_query(query)
+        assert_no_regression(bench.run(f"falkordb.{name}", lambda: graph.ro_query(query),
+                                       rounds=10, warmup=1, min_round_ms=0))
@@ -0,0 +1,151 @@
+"""
+Tests for per-connection WebSocket send queues and slow-consumer policies
+"""
+import asyncio
+import time
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_queue import ClientSendQueue, QueuedWebSocket, SlowConsumerPolicy
+
+
+class FakeWebSocket:
+    """Records sent frames; can be made to block to simulate a slow client"""
+
+    def __init__(self, blocked: bool = False):
+        self.sent = []
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def send_text(self, text):
+        await self.unblocked.wait()
+        self.sent.append(text)
+
+
+class TestClientSendQueue:
+    """Test queueing, policies and lag metrics"""
+
+    @pytest.mark.asyncio
+    async def test_messages_delivered_in_order(self):
+        ws = FakeWebSocket()
+        queue = ClientSendQueue(ws, maxsize=10)
+        queue.start()
+        for i in range(5):
+            assert queue.put(f"m{i}")
+        await queue.drain()
+        await asyncio.sleep(0)
+        assert ws.sent == [f"m{i}" for i in range(5)]
+        assert queue.stats()["sent"] == 5
+        queue.close()
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest_when_full(self):
+        ws = FakeWebSocket(blocked=True)
+        queue = ClientSendQueue(ws, maxsize=3, policy=SlowConsumerPolicy.DROP_OLDEST)
+        queue.start()
+        queue.put("first")
+        await asyncio.sleep(0)  # writer takes "first" and blocks on send
+        for i in range(5):
+            queue.put(f"m{i}")
+        assert queue.stats()["dropped"] == 2
+        ws.unblocked.set()
+        await queue.drain()
+        await asyncio.sleep(0)
+        assert ws.sent == ["first", "m2", "m3", "m4"]
+        queue.close()
+
+    @pytest.mark.asyncio
+    async def test_coalesce_replaces_pending_message_with_same_key(self):
+        ws = FakeWebSocket(blocked=True)
+        queue = ClientSendQueue(ws, maxsize=3, policy=SlowConsumerPolicy.COALESCE)
+        queue.start()
+        queue.put("chat")
+        await asyncio.sleep(0)
+        queue.put("update-1", coalesce_key="dashboard_update")
+        queue.put("other")
+        queue.put("update-2", coalesce_key="dashboard_update")
+        assert queue.stats()["coalesced"] == 1
+        assert queue.stats()["queue_depth"] == 2
+        ws.unblocked.set()
+        await queue.drain()
+        await asyncio.sleep(0)
+        assert ws.sent == ["chat", "update-2", "other"]
+        queue.close()
+
+    @pytest.mark.asyncio
+    async def test_disconnect_policy_closes_slow_consumer(self):
+        ws = FakeWebSocket(blocked=True)
+        failed = []
+        queue = ClientSendQueue(ws, maxsize=2, policy=SlowConsumerPolicy.DISCONNECT,
+                                on_failure=failed.append)
+        queue.start()
+        queue.put("a")
+        await asyncio.sleep(0)
+        queue.put("b")
+        queue.put("c")
+        assert not queue.put("d")
+        assert failed == [ws]
+        assert queue.closed
+
+    @pytest.mark.asyncio
+    async def test_replies_are_never_dropped(self):
+        ws = FakeWebSocket(blocked=True)
+        queue = ClientSendQueue(ws, maxsize=2, policy=SlowConsumerPolicy.DROP_OLDEST)
+        queue.start()
+        queue.put("ping")
+        await asyncio.sleep(0)  # writer takes "ping" and blocks on send
+        reply = asyncio.create_task(QueuedWebSocket(ws, queue).send_text("answer"))
+        await asyncio.sleep(0)
+        for i in range(3):
+            queue.put(f"update-{i}")
+        assert not reply.done()
+        ws.unblocked.set()
+        await reply
+        await queue.drain()
+        await asyncio.sleep(0)
+        # The full queue dropped broadcasts around the reply, never the reply itself
+        assert ws.sent == ["ping", "answer", "update-2"]
+        assert queue.stats()["dropped"] == 2
+        queue.close()
+
+    @pytest.mark.asyncio
+    async def test_reply_fails_when_connection_closes(self):
+        ws = FakeWebSocket(blocked=True)
+        queue = ClientSendQueue(ws)
+        queue.start()
+        queue.put("first")
+        await asyncio.sleep(0)
+        reply = asyncio.create_task(queue.send("answer"))
+        await asyncio.sleep(0)
+        queue.close()
+        with pytest.raises(ConnectionError):
+            await reply
+        with pytest.raises(ConnectionError):
+            await queue.send("late")
+
+    @pytest.mark.asyncio
+    async def test_slow_client_does_not_delay_fan_out(self):
+        """Enqueueing to thousands of clients stays cheap even when one never reads"""
+        slow = FakeWebSocket(blocked=True)
+        fast = [FakeWebSocket() for _ in range(2000)]
+        queues = [ClientSendQueue(ws, maxsize=10) for ws in [slow] + fast]
+        for queue in queues:
+            queue.start()
+
+        start = time.perf_counter()
+        for queue in queues:
+            queue.put("payload", coalesce_key="dashboard_update")
+        fan_out_ms = (time.perf_counter() - start) * 1000
+
+        await asyncio.gather(*(queue.drain() for queue in queues[1:]))
+        await asyncio.sleep(0)
+        assert all(ws.sent == ["payload"] for ws in fast)
+        assert slow.sent == []
+        assert fan_out_ms < 500
+        for queue in queues:
+            queue.close()
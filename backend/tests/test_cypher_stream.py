@@ -0,0 +1,110 @@
+"""
+Tests for early-exit Cypher extraction from streamed completions
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cypher_stream import StreamingCypherExtractor, extract_statement, read_cypher
+
+QUERY = "MATCH (p:Person)-[:MEMBER_OF]->(t:Team {name: 'Platform'}) RETURN p.name, p.role ORDER BY p.name"
+
+
+def first_complete(text, size=2):
+    """Query reported while streaming `text` in chunks, and how much had been read"""
+    extractor = StreamingCypherExtractor()
+    for i in range(0, len(text), size):
+        query = extractor.feed(text[i:i + size])
+        if query is not None:
+            return query, len(extractor.text)
+    return extractor.finish(), len(text)
+
+
+class TestExtractStatement:
+    def test_closing_fence_ends_statement(self):
+        text = f"```cypher\n{QUERY}\n```\nThis query finds everyone on the Platform team."
+        query, read = first_complete(text)
+        assert query == QUERY
+        assert read < text.index("This query")
+
+    def test_limit_ends_statement_once_next_word_is_seen(self):
+        text = f"{QUERY} LIMIT 20\nExplanation: ..."
+        assert extract_statement(f"{QUERY} LIMIT 2") is None
+        assert extract_statement(f"{QUERY} LIMIT 20 ") is None
+        query, _ = first_complete(text)
+        assert query == f"{QUERY} LIMIT 20"
+
+    def test_limit_followed_by_union_continues(self):
+        text = ("MATCH (p:Person) RETURN p.name AS name LIMIT 5 UNION "
+                "MATCH (t:Team) RETURN t.name AS name LIMIT 5\nDone")
+        query, _ = first_complete(text)
+        assert query.endswith("RETURN t.name AS name LIMIT 5")
+        assert "UNION" in query
+
+    def test_prose_line_after_return_ends_statement(self):
+        query, _ = first_complete(f"{QUERY}\nThis returns the members.")
+        assert query == QUERY
+
+    def test_multiline_query_is_not_cut(self):
+        text = "MATCH (p:Person)\nRETURN p.name,\n  p.role\nORDER BY p.name\nLIMIT 10\n"
+        assert extract_statement(text) is None
+        assert extract_statement(text + "Hope this helps") == text.strip()
+
+    def test_multiline_return_is_not_cut(self):
+        text = "MATCH (p:Person)\nRETURN\n  p.name, p.role\n"
+        assert extract_statement(text) is None
+        assert extract_statement(text, final=True) == text.strip()
+        query, _ = first_complete(text + "This lists every person.", size=1)
+        assert query == text.strip()
+
+        text = ("MATCH (p:Person)-[:MEMBER_OF]->(t:Team)\nRETURN DISTINCT\n  t.name AS team,\n"
+                "  count(p) AS members\nORDER BY members DESC\n\nThe largest teams come first.")
+        query, _ = first_complete(text, size=3)
+        assert query == text[:text.index("\n\n")]
+
+    def test_column_lines_continue_the_return(self):
+        for column in ("p", "p.name", "p AS person", "p as person", "collect(p.name)", "p, t", "t.name\n  , p.name"):
+            text = f"MATCH (p:Person)-[:MEMBER_OF]->(t:Team)\nRETURN\n  {column}\nLIMIT 5\n"
+            assert first_complete(text + "Done.", size=1)[0] == text.strip()
+            text = f"MATCH (p:Person)-[:MEMBER_OF]->(t:Team)\nRETURN t.role,\n  {column}\n\n"
+            assert first_complete(text + "Done.", size=1)[0] == text.strip()
+        # A word that starts prose still ends the statement
+        query, _ = first_complete(f"{QUERY}\nAssuming names are unique.", size=1)
+        assert query == QUERY
+
+    def test_terminators_inside_strings_are_ignored(self):
+        text = "MATCH (p:Policy) WHERE p.name = 'a; ```b' RETURN p.name\nNote"
+        query, _ = first_complete(text)
+        assert query == "MATCH (p:Policy) WHERE p.name = 'a; ```b' RETURN p.name"
+
+    def test_semicolon_and_leading_prose(self):
+        query, _ = first_complete(f"Here is the query: {QUERY}; and some notes")
+        assert query == QUERY
+
+    def test_unterminated_completion_is_taken_whole_at_end(self):
+        assert extract_statement(QUERY) is None
+        assert extract_statement(QUERY, final=True) == QUERY
+        assert extract_statement("no query here", final=True) == "no query here"
+
+
+class TestReadCypher:
+    @pytest.mark.asyncio
+    async def test_stream_closed_after_complete_statement(self):
+        log = {"chunks": 0, "closed": False}
+
+        async def chunks():
+            try:
+                for part in [QUERY[:40], QUERY[40:], " LIMIT 5", "\n", "This query ", "lists ", "people."]:
+                    log["chunks"] += 1
+                    yield part
+            finally:
+                log["closed"] = True
+
+        query, early = await read_cypher(chunks())
+        assert (query, early) == (f"{QUERY} LIMIT 5", True)
+        assert log["closed"]
+        # Read up to the first word after LIMIT, never the rest of the explanation
+        assert log["chunks"] == 5
@@ -0,0 +1,153 @@
+"""
+Tests for the dashboard WebSocket change feed
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.dashboard_feed import DashboardChangeFeed, diff_panel, panel_digest
+
+
+class FakePanels:
+    """Panel builders whose return values can be changed between refreshes"""
+
+    def __init__(self):
+        self.values = {
+            "overview": {"total_employees": 500, "total_teams": 20, "last_updated": "t0"},
+            "offices": [{"name": "London", "employee_count": 85}],
+        }
+
+    def builders(self):
+        async def overview():
+            return dict(self.values["overview"])
+
+        async def offices():
+            return list(self.values["offices"])
+
+        return {"overview": overview, "offices": offices}
+
+
+class TestDashboardChangeFeed:
+    """Test change detection and per-client delta encoding"""
+
+    def setup_method(self):
+        self.panels = FakePanels()
+        self.feed = DashboardChangeFeed(panels=self.panels.builders())
+        self.sent = []
+
+        async def broadcast(message, connections):
+            self.sent.append((message, list(connections)))
+
+        self.feed._broadcast = broadcast
+
+    def test_volatile_fields_do_not_change_digest(self):
+        a = {"total_employees": 500, "last_updated": "t0"}
+        b = {"total_employees": 500, "last_updated": "t1"}
+        assert panel_digest(a) == panel_digest(b)
+        assert panel_digest(a) != panel_digest({"total_employees": 501, "last_updated": "t0"})
+
+    def test_diff_panel_patches_changed_keys_only(self):
+        old = {"a": 1, "b": 2, "c": 3, "d": 4}
+        new = {"a": 1, "b": 5, "c": 3}
+        delta = diff_panel(old, new)
+        assert delta == {"op": "patch", "set": {"b": 5}, "unset": ["d"]}
+        assert diff_panel([1], [2]) == {"op": "replace", "data": [2]}
+
+    @pytest.mark.asyncio
+    async def test_only_changed_panels_are_pushed(self):
+        client = object()
+        await self.feed.subscribe(client, 0)
+
+        await self.feed.refresh()
+        await self.feed.publish()
+        message, targets = self.sent[-1]
+        assert targets == [client]
+        assert message["version"] == 1
+        assert set(message["panels"]) == {"overview", "offices"}
+        self.feed.acknowledge(client, 1)
+
+        # A volatile-only change is not a change
+        self.panels.values["overview"]["last_updated"] = "t1"
+        assert await self.feed.refresh() == {}
+
+        self.panels.values["overview"]["total_employees"] = 501
+        await self.feed.refresh()
+        await self.feed.publish()
+        message, _ = self.sent[-1]
+        assert message["base_version"] == 1
+        assert list(message["panels"]) == ["overview"]
+        assert message["panels"]["overview"]["set"]["total_employees"] == 501
+        assert "total_teams" not in message["panels"]["overview"]["set"]
+
+    @pytest.mark.asyncio
+    async def test_unacknowledged_client_gets_cumulative_delta(self):
+        client = object()
+        await self.feed.subscribe(client, 0)
+        await self.feed.refresh()
+        await self.feed.publish()
+        self.feed.acknowledge(client, 1)
+
+        self.panels.values["overview"]["total_teams"] = 21
+        await self.feed.refresh()
+        await self.feed.publish()
+        sent_before = len(self.sent)
+
+        # No ack for version 2; nothing is re-sent until something else changes
+        await self.feed.publish()
+        assert len(self.sent) == sent_before
+
+        self.panels.values["offices"] = [{"name": "London", "employee_count": 86}]
+        await self.feed.refresh()
+        await self.feed.publish()
+        message, _ = self.sent[-1]
+        assert message["base_version"] == 1
+        assert message["version"] == 3
+        assert set(message["panels"]) == {"overview", "offices"}
+
+    @pytest.mark.asyncio
+    async def test_clients_on_same_version_share_one_broadcast(self):
+        clients = [object() for _ in range(3)]
+        for client in clients:
+            await self.feed.subscribe(client, 0)
+        await self.feed.refresh()
+        await self.feed.publish()
+        assert len(self.sent) == 1
+        assert set(map(id, self.sent[0][1])) == set(map(id, clients))
+
+    @pytest.mark.asyncio
+    async def test_version_from_another_epoch_gets_full_state(self):
+        client = object()
+        await self.feed.subscribe(client, 0)
+        await self.feed.refresh()
+        self.panels.values["overview"]["total_teams"] = 21
+        await self.feed.refresh()
+
+        # Same version number, but counted by another process: every panel is replaced
+        other = object()
+        await self.feed.subscribe(other, 1, "another-worker")
+        message, targets = self.sent[-1]
+        assert targets == [other]
+        assert message["epoch"] == self.feed.epoch and message["base_version"] == 0
+        assert {delta["op"] for delta in message["panels"].values()} == {"replace"}
+        assert set(message["panels"]) == {"overview", "offices"}
+
+        # The same version from this epoch only gets what changed since
+        await self.feed.subscribe(object(), 1, self.feed.epoch)
+        message, _ = self.sent[-1]
+        assert message["base_version"] == 1 and list(message["panels"]) == ["overview"]
+
+    @pytest.mark.asyncio
+    async def test_malformed_versions_are_ignored(self):
+        client = object()
+        await self.feed.subscribe(client, "abc")
+        assert self.feed.subscribers[client] == 0
+        await self.feed.refresh()
+        self.feed.acknowledge(client, "1.5")
+        self.feed.acknowledge(client, {"v": 1})
+        self.feed.acknowledge(client, -1)
+        assert self.feed.subscribers[client] == 0
+        self.feed.acknowledge(client, "1")
+        assert self.feed.subscribers[client] == 1
@@ -0,0 +1,152 @@
+"""
+Tests for the fuzzy entity name index, its refresher and the error handler on top of it
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entity_index import GRAPH_SOURCE, EntityIndex, EntityIndexRefresher, normalize
+from error_handler import QueryErrorHandler
+
+GRAPH_NAMES = {
+    "Person": ["Sarah Chen", "Sara Lopez", "Jonathan Smith", "Mr. Jonathon Smith", "Priya O'Brien-Patel"],
+    "Team": ["Mobile Apps", "Platform Infrastructure", "Data Engineering"],
+    "Policy": ["Data Breach Notification Policy", "Access Control Policy"],
+    "Skill": ["Python", "Kubernetes"],
+    "Office": ["San Francisco HQ"],
+    "Group": ["Architecture Review Board"],
+}
+TYPES = {"Person": "people", "Team": "teams", "Policy": "policies", "Skill": "skills",
+         "Office": "offices", "Group": "groups"}
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.result_set = rows
+
+
+class FakeEntityGraph:
+    """Answers the per-label name queries from a dict"""
+
+    def __init__(self, names):
+        self.names = names
+        self.queries = []
+
+    def ro_query(self, q):
+        self.queries.append(q)
+        label = q.split(":", 1)[1].split(")", 1)[0]
+        return FakeResult([[name] for name in self.names.get(label, [])])
+
+
+@pytest.fixture
+def index():
+    index = EntityIndex()
+    index.replace(GRAPH_SOURCE, [(name, TYPES[label]) for label, names in GRAPH_NAMES.items() for name in names])
+    return index
+
+
+class TestEntityIndex:
+    def test_normalize(self):
+        assert normalize("  Priya O'Brien-Patel ") == "priya obrien patel"
+        assert normalize("CI/CD Security Policy") == "ci cd security policy"
+
+    def test_multi_word_typos(self, index):
+        assert index.search("Jonathon Smtih")[0].name == "Jonathan Smith"
+        assert index.search("data breech notification policy")[0].name == "Data Breach Notification Policy"
+        match = index.search("Sarah Chn")[0]
+        assert (match.name, match.entity_type) == ("Sarah Chen", "people")
+
+    def test_single_words_and_types(self, index):
+        assert index.search("Kubernets")[0].name == "Kubernetes"
+        # Words of multi-word names are searchable on their own, under the name's type
+        assert [m.name for m in index.search("Infrastructur", "teams")] == ["Infrastructure"]
+        assert index.search("Infrastructur", "skills") == []
+        # An unknown type searches everything
+        assert index.search("Pyton", "languages")[0].name == "Python"
+        assert index.search("qwertyuiop") == []
+
+    def test_replace_swaps_one_source(self, index):
+        index.replace("builtin", [("mobile", "teams")])
+        index.replace(GRAPH_SOURCE, [("Sarah Chen", "people")])
+        assert index.contains("mobile") and index.contains("sarah chen", GRAPH_SOURCE)
+        assert not index.contains("Kubernetes")
+        assert not index.contains("mobile", GRAPH_SOURCE)
+        assert index.stats()["sources"] == {GRAPH_SOURCE: 1, "builtin": 1}
+
+
+class TestResolveNames:
+    def test_misspelled_names_are_rewritten(self, index):
+        text, resolutions = index.resolve_names("Who does Sarah Chn report to, and who knows Kubernets?")
+        assert text == "Who does Sarah Chen report to, and who knows Kubernetes?"
+        assert [(r.text, r.name, r.entity_type) for r in resolutions] == [
+            ("Sarah Chn", "Sarah Chen", "people"), ("Kubernets", "Kubernetes", "skills")
+        ]
+
+    def test_possessive_is_kept(self, index):
+        text, _ = index.resolve_names("what is Priya OBrien Patell's role?")
+        assert text == "what is Priya O'Brien-Patel's role?"
+
+    def test_known_names_and_plain_words_are_left_alone(self, index):
+        question = "who on the mobile apps team knows python and manages sarah chen?"
+        assert index.resolve_names(question) == (question, [])
+        # Lowercase single words are never corrected into names
+        assert index.resolve_names("show the platfrm teams")[0] == "show the platfrm teams"
+
+    def test_ambiguous_names_are_not_guessed(self):
+        index = EntityIndex()
+        index.replace(GRAPH_SOURCE, [("Ana Diaz", "people"), ("Ann Diaz", "people")])
+        assert index.resolve_names("who manages Anna Diaz?")[1] == []
+
+    def test_ties_and_partial_matches_are_not_guessed(self):
+        index = EntityIndex()
+        index.replace(GRAPH_SOURCE, [("John Smith", "people"), ("Jon Smith", "people"), ("Jo Smith", "people"),
+                                     ("Sarah Jones", "people"), ("Mark Johnson", "people")])
+        assert index.resolve_names("Who is Jonh Smith?") == ("Who is Jonh Smith?", [])
+        # The surname alone would match, but the full name is too far from any person
+        assert index.resolve_names("Who is Sarha Jonson?") == ("Who is Sarha Jonson?", [])
+
+    def test_plurals_of_known_words_are_left_alone(self):
+        index = EntityIndex()
+        index.replace(GRAPH_SOURCE, [("Mobile Team", "teams"), ("Team", "teams"), ("Policy", "policies")])
+        for question in ("Show all Teams", "Who is on the Mobile Teams?", "List Engineers", "Show Policies"):
+            assert index.resolve_names(question) == (question, [])
+
+    def test_only_graph_names_resolve(self):
+        index = EntityIndex()
+        index.replace("builtin", [("engineer", "roles")])
+        assert index.resolve_names("find every Enginer") == ("find every Enginer", [])
+
+
+class TestEntityIndexRefresher:
+    @pytest.mark.asyncio
+    async def test_rebuilds_only_when_names_change(self):
+        names = {label: list(values) for label, values in GRAPH_NAMES.items()}
+        graph = FakeEntityGraph(names)
+        index = EntityIndex()
+        refresher = EntityIndexRefresher(index, lambda: graph, labels={label: TYPES[label] for label in names})
+
+        assert await refresher.refresh()
+        assert index.contains("Sarah Chen", GRAPH_SOURCE)
+        assert not await refresher.refresh()
+
+        names["Person"].append("Marcus Webb")
+        assert await refresher.refresh()
+        assert index.search("Marcus Web")[0].name == "Marcus Webb"
+        assert (refresher.refreshes, refresher.rebuilds) == (3, 2)
+        assert all(q.startswith("MATCH (n:") for q in graph.queries)
+
+
+class TestErrorHandlerSuggestions:
+    def test_builtin_vocabulary(self):
+        handler = QueryErrorHandler(EntityIndex())
+        similar = handler.find_similar_entities("mobil", "teams")
+        assert similar[0][0] == "mobile" and similar[0][1] > 0.8
+        assert handler.find_similar_entities("enginer", "roles")[0][0] == "engineer"
+
+    def test_did_you_mean_uses_graph_names(self, index):
+        handler = QueryErrorHandler(index)
+        response = handler.format_error_response(Exception("No results found"), "who is on the mobile kubernets team")
+        assert response["help"]["did_you_mean"] == ["Did you mean 'Kubernetes' instead of 'kubernets'?"]
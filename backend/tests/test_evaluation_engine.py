@@ -0,0 +1,177 @@
+"""
+Tests for the parallel, resumable model evaluation engine
+"""
+import asyncio
+import pytest
+import sys
+import os
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+from evaluation_engine import Checkpoint, EvaluationEngine, OutputCache, cases_from, summarize_model
+
+QUERIES = {
+    "hierarchy": [
+        {"query": "who reports to Sarah?", "expected_pattern": "REPORTS_TO"},
+        {"query": "who manages the mobile team?", "expected_pattern": "MANAGES"},
+    ],
+    "skills": [
+        {"query": "who knows Python?", "expected_pattern": "HAS_SKILL"},
+        {"query": "find Kubernetes experts", "expected_pattern": "HAS_SKILL"},
+    ],
+}
+
+
+class FakeModel:
+    """Async generate function that records how many requests were in flight"""
+
+    def __init__(self, fail_on=None, delay=0.01):
+        self.fail_on = fail_on
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, prompt, model):
+        self.calls.append((model, prompt))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail_on and self.fail_on in prompt:
+                raise RuntimeError("model unavailable")
+            return f"MATCH (n) RETURN n // {prompt}"
+        finally:
+            self.in_flight -= 1
+
+
+def make_engine(generate, tmp_path, execute=None, **kwargs):
+    kwargs.setdefault("prepare", lambda raw: (raw.split(" //")[0], True, []))
+    return EvaluationEngine(
+        build_prompt=lambda query: f"Question: {query}",
+        generate=generate,
+        score=lambda cypher, case: {"syntax_valid": True, "pattern_match": case["expected_pattern"] in cypher},
+        execute=execute,
+        cache=OutputCache(str(tmp_path / "cache.jsonl")),
+        checkpoint=Checkpoint(str(tmp_path / "checkpoint.jsonl"), run="full"),
+        **kwargs,
+    )
+
+
+class TestEvaluationEngine:
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded_per_model(self, tmp_path):
+        model = FakeModel()
+        engine = make_engine(model, tmp_path, concurrency=2)
+        results = await engine.run(["a"], cases_from(QUERIES))
+        assert model.peak == 2
+        assert [r["query"] for r in results["a"]] == [case["query"] for cases in QUERIES.values() for case in cases]
+
+    @pytest.mark.asyncio
+    async def test_rerun_uses_cached_outputs(self, tmp_path):
+        model = FakeModel()
+        await make_engine(model, tmp_path).run(["a"], cases_from(QUERIES))
+        os.remove(tmp_path / "checkpoint.jsonl")
+
+        rerun = FakeModel()
+        engine = make_engine(rerun, tmp_path)
+        results = await engine.run(["a", "b"], cases_from(QUERIES))
+        # Only model "b" needed generating; "a" came from the output cache
+        assert {model for model, _ in rerun.calls} == {"b"}
+        assert all(r["cached"] for r in results["a"])
+        assert engine.stats.cached == 4 and engine.stats.generated == 4
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_checkpointed_cases(self, tmp_path):
+        cases = cases_from(QUERIES)
+        await make_engine(FakeModel(), tmp_path).run(["a"], cases[:3])
+
+        model = FakeModel()
+        engine = make_engine(model, tmp_path)
+        results = await engine.run(["a"], cases)
+        assert len(model.calls) == 1 and cases[3].query in model.calls[0][1]
+        assert engine.stats.resumed == 3
+        assert len(results["a"]) == 4
+
+        # Another prompt mode does not reuse the checkpoint
+        assert Checkpoint(str(tmp_path / "checkpoint.jsonl"), run="simple").get("a", cases[0]) is None
+
+    @pytest.mark.asyncio
+    async def test_failed_generation_is_retried(self, tmp_path):
+        cases = cases_from(QUERIES)
+        engine = make_engine(FakeModel(fail_on="Kubernetes"), tmp_path)
+        results = await engine.run(["a"], cases)
+        assert engine.stats.errors == 1
+        assert results["a"][3]["generation_failed"]
+
+        model = FakeModel()
+        await make_engine(model, tmp_path).run(["a"], cases)
+        assert [prompt for _, prompt in model.calls] == ["Question: find Kubernetes experts"]
+
+    @pytest.mark.asyncio
+    async def test_execution_errors_are_recorded(self, tmp_path):
+        def execute(cypher):
+            if "Python" in cypher:
+                raise ValueError("bad query")
+            return [[1], [2]]
+
+        engine = make_engine(FakeModel(), tmp_path, execute=execute,
+                             prepare=lambda raw: (raw, True, []))
+        results = (await engine.run(["a"], cases_from(QUERIES)))["a"]
+        assert [r["execution_success"] for r in results] == [True, True, False, True]
+        assert results[2]["error"] == "bad query"
+        assert results[0]["result_count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_timed_out_query_keeps_its_db_slot(self, tmp_path):
+        lock = threading.Lock()
+        running = {"now": 0, "peak": 0}
+
+        def execute(cypher):
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            time.sleep(0.05)
+            with lock:
+                running["now"] -= 1
+            return []
+
+        engine = make_engine(FakeModel(delay=0), tmp_path, execute=execute,
+                             db_concurrency=1, execution_timeout=0.01)
+        results = (await engine.run(["a"], cases_from(QUERIES)))["a"]
+        assert all(r["error"] == "Query timeout (0.01s)" for r in results)
+        assert running["peak"] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_queries_do_not_hold_generation_slots(self, tmp_path):
+        model = FakeModel(delay=0)
+        release = threading.Event()
+
+        def execute(cypher):
+            release.wait(1)
+            return []
+
+        engine = make_engine(model, tmp_path, execute=execute, concurrency=1, db_concurrency=4)
+        run = asyncio.create_task(engine.run(["a"], cases_from(QUERIES)))
+        await asyncio.sleep(0.1)
+        # Every case was generated while the first queries were still running
+        assert len(model.calls) == 4
+        release.set()
+        results = (await run)["a"]
+        assert all(r["execution_success"] for r in results)
+
+    def test_summary_matches_report_layout(self):
+        results = [
+            {"category": "skills", "syntax_valid": True, "execution_success": True, "has_results": True,
+             "pattern_match": True, "generation_time": 1.0, "execution_time": 0.1, "prompt_chars": 100},
+            {"category": "skills", "error": "model unavailable", "generation_failed": True, "prompt_chars": 100},
+        ]
+        report = summarize_model("a", results)
+        metrics = report["overall_metrics"]
+        assert metrics["total_queries"] == 2 and metrics["generation_errors"] == 1
+        assert metrics["category_scores"] == {"skills": 0.5}
+        assert report["overall_score"] == 50.0
@@ -0,0 +1,68 @@
+"""
+Tests for BM25 few-shot selection and the compact generate_query prompt
+"""
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from few_shot_retrieval import BM25Index, FewShotSelector, parse_prompt, tokenize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT_PATH = os.path.join(BACKEND_DIR, "prompts", "generate_query.txt")
+
+
+def selector(log_path=None):
+    return FewShotSelector(prompt_path=PROMPT_PATH, log_path=log_path, k=6)
+
+
+class TestFewShotRetrieval:
+    """Test prompt parsing, example ranking and prompt size"""
+
+    def test_parse_generate_query_prompt(self):
+        with open(PROMPT_PATH) as f:
+            parts = parse_prompt(f.read())
+        assert len(parts.examples) > 50
+        assert {"Person", "Visa", "Client"} <= set(parts.nodes)
+        assert any(line.startswith("- (Person)-[:HAS_VISA") for _, line, _ in parts.relationships)
+        headers = [section.splitlines()[0] for section in parts.instructions]
+        assert "QUERY GENERATION RULES:" in headers
+        # Example-only sections are not kept as instructions
+        assert "VISA & WORK AUTHORIZATION PATTERNS:" not in headers
+        assert parts.footer.startswith("REMEMBER:")
+
+    def test_bm25_ranks_matching_documents_first(self):
+        index = BM25Index()
+        for text in ["expiring visas by country", "count all employees", "open incidents by severity"]:
+            index.add(tokenize(text))
+        assert index.top(tokenize("Which visas are expiring soon?"), 2) == [0]
+
+    def test_selects_relevant_examples(self):
+        titles = [example.title for example in selector().select("Show visas expiring in the next 90 days")]
+        assert titles[0] == "Expiring visas:"
+        assert all("incident" not in title.lower() for title in titles)
+
+    def test_prompt_is_several_times_smaller_with_relevant_schema(self):
+        with open(PROMPT_PATH) as f:
+            full_size = len(f.read())
+        prompt = selector().build_prompt("Who is on call for P0 incidents?")
+        assert len(prompt) * 3 < full_size
+        assert "- Incident:" in prompt and "- Schedule:" in prompt
+        assert "- PlatformComponent:" not in prompt
+        assert "QUERY GENERATION RULES:" in prompt
+        assert prompt.rstrip().endswith("No explanations, no additional text.")
+
+    def test_successful_queries_are_indexed_and_logged(self, tmp_path):
+        log_path = tmp_path / "successful_queries.jsonl"
+        first = selector(str(log_path))
+        query = "MATCH (p:Person)-[:SPEAKS]->(l:Language {name: 'Klingon'}) RETURN p.name"
+        first.record_success("Who speaks Klingon?", query)
+        first.record_success("who speaks klingon", query)  # duplicate question
+        assert first.select("Anyone speaking Klingon?")[0].query == query
+        assert len(log_path.read_text().splitlines()) == 1
+        assert json.loads(log_path.read_text())["question"] == "Who speaks Klingon?"
+
+        # A new process picks the logged example up again
+        assert selector(str(log_path)).select("Klingon speakers")[0].query == query
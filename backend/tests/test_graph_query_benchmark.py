@@ -0,0 +1,78 @@
+"""
+Tests for the scale-factor dataset and query catalog of the graph query benchmark
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+from api.dashboard import QUERIES as DASHBOARD_QUERIES
+from graph_query_benchmark import (
+    MULTIHOP_QUERIES, build_catalog, generate_dataset, growth, query_parameters, storable
+)
+from query_patterns import EnhancedQueryPatternMatcher
+from query_validator import QueryValidator
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return generate_dataset(0.2)
+
+
+class TestDataset:
+    def test_people_and_projects_scale(self, dataset):
+        larger = generate_dataset(0.4)
+        assert len(dataset.nodes["Person"]) == 100
+        assert len(larger.nodes["Person"]) == 200
+        assert len(larger.nodes["Project"]) == 2 * len(dataset.nodes["Project"])
+        assert len(larger.nodes["Team"]) == len(dataset.nodes["Team"])
+
+    def test_edges_reference_generated_nodes(self, dataset):
+        ids = {label: {row["id"] for row in rows} for label, rows in dataset.nodes.items()}
+        for edge_set in dataset.edges:
+            for row in edge_set.rows:
+                assert row["src"] in ids[edge_set.source]
+                assert row["dst"] in ids[edge_set.target]
+        assert "REPORTS_TO" in {edge_set.rel_type for edge_set in dataset.edges}
+
+    def test_only_storable_properties(self):
+        assert storable({"a": 1, "b": None, "c": ["x", "y"], "d": {"k": 1}, "e": [{"k": 1}]}) == {"a": 1, "c": ["x", "y"]}
+
+
+class TestCatalog:
+    def test_covers_dashboard_patterns_and_multihop(self, dataset):
+        catalog = build_catalog(dataset)
+        names = {(entry.group, entry.name) for entry in catalog}
+        assert {name for group, name in names if group == "dashboard"} == \
+            {key.replace("dashboard:", "") for key in DASHBOARD_QUERIES}
+        assert {name for group, name in names if group == "pattern"} == \
+            {pattern.name for pattern in EnhancedQueryPatternMatcher().patterns}
+        assert {name for group, name in names if group == "multihop"} == set(MULTIHOP_QUERIES)
+        assert [entry.group for entry in build_catalog(dataset, ["multihop"])] == ["multihop"] * len(MULTIHOP_QUERIES)
+
+    def test_parameters_are_bound_to_real_names(self, dataset):
+        people = {p["name"] for p in dataset.nodes["Person"]}
+        validator = QueryValidator()
+        for entry in build_catalog(dataset):
+            assert set(query_parameters(entry.query)) == set(entry.params), entry.name
+            assert validator.validate(entry.query)[0], entry.name
+        pattern = {entry.name: entry for entry in build_catalog(dataset, ["pattern"])}
+        assert pattern["manager_queries"].params["person_name"] in people
+
+
+class TestGrowth:
+    def test_flags_superlinear_queries(self):
+        points = [
+            {"scale": 1, "queries": {"linear": {"group": "g", "p50_ms": 2.0}, "quadratic": {"group": "g", "p50_ms": 1.0},
+                                     "broken": {"group": "g", "error": "boom"}}},
+            {"scale": 10, "queries": {"linear": {"group": "g", "p50_ms": 20.0}, "quadratic": {"group": "g", "p50_ms": 100.0},
+                                      "broken": {"group": "g", "error": "boom"}}},
+        ]
+        report = growth(points, superlinear=1.2)
+        assert report["linear"] == {"group": "g", "exponent": 1.0, "superlinear": False}
+        assert report["quadratic"]["exponent"] == 2.0 and report["quadratic"]["superlinear"]
+        assert "broken" not in report
+        assert growth(points[:1], 1.2) == {}
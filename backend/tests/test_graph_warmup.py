@@ -0,0 +1,171 @@
+"""
+Tests for background graph warm-up and readiness gating
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_warmup import GraphWarmup
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.result_set = rows
+
+
+class FakeGraph:
+    def __init__(self, client):
+        self.client = client
+
+    def query(self, q, params=None):
+        if "SeedStats" in q and q.startswith("MATCH"):
+            return FakeResult([[500, 20]] if self.client.seeded else [])
+        self.client.writes.append(q)
+        return FakeResult([])
+
+
+class FakeClient:
+    def __init__(self, seeded=False):
+        self.seeded = seeded
+        self.writes = []
+
+    def select_graph(self, name):
+        return FakeGraph(self)
+
+
+class TestGraphWarmup:
+    """Test seeding, progress reporting and connection retries"""
+
+    @pytest.mark.asyncio
+    async def test_seeds_empty_graph_and_reports_progress(self):
+        client = FakeClient(seeded=False)
+        started = asyncio.Event()
+        release = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def seed(progress_client):
+            db = progress_client.select_graph("agent_poc")
+            db.query("CREATE (p:Person {name: 'Ada'})")
+            db.query("CREATE (t:Team {name: 'Core'})")
+            loop.call_soon_threadsafe(started.set)
+            asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+            client.seeded = True
+
+        warmup = GraphWarmup(lambda: client, seed_fn=seed, index_fn=lambda c: None)
+        ready_calls = []
+        warmup.on_ready(lambda: ready_calls.append(True))
+        warmup.start()
+
+        await started.wait()
+        assert warmup.warming_up
+        progress = warmup.progress()
+        assert progress["step"] == "seeding"
+        assert progress["seed_queries"] == 2
+        assert progress["seed_current"] == "Team"
+        assert "2 writes" in warmup.warming_up_message()
+
+        release.set()
+        assert await warmup.wait_ready(timeout=1)
+        assert warmup.progress()["step"] == "ready"
+        assert ready_calls == [True]
+        assert not warmup.warming_up
+
+    @pytest.mark.asyncio
+    async def test_skips_seeding_when_already_seeded(self):
+        seeded_calls = []
+        warmup = GraphWarmup(lambda: FakeClient(seeded=True), seed_fn=seeded_calls.append)
+        warmup.start()
+        assert await warmup.wait_ready(timeout=1)
+        assert seeded_calls == []
+        assert warmup.seeded_now is False
+
+    @pytest.mark.asyncio
+    async def test_retries_until_falkordb_is_reachable(self):
+        attempts = []
+
+        def connect():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionError("connection refused")
+            return FakeClient(seeded=True)
+
+        warmup = GraphWarmup(connect, retry_delay=0.01)
+        warmup.start()
+        assert await warmup.wait_ready(timeout=1)
+        assert warmup.connect_attempts == 3
+        assert warmup.error is None
+
+    def test_not_warming_up_before_start(self):
+        warmup = GraphWarmup(lambda: FakeClient())
+        assert warmup.warming_up is False
+        assert warmup.is_ready is False
+
+
+class FakeSeedLock:
+    """In-memory stand-in for the Redis seed lock, shared by several warm-ups"""
+
+    def __init__(self, shared):
+        self.shared = shared
+        self.ttl_ms = 30000
+
+    def acquire(self):
+        if self.shared.holder is None:
+            self.shared.holder = self
+            return True
+        return False
+
+    def extend(self):
+        return self.shared.holder is self
+
+    def release(self):
+        if self.shared.holder is self:
+            self.shared.holder = None
+
+
+class TestSeedLock:
+    @pytest.mark.asyncio
+    async def test_only_one_worker_seeds(self):
+        client = FakeClient(seeded=False)
+        seeds = []
+
+        def seed(progress_client):
+            seeds.append(1)
+            time.sleep(0.05)
+            client.seeded = True
+
+        shared = SimpleNamespace(holder=None)
+        workers = [
+            GraphWarmup(lambda: client, seed_fn=seed, retry_delay=0.01, seed_lock=FakeSeedLock(shared))
+            for _ in range(3)
+        ]
+        for warmup in workers:
+            warmup.start()
+        assert all([await warmup.wait_ready(timeout=2) for warmup in workers])
+        assert seeds == [1]
+        assert [warmup.seeded_now for warmup in workers].count(True) == 1
+        assert shared.holder is None
+
+    @pytest.mark.asyncio
+    async def test_takes_over_when_the_holder_is_gone(self):
+        client = FakeClient(seeded=False)
+        shared = SimpleNamespace(holder=None)
+        stale = FakeSeedLock(shared)
+        stale.acquire()
+
+        def seed(progress_client):
+            client.seeded = True
+
+        warmup = GraphWarmup(lambda: client, seed_fn=seed, retry_delay=0.01, seed_lock=FakeSeedLock(shared))
+        warmup.start()
+        await asyncio.sleep(0.05)
+        assert warmup.progress()["step"] == "seeding" and not warmup.is_ready
+        # The lock expires in Redis when its holder dies
+        stale.release()
+        assert await warmup.wait_ready(timeout=1)
+        assert warmup.seeded_now and client.seeded
@@ -0,0 +1,71 @@
+"""
+Tests for the timer-wheel WebSocket heartbeat scheduler
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from heartbeat_wheel import HeartbeatWheel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHeartbeatWheel:
+    """Test ping scheduling, batching and eviction with a manual clock"""
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.pings = []
+        self.dead = []
+        self.wheel = HeartbeatWheel(
+            send=lambda ws, text: self.pings.append((ws, text)),
+            on_dead=self.dead.append,
+            interval=5, tick=1, timeout=12, clock=self.clock
+        )
+
+    def run_ticks(self, n):
+        for _ in range(n):
+            self.clock.now += 1
+            self.wheel.advance()
+
+    def test_ping_once_per_interval(self):
+        self.wheel.register("a")
+        self.run_ticks(4)
+        assert self.pings == []
+        self.run_ticks(1)
+        assert [ws for ws, _ in self.pings] == ["a"]
+        self.run_ticks(5)
+        assert len(self.pings) == 2
+
+    def test_pings_in_same_tick_share_one_frame(self):
+        for ws in ("a", "b", "c"):
+            self.wheel.register(ws)
+        self.run_ticks(5)
+        assert len(self.pings) == 3
+        assert len({text for _, text in self.pings}) == 1
+
+    def test_silent_peer_is_evicted_and_active_peer_kept(self):
+        self.wheel.register("silent")
+        self.wheel.register("active")
+        for _ in range(4):
+            self.run_ticks(5)
+            self.wheel.touch("active")
+        assert self.dead == ["silent"]
+        assert len(self.wheel) == 1
+        assert self.wheel.stats()["evicted"] == 1
+
+    def test_unregister_reuses_liveness_slot(self):
+        self.wheel.register("a")
+        self.wheel.unregister("a")
+        self.wheel.register("b")
+        assert len(self.wheel._last_seen) == 1
+        self.run_ticks(5)
+        assert [ws for ws, _ in self.pings] == ["b"]
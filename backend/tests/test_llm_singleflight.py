@@ -0,0 +1,144 @@
+"""
+Tests for single-flight coalescing of identical LLM requests
+"""
+import asyncio
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_singleflight import SingleFlight, prompt_key
+
+
+class SlowModel:
+    """Model call that blocks until released, counting real calls and cancellations"""
+
+    def __init__(self, result="answer"):
+        self.result = result
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestSingleFlight:
+    def test_key_depends_on_model_and_prompt(self):
+        assert prompt_key("a", "p") == prompt_key("a", "p")
+        assert prompt_key("a", "p") != prompt_key("b", "p")
+        assert prompt_key("a", "p") != prompt_key("a", "q")
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_share_one_call(self):
+        flights = SingleFlight(cache_ttl=0)
+        model = SlowModel()
+        waiters = [asyncio.create_task(flights.run("k", model)) for _ in range(5)]
+        await settle()
+        model.release.set()
+        assert await asyncio.gather(*waiters) == ["answer"] * 5
+        assert model.calls == 1
+        assert flights.stats()["coalesced"] == 4
+        assert flights.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_different_keys_are_not_coalesced(self):
+        flights = SingleFlight(cache_ttl=0)
+        model = SlowModel()
+        model.release.set()
+        await asyncio.gather(flights.run("a", model), flights.run("b", model))
+        assert model.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        flights = SingleFlight(cache_ttl=0)
+        model = SlowModel()
+        first = asyncio.create_task(flights.run("k", model))
+        second = asyncio.create_task(flights.run("k", model))
+        await settle()
+
+        first.cancel()
+        await settle()
+        assert first.cancelled()
+        assert model.cancelled == 0
+
+        model.release.set()
+        assert await second == "answer"
+        assert model.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_call_cancelled_when_last_waiter_leaves(self):
+        flights = SingleFlight(cache_ttl=0)
+        model = SlowModel()
+        waiters = [asyncio.create_task(flights.run("k", model)) for _ in range(2)]
+        await settle()
+        for waiter in waiters:
+            waiter.cancel()
+        await settle()
+        assert model.cancelled == 1
+        assert flights.stats()["abandoned"] == 1
+
+        # A new request afterwards starts a fresh call instead of joining the cancelled one
+        model.release.set()
+        assert await flights.run("k", model) == "answer"
+        assert model.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_waiter_and_are_not_cached(self):
+        flights = SingleFlight(cache_ttl=60)
+        model = SlowModel(result=RuntimeError("ollama down"))
+        waiters = [asyncio.create_task(flights.run("k", model)) for _ in range(3)]
+        await settle()
+        model.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+        model.result = "recovered"
+        assert await flights.run("k", model) == "recovered"
+        assert model.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_response_cache_reuses_recent_result(self):
+        flights = SingleFlight(cache_ttl=0.05)
+        model = SlowModel()
+        model.release.set()
+        assert await flights.run("k", model) == "answer"
+        assert await flights.run("k", model) == "answer"
+        assert model.calls == 1
+        assert flights.stats()["cache_hits"] == 1
+
+        await asyncio.sleep(0.06)
+        await flights.run("k", model)
+        assert model.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_cache_is_bounded(self):
+        flights = SingleFlight(cache_ttl=60, cache_size=2)
+        model = SlowModel()
+        model.release.set()
+        for key in ("a", "b", "c"):
+            await flights.run(key, model)
+        assert flights.stats()["cached"] == 2
+
+    @pytest.mark.asyncio
+    async def test_disabled_passes_through(self):
+        flights = SingleFlight(enabled=False)
+        model = SlowModel()
+        model.release.set()
+        await asyncio.gather(flights.run("k", model), flights.run("k", model))
+        assert model.calls == 2
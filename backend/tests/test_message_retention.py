@@ -0,0 +1,102 @@
+"""
+Tests for message retention, archival and time buckets
+"""
+import gzip
+import json
+import pytest
+import sys
+import os
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from message_retention import MessageRetentionManager, buckets_since, message_bucket
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.result_set = rows
+
+
+class FakeMessageGraph:
+    """Minimal stand-in that understands the retention queries"""
+
+    def __init__(self, messages):
+        # id -> (original, pig_latin, timestamp, bucket)
+        self.messages = dict(enumerate(messages))
+        self.queries = []
+
+    def query(self, q, params=None):
+        self.queries.append(q)
+        params = params or {}
+        if "DELETE m" in q and "$ids" in q:
+            for node_id in params["ids"]:
+                self.messages.pop(node_id, None)
+            return FakeResult([])
+        expired = [
+            (node_id, *msg) for node_id, msg in sorted(self.messages.items())
+            if msg[2] < params.get("cutoff", "")
+        ][:params.get("limit", 0)]
+        if "DELETE m" in q:
+            for row in expired:
+                self.messages.pop(row[0])
+            return FakeResult([[len(expired)]])
+        if "RETURN ID(m)" in q:
+            return FakeResult([list(row) for row in expired])
+        return FakeResult([])
+
+
+def make_messages(day_count, per_day):
+    return [
+        (f"msg {day}-{i}", "", f"2025-06-{day:02d}T12:00:{i:02d}", f"2025-06-{day:02d}")
+        for day in range(1, day_count + 1) for i in range(per_day)
+    ]
+
+
+class TestBuckets:
+    def test_bucket_granularity(self):
+        ts = "2025-06-22T14:05:00.123"
+        assert message_bucket(ts, "day") == "2025-06-22"
+        assert message_bucket(ts, "hour") == "2025-06-22T14"
+        assert message_bucket(ts, "month") == "2025-06"
+
+    def test_buckets_since_covers_window(self):
+        buckets = buckets_since(datetime(2025, 6, 20, 23), datetime(2025, 6, 22, 1), "day")
+        assert buckets == ["2025-06-20", "2025-06-21", "2025-06-22"]
+        months = buckets_since(datetime(2025, 1, 31), datetime(2025, 4, 1), "month")
+        assert months == ["2025-01", "2025-02", "2025-03", "2025-04"]
+
+
+class TestMessageRetentionManager:
+    """Test batched TTL deletion with and without archival"""
+
+    @pytest.mark.asyncio
+    async def test_sweep_deletes_only_expired_in_batches(self):
+        graph = FakeMessageGraph(make_messages(10, 3))
+        retention = MessageRetentionManager(lambda: graph, retention_days=5, batch_size=4)
+        removed = await retention.sweep(now=datetime(2025, 6, 11))
+        # Days 1-5 are older than the 5 day TTL (cutoff 2025-06-06T00:00)
+        assert removed == 15
+        assert all(msg[2] >= "2025-06-06" for msg in graph.messages.values())
+        assert sum("WITH m LIMIT" in q for q in graph.queries) == 4
+
+    @pytest.mark.asyncio
+    async def test_sweep_archives_before_deleting(self, tmp_path):
+        graph = FakeMessageGraph(make_messages(3, 2))
+        retention = MessageRetentionManager(
+            lambda: graph, retention_days=1, batch_size=10, archive_dir=str(tmp_path)
+        )
+        removed = await retention.sweep(now=datetime(2025, 6, 4))
+        assert removed == 4
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "messages-2025-06-01.ndjson.gz", "messages-2025-06-02.ndjson.gz"
+        ]
+        with gzip.open(tmp_path / "messages-2025-06-01.ndjson.gz", "rt") as f:
+            records = [json.loads(line) for line in f]
+        assert [r["original"] for r in records] == ["msg 1-0", "msg 1-1"]
+        assert retention.stats()["archived"] == 4
+
+    def test_disabled_when_ttl_is_zero(self):
+        retention = MessageRetentionManager(lambda: None, retention_days=0)
+        assert retention.enabled is False
@@ -0,0 +1,77 @@
+"""
+Tests for the write-behind chat message buffer
+"""
+import asyncio
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from message_store import MessageWriteBehindQueue
+
+
+class FlakyWriter:
+    """Records written batches; fails while `down` is set"""
+
+    def __init__(self):
+        self.batches = []
+        self.down = False
+
+    def __call__(self, rows):
+        if self.down:
+            raise ConnectionError("FalkorDB unavailable")
+        self.batches.append([row["original"] for row in rows])
+
+
+class TestMessageWriteBehindQueue:
+    """Test batching, outage retry, bounding and shutdown drain"""
+
+    @pytest.mark.asyncio
+    async def test_flushes_full_batches_without_waiting_for_interval(self):
+        writer = FlakyWriter()
+        store = MessageWriteBehindQueue(writer, batch_size=3, flush_interval=60)
+        store.start()
+        for i in range(7):
+            store.enqueue(f"m{i}", "")
+        await asyncio.sleep(0.05)
+        assert writer.batches == [["m0", "m1", "m2"], ["m3", "m4", "m5"]]
+        assert len(store) == 1
+        await store.stop()
+        assert writer.batches[-1] == ["m6"]
+
+    @pytest.mark.asyncio
+    async def test_partial_batch_flushed_by_interval(self):
+        writer = FlakyWriter()
+        store = MessageWriteBehindQueue(writer, batch_size=100, flush_interval=0.02)
+        store.start()
+        store.enqueue("hello", "ellohay")
+        await asyncio.sleep(0.1)
+        assert writer.batches == [["hello"]]
+        await store.stop()
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_retried_in_order(self):
+        writer = FlakyWriter()
+        store = MessageWriteBehindQueue(writer, batch_size=2)
+        writer.down = True
+        for i in range(3):
+            store.enqueue(f"m{i}", "")
+        assert await store.flush() is False
+        assert store.stats()["failures"] == 1
+        assert len(store) == 3
+
+        writer.down = False
+        await store.stop(drain_timeout=1)
+        assert writer.batches == [["m0", "m1"], ["m2"]]
+        assert store.stats()["retry_backoff_seconds"] == 0
+
+    @pytest.mark.asyncio
+    async def test_pending_buffer_is_bounded(self):
+        writer = FlakyWriter()
+        store = MessageWriteBehindQueue(writer, batch_size=10, max_pending=3)
+        results = [store.enqueue(f"m{i}", "") for i in range(5)]
+        assert results == [True, True, True, False, False]
+        assert [row["original"] for row in store.pending] == ["m2", "m3", "m4"]
+        assert store.stats()["dropped"] == 2
@@ -0,0 +1,97 @@
+"""
+Tests for per-connection concurrent message processing and cancellation
+"""
+import asyncio
+import json
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import message_tasks
+from message_tasks import ConnectionTaskManager, TaggedWebSocket
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+class TestConnectionTaskManager:
+    """Test the per-user limit, cancellation and frame tagging"""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limited_per_user(self, monkeypatch):
+        monkeypatch.setattr(message_tasks, "MAX_CONCURRENT_MESSAGES", 2)
+        websocket = FakeWebSocket()
+        tasks = ConnectionTaskManager(websocket, "user-a")
+        running = []
+        peak = []
+        release = asyncio.Event()
+
+        async def handler(text, sink):
+            running.append(text)
+            peak.append(len(running))
+            await release.wait()
+            running.remove(text)
+
+        for i in range(4):
+            tasks.submit(handler, f"m{i}", f"q{i}")
+        await asyncio.sleep(0.01)
+        assert len(running) == 2
+
+        release.set()
+        await asyncio.sleep(0.01)
+        assert max(peak) == 2
+        assert tasks.tasks == {}
+        await tasks.close()
+
+    @pytest.mark.asyncio
+    async def test_cancel_by_id_only_stops_that_request(self):
+        websocket = FakeWebSocket()
+        tasks = ConnectionTaskManager(websocket, "user-b")
+        finished = []
+
+        async def handler(text, sink):
+            await asyncio.sleep(0.05 if text == "fast" else 10)
+            finished.append(text)
+
+        tasks.submit(handler, "slow", "q1")
+        tasks.submit(handler, "fast", "q2")
+        await asyncio.sleep(0)
+        assert tasks.cancel("q1") == 1
+        assert tasks.cancel("missing") == 0
+        await asyncio.sleep(0.1)
+
+        assert finished == ["fast"]
+        assert {"type": "cancelled", "message": "Request cancelled", "id": "q1"} in websocket.sent
+        await tasks.close()
+
+    @pytest.mark.asyncio
+    async def test_close_cancels_everything_and_releases_slot(self):
+        tasks = ConnectionTaskManager(FakeWebSocket(), "user-c")
+
+        async def handler(text, sink):
+            await asyncio.sleep(10)
+
+        tasks.submit(handler, "a")
+        tasks.submit(handler, "b")
+        await tasks.close()
+        assert tasks.tasks == {}
+        assert "user-c" not in message_tasks._user_semaphores
+
+    @pytest.mark.asyncio
+    async def test_tagged_websocket_stamps_frames(self):
+        websocket = FakeWebSocket()
+        tagged = TaggedWebSocket(websocket, "q7")
+        await tagged.send_text(json.dumps({"type": "query", "message": "MATCH"}))
+        await tagged.send_text("**Plain markdown answer**")
+        assert websocket.sent == [
+            {"type": "query", "message": "MATCH", "id": "q7"},
+            {"type": "server", "id": "q7", "message": "**Plain markdown answer**"},
+        ]
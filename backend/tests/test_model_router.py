@@ -0,0 +1,127 @@
+"""
+Tests for per-task model routing and the small-to-large cascade
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_router import ModelRouter
+from query_validator import QueryValidator
+
+VALID = "MATCH (p:Person)-[:MEMBER_OF]->(t:Team) RETURN p.name, t.name"
+INVALID = "MATCH (p:Person) RETURN x.name"
+
+
+class FakeModels:
+    """Model call returning canned output per model and recording the calls"""
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.calls = []
+
+    async def __call__(self, prompt, websocket=None, model=None, task=None, tier=None):
+        self.calls.append((model, tier, websocket))
+        output = self.outputs[model]
+        if isinstance(output, Exception):
+            raise output
+        return output
+
+
+def make_router(**kwargs):
+    kwargs.setdefault("cascade", True)
+    kwargs.setdefault("cascade_model", "small")
+    kwargs.setdefault("cascade_tasks", ("generate_query",))
+    return ModelRouter(lambda: "big", **kwargs)
+
+
+class TestRouting:
+    def test_default_model_without_overrides(self):
+        router = ModelRouter(lambda: "big", task_models={})
+        assert router.model_for("analyze") == "big"
+        assert router.model_for(None) == "big"
+
+    def test_code_and_env_overrides(self, monkeypatch):
+        router = ModelRouter(lambda: "big", task_models={"format_results": "tiny"})
+        assert router.model_for("format_results") == "tiny"
+        monkeypatch.setenv("OLLAMA_MODEL_FORMAT_RESULTS", "env-model")
+        assert router.model_for("format_results") == "env-model"
+
+    def test_tiers_only_for_cascade_tasks(self):
+        router = make_router()
+        assert router.tiers_for("generate_query") == [("small", "small"), ("large", "big")]
+        assert router.tiers_for("analyze") == [("default", "big")]
+        assert router.next_tier("generate_query", "small") == ("large", "big")
+        assert router.next_tier("generate_query", "large") is None
+
+    def test_no_cascade_when_disabled(self):
+        router = make_router(cascade=False)
+        assert router.tiers_for("generate_query") == [("default", "big")]
+
+
+class TestCascade:
+    @pytest.mark.asyncio
+    async def test_valid_small_output_is_kept(self):
+        router = make_router()
+        models = FakeModels({"small": VALID, "big": "unused"})
+        query, tier = await router.generate("generate_query", "prompt", models, websocket="ws")
+        assert (query, tier) == (VALID, "small")
+        # Errors of a tier that may still escalate are not reported to the client
+        assert models.calls == [("small", "small", None)]
+
+    @pytest.mark.asyncio
+    async def test_invalid_small_output_escalates(self):
+        router = make_router()
+        models = FakeModels({"small": INVALID, "big": VALID})
+        router.record("generate_query", "small", "small", 10.0)
+        query, tier = await router.generate("generate_query", "prompt", models, websocket="ws")
+        assert (query, tier) == (VALID, "large")
+        assert models.calls[-1] == ("big", "large", "ws")
+        assert router.stats()["tiers"]["generate_query/small"]["escalations"] == 1
+        assert router.stats()["escalation_reasons"] == {"validation failed": 1}
+
+    @pytest.mark.asyncio
+    async def test_small_model_error_escalates(self):
+        router = make_router()
+        models = FakeModels({"small": RuntimeError("model not found"), "big": VALID})
+        query, tier = await router.generate("generate_query", "prompt", models)
+        assert tier == "large"
+        assert router.escalation_reasons == {"model error: RuntimeError": 1}
+
+    @pytest.mark.asyncio
+    async def test_last_tier_errors_propagate(self):
+        router = make_router(cascade=False)
+        models = FakeModels({"big": RuntimeError("down")})
+        with pytest.raises(RuntimeError):
+            await router.generate("generate_query", "prompt", models)
+
+
+class TestStats:
+    def test_latency_tokens_and_cost_per_tier(self):
+        router = make_router(costs={"big": 2.0})
+        for ms in (100, 200, 300):
+            router.record("generate_query", "large", "big", ms, {"prompt_eval_count": 400, "eval_count": 100})
+        router.record("generate_query", "large", "big", 50, error=True)
+        tier = router.stats()["tiers"]["generate_query/large"]
+        assert tier["calls"] == 4
+        assert tier["errors"] == 1
+        assert tier["avg_latency_ms"] == 162.5
+        assert tier["p95_latency_ms"] == 300
+        assert tier["prompt_tokens"] == 1200
+        assert tier["relative_cost"] == 3.0
+
+
+class TestValidatorVariables:
+    def test_path_targets_are_defined(self):
+        query = ("MATCH (p:Person)-[hv:HAS_VISA]->(v:Visa {type: 'Business'}) "
+                 "WITH p, collect(v.type) AS visas UNWIND visas AS visa "
+                 "RETURN p.name, [x IN visas | x] AS all_visas, visa")
+        is_valid, errors, _ = QueryValidator().validate(query)
+        assert is_valid, errors
+
+    def test_unknown_variable_is_rejected(self):
+        is_valid, errors, _ = QueryValidator().validate("MATCH (p:Person) RETURN count(x.name)")
+        assert not is_valid
+        assert "Undefined variables: x" in errors[0]
@@ -0,0 +1,117 @@
+"""
+Tests for Ollama prompt-prefix reuse, keep-alive and warm-up
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ollama_prefix_cache import OllamaPrefixCache, static_prefix
+
+PREFIX = ("You write Cypher. " * 200).strip()
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeOllama:
+    """Async client stand-in that records requests"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def post(self, url, json=None):
+        self.requests.append(json)
+        if "prompt" not in json:
+            return FakeResponse({"done": True, "load_duration": 2_500_000_000})
+        return FakeResponse({
+            "response": "READY",
+            "context": [1, 2, 3],
+            "prompt_eval_count": 9000,
+            "prompt_eval_duration": 4_000_000_000,
+        })
+
+
+def make_cache(tmp_path, enabled=True):
+    (tmp_path / "generate_query.txt").write_text(PREFIX)
+    (tmp_path / "format_results.txt").write_text('Short "{{ user_message }}" prompt')
+    ollama = FakeOllama()
+    cache = OllamaPrefixCache(lambda: ("http://ollama:11434", "granite"), prompts_dir=str(tmp_path),
+                              enabled=enabled, keep_alive="1h", http_client_factory=lambda: ollama)
+    cache.register_prompts(["generate_query", "format_results"])
+    return cache, ollama
+
+
+class TestOllamaPrefixCache:
+    """Test prefix registration, context reuse and timing stats"""
+
+    def test_static_prefix_stops_at_first_template_tag(self):
+        assert static_prefix('Intro text\n\nUser: "{{ user_message }}"') == 'Intro text\n\nUser: "'
+        assert static_prefix("No variables at all\n") == "No variables at all"
+
+    def test_short_prefixes_are_not_registered(self, tmp_path):
+        cache, _ = make_cache(tmp_path)
+        assert list(cache.prefixes) == ["generate_query"]
+
+    def test_disabled_mode_sends_full_prompt_with_keep_alive(self, tmp_path):
+        cache, _ = make_cache(tmp_path, enabled=False)
+        fields, name, reused = cache.prepare("granite", PREFIX + '\n\nQuestion: "x"\nQuery:')
+        assert fields == {"prompt": PREFIX + '\n\nQuestion: "x"\nQuery:', "context": [], "keep_alive": "1h"}
+        assert name == "generate_query" and not reused
+
+    @pytest.mark.asyncio
+    async def test_warm_up_primes_prefix_and_reuses_context(self, tmp_path):
+        cache, ollama = make_cache(tmp_path)
+        await cache.warm_up()
+
+        assert ollama.requests[0] == {"model": "granite", "keep_alive": "1h"}
+        assert ollama.requests[1]["prompt"].startswith(PREFIX)
+        assert cache.warmup["status"] == "done"
+        assert cache.warmup["primed"] == ["generate_query"]
+        assert cache.warmup["load_ms"] == 2500.0
+
+        fields, name, reused = cache.prepare("granite", PREFIX + '\n\nQuestion: "x"\nQuery:')
+        assert reused
+        assert fields["context"] == [1, 2, 3]
+        assert fields["prompt"] == 'Question: "x"\nQuery:'
+
+        # Contexts are per model
+        _, _, reused = cache.prepare("llama3", PREFIX + '\n\nQuestion: "x"\nQuery:')
+        assert not reused
+
+    @pytest.mark.asyncio
+    async def test_warm_up_failure_is_reported(self, tmp_path):
+        class Unreachable(FakeOllama):
+            async def post(self, url, json=None):
+                raise ConnectionError("connection refused")
+
+        cache, _ = make_cache(tmp_path)
+        cache.http_client_factory = Unreachable
+        await cache.warm_up()
+        assert cache.warmup["status"] == "failed"
+
+    def test_records_first_call_and_prefill(self, tmp_path):
+        cache, _ = make_cache(tmp_path)
+        cache.record("granite", "generate_query", {"prompt_eval_count": 9000, "prompt_eval_duration": 4e9}, 5200.0, False)
+        cache.record("granite", "generate_query", {"prompt_eval_count": 20, "prompt_eval_duration": 2e7}, 900.0, True)
+        summary = cache.stats()["prompts"]["granite/generate_query"]
+        assert summary["first_call_ms"] == 5200.0
+        assert summary["calls"] == 2
+        assert summary["prefix_reused"] == 1
+        assert summary["avg_prefill_ms"] == 2010.0
@@ -0,0 +1,114 @@
+"""
+Tests for the Ollama stand-in server used for CPU-only load tests
+"""
+import json
+import random
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+from fastapi.testclient import TestClient
+
+from analysis_output import parse_analysis
+from cypher_stream import extract_statement
+from ollama_standin import Faults, LatencyModel, ResponseBook, create_app, question_of, split_tokens
+from query_validator import QueryValidator
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def render(kind, question):
+    from jinja2 import Template
+    with open(os.path.join(BACKEND_DIR, "prompts", f"{kind}.txt")) as f:
+        source = f.read()
+    context = {"people_count": 1, "sample_departments": [], "teams_count": 1, "sample_teams": [],
+               "groups_count": 1, "sample_groups": [], "policies_count": 1}
+    prompt = Template(source).render(user_message=question, database_context=context, results={}, previous_query="")
+    if kind == "generate_query":
+        prompt += f'\n\nQuestion: "{question}"\nQuery:'
+    return prompt
+
+
+@pytest.fixture
+def book(tmp_path):
+    return ResponseBook(str(tmp_path / "recorded.jsonl"))
+
+
+class TestResponseBook:
+    def test_prompt_kind_and_question(self, book):
+        prompt = render("generate_query", "Who are the team leads in Engineering?")
+        assert book.kind_of(prompt) == "generate_query"
+        assert book.kind_of(render("analyze_message", "hi")) == "analyze_message"
+        assert question_of(prompt) == "Who are the team leads in Engineering?"
+
+    def test_synthetic_answers_fit_the_pipeline(self, book):
+        query, source = book.lookup("m", render("generate_query", "Who are the team leads in Engineering?"))
+        assert source == "synthetic"
+        assert QueryValidator().validate(query)[0]
+        assert extract_statement(query, final=True) == query
+
+        analysis = parse_analysis(book.lookup("m", render("analyze_message", "who is on the mobile team?"))[0])
+        assert analysis.tools == ["custom_query", "store_message"]
+
+    def test_recorded_responses_replay(self, tmp_path, book):
+        prompt = render("format_results", "list teams")
+        book.record("m", prompt, "recorded answer")
+
+        replay = ResponseBook(str(tmp_path / "recorded.jsonl"))
+        assert replay.lookup("m", prompt) == ("recorded answer", "hash")
+        # Same question with a different rendering (other results) matches by question
+        assert replay.lookup("m", prompt + " ")[0] == "recorded answer"
+
+
+class TestLatencyModel:
+    def test_parse_and_draw(self):
+        assert LatencyModel.parse("fixed:250").first_token_ms(random.Random(1)) == 250
+        uniform = LatencyModel.parse("uniform:10:20", tokens_per_sec=50)
+        assert 10 <= uniform.first_token_ms(random.Random(1)) <= 20
+        assert uniform.token_delay() == 0.02
+        with pytest.raises(ValueError):
+            LatencyModel.parse("gamma:1")
+
+    def test_seeded_draws_repeat(self):
+        model = LatencyModel.parse("lognormal:400:0.5")
+        first = [model.first_token_ms(random.Random(7)) for _ in range(3)]
+        assert first == [model.first_token_ms(random.Random(7)) for _ in range(3)]
+
+
+class TestServer:
+    def test_non_streaming_generate(self, book):
+        client = TestClient(create_app(book))
+        data = client.post("/api/generate", json={"model": "m", "prompt": "hello", "stream": False}).json()
+        assert data["done"] and data["response"] == "OK"
+        assert data["prompt_eval_count"] > 0 and data["context"]
+
+    def test_streaming_generate_is_ndjson(self, book):
+        client = TestClient(create_app(book))
+        prompt = render("format_results", "list teams")
+        lines = [json.loads(line) for line in client.post(
+            "/api/generate", json={"model": "m", "prompt": prompt}).text.splitlines()]
+        assert lines[-1]["done"] is True
+        text = "".join(line["response"] for line in lines)
+        assert text == book.lookup("m", prompt)[0]
+        assert len(lines) == len(split_tokens(text)) + 1
+
+    def test_load_only_request(self, book):
+        client = TestClient(create_app(book))
+        assert client.post("/api/generate", json={"model": "m"}).json()["done_reason"] == "load"
+
+    def test_error_injection(self, book):
+        client = TestClient(create_app(book, faults=Faults(error_rate=1.0, error_status=503)))
+        resp = client.post("/api/generate", json={"model": "m", "prompt": "hello"})
+        assert resp.status_code == 503
+        assert client.get("/standin/stats").json()["injected"] == {"error": 1}
+
+    def test_dropped_stream_has_no_done_line(self, book):
+        client = TestClient(create_app(book, faults=Faults(drop_rate=1.0), seed=1))
+        prompt = render("format_results", "list teams")
+        lines = [json.loads(line) for line in client.post(
+            "/api/generate", json={"model": "m", "prompt": prompt}).text.splitlines()]
+        assert not any(line.get("done") for line in lines)
@@ -0,0 +1,24 @@
+"""
+Tests for write-query detection in the query validator
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_validator import is_write_query
+
+
+class TestIsWriteQuery:
+    def test_write_clauses(self):
+        assert is_write_query("MATCH (p:Person {name: 'Sarah'}) SET p.title = 'Lead'")
+        assert is_write_query("merge (t:Team {name: 'Mobile'}) RETURN t")
+        assert is_write_query("MATCH (m:Message) DETACH DELETE m")
+        assert is_write_query("MATCH (p:Person) REMOVE p.visa_status")
+
+    def test_read_queries(self):
+        assert not is_write_query("MATCH (p:Person)-[:MEMBER_OF]->(t:Team) RETURN p.name, t.name")
+        # Keywords inside strings and property names are not clauses
+        assert not is_write_query("MATCH (p:Policy) WHERE p.name = 'Data Deletion: DELETE on request' RETURN p")
+        assert not is_write_query("MATCH (s:Skill) RETURN s.set, s.created")
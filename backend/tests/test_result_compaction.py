@@ -0,0 +1,65 @@
+"""
+Tests for summarizing large result sets before the formatting prompt
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_compaction import ResultSummarizer, compact_for_prompt, estimate_tokens, flatten_record
+
+
+def people(count):
+    return [
+        {
+            "p": {"name": f"Person {i}", "department": ["Engineering", "Sales", "HR"][i % 3],
+                  "level": i % 7, "_labels": ["Person"]},
+            "team": f"Team {i % 12}",
+        }
+        for i in range(count)
+    ]
+
+
+class TestResultCompaction:
+    """Test column statistics, group-by summaries and the token budget"""
+
+    def test_small_results_pass_through(self):
+        records = people(3)
+        context = compact_for_prompt("MATCH (p:Person) RETURN p", records)
+        assert context == {"query": "MATCH (p:Person) RETURN p", "count": 3, "results": records}
+
+    def test_large_results_are_summarized_within_budget(self):
+        records = people(500)
+        context = compact_for_prompt("MATCH (p:Person) RETURN p", records, budget=600)
+        assert context["summarized"] is True
+        assert context["total_count"] == 500
+        assert estimate_tokens(context) <= 600
+
+        columns = context["columns"]
+        assert columns["p.department"]["top_values"][0] == ["Engineering", 167]
+        assert columns["p.level"] == {"non_null": 500, "distinct": 7, "min": 0, "max": 6, "mean": 2.99}
+        # Unique names are not worth a group-by
+        assert "top_values" not in columns["p.name"]
+
+    def test_summary_spans_pages(self):
+        records = people(120)
+        summarizer = ResultSummarizer()
+        summarizer.add_records(records[:50])
+        summarizer.add_records(records[50:])
+        context = compact_for_prompt("q", records[:50], summarizer)
+        assert context["summarized"] is True
+        assert context["total_count"] == 120
+
+        summarizer.complete = False
+        assert compact_for_prompt("q", records[:50], summarizer)["total_count"] == "more than 120"
+
+    def test_very_wide_results_drop_columns(self):
+        records = [{f"col_{c}": f"value {r}-{c}" for c in range(300)} for r in range(20)]
+        context = compact_for_prompt("q", records, budget=400)
+        assert context["omitted_columns"] > 0
+        assert context["sample_rows"] == []
+
+    def test_flatten_record(self):
+        flat = flatten_record({"p": {"name": "Ada", "_labels": ["Person"]}, "n": 3, "tags": ["a", "b"]})
+        assert flat == {"p.name": "Ada", "n": 3, "tags": ["a", "b"]}
@@ -0,0 +1,100 @@
+"""
+Tests for rule-based formatting of simple result shapes
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_formatters import FormattingStats, format_custom_results, format_search_results
+
+
+def person_rows(count):
+    return [
+        {"p.id": i, "p.name": f"Person {i}", "p.email": f"person{i}@example.com",
+         "p.department": "Engineering", "p.role": "Engineer", "labels": ["Person"]}
+        for i in range(count)
+    ]
+
+
+class TestResultFormatters:
+    """Test shape detection and the markdown each rule produces"""
+
+    def test_scalar_count(self):
+        assert format_custom_results({"results": [{"count": 1234}]}) == ("scalar", "**Count:** 1,234")
+
+    def test_empty_results(self):
+        shape, markdown = format_custom_results({"results": [], "count": 0})
+        assert shape == "empty"
+        assert "couldn't find" in markdown
+
+    def test_person_list(self):
+        shape, markdown = format_custom_results({"results": person_rows(3)})
+        assert shape == "person_list"
+        assert "## People (3)" in markdown
+        assert "* **Person 0** — Engineer, Engineering (`person0@example.com`)" in markdown
+
+    def test_long_or_paginated_lists_go_to_the_llm(self):
+        assert format_custom_results({"results": person_rows(40)}) is None
+        assert format_custom_results({"results": person_rows(3), "has_more": True}) is None
+
+    def test_hierarchy_groups_reports_by_manager(self):
+        rows = [
+            {"p.id": 1, "p.name": "Ada", "p.role": "Engineer", "p.department": "Core",
+             "manager_id": 9, "manager_name": "Grace", "manager_role": "Director"},
+            {"p.id": 2, "p.name": "Alan", "p.role": "Engineer", "p.department": "Core",
+             "manager_id": 9, "manager_name": "Grace", "manager_role": "Director"},
+        ]
+        shape, markdown = format_custom_results({"results": rows})
+        assert shape == "hierarchy"
+        assert "**Grace** — Director (2 direct reports)" in markdown
+        assert "  * **Alan** — Engineer, Core" in markdown
+
+    def test_policy_list_with_owners_sorted_by_severity(self):
+        rows = [
+            {"t.id": 1, "t.name": "Security", "labels": ["Team"], "p.id": 3,
+             "p.name": "Access Control", "p.category": "security", "p.severity": "high"},
+            {"t.id": 2, "t.name": "IT", "labels": ["Team"], "p.id": 3,
+             "p.name": "Access Control", "p.category": "security", "p.severity": "high"},
+            {"t.id": 2, "t.name": "IT", "labels": ["Team"], "p.id": 4,
+             "p.name": "Data Retention", "p.category": "data", "p.severity": "critical"},
+        ]
+        shape, markdown = format_custom_results({"results": rows})
+        assert shape == "policy_list"
+        assert markdown.index("Data Retention") < markdown.index("Access Control")
+        assert "Owned by: **Security**, **IT**" in markdown
+
+    def test_group_counts(self):
+        rows = [{"department": "Engineering", "people": 12}, {"department": "Sales", "people": 5}]
+        shape, markdown = format_custom_results({"results": rows})
+        assert shape == "group_counts"
+        assert "| Engineering | 12 |" in markdown
+        assert "**Total:** 17 across 2 groups" in markdown
+
+    def test_nested_values_go_to_the_llm(self):
+        rows = [{"name": "Ada", "skills": ["python", "go"], "a": 1, "b": 2, "c": 3, "d": 4}]
+        assert format_custom_results({"results": rows}) is None
+
+    def test_search_results(self):
+        found = {
+            "people": [{"name": "Ada", "role": "Engineer", "_labels": ["Person"]}],
+            "teams": [{"name": "Core", "description": "Platform team", "_labels": ["Team"]}],
+            "policies": [],
+        }
+        shape, markdown = format_search_results(found)
+        assert shape == "search"
+        assert "## People (1)" in markdown
+        assert "* **Core** — Platform team" in markdown
+        # Documents, messages etc. are left to the model
+        assert format_search_results({"documents": [{"name": "Handbook"}]}) is None
+
+    def test_stats_report_local_share(self):
+        stats = FormattingStats()
+        stats.record_local("scalar", 0.00001)
+        stats.record_local("person_list", 0.00003)
+        stats.record_llm("custom")
+        report = stats.stats()
+        assert report["responses"] == 3
+        assert report["local_share"] == 0.667
+        assert report["by_shape"] == {"scalar": 1, "person_list": 1}
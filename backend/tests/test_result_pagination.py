@@ -0,0 +1,117 @@
+"""
+Tests for SKIP/LIMIT query paging and the per-connection result cursor store
+"""
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_pagination import ResultCursorStore, paginate_query, split_page
+
+
+class TestPaginateQuery:
+    """Test rewriting generated queries into page queries"""
+
+    def test_appends_skip_and_limit(self):
+        query = "MATCH (p:Person) RETURN p.name ORDER BY p.name;"
+        assert paginate_query(query, 0, 51) == "MATCH (p:Person) RETURN p.name ORDER BY p.name SKIP 0 LIMIT 51"
+        assert paginate_query(query, 50, 51).endswith("SKIP 50 LIMIT 51")
+
+    def test_respects_existing_window(self):
+        query = "MATCH (p:Person) RETURN p.name ORDER BY p.name SKIP 10 LIMIT 60"
+        assert paginate_query(query, 0, 51) == "MATCH (p:Person) RETURN p.name ORDER BY p.name SKIP 10 LIMIT 51"
+        # Second page never reads past the original LIMIT
+        assert paginate_query(query, 50, 51) == "MATCH (p:Person) RETURN p.name ORDER BY p.name SKIP 60 LIMIT 10"
+        assert paginate_query(query, 60, 51).endswith("LIMIT 0")
+
+    def test_unordered_queries_are_ordered_by_every_column(self):
+        query = "MATCH (p:Person) RETURN p.name SKIP 10 LIMIT 60"
+        assert paginate_query(query, 0, 51) == "MATCH (p:Person) RETURN p.name AS `p.name` ORDER BY `p.name` SKIP 10 LIMIT 51"
+
+        # Aliases and bare variables are used as they are; other expressions are aliased to their own text
+        query = "MATCH (t:Team)<-[:MEMBER_OF]-(p) RETURN DISTINCT t, t.name, count(p) AS size, collect(p.name)[0..3]"
+        assert paginate_query(query, 0, 51) == (
+            "MATCH (t:Team)<-[:MEMBER_OF]-(p) RETURN DISTINCT t, t.name AS `t.name`, count(p) AS size, "
+            "collect(p.name)[0..3] AS `collect(p.name)[0..3]` "
+            "ORDER BY t, `t.name`, size, `collect(p.name)[0..3]` SKIP 0 LIMIT 51"
+        )
+
+        # Commas inside maps, calls and strings do not split columns
+        paged = paginate_query("MATCH (p:Person) RETURN {name: p.name, role: p.role} AS card, 'a, b'", 0, 11)
+        assert paged.endswith("ORDER BY card, `'a, b'` SKIP 0 LIMIT 11")
+
+    def test_unpageable_queries(self):
+        assert paginate_query("MATCH (p:Person) RETURN p.name UNION MATCH (t:Team) RETURN t.name", 0, 10) is None
+        assert paginate_query("CREATE (p:Person {name: 'Ada'})", 0, 10) is None
+        # Writes are never re-run for later pages
+        assert paginate_query("CREATE (p:Person {name: 'Ada'}) RETURN p", 0, 10) is None
+        # Columns that can't be referenced in ORDER BY
+        assert paginate_query("MATCH (p:Person) RETURN *", 0, 10) is None
+        assert paginate_query("MATCH (p:Person) RETURN p.`full name`", 0, 10) is None
+        assert paginate_query("MATCH (p:Person) WITH p RETURN p.name", 0, 10) is not None
+
+    def test_parameter_bounds_are_not_rewritten(self):
+        assert paginate_query("MATCH (p:Person) RETURN p.name LIMIT $n", 0, 10) is None
+        assert paginate_query("MATCH (p:Person) RETURN p.name SKIP $offset LIMIT 5", 0, 10) is None
+        assert paginate_query("MATCH (p:Person) RETURN p.name LIMIT toInteger('5')", 0, 10) is None
+        assert paginate_query("MATCH (p:Person) RETURN 'no limit' AS note", 0, 10).endswith("SKIP 0 LIMIT 10")
+
+    def test_order_before_return_is_not_replaced(self):
+        query = "MATCH (p:Person) WITH p ORDER BY p.age DESC RETURN p.name, p.age"
+        assert paginate_query(query, 0, 10) is None
+        ordered = "MATCH (p:Person) WITH p ORDER BY p.age DESC RETURN p.name ORDER BY p.name"
+        assert paginate_query(ordered, 0, 10) == f"{ordered} SKIP 0 LIMIT 10"
+
+    def test_split_page(self):
+        rows = [[i] for i in range(11)]
+        page, has_more = split_page(rows, 10)
+        assert len(page) == 10 and has_more
+        page, has_more = split_page(rows[:10], 10)
+        assert len(page) == 10 and not has_more
+
+
+class TestResultCursorStore:
+    """Test cursor lifetime, ownership and bounds"""
+
+    def test_advance_and_close_on_last_page(self):
+        store = ResultCursorStore()
+        owner = object()
+        cursor_id = store.create(owner, "MATCH (n) RETURN n", next_offset=50, page_size=50)
+
+        cursor = store.get(owner, cursor_id)
+        store.advance(cursor, 50, has_more=True)
+        assert cursor.next_offset == 100 and cursor.page == 2
+        assert store.get(owner, cursor_id) is cursor
+
+        store.advance(cursor, 12, has_more=False)
+        assert store.get(owner, cursor_id) is None
+        assert len(store) == 0
+
+    def test_cursors_are_private_to_their_connection(self):
+        store = ResultCursorStore()
+        owner, other = object(), object()
+        cursor_id = store.create(owner, "MATCH (n) RETURN n", 50, 50)
+        assert store.get(other, cursor_id) is None
+
+        store.drop_owner(owner)
+        assert store.get(owner, cursor_id) is None
+
+    def test_evicts_oldest_beyond_limit(self):
+        store = ResultCursorStore(max_per_owner=2)
+        owner = object()
+        first = store.create(owner, "q1", 50, 50)
+        second = store.create(owner, "q2", 50, 50)
+        third = store.create(owner, "q3", 50, 50)
+        assert store.get(owner, first) is None
+        assert store.get(owner, second) and store.get(owner, third)
+        assert store.stats()["evicted"] == 1
+
+    def test_expires_idle_cursors(self):
+        store = ResultCursorStore(ttl=0.01)
+        owner = object()
+        cursor_id = store.create(owner, "q", 50, 50)
+        time.sleep(0.02)
+        assert store.get(owner, cursor_id) is None
+        assert store.stats()["expired"] == 1
@@ -0,0 +1,103 @@
+"""
+Tests for one-pass result conversion, lazy table rendering and deferred logging
+"""
+import json
+import logging
+import logging.handlers
+import threading
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import result_rendering
+from result_rendering import QueryResultSet, log_result_set, setup_results_logging, stop_results_logging
+
+
+class FakeGraphResult:
+    def __init__(self, header, rows):
+        self.header = header
+        self.result_set = rows
+
+
+class FakeNode:
+    def __init__(self, labels, properties):
+        self.labels = labels
+        self.properties = properties
+
+
+class CountingCell:
+    """Counts str() calls to detect eager rendering"""
+    renders = 0
+
+    def __str__(self):
+        CountingCell.renders += 1
+        return "cell"
+
+
+class TestQueryResultSet:
+    """Test conversion, preview limits and the structured payload"""
+
+    def test_records_match_previous_conversion(self):
+        result = FakeGraphResult([[1, "name"], [1, "age"]], [["Ada", 36], ["Alan", 41]])
+        assert QueryResultSet.from_graph_result(result).records == [
+            {"name": "Ada", "age": 36}, {"name": "Alan", "age": 41}
+        ]
+        headless = QueryResultSet.from_graph_result(FakeGraphResult([], [[5]]))
+        assert headless.records == [{"result": 5}]
+
+    def test_table_renders_only_preview_rows(self):
+        CountingCell.renders = 0
+        rows = [[CountingCell()] for _ in range(1000)]
+        result_set = QueryResultSet(["value"], rows)
+        assert CountingCell.renders == 0
+        table = result_set.render_table(max_rows=10)
+        assert CountingCell.renders == 10
+        assert table.splitlines()[-1] == "... 990 more rows"
+        assert len(table.splitlines()) == 2 + 10 + 1
+
+    def test_payload_is_structured_and_json_safe(self):
+        node = FakeNode(["Person"], {"name": "Ada"})
+        result_set = QueryResultSet(["p", "n"], [[node, i] for i in range(5)])
+        payload = result_set.payload(max_rows=3)
+        json.dumps(payload)
+        assert payload["columns"] == ["p", "n"]
+        assert payload["rows"][0] == [{"name": "Ada", "_labels": ["Person"]}, 0]
+        assert payload["total_rows"] == 5
+        assert payload["truncated"] is True
+        assert "showing 3 of 5 rows" in payload["message"]
+
+    def test_pages_report_their_row_range(self):
+        first = QueryResultSet(["n"], [[i] for i in range(50)]).payload(max_rows=50, has_more=True)
+        assert first["message"].startswith("**Query Results:** (rows 1-50, more available)")
+        assert (first["first_row"], first["last_row"], first["total_rows"]) == (1, 50, None)
+
+        # Later pages carry no header of their own; the total is known on the last one
+        last = QueryResultSet(["n"], [[i] for i in range(12)]).payload(max_rows=50, offset=50)
+        assert last["message"].startswith("*Rows 51-62*")
+        assert "Query Results" not in last["message"]
+        assert (last["first_row"], last["last_row"], last["total_rows"]) == (51, 62, 62)
+
+
+class TestResultLogging:
+    def test_table_is_formatted_off_the_calling_thread(self):
+        render_threads = []
+        original = QueryResultSet.render_table
+
+        def spy(self, max_rows=result_rendering.RESULT_PREVIEW_ROWS):
+            render_threads.append(threading.current_thread())
+            return original(self, max_rows)
+
+        QueryResultSet.render_table = spy
+        try:
+            setup_results_logging("DEBUG")
+            log_result_set("MATCH (n) RETURN n", QueryResultSet(["n"], [[1], [2]]))
+            stop_results_logging()
+        finally:
+            QueryResultSet.render_table = original
+
+        assert len(render_threads) == 1
+        assert render_threads[0] is not threading.current_thread()
+        assert not any(isinstance(h, logging.handlers.QueueHandler)
+                       for h in result_rendering.results_logger.handlers)
@@ -0,0 +1,48 @@
+"""
+Tests for startup import/init profiling and lazy subsystem initialization
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import startup_profiler
+import query_patterns
+
+
+class TestStartupProfiler:
+    """Test the import hook and phase timing"""
+
+    def test_records_new_imports_only(self):
+        sys.modules.pop("colorsys", None)
+        startup_profiler.install()
+        try:
+            import colorsys  # noqa: F401
+            import json  # noqa: F401  (already loaded, not recorded again)
+        finally:
+            startup_profiler.uninstall()
+        assert "colorsys" in startup_profiler.import_times
+        names = [entry["module"] for entry in startup_profiler.report()["imports"]]
+        assert names.count("colorsys") == 1
+        assert startup_profiler.report()["total_import_ms"] > 0
+
+    def test_phase_is_noop_when_disabled(self, monkeypatch):
+        monkeypatch.setattr(startup_profiler, "PROFILE_ENABLED", False)
+        before = len(startup_profiler.phase_times)
+        with startup_profiler.phase("noop"):
+            pass
+        assert len(startup_profiler.phase_times) == before
+
+        monkeypatch.setattr(startup_profiler, "PROFILE_ENABLED", True)
+        with startup_profiler.phase("timed"):
+            pass
+        assert startup_profiler.phase_times[-1]["phase"] == "timed"
+
+
+class TestLazyQueryMatcher:
+    def test_matcher_built_on_first_use(self, monkeypatch):
+        monkeypatch.setattr(query_patterns, "_enhanced_query_matcher", None)
+        matcher = query_patterns.enhanced_query_matcher
+        assert matcher is query_patterns.get_enhanced_query_matcher()
+        assert query_patterns._enhanced_query_matcher is matcher
@@ -0,0 +1,83 @@
+"""
+Tests for the Redis pub/sub WebSocket broadcast broker
+"""
+import asyncio
+import json
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ws_broker import RedisBroadcastBroker
+
+
+class FakeRedis:
+    """Stands in for redis.asyncio.Redis and loops published messages back to brokers"""
+
+    def __init__(self, *brokers):
+        self.brokers = brokers
+
+    async def publish(self, channel, data):
+        for broker in self.brokers:
+            await broker._on_message(channel, data)
+
+
+class TestRedisBroadcastBroker:
+    """Test local fallback and cross-worker relay ordering"""
+
+    @pytest.mark.asyncio
+    async def test_local_fallback_when_redis_unavailable(self):
+        broker = RedisBroadcastBroker()
+        received = []
+
+        async def handler(payload):
+            received.append(payload)
+
+        broker.register("dashboard", handler)
+        await broker.publish("dashboard", {"panel": "teams"})
+        assert received == [{"panel": "teams"}]
+        assert broker.stats()["local_fallbacks"] == 1
+
+    @pytest.mark.asyncio
+    async def test_messages_reach_every_worker_in_order(self):
+        workers = [RedisBroadcastBroker() for _ in range(3)]
+        received = {w.worker_id: [] for w in workers}
+        fake = FakeRedis(*workers)
+
+        for worker in workers:
+            async def handler(payload, worker_id=worker.worker_id):
+                received[worker_id].append(payload["n"])
+            worker.register("dashboard", handler)
+            worker._redis = fake
+            worker.connected = True
+            worker._outbox = asyncio.Queue()
+            worker._tasks = [asyncio.create_task(worker._publisher())]
+
+        for n in range(20):
+            await workers[n % 2].publish("dashboard", {"n": n})
+        await asyncio.sleep(0.05)
+
+        expected = sorted(received[workers[0].worker_id])
+        assert len(expected) == 20
+        for worker in workers:
+            # Every worker sees the same sequence, including the publisher itself
+            assert received[worker.worker_id] == received[workers[0].worker_id]
+            await worker.stop()
+
+    @pytest.mark.asyncio
+    async def test_malformed_message_is_dropped(self):
+        broker = RedisBroadcastBroker()
+        received = []
+
+        async def handler(payload):
+            received.append(payload)
+
+        broker.register("dashboard", handler)
+        await broker._on_message(broker.prefix + "dashboard", "not json")
+        await broker._on_message(
+            broker.prefix + "dashboard",
+            json.dumps({"origin": "w1", "seq": 1, "payload": {"ok": True}})
+        )
+        assert received == [{"ok": True}]
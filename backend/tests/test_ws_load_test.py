@@ -0,0 +1,94 @@
+"""
+Tests for the WebSocket load generator's turn tracking and reporting
+"""
+import asyncio
+import json
+import random
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+from ws_load_test import ThinkTime, TurnResult, parse_mix, percentiles, run_turn, summarize
+
+
+class ScriptedSocket:
+    """Replies to each sent chat message with frames produced by `script(request_id)`"""
+
+    def __init__(self, script):
+        self.script = script
+        self.inbox = asyncio.Queue()
+        self.sent = []
+
+    async def send(self, text):
+        frame = json.loads(text)
+        self.sent.append(frame)
+        if frame.get("type") == "message":
+            for reply in self.script(frame["id"]):
+                await self.inbox.put(json.dumps(reply))
+
+    async def recv(self):
+        return await self.inbox.get()
+
+
+class TestRunTurn:
+    @pytest.mark.asyncio
+    async def test_turn_ends_with_tagged_answer(self):
+        ws = ScriptedSocket(lambda rid: [
+            {"type": "ping"},
+            {"type": "info", "id": "someone-else"},
+            {"type": "query", "id": rid},
+            {"type": "server", "id": rid, "message": "done"},
+        ])
+        result = await run_turn(ws, 0, "llm", "q", timeout=5, error_grace=1)
+        assert result.outcome == "ok"
+        assert result.frames == {"query": 1, "server": 1}
+        assert result.ttff_ms is not None and result.total_ms >= result.ttff_ms
+        # Server pings are answered
+        assert {"type": "pong"} in ws.sent
+
+    @pytest.mark.asyncio
+    async def test_error_without_answer_ends_after_grace(self):
+        ws = ScriptedSocket(lambda rid: [{"type": "error", "id": rid, "message": "Database search failed"}])
+        result = await run_turn(ws, 0, "llm", "q", timeout=5, error_grace=0.05)
+        assert result.outcome == "error"
+        assert result.error == "Database search failed"
+
+    @pytest.mark.asyncio
+    async def test_silence_times_out(self):
+        ws = ScriptedSocket(lambda rid: [])
+        result = await run_turn(ws, 0, "chat", "q", timeout=0.05, error_grace=1)
+        assert result.outcome == "timeout"
+        assert result.ttff_ms is None
+
+
+class TestReporting:
+    def test_parse_mix_and_think_time(self):
+        assert parse_mix("pattern=0.7,llm=0.3") == {"pattern": 0.7, "llm": 0.3}
+        with pytest.raises(ValueError):
+            parse_mix("sql=1")
+        assert ThinkTime.parse("fixed:1500").seconds(random.Random(1)) == 1.5
+        assert ThinkTime.parse("none").seconds(random.Random(1)) == 0.0
+        with pytest.raises(ValueError):
+            ThinkTime.parse("exp")
+
+    def test_percentiles(self):
+        stats = percentiles([float(i) for i in range(1, 101)])
+        assert (stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["max_ms"]) == (51.0, 96.0, 100.0, 100.0)
+        assert percentiles([])["p95_ms"] is None
+
+    def test_summary_per_category(self):
+        turns = [
+            TurnResult(0, "pattern", "q", "ok", 0, ttff_ms=5, total_ms=100),
+            TurnResult(0, "pattern", "q", "ok", 0, ttff_ms=6, total_ms=200),
+            TurnResult(1, "llm", "q", "error", 0, ttff_ms=50, total_ms=300),
+            TurnResult(1, "llm", "q", "timeout", 0),
+        ]
+        summary = summarize(turns, elapsed=10)
+        assert summary["overall"]["completed"] == 2
+        assert summary["overall"]["throughput_per_s"] == 0.2
+        assert summary["overall"]["error_rate"] == 0.5
+        assert summary["categories"]["llm"]["outcomes"] == {"error": 1, "timeout": 1}
+        assert summary["categories"]["pattern"]["latency"]["p50_ms"] == 200
@@ -2,14 +2,20 @@
 """
 Comprehensive evaluation of top 3 models for complex organizational query translation.
 Designed to run inside Docker container for direct FalkorDB access.
+
+Cases run concurrently through tools/evaluation_engine.py. Model outputs are
+cached by (model, prompt hash) in --cache and finished cases are checkpointed
+in --checkpoint, so an interrupted or repeated run only does the missing work
+(--fresh ignores the checkpoint).
 """
 
+import argparse
 import asyncio
 import json
-import time
 import sys
 import os
 from datetime import datetime
+from functools import partial
 from typing import Dict, List, Any, Tuple, Optional
 import httpx
 from pathlib import Path
@@ -20,6 +26,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from main import load_prompt, clean_ai_generated_query, get_falkor_client
 from query_processor import process_query
 from query_validator import validate_query
+from few_shot_retrieval import FewShotSelector
+from evaluation_engine import Checkpoint, EvaluationEngine, OutputCache, cases_from, stats_dict, summarize_model
 
 # Models to evaluate - remaining models not tested in first run
 MODELS_TO_EVALUATE = [
@@ -199,6 +207,24 @@ EVALUATION_QUERIES = {
     ]
 }
 
+# Prompt used to generate queries: "simple" (generate_query_simple), "full"
+# (generate_query as sent by the API) or "retrieval" (top-k examples + relevant schema)
+PROMPT_MODE = "simple"
+_few_shot_selector = None
+
+
+def build_generation_prompt(query_text: str) -> str:
+    global _few_shot_selector
+    if PROMPT_MODE == "retrieval":
+        if _few_shot_selector is None:
+            _few_shot_selector = FewShotSelector(log_path=None)
+        prompt = _few_shot_selector.build_prompt(query_text)
+    elif PROMPT_MODE == "full":
+        prompt = load_prompt("generate_query", user_message=query_text)
+    else:
+        prompt = load_prompt("generate_query_simple", user_message=query_text)
+    return prompt + f"\n\nQuestion: \"{query_text}\"\nQuery:"
+
 async def call_model(prompt_text: str, model_name: str, timeout: int = 30) -> str:
     """Call a specific model with the prompt."""
     # Use localhost when running inside Docker container
@@ -223,31 +249,60 @@ async def call_model(prompt_text: str, model_name: str, timeout: int = 30) -> st
         data = resp.json()
         return data.get('response', '')
 
-async def execute_query(cypher_query: str) -> Tuple[bool, Optional[List], Optional[str], float]:
-    """Execute query and return (success, results, error, execution_time)."""
-    start_time = time.time()
-    
-    try:
-        def run_query():
-            falkor = get_falkor_client()
-            db = falkor.select_graph("agent_poc")
-            result = db.query(cypher_query)
-            return result
-        
-        result = await asyncio.wait_for(
-            asyncio.get_event_loop().run_in_executor(None, run_query),
-            timeout=15
-        )
-        
-        execution_time = time.time() - start_time
-        has_results = result and result.result_set and len(result.result_set) > 0
-        
-        return True, result.result_set if has_results else [], None, execution_time
-        
-    except asyncio.TimeoutError:
-        return False, None, "Query timeout (15s)", time.time() - start_time
-    except Exception as e:
-        return False, None, str(e), time.time() - start_time
+_graph = None
+
+
+def execute_readonly(cypher_query: str, timeout: float = 15.0) -> List:
+    """Run a generated query read-only; called from the engine's worker threads
+
+    The timeout is enforced by FalkorDB, so a slow query stops on the server
+    and frees its worker thread instead of running on after the engine gives up.
+    """
+    global _graph
+    if _graph is None:
+        _graph = get_falkor_client().select_graph("agent_poc")
+    result = _graph.ro_query(cypher_query, timeout=int(timeout * 1000))
+    return result.result_set or []
+
+
+def prepare_query(raw_response: str) -> Tuple[str, bool, List[str]]:
+    """Clean, post-process (common FalkorDB fixes) and validate a model response"""
+    cypher_query = process_query(clean_ai_generated_query(raw_response))
+    is_valid, validation_errors, _ = validate_query(cypher_query)
+    return cypher_query, is_valid, validation_errors
+
+
+def print_result(model: str, case, result: Dict[str, Any]):
+    if result.get("generation_failed"):
+        print(f"[{model}] {case.category}: {case.query[:60]} -> ERROR {result['error']}")
+        return
+    status = "OK" if result["execution_success"] else "FAIL"
+    source = "cached" if result.get("cached") else f"{result['generation_time']:.2f}s"
+    print(f"[{model}] {case.category}: {case.query[:60]} -> {status} ({source}, {result['result_count']} rows)")
+    if result.get("error"):
+        print(f"   Error: {result['error']}")
+
+
+def build_engine(cache_path: Optional[str] = None, checkpoint_path: Optional[str] = None,
+                 concurrency: int = 2, parallel_models: int = 1, db_concurrency: int = 4,
+                 generation_timeout: int = 30, execution_timeout: float = 15.0,
+                 execute: bool = True) -> EvaluationEngine:
+    return EvaluationEngine(
+        build_prompt=build_generation_prompt,
+        generate=lambda prompt, model: call_model(prompt, model, timeout=generation_timeout),
+        prepare=prepare_query,
+        score=evaluate_query_quality,
+        execute=partial(execute_readonly, timeout=execution_timeout) if execute else None,
+        cache=OutputCache(cache_path),
+        checkpoint=Checkpoint(checkpoint_path, run=PROMPT_MODE),
+        concurrency=concurrency,
+        parallel_models=parallel_models,
+        db_concurrency=db_concurrency,
+        generation_timeout=generation_timeout + 5,
+        execution_timeout=execution_timeout + 5,
+        on_result=print_result,
+    )
+
 
 def evaluate_query_quality(query: str, test_case: Dict) -> Dict[str, Any]:
     """Evaluate the quality of a generated query."""
@@ -289,150 +344,42 @@ def evaluate_query_quality(query: str, test_case: Dict) -> Dict[str, Any]:
     
     return scores
 
-async def evaluate_model(model_name: str, test_queries: Dict) -> Dict[str, Any]:
+def model_report(model_name: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    report = summarize_model(model_name, results)
+    report["timestamp"] = datetime.now().isoformat()
+    report["prompt_mode"] = PROMPT_MODE
+    return report
+
+
+async def evaluate_model(model_name: str, test_queries: Dict, engine: Optional[EvaluationEngine] = None) -> Dict[str, Any]:
     """Comprehensively evaluate a single model."""
-    print(f"\n{'='*80}")
-    print(f"Evaluating: {model_name}")
-    print(f"{'='*80}")
-    
-    results = {
-        "model": model_name,
-        "timestamp": datetime.now().isoformat(),
-        "categories": {},
-        "overall_metrics": {
-            "total_queries": 0,
-            "syntax_valid": 0,
-            "execution_success": 0,
-            "has_results": 0,
-            "pattern_matches": 0,
-            "avg_generation_time": 0,
-            "avg_execution_time": 0,
-            "category_scores": {}
-        }
-    }
-    
-    all_generation_times = []
-    all_execution_times = []
-    
-    for category, queries in test_queries.items():
-        print(f"\n[{category.upper()}]")
-        category_results = []
-        
-        for i, test_case in enumerate(queries, 1):
-            query_text = test_case["query"]
-            print(f"\n{i}. {query_text}")
-            
-            # Generate query
-            start_time = time.time()
-            try:
-                prompt = load_prompt("generate_query_simple", user_message=query_text)
-                prompt += f"\n\nQuestion: \"{query_text}\"\nQuery:"
-                
-                raw_response = await call_model(prompt, model_name)
-                cypher_query = clean_ai_generated_query(raw_response)
-                
-                # Apply post-processing to fix common FalkorDB issues
-                original_query = cypher_query
-                cypher_query = process_query(cypher_query)
-                
-                # Validate the query
-                is_valid, validation_errors, validation_warnings = validate_query(cypher_query)
-                
-                generation_time = time.time() - start_time
-                all_generation_times.append(generation_time)
-                
-                print(f"   Generated: {cypher_query[:100]}...")
-                print(f"   Generation time: {generation_time:.2f}s")
-                
-                if original_query != cypher_query:
-                    print(f"   Post-processing applied: Yes")
-                
-                if not is_valid:
-                    print(f"   Validation errors: {', '.join(validation_errors[:2])}")
-                
-                # Evaluate query quality
-                quality_scores = evaluate_query_quality(cypher_query, test_case)
-                
-                # Execute query
-                success, results_data, error, exec_time = await execute_query(cypher_query)
-                all_execution_times.append(exec_time)
-                
-                result_entry = {
-                    "query": query_text,
-                    "generated_cypher": cypher_query,
-                    "generation_time": generation_time,
-                    "execution_time": exec_time,
-                    "syntax_valid": quality_scores["syntax_valid"],
-                    "execution_success": success,
-                    "has_results": results_data is not None and len(results_data) > 0,
-                    "pattern_match": quality_scores["pattern_match"],
-                    "complexity_appropriate": quality_scores["complexity_appropriate"],
-                    "handles_ambiguity": quality_scores["handles_ambiguity"],
-                    "error": error,
-                    "result_count": len(results_data) if results_data else 0
-                }
-                
-                category_results.append(result_entry)
-                
-                # Update overall metrics
-                results["overall_metrics"]["total_queries"] += 1
-                if quality_scores["syntax_valid"]:
-                    results["overall_metrics"]["syntax_valid"] += 1
-                if success:
-                    results["overall_metrics"]["execution_success"] += 1
-                if result_entry["has_results"]:
-                    results["overall_metrics"]["has_results"] += 1
-                if quality_scores["pattern_match"]:
-                    results["overall_metrics"]["pattern_matches"] += 1
-                
-                # Print summary
-                status = "OK" if success else "FAIL"
-                print(f"   Execution: {status} ({exec_time:.2f}s)")
-                if results_data:
-                    print(f"   Results: {len(results_data)} rows")
-                if error:
-                    print(f"   Error: {error}")
-                
-            except Exception as e:
-                print(f"   ERROR: {str(e)}")
-                category_results.append({
-                    "query": query_text,
-                    "error": str(e),
-                    "generation_time": time.time() - start_time
-                })
-        
-        results["categories"][category] = category_results
-        
-        # Calculate category score
-        if category_results:
-            category_score = sum(
-                r.get("syntax_valid", False) and 
-                r.get("execution_success", False) and
-                r.get("pattern_match", False)
-                for r in category_results
-            ) / len(category_results)
-            results["overall_metrics"]["category_scores"][category] = category_score
-    
-    # Calculate averages
-    if all_generation_times:
-        results["overall_metrics"]["avg_generation_time"] = sum(all_generation_times) / len(all_generation_times)
-    if all_execution_times:
-        results["overall_metrics"]["avg_execution_time"] = sum(all_execution_times) / len(all_execution_times)
-    
-    # Calculate overall score
-    metrics = results["overall_metrics"]
-    results["overall_score"] = (
-        (metrics["syntax_valid"] / metrics["total_queries"]) * 0.25 +
-        (metrics["execution_success"] / metrics["total_queries"]) * 0.25 +
-        (metrics["pattern_matches"] / metrics["total_queries"]) * 0.25 +
-        (metrics["has_results"] / metrics["total_queries"]) * 0.25
-    ) * 100
-    
-    return results
+    engine = engine or build_engine()
+    results = await engine.run([model_name], cases_from(test_queries))
+    return model_report(model_name, results[model_name])
 
 async def main():
     """Run comprehensive evaluation of top 3 models."""
+    global PROMPT_MODE, MODELS_TO_EVALUATE
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompt", choices=["simple", "full", "retrieval"], default=PROMPT_MODE,
+                        help="Query generation prompt (compare 'full' and 'retrieval' for few-shot selection)")
+    parser.add_argument("--models", nargs="+", help="Models to evaluate (default: MODELS_TO_EVALUATE)")
+    parser.add_argument("--concurrency", type=int, default=2, help="Generation requests in flight per model")
+    parser.add_argument("--parallel-models", type=int, default=1, help="Models evaluated at the same time")
+    parser.add_argument("--db-concurrency", type=int, default=4, help="Generated queries executed at the same time")
+    parser.add_argument("--generation-timeout", type=int, default=30, help="Seconds per model request")
+    parser.add_argument("--cache", default="model_output_cache.jsonl", help="Model output cache ('' to disable)")
+    parser.add_argument("--checkpoint", default="comprehensive_eval_checkpoint.jsonl",
+                        help="Finished cases, for resuming ('' to disable)")
+    parser.add_argument("--fresh", action="store_true", help="Ignore and restart the checkpoint")
+    parser.add_argument("--no-execute", action="store_true", help="Generate and score only")
+    args = parser.parse_args()
+    PROMPT_MODE = args.prompt
+    if args.models:
+        MODELS_TO_EVALUATE = args.models
+    
     print("COMPREHENSIVE MODEL EVALUATION")
+    print(f"Prompt mode: {PROMPT_MODE}")
     print("Testing complex organizational query translation capabilities")
     print("=" * 80)
     
@@ -443,22 +390,28 @@ async def main():
         print("docker exec -it stunning-lamp-api-1 python tools/comprehensive_model_evaluation.py")
         print("\nContinuing with current configuration...")
     
-    all_results = []
+    if args.fresh and args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    engine = build_engine(
+        cache_path=args.cache or None, checkpoint_path=args.checkpoint or None,
+        concurrency=args.concurrency, parallel_models=args.parallel_models,
+        db_concurrency=args.db_concurrency, generation_timeout=args.generation_timeout,
+        execute=not args.no_execute,
+    )
+    cases = cases_from(EVALUATION_QUERIES)
+    print(f"{len(cases)} cases x {len(MODELS_TO_EVALUATE)} models, {args.concurrency} in flight per model")
+    
+    # Evaluate all models
+    results_by_model = await engine.run(MODELS_TO_EVALUATE, cases)
+    print(f"\nEngine: {stats_dict(engine.stats)}")
     
-    # Evaluate each model
+    all_results = []
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     for model in MODELS_TO_EVALUATE:
-        try:
-            result = await evaluate_model(model, EVALUATION_QUERIES)
-            all_results.append(result)
-            
-            # Save intermediate results
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            with open(f"comprehensive_eval_{model.replace(':', '_')}_{timestamp}.json", 'w') as f:
-                json.dump(result, f, indent=2)
-                
-        except Exception as e:
-            print(f"\nError evaluating {model}: {e}")
-            all_results.append({"model": model, "error": str(e)})
+        result = model_report(model, results_by_model[model])
+        all_results.append(result)
+        with open(f"comprehensive_eval_{model.replace(':', '_')}_{timestamp}.json", 'w') as f:
+            json.dump(result, f, indent=2)
     
     # Generate comparative report
     print("\n" + "="*80)
@@ -477,6 +430,7 @@ async def main():
         print(f"   Execution Success: {metrics['execution_success']}/{metrics['total_queries']} ({metrics['execution_success']/metrics['total_queries']*100:.0f}%)")
         print(f"   Pattern Matches: {metrics['pattern_matches']}/{metrics['total_queries']} ({metrics['pattern_matches']/metrics['total_queries']*100:.0f}%)")
         print(f"   Avg Generation Time: {metrics['avg_generation_time']:.2f}s")
+        print(f"   Avg Prompt Size: {metrics.get('avg_prompt_chars', 0):,.0f} chars")
         print(f"   Avg Execution Time: {metrics['avg_execution_time']:.2f}s")
     
     print("\n## Category Performance")
@@ -497,6 +451,7 @@ async def main():
     final_report = {
         "evaluation_date": datetime.now().isoformat(),
         "models_evaluated": MODELS_TO_EVALUATE,
+        "prompt_mode": PROMPT_MODE,
         "total_test_queries": sum(len(queries) for queries in EVALUATION_QUERIES.values()),
         "results": all_results,
         "rankings": [{"model": r["model"], "score": r["overall_score"]} for r in valid_results]
@@ -0,0 +1,289 @@
+"""
+Parallel, Resumable Model Evaluation Engine
+
+Runs evaluation cases for several models concurrently instead of one query
+after another:
+  * each model gets at most `concurrency` generation requests in flight, and
+    at most `parallel_models` models are evaluated at once (Ollama keeps a
+    limited number of models loaded);
+  * model outputs are cached on disk by (model, prompt hash), so a re-run, or
+    another run with the same prompt, skips generations it already has;
+  * every finished case is appended to a checkpoint file, and a resumed run
+    skips the (model, case) pairs recorded there;
+  * generated Cypher runs against FalkorDB in a thread pool, up to
+    `db_concurrency` queries at once, read-only.
+
+Generation, cleanup, scoring and execution are passed in, so the engine is
+shared by the evaluation scripts in this directory.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_singleflight import prompt_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EvalCase:
+    category: str
+    query: str
+    expected_pattern: str = ""
+    complexity: int = 1
+    ambiguous: bool = False
+
+    @property
+    def case_id(self) -> str:
+        return f"{self.category}/{hashlib.sha256(self.query.encode()).hexdigest()[:12]}"
+
+    def as_test_case(self) -> Dict[str, Any]:
+        return {"query": self.query, "expected_pattern": self.expected_pattern,
+                "complexity": self.complexity, "ambiguous": self.ambiguous}
+
+
+def cases_from(queries_by_category: Dict[str, List[Dict[str, Any]]]) -> List[EvalCase]:
+    """Cases from the {category: [{"query", "expected_pattern", ...}]} layout of the evaluation scripts"""
+    return [
+        EvalCase(category, case["query"], case.get("expected_pattern", ""),
+                 case.get("complexity", 1), case.get("ambiguous", False))
+        for category, cases in queries_by_category.items() for case in cases
+    ]
+
+
+class JsonlStore:
+    """Append-only JSON lines file, flushed after every record so an interrupted run keeps its work"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+
+    def load(self) -> List[Dict[str, Any]]:
+        if not self.path or not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A run killed mid-write leaves a partial last line
+                    logger.warning(f"Skipping unreadable line in {self.path}")
+        return records
+
+    def append(self, record: Dict[str, Any]):
+        if not self.path:
+            return
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+
+
+class OutputCache:
+    """Raw model responses keyed by (model, sha256 of the prompt)"""
+
+    def __init__(self, path: Optional[str]):
+        self.store = JsonlStore(path)
+        self.entries: Dict[Tuple[str, str], Dict[str, Any]] = {
+            (record["model"], record["prompt_sha256"]): record for record in self.store.load()
+        }
+
+    def get(self, model: str, prompt: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(prompt_key(model, prompt))
+
+    def put(self, model: str, prompt: str, response: str, generation_time: float):
+        key = prompt_key(model, prompt)
+        record = {"model": model, "prompt_sha256": key[1], "response": response, "generation_time": generation_time}
+        self.entries[key] = record
+        self.store.append(record)
+
+
+class Checkpoint:
+    """Finished case results per (run, model, case); `run` separates e.g. prompt modes"""
+
+    def __init__(self, path: Optional[str], run: str = ""):
+        self.store = JsonlStore(path)
+        self.run = run
+        self.done: Dict[Tuple[str, str], Dict[str, Any]] = {
+            (record["model"], record["case_id"]): record["result"]
+            for record in self.store.load() if record.get("run", "") == run
+        }
+
+    def get(self, model: str, case: EvalCase) -> Optional[Dict[str, Any]]:
+        return self.done.get((model, case.case_id))
+
+    def record(self, model: str, case: EvalCase, result: Dict[str, Any]):
+        self.done[(model, case.case_id)] = result
+        self.store.append({"run": self.run, "model": model, "case_id": case.case_id, "result": result})
+
+
+@dataclass
+class EngineStats:
+    generated: int = 0
+    cached: int = 0
+    resumed: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+
+
+@dataclass
+class EvaluationEngine:
+    build_prompt: Callable[[str], str]
+    generate: Callable[[str, str], Awaitable[str]]  # (prompt, model) -> raw response
+    prepare: Callable[[str], Tuple[str, bool, List[str]]]  # raw -> (cypher, valid, validation errors)
+    score: Callable[[str, Dict[str, Any]], Dict[str, bool]]  # (cypher, test case) -> quality flags
+    execute: Optional[Callable[[str], List[Any]]] = None  # blocking, raises on failure
+    cache: OutputCache = field(default_factory=lambda: OutputCache(None))
+    checkpoint: Checkpoint = field(default_factory=lambda: Checkpoint(None))
+    concurrency: int = 2
+    parallel_models: int = 1
+    db_concurrency: int = 4
+    execution_timeout: float = 15.0
+    generation_timeout: float = 120.0
+    on_result: Optional[Callable[[str, EvalCase, Dict[str, Any]], None]] = None
+    stats: EngineStats = field(default_factory=EngineStats)
+
+    def __post_init__(self):
+        self._db_slots = asyncio.Semaphore(self.db_concurrency)
+
+    async def run(self, models: Iterable[str], cases: List[EvalCase]) -> Dict[str, List[Dict[str, Any]]]:
+        """Results per model, in case order"""
+        started = time.perf_counter()
+        model_slots = asyncio.Semaphore(self.parallel_models)
+
+        async def run_model(model):
+            async with model_slots:
+                return model, await self.run_model(model, cases)
+
+        results = dict(await asyncio.gather(*(run_model(model) for model in models)))
+        self.stats.elapsed = time.perf_counter() - started
+        return results
+
+    async def run_model(self, model: str, cases: List[EvalCase]) -> List[Dict[str, Any]]:
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def run_case(case):
+            resumed = self.checkpoint.get(model, case)
+            if resumed is not None:
+                self.stats.resumed += 1
+                return resumed
+            # Only generation holds the model's slot; execution is bounded by db_concurrency alone
+            async with slots:
+                result = await self.generate_case(model, case)
+            if not result.get("generation_failed"):
+                result.update(await self.execute_cypher(result["generated_cypher"]))
+                self.checkpoint.record(model, case, result)
+            if self.on_result:
+                self.on_result(model, case, result)
+            return result
+
+        return await asyncio.gather(*(run_case(case) for case in cases))
+
+    async def evaluate_case(self, model: str, case: EvalCase) -> Dict[str, Any]:
+        entry = await self.generate_case(model, case)
+        if not entry.get("generation_failed"):
+            entry.update(await self.execute_cypher(entry["generated_cypher"]))
+        return entry
+
+    async def generate_case(self, model: str, case: EvalCase) -> Dict[str, Any]:
+        """Generate, clean up and score one case, without executing the query"""
+        prompt = self.build_prompt(case.query)
+        entry = {"category": case.category, "case_id": case.case_id, "query": case.query,
+                 "prompt_chars": len(prompt)}
+        try:
+            cached = self.cache.get(model, prompt)
+            if cached is not None:
+                self.stats.cached += 1
+                response, generation_time = cached["response"], cached["generation_time"]
+                entry["cached"] = True
+            else:
+                started = time.perf_counter()
+                response = await asyncio.wait_for(self.generate(prompt, model), self.generation_timeout)
+                generation_time = time.perf_counter() - started
+                self.stats.generated += 1
+                self.cache.put(model, prompt, response, generation_time)
+        except Exception as e:
+            # Failed generations are not cached or checkpointed as successes; a re-run retries them
+            self.stats.errors += 1
+            return {**entry, "error": str(e) or type(e).__name__, "generation_failed": True}
+
+        cypher, is_valid, validation_errors = self.prepare(response)
+        quality = self.score(cypher, case.as_test_case())
+        entry.update({
+            "generated_cypher": cypher,
+            "generation_time": generation_time,
+            "validation_errors": validation_errors if not is_valid else [],
+            **quality,
+        })
+        return entry
+
+    async def execute_cypher(self, cypher: str) -> Dict[str, Any]:
+        if self.execute is None:
+            return {"execution_success": None, "has_results": None, "result_count": 0,
+                    "execution_time": 0.0, "error": None}
+        async with self._db_slots:
+            started = time.perf_counter()
+            query = asyncio.ensure_future(asyncio.to_thread(self.execute, cypher))
+            try:
+                rows = await asyncio.wait_for(asyncio.shield(query), self.execution_timeout)
+                error = None
+            except asyncio.TimeoutError:
+                rows, error = None, f"Query timeout ({self.execution_timeout:g}s)"
+            except Exception as e:
+                rows, error = None, str(e)
+            elapsed = time.perf_counter() - started
+            if not query.done():
+                # The worker thread can't be interrupted; keep the slot until it returns
+                # so timed-out queries never exceed db_concurrency
+                await asyncio.gather(query, return_exceptions=True)
+        return {"execution_success": error is None, "has_results": bool(rows), "result_count": len(rows or []),
+                "execution_time": elapsed, "error": error}
+
+
+def summarize_model(model: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-model report in the layout of comprehensive_eval_*.json"""
+    categories: Dict[str, List[Dict[str, Any]]] = {}
+    for result in results:
+        categories.setdefault(result["category"], []).append(result)
+
+    scored = [r for r in results if not r.get("generation_failed")]
+    total = len(results)
+    metrics = {
+        "total_queries": total,
+        "syntax_valid": sum(1 for r in scored if r.get("syntax_valid")),
+        "execution_success": sum(1 for r in scored if r.get("execution_success")),
+        "has_results": sum(1 for r in scored if r.get("has_results")),
+        "pattern_matches": sum(1 for r in scored if r.get("pattern_match")),
+        "generation_errors": total - len(scored),
+        "cached_generations": sum(1 for r in scored if r.get("cached")),
+        "avg_generation_time": _mean(r.get("generation_time") for r in scored),
+        "avg_execution_time": _mean(r.get("execution_time") for r in scored),
+        "avg_prompt_chars": _mean(r.get("prompt_chars") for r in results),
+        "category_scores": {
+            category: sum(bool(r.get("syntax_valid") and r.get("execution_success") and r.get("pattern_match"))
+                          for r in rows) / len(rows)
+            for category, rows in categories.items()
+        },
+    }
+    overall = 0.0
+    if total:
+        overall = sum(metrics[key] / total for key in
+                      ("syntax_valid", "execution_success", "pattern_matches", "has_results")) * 25
+    return {"model": model, "categories": categories, "overall_metrics": metrics, "overall_score": overall}
+
+
+def _mean(values) -> float:
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else 0.0
+
+
+def stats_dict(stats: EngineStats) -> Dict[str, Any]:
+    return {key: round(value, 2) if isinstance(value, float) else value for key, value in asdict(stats).items()}
@@ -0,0 +1,424 @@
+"""
+Graph Query Scale Benchmark
+
+Seeds a scratch graph at several scale factors and runs a query catalog
+against each one:
+  * dashboard   every query the dashboard API runs (api.dashboard.QUERIES)
+  * pattern     every QueryPattern template in query_patterns, bound to real names
+  * multihop    REPORTS_TO chains, variable-length paths and shortest paths
+
+Scale 1 is the regular seed size (500 people, 20 projects); people and
+projects grow with the scale factor while teams, groups, offices, policies
+and skills stay fixed, the way an organisation grows. Seeding uses batched
+UNWIND writes with temporary id indexes, which are dropped again so queries
+run against the same indexes as the real graph.
+
+For every scale point it records client latency percentiles, the server-side
+run time and FalkorDB memory. Queries whose median grows faster than the
+data (growth exponent above --superlinear between the smallest and largest
+scale) are flagged. Results are saved as JSON.
+
+Usage:
+    python tools/graph_query_benchmark.py [--scales 1,2,5,10] [--runs 20] [--only multihop]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PEOPLE_PER_SCALE = 500
+PROJECTS_PER_SCALE = 20
+PROTECTED_GRAPHS = {"agent_poc"}
+
+# (data key, relationship type, source label, source id field, target label, target id field)
+RELATIONSHIPS = [
+    ("person_team_memberships", "MEMBER_OF", "Person", "person_id", "Team", "team_id"),
+    ("person_group_memberships", "MEMBER_OF", "Person", "person_id", "Group", "group_id"),
+    ("team_policy_responsibilities", "RESPONSIBLE_FOR", "Team", "team_id", "Policy", "policy_id"),
+    ("group_policy_responsibilities", "RESPONSIBLE_FOR", "Group", "group_id", "Policy", "policy_id"),
+    ("person_skills", "HAS_SKILL", "Person", "person_id", "Skill", "skill_id"),
+    ("person_project_allocations", "ALLOCATED_TO", "Person", "person_id", "Project", "project_id"),
+    ("project_skill_requirements", "REQUIRES_SKILL", "Project", "project_id", "Skill", "skill_id"),
+    ("team_project_delivery", "DELIVERS", "Team", "team_id", "Project", "project_id"),
+    ("person_mentorships", "MENTORED_BY", "Person", "mentee_id", "Person", "mentor_id"),
+    ("person_office_assignments", "WORKS_AT", "Person", "person_id", "Office", "office_id"),
+    ("person_reports_to", "REPORTS_TO", "Person", "person_id", "Person", "manager_id"),
+]
+
+MULTIHOP_QUERIES = {
+    "reports_chain_up": "MATCH (p:Person {id: $person_id})-[:REPORTS_TO*1..6]->(m:Person) RETURN m.name, m.role",
+    "reports_subtree": "MATCH (p:Person)-[:REPORTS_TO*1..3]->(m:Person {id: $manager_id}) RETURN count(DISTINCT p)",
+    "reporting_depth": "MATCH (p:Person) OPTIONAL MATCH path = (p)-[:REPORTS_TO*]->(:Person) "
+                       "WITH p, max(length(path)) AS depth RETURN depth, count(p) ORDER BY depth",
+    "shortest_path_to_manager": "MATCH (a:Person {id: $person_id}), (b:Person {id: $manager_id}) "
+                                "RETURN length(shortestPath((a)-[:REPORTS_TO*]->(b)))",
+    "two_hop_network": "MATCH (p1:Person {id: $person_id})-[*2]-(p2:Person) WHERE p1 <> p2 "
+                       "RETURN count(DISTINCT p2)",
+    "three_hop_network": "MATCH (p1:Person {id: $person_id})-[*3]-(p2:Person) WHERE p1 <> p2 "
+                         "RETURN count(DISTINCT p2)",
+    "teammate_skills": "MATCH (p:Person {id: $person_id})-[:MEMBER_OF]->(t:Team)<-[:MEMBER_OF]-(c:Person)"
+                       "-[:HAS_SKILL]->(s:Skill) RETURN s.name, count(DISTINCT c) AS people ORDER BY people DESC LIMIT 10",
+    "project_skill_match": "MATCH (proj:Project)-[:REQUIRES_SKILL]->(s:Skill)<-[:HAS_SKILL]-(p:Person) "
+                           "WHERE p.current_utilization < 90 WITH proj, p, count(DISTINCT s) AS matching "
+                           "RETURN proj.name, collect(p.name)[0..5] ORDER BY proj.name",
+    "cross_department_groups": "MATCH (p1:Person)-[:MEMBER_OF]->(g:Group)<-[:MEMBER_OF]-(p2:Person) "
+                               "WHERE p1.department <> p2.department "
+                               "RETURN p1.department, p2.department, count(*) AS pairs ORDER BY pairs DESC LIMIT 20",
+}
+
+
+@dataclass
+class EdgeSet:
+    rel_type: str
+    source: str
+    target: str
+    rows: List[Dict[str, Any]]  # {"src": id, "dst": id, "props": {...}}
+
+
+@dataclass
+class Dataset:
+    scale: float
+    nodes: Dict[str, List[Dict[str, Any]]]
+    edges: List[EdgeSet]
+
+    @property
+    def node_count(self) -> int:
+        return sum(len(rows) for rows in self.nodes.values())
+
+    @property
+    def edge_count(self) -> int:
+        return sum(len(edge_set.rows) for edge_set in self.edges)
+
+
+@dataclass
+class CatalogQuery:
+    name: str
+    group: str
+    query: str
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def storable(props: Dict[str, Any]) -> Dict[str, Any]:
+    """Properties FalkorDB can store: scalars and lists of scalars, no nulls"""
+    scalar = (str, int, float, bool)
+    return {
+        key: value for key, value in props.items()
+        if isinstance(value, scalar) or (isinstance(value, list) and all(isinstance(v, scalar) for v in value))
+    }
+
+
+def generate_dataset(scale: float, seed: int = 42) -> Dataset:
+    """Seed data with people and projects multiplied by `scale`"""
+    from scripts.data_generators.entities import (
+        GroupsGenerator, OfficesGenerator, PeopleGenerator, PoliciesGenerator,
+        ProjectsGenerator, SkillsGenerator, TeamsGenerator
+    )
+    from scripts.data_generators.relationships import (
+        GroupPolicyResponsibilityGenerator, PersonGroupMembershipGenerator, PersonMentorshipGenerator,
+        PersonOfficeAssignmentGenerator, PersonProjectAllocationGenerator, PersonSkillGenerator,
+        PersonTeamMembershipGenerator, ProjectSkillRequirementGenerator, TeamPolicyResponsibilityGenerator,
+        TeamProjectDeliveryGenerator
+    )
+
+    people = PeopleGenerator(count=max(1, int(PEOPLE_PER_SCALE * scale)), seed=seed).generate()
+    teams = TeamsGenerator(seed=seed).generate()
+    groups = GroupsGenerator(seed=seed).generate()
+    offices = OfficesGenerator(seed=seed).generate()
+    policies = PoliciesGenerator(seed=seed).generate()
+    skills = SkillsGenerator(seed=seed).generate()
+    projects = ProjectsGenerator(count=max(1, int(PROJECTS_PER_SCALE * scale)), seed=seed).generate()
+
+    relationships = {
+        "person_team_memberships": PersonTeamMembershipGenerator(people, teams).generate(),
+        "person_group_memberships": PersonGroupMembershipGenerator(people, groups).generate(),
+        "team_policy_responsibilities": TeamPolicyResponsibilityGenerator(teams, policies).generate(),
+        "group_policy_responsibilities": GroupPolicyResponsibilityGenerator(groups, policies).generate(),
+        "person_skills": PersonSkillGenerator(people, skills).generate(),
+        "person_project_allocations": PersonProjectAllocationGenerator(people, projects).generate(),
+        "project_skill_requirements": ProjectSkillRequirementGenerator(projects, skills).generate(),
+        "team_project_delivery": TeamProjectDeliveryGenerator(teams, projects).generate(),
+        "person_mentorships": PersonMentorshipGenerator(people).generate(),
+        "person_office_assignments": PersonOfficeAssignmentGenerator(people, offices).generate(),
+        "person_reports_to": [{"person_id": p["id"], "manager_id": p["manager_id"]}
+                              for p in people if p.get("manager_id")],
+    }
+
+    nodes = {
+        "Person": people, "Team": teams, "Group": groups, "Office": offices,
+        "Policy": policies, "Skill": skills, "Project": projects,
+    }
+    # Edges to ids the generators never create (e.g. office assignments to 'office_sf')
+    # are dropped, matching the seeder whose MATCH finds nothing for them
+    ids = {label: {row["id"] for row in rows} for label, rows in nodes.items()}
+    edges = []
+    for key, rel_type, source, source_field, target, target_field in RELATIONSHIPS:
+        rows = [
+            {"src": row[source_field], "dst": row[target_field],
+             "props": storable({k: v for k, v in row.items() if k not in (source_field, target_field)})}
+            for row in relationships[key]
+            if row[source_field] in ids[source] and row[target_field] in ids[target]
+        ]
+        edges.append(EdgeSet(rel_type, source, target, rows))
+
+    return Dataset(scale, {label: [storable(row) for row in rows] for label, rows in nodes.items()}, edges)
+
+
+def _batches(rows: List[Any], size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def seed_graph(graph, dataset: Dataset, batch_size: int = 1000) -> float:
+    """Replace `graph` with `dataset`; returns seconds taken"""
+    from scripts.data_generators.database.indexes import IndexCreator
+
+    started = time.perf_counter()
+    try:
+        graph.delete()
+    except Exception:
+        pass  # Graph does not exist yet
+
+    # Same indexes as the seeded application graph, plus id lookups for loading edges
+    IndexCreator(SimpleNamespace(db=graph)).create_all_indexes()
+    for label in dataset.nodes:
+        graph.query(f"CREATE INDEX ON :{label}(id)")
+
+    for label, rows in dataset.nodes.items():
+        for batch in _batches(rows, batch_size):
+            graph.query(f"UNWIND $rows AS row CREATE (n:{label}) SET n = row", {"rows": batch})
+    for edge_set in dataset.edges:
+        for batch in _batches(edge_set.rows, batch_size):
+            graph.query(
+                f"UNWIND $rows AS row "
+                f"MATCH (a:{edge_set.source} {{id: row.src}}), (b:{edge_set.target} {{id: row.dst}}) "
+                f"CREATE (a)-[r:{edge_set.rel_type}]->(b) SET r = row.props",
+                {"rows": batch},
+            )
+
+    for label in dataset.nodes:
+        graph.query(f"DROP INDEX ON :{label}(id)")
+    return time.perf_counter() - started
+
+
+def sample_values(dataset: Dataset) -> Dict[str, Any]:
+    """Real names and ids from the dataset for parameterised queries"""
+    people = dataset.nodes["Person"]
+    managers = Counter(p.get("manager_id") for p in people if p.get("manager_id"))
+    manager_id = managers.most_common(1)[0][0] if managers else people[0]["id"]
+    reports = [p for p in people if p.get("manager_id") == manager_id] or people
+    person = reports[0]
+    team_ids = {row["dst"] for edge_set in dataset.edges if edge_set.rel_type == "MEMBER_OF"
+                and edge_set.target == "Team" for row in edge_set.rows}
+    team = next((t for t in dataset.nodes["Team"] if t["id"] in team_ids), dataset.nodes["Team"][0])
+    return {
+        "person_id": person["id"],
+        "manager_id": manager_id,
+        "name": person["name"],
+        "person_name": person["name"],
+        "team_name": team["name"],
+        "team_name_upper": team["name"].title(),
+        "policy": dataset.nodes["Policy"][0]["category"],
+        "level": "Senior",
+        "role": "Engineer",
+        "term": "engineers",
+        "role_term": "engineers",
+        "dept": person["department"],
+    }
+
+
+def query_parameters(query: str) -> List[str]:
+    return sorted(set(re.findall(r"\$([A-Za-z_]\w*)", query)))
+
+
+def build_catalog(dataset: Dataset, groups: Optional[List[str]] = None) -> List[CatalogQuery]:
+    """Dashboard, QueryPattern and multi-hop queries with parameters bound from `dataset`"""
+    from api.dashboard import QUERIES as DASHBOARD_QUERIES
+    from query_patterns import EnhancedQueryPatternMatcher
+
+    values = sample_values(dataset)
+    catalog = [CatalogQuery(key.replace("dashboard:", ""), "dashboard", query.strip())
+               for key, query in DASHBOARD_QUERIES.items()]
+
+    matcher = EnhancedQueryPatternMatcher()
+    for pattern in matcher.patterns:
+        params = {name: values[name] for name in pattern.parameter_extractors}
+        if pattern.semantic_aware:
+            # Semantic templates are placeholders; the matcher builds the Cypher itself
+            query = matcher._build_semantic_query(pattern, params)
+            params = {}
+        else:
+            query = pattern.cypher_template
+            params = {name: values[name] for name in query_parameters(query)}
+        catalog.append(CatalogQuery(pattern.name, "pattern", query, params))
+
+    for name, query in MULTIHOP_QUERIES.items():
+        catalog.append(CatalogQuery(name, "multihop", query, {p: values[p] for p in query_parameters(query)}))
+
+    return [entry for entry in catalog if not groups or entry.group in groups]
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(ordered[-1], 3)}
+
+
+def run_query(graph, entry: CatalogQuery, runs: int, warmup: int, timeout_ms: int) -> Dict[str, Any]:
+    """Latency percentiles of one catalog query; errors are reported, not raised"""
+    client_ms, server_ms = [], []
+    rows = None
+    try:
+        for i in range(warmup + runs):
+            started = time.perf_counter()
+            result = graph.ro_query(entry.query, entry.params or None, timeout=timeout_ms)
+            elapsed = (time.perf_counter() - started) * 1000
+            if i >= warmup:
+                client_ms.append(elapsed)
+                server_ms.append(result.run_time_ms)
+            rows = len(result.result_set)
+    except Exception as e:
+        return {"group": entry.group, "error": str(e).splitlines()[0][:200]}
+    server = sorted(server_ms)
+    return {"group": entry.group, "rows": rows, **percentiles(client_ms),
+            "server_p50_ms": round(server[len(server) // 2], 3)}
+
+
+def memory_usage(client, graph_name: str) -> Dict[str, Any]:
+    """FalkorDB server memory, and the graph's own usage where GRAPH.MEMORY is supported"""
+    usage = {}
+    try:
+        usage["used_memory_mb"] = round(client.connection.info("memory")["used_memory"] / 1024 / 1024, 2)
+    except Exception as e:
+        usage["used_memory_error"] = str(e)
+    try:
+        reply = client.connection.execute_command("GRAPH.MEMORY", "USAGE", graph_name)
+        pairs = dict(zip(reply[::2], reply[1::2]))
+        usage["graph_memory"] = {(k.decode() if isinstance(k, bytes) else k): v for k, v in pairs.items()}
+    except Exception:
+        pass  # Older FalkorDB versions have no GRAPH.MEMORY
+    return usage
+
+
+def growth(scale_points: List[Dict[str, Any]], superlinear: float) -> Dict[str, Dict[str, Any]]:
+    """Per-query growth exponent of the median between the smallest and largest scale
+
+    1.0 means latency grows in step with the data; above `superlinear` the
+    query is flagged.
+    """
+    if len(scale_points) < 2:
+        return {}
+    first, last = scale_points[0], scale_points[-1]
+    ratio = last["scale"] / first["scale"]
+    report = {}
+    for name, small in first["queries"].items():
+        large = last["queries"].get(name, {})
+        if not small.get("p50_ms") or not large.get("p50_ms"):
+            continue
+        exponent = math.log(large["p50_ms"] / small["p50_ms"]) / math.log(ratio)
+        report[name] = {"group": small["group"], "exponent": round(exponent, 2),
+                        "superlinear": exponent > superlinear}
+    return report
+
+
+def print_scale_point(point: Dict[str, Any]):
+    memory = point["memory"].get("used_memory_mb")
+    print(f"\n📊 Scale {point['scale']:g}: {point['nodes']:,} nodes, {point['edges']:,} edges, "
+          f"seeded in {point['seed_s']:.1f}s, server memory {memory} MB")
+    print(f"   {'query':<32} {'group':<10} {'rows':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'server':>9}")
+    for name, stats in point["queries"].items():
+        if "error" in stats:
+            print(f"   {name:<32} {stats['group']:<10} ERROR {stats['error']}")
+            continue
+        print(f"   {name:<32} {stats['group']:<10} {stats['rows']:>6} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['server_p50_ms']:>9.2f}")
+
+
+def run(args) -> Dict[str, Any]:
+    import falkordb
+
+    client = falkordb.FalkorDB(host=args.host, port=args.port)
+    graph = client.select_graph(args.graph)
+    groups = args.only.split(",") if args.only else None
+
+    results = {"timestamp": datetime.now().isoformat(), "graph": args.graph, "runs": args.runs, "scales": []}
+    try:
+        for scale in args.scales:
+            random.seed(args.seed)
+            print(f"🌱 Generating and seeding scale {scale:g}...")
+            dataset = generate_dataset(scale, seed=args.seed)
+            seed_s = seed_graph(graph, dataset)
+            point = {
+                "scale": scale, "people": len(dataset.nodes["Person"]),
+                "nodes": dataset.node_count, "edges": dataset.edge_count,
+                "seed_s": round(seed_s, 2), "memory": memory_usage(client, args.graph), "queries": {},
+            }
+            for entry in build_catalog(dataset, groups):
+                point["queries"][entry.name] = run_query(graph, entry, args.runs, args.warmup, args.query_timeout)
+            print_scale_point(point)
+            results["scales"].append(point)
+    finally:
+        if not args.keep:
+            try:
+                graph.delete()
+            except Exception:
+                pass
+
+    results["growth"] = growth(results["scales"], args.superlinear)
+    flagged = {name: g for name, g in results["growth"].items() if g["superlinear"]}
+    if results["growth"]:
+        print(f"\n📈 Growth exponent of p50 from scale {args.scales[0]:g} to {args.scales[-1]:g} "
+              f"(1.0 = linear in data size)")
+        for name, g in sorted(results["growth"].items(), key=lambda item: -item[1]["exponent"]):
+            marker = "  ⚠️ super-linear" if g["superlinear"] else ""
+            print(f"   {name:<32} {g['group']:<10} {g['exponent']:>6.2f}{marker}")
+        print(f"\n{len(flagged)} of {len(results['growth'])} queries scale super-linearly")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1,2,5,10",
+                        type=lambda value: sorted(float(s) for s in value.split(",")),
+                        help="Comma-separated scale factors (1 = 500 people)")
+    parser.add_argument("--runs", type=int, default=20, help="Timed runs per query")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--only", help="Comma-separated catalog groups: dashboard, pattern, multihop")
+    parser.add_argument("--host", default=os.getenv("FALKOR_HOST", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("FALKOR_PORT", 6379)))
+    parser.add_argument("--graph", default="benchmark_scale", help="Scratch graph, replaced at every scale")
+    parser.add_argument("--keep", action="store_true", help="Keep the last seeded graph")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--query-timeout", type=int, default=30000, help="Per-query timeout in ms")
+    parser.add_argument("--superlinear", type=float, default=1.2, help="Growth exponent that flags a query")
+    parser.add_argument("--output", default=f"graph_query_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    args = parser.parse_args()
+
+    if args.graph in PROTECTED_GRAPHS:
+        parser.error(f"refusing to overwrite the application graph '{args.graph}'")
+
+    results = run(args)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
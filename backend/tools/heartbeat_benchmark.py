@@ -0,0 +1,131 @@
+"""
+Heartbeat Scheduler Benchmark
+
+Measures scheduler overhead against connection count for the shared timer-wheel
+heartbeat (heartbeat_wheel.HeartbeatWheel) versus the previous design of one
+sleeping asyncio task per connection. No server or network is involved; sends
+are counted in memory.
+
+Usage:
+    python tools/heartbeat_benchmark.py [--counts 1000,10000,50000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from heartbeat_wheel import HeartbeatWheel
+
+
+class FakeConnection:
+    __slots__ = ("sent",)
+
+    def __init__(self):
+        self.sent = 0
+
+
+def benchmark_wheel(count: int, interval: float = 30.0, tick: float = 1.0) -> Dict:
+    """Register `count` connections and run one full wheel rotation"""
+    connections = [FakeConnection() for _ in range(count)]
+
+    def send(ws, _text):
+        ws.sent += 1
+
+    tracemalloc.start()
+    wheel = HeartbeatWheel(send=send, on_dead=lambda ws: None, interval=interval, tick=tick)
+    # Spread registrations over the wheel as real connects would be
+    per_slot = max(1, count // wheel.slot_count)
+    for i, ws in enumerate(connections):
+        if i and i % per_slot == 0:
+            wheel.advance()
+        wheel.register(ws)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tick_times: List[float] = []
+    for _ in range(wheel.slot_count):
+        start = time.perf_counter()
+        wheel.advance()
+        tick_times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "connections": count,
+        "scheduler_tasks": 1,
+        "memory_kb": round(peak / 1024, 1),
+        "avg_tick_ms": round(sum(tick_times) / len(tick_times), 3),
+        "max_tick_ms": round(max(tick_times), 3),
+        "rotation_cpu_ms": round(sum(tick_times), 3),
+        "pings_sent": sum(ws.sent for ws in connections),
+    }
+
+
+async def benchmark_task_per_connection(count: int, interval: float = 0.5) -> Dict:
+    """Previous design: one task per connection sleeping `interval` then sending a ping"""
+    connections = [FakeConnection() for _ in range(count)]
+
+    async def heartbeat_loop(ws):
+        while True:
+            await asyncio.sleep(interval)
+            json.dumps({"type": "ping", "timestamp": datetime.now().isoformat()})
+            ws.sent += 1
+
+    tracemalloc.start()
+    tasks = [asyncio.create_task(heartbeat_loop(ws)) for ws in connections]
+    await asyncio.sleep(0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Time one round of wakeups (event loop CPU while all timers fire)
+    start_cpu = time.process_time()
+    await asyncio.sleep(interval * 1.5)
+    rotation_cpu_ms = (time.process_time() - start_cpu) * 1000
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {
+        "connections": count,
+        "scheduler_tasks": count,
+        "memory_kb": round(peak / 1024, 1),
+        "rotation_cpu_ms": round(rotation_cpu_ms, 3),
+        "pings_sent": sum(ws.sent for ws in connections),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", default="1000,10000,50000",
+                        help="Comma-separated connection counts to measure")
+    parser.add_argument("--output", default="heartbeat_benchmark_results.json")
+    args = parser.parse_args()
+    counts = [int(c) for c in args.counts.split(",")]
+
+    results = {"timer_wheel": [], "task_per_connection": []}
+    print(f"{'connections':>12} | {'design':<20} | {'memory KB':>10} | {'CPU/rotation ms':>16} | {'max tick ms':>11}")
+    print("-" * 82)
+    for count in counts:
+        wheel = benchmark_wheel(count)
+        tasks = await benchmark_task_per_connection(count)
+        results["timer_wheel"].append(wheel)
+        results["task_per_connection"].append(tasks)
+        print(f"{count:>12} | {'timer wheel':<20} | {wheel['memory_kb']:>10} | "
+              f"{wheel['rotation_cpu_ms']:>16} | {wheel['max_tick_ms']:>11}")
+        print(f"{count:>12} | {'task per connection':<20} | {tasks['memory_kb']:>10} | "
+              f"{tasks['rotation_cpu_ms']:>16} | {'-':>11}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,358 @@
+"""
+Ollama Stand-in Server
+
+A CPU-only stand-in for the subset of the Ollama API the backend uses, so the
+chat pipeline and the benchmarks can run end to end without a GPU:
+
+- POST /api/generate   streaming (NDJSON) and non-streaming, `format`, `context`,
+                       `keep_alive`, and the prompt-less model-load request
+- GET  /api/tags, GET /api/version, GET /   health and model listing
+- GET  /standin/stats  requests served, canned hits and injected errors
+
+Responses are looked up in a JSONL file of canned responses, first by exact
+(model, prompt hash), then by prompt type and user question. Record one from
+a real Ollama with --record-from: requests are proxied and every answer is
+appended to the file. Unknown prompts get a deterministic synthetic answer:
+generate_query/fallback_query return the most similar example query from
+prompts/generate_query.txt, analyze_message returns tool JSON and
+format_results a short summary.
+
+Latency is the time to the first token (--latency fixed:MS, uniform:LO:HI,
+normal:MEAN:SD or lognormal:MEDIAN:SIGMA, all in ms) plus generation at
+--tokens-per-sec. --error-rate returns --error-status, --hang-rate holds the
+request for --hang-seconds (client timeouts) and --drop-rate cuts a stream
+half-way. --seed makes latency and error draws reproducible.
+
+Usage:
+    python tools/ollama_standin.py [--port 11434] [--responses recorded.jsonl]
+        [--latency lognormal:400:0.5] [--tokens-per-sec 40] [--error-rate 0.02] [--seed 1]
+    python tools/ollama_standin.py --record-from http://gpu-host:11434 --responses recorded.jsonl
+
+Point the API at it with OLLAMA_HOST=http://localhost:11434.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from ollama_prefix_cache import static_prefix
+
+PROMPT_KINDS = ("analyze_message", "generate_query", "fallback_query", "format_results")
+_QUESTION = re.compile(
+    r'(?:User message|User\'s original request|Original user request|Question): "(.*?)"', re.DOTALL
+)
+_TOKEN = re.compile(r"\s*\S+|\s+")
+_NS_PER_MS = 1_000_000
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+def question_of(prompt: str) -> str:
+    """The user's question in a rendered prompt (the last one; generate_query lists examples first)"""
+    found = _QUESTION.findall(prompt)
+    return found[-1].strip() if found else ""
+
+
+def split_tokens(text: str) -> List[str]:
+    """Word-sized pieces standing in for model tokens"""
+    return _TOKEN.findall(text)
+
+
+@dataclass
+class LatencyModel:
+    """Time to first token drawn from a distribution, then a fixed generation rate"""
+    kind: str = "fixed"
+    params: Tuple[float, ...] = (0.0,)
+    tokens_per_sec: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str, tokens_per_sec: float = 0.0) -> "LatencyModel":
+        name, *values = spec.split(":")
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if name not in expected or len(values) != expected[name]:
+            raise ValueError(f"Bad latency spec {spec!r}; use fixed:MS, uniform:LO:HI, normal:MEAN:SD or lognormal:MEDIAN:SIGMA")
+        return cls(name, tuple(float(v) for v in values), tokens_per_sec)
+
+    def first_token_ms(self, rng: random.Random) -> float:
+        a, *rest = self.params
+        if self.kind == "uniform":
+            return rng.uniform(a, rest[0])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(a, rest[0]))
+        if self.kind == "lognormal":
+            return a * rng.lognormvariate(0, rest[0])
+        return a
+
+    def token_delay(self) -> float:
+        return 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+
+@dataclass
+class Faults:
+    error_rate: float = 0.0
+    error_status: int = 500
+    hang_rate: float = 0.0
+    hang_seconds: float = 120.0
+    drop_rate: float = 0.0
+
+
+class ResponseBook:
+    """Canned responses by exact prompt, then by prompt kind and question, then synthetic"""
+
+    def __init__(self, path: Optional[str] = None, prompts_dir: str = os.path.join(BACKEND_DIR, "prompts")):
+        self.path = Path(path) if path else None
+        self.by_hash: Dict[Tuple[str, str], str] = {}
+        self.by_question: Dict[Tuple[str, str], str] = {}
+        self.kind_markers: Dict[str, str] = {}
+        for kind in PROMPT_KINDS:
+            try:
+                first_line = static_prefix((Path(prompts_dir) / f"{kind}.txt").read_text()).splitlines()[0]
+                self.kind_markers[kind] = first_line.strip()
+            except (OSError, IndexError):
+                continue
+        self._selector = None
+        if self.path and self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def __len__(self):
+        return len(self.by_hash)
+
+    def _add(self, entry: Dict[str, Any]):
+        self.by_hash[(entry.get("model", ""), entry["prompt_sha"])] = entry["response"]
+        self.by_hash.setdefault(("", entry["prompt_sha"]), entry["response"])
+        if entry.get("question"):
+            self.by_question.setdefault((entry.get("kind", ""), entry["question"].lower()), entry["response"])
+
+    def kind_of(self, prompt: str) -> str:
+        for kind, marker in self.kind_markers.items():
+            if prompt.startswith(marker):
+                return kind
+        return "other"
+
+    def lookup(self, model: str, prompt: str) -> Tuple[str, str]:
+        """(response, source) where source is "hash", "question" or "synthetic" """
+        digest = prompt_hash(prompt)
+        for key in ((model, digest), ("", digest)):
+            if key in self.by_hash:
+                return self.by_hash[key], "hash"
+        kind = self.kind_of(prompt)
+        question = question_of(prompt)
+        response = self.by_question.get((kind, question.lower()))
+        if response is not None:
+            return response, "question"
+        return self.synthesize(kind, question), "synthetic"
+
+    def synthesize(self, kind: str, question: str) -> str:
+        if kind in ("generate_query", "fallback_query"):
+            if self._selector is None:
+                from few_shot_retrieval import FewShotSelector
+                self._selector = FewShotSelector(os.path.join(BACKEND_DIR, "prompts", "generate_query.txt"), log_path=None)
+            return self._selector.select(question or "people", k=1)[0].query
+        if kind == "analyze_message":
+            asks = "?" in question or re.match(r"(?i)\s*(who|what|which|how|find|show|list|count)\b", question)
+            if asks:
+                return json.dumps({"tools": ["custom_query", "store_message"], "response_type": "custom",
+                                   "reasoning": "The user asks about organizational data."})
+            return json.dumps({"tools": ["pig_latin", "store_message"], "response_type": "pig_latin",
+                               "reasoning": "This is a normal chat message."})
+        if kind == "format_results":
+            return f"**Results for:** {question}\n\nThe query returned the rows shown above."
+        return "OK"
+
+    def record(self, model: str, prompt: str, response: str):
+        entry = {
+            "model": model,
+            "prompt_sha": prompt_hash(prompt),
+            "kind": self.kind_of(prompt),
+            "question": question_of(prompt),
+            "response": response,
+        }
+        self._add(entry)
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+@dataclass
+class StandinStats:
+    requests: int = 0
+    streamed: int = 0
+    load_only: int = 0
+    sources: Dict[str, int] = field(default_factory=dict)
+    injected: Dict[str, int] = field(default_factory=dict)
+
+    def count(self, bucket: Dict[str, int], name: str):
+        bucket[name] = bucket.get(name, 0) + 1
+
+
+def create_app(book: ResponseBook, latency: Optional[LatencyModel] = None, faults: Optional[Faults] = None,
+               seed: Optional[int] = None, record_from: Optional[str] = None,
+               models: Tuple[str, ...] = ("granite3.3:8b-largectx",)) -> FastAPI:
+    latency = latency or LatencyModel()
+    faults = faults or Faults()
+    app = FastAPI(title="Ollama stand-in")
+    rng = random.Random(seed)
+    stats = StandinStats()
+    app.state.stats = stats
+
+    async def proxy(payload: Dict[str, Any]) -> str:
+        import httpx
+        async with httpx.AsyncClient(timeout=600) as client:
+            resp = await client.post(f"{record_from}/api/generate", json={**payload, "stream": False})
+            resp.raise_for_status()
+            return resp.json().get("response", "")
+
+    def final_fields(prompt: str, tokens: List[str], started: float, first_token_ms: float) -> Dict[str, Any]:
+        prompt_tokens = len(prompt) // 4 + 1
+        return {
+            "done": True,
+            "done_reason": "stop",
+            # Stand-in token ids; enough for clients that send the context back
+            "context": list(range(prompt_tokens + len(tokens))),
+            "total_duration": int((time.perf_counter() - started) * 1000 * _NS_PER_MS),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(first_token_ms * _NS_PER_MS),
+            "eval_count": len(tokens),
+            "eval_duration": int(len(tokens) * latency.token_delay() * 1000 * _NS_PER_MS),
+        }
+
+    @app.get("/")
+    async def root():
+        return PlainTextResponse("Ollama is running")
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-standin"}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": name, "model": name} for name in models]}
+
+    @app.get("/standin/stats")
+    async def standin_stats():
+        return {
+            "requests": stats.requests,
+            "streamed": stats.streamed,
+            "load_only": stats.load_only,
+            "sources": stats.sources,
+            "injected": stats.injected,
+            "canned_responses": len(book),
+        }
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        payload = await request.json()
+        model = payload.get("model", "")
+        prompt = payload.get("prompt")
+        started = time.perf_counter()
+        stats.requests += 1
+
+        if not prompt:
+            # A request without a prompt only loads the model
+            stats.load_only += 1
+            return {"model": model, "response": "", "done": True, "done_reason": "load", "load_duration": 0}
+
+        draw = rng.random()
+        if draw < faults.error_rate:
+            stats.count(stats.injected, "error")
+            return JSONResponse(status_code=faults.error_status, content={"error": "injected failure"})
+        if draw < faults.error_rate + faults.hang_rate:
+            stats.count(stats.injected, "hang")
+            await asyncio.sleep(faults.hang_seconds)
+        drop = rng.random() < faults.drop_rate
+
+        if record_from:
+            response = await proxy(payload)
+            book.record(model, prompt, response)
+            source = "recorded"
+        else:
+            response, source = book.lookup(model, prompt)
+        stats.count(stats.sources, source)
+
+        tokens = split_tokens(response)
+        first_token_ms = latency.first_token_ms(rng)
+        delay = latency.token_delay()
+
+        if not payload.get("stream", True):
+            await asyncio.sleep((first_token_ms / 1000) + delay * len(tokens))
+            return {"model": model, "response": response, **final_fields(prompt, tokens, started, first_token_ms)}
+
+        stats.streamed += 1
+        if drop:
+            stats.count(stats.injected, "drop")
+
+        async def stream():
+            await asyncio.sleep(first_token_ms / 1000)
+            cut = len(tokens) // 2 if drop else None
+            for index, token in enumerate(tokens):
+                if index == cut:
+                    # Connection dropped mid-stream: no final "done" line
+                    return
+                yield json.dumps({"model": model, "response": token, "done": False}) + "\n"
+                if delay:
+                    await asyncio.sleep(delay)
+            yield json.dumps({"model": model, "response": "", **final_fields(prompt, tokens, started, first_token_ms)}) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU-only stand-in for the Ollama /api/generate subset")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--responses", help="JSONL file of canned responses (appended to with --record-from)")
+    parser.add_argument("--record-from", help="Proxy to this real Ollama URL and record its responses")
+    parser.add_argument("--latency", default="fixed:0", help="Time to first token: fixed:MS, uniform:LO:HI, normal:MEAN:SD, lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="Generation rate after the first token (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--models", default=os.getenv("OLLAMA_MODEL", "granite3.3:8b-largectx"),
+                        help="Comma-separated model names listed by /api/tags")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    book = ResponseBook(args.responses)
+    app = create_app(
+        book,
+        latency=LatencyModel.parse(args.latency, args.tokens_per_sec),
+        faults=Faults(args.error_rate, args.error_status, args.hang_rate, args.hang_seconds, args.drop_rate),
+        seed=args.seed,
+        record_from=args.record_from,
+        models=tuple(m.strip() for m in args.models.split(",") if m.strip()),
+    )
+    mode = f"recording from {args.record_from}" if args.record_from else f"{len(book)} canned responses"
+    print(f"Ollama stand-in on http://{args.host}:{args.port} ({mode}, latency {args.latency}, "
+          f"{args.tokens_per_sec or 'instant'} tokens/s, error rate {args.error_rate})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
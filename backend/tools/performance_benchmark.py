@@ -2,6 +2,9 @@
 Performance Benchmark Script for FalkorDB Chat Interface
 
 This script measures the performance improvements from the optimization features.
+It needs a running model; regression-checked benchmarks of the pattern matcher,
+validator, processor, error handler, seeding and formatting live in
+tests/test_benchmarks.py (BENCHMARKS=1 python -m pytest tests/test_benchmarks.py).
 """
 
 import asyncio
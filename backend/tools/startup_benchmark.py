@@ -0,0 +1,169 @@
+"""
+API Cold-Start Benchmark
+
+Measures how long a fresh process takes to import `main` and, with --serve,
+how long `uvicorn main:app` takes until /health answers. Each run is a new
+interpreter, so nothing is warm except the OS page cache. One extra run with
+STARTUP_PROFILE=1 collects the slowest module imports.
+
+Results are saved as JSON. Pass --baseline with a previous results file to
+fail (exit code 1) when the median regresses by more than --threshold.
+
+Usage:
+    python tools/startup_benchmark.py [--runs 10] [--serve] [--baseline startup_baseline.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import main; "
+    "print((time.perf_counter() - t) * 1000)"
+)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min_ms": round(ordered[0], 1),
+        "median_ms": round(statistics.median(ordered), 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        "max_ms": round(ordered[-1], 1),
+    }
+
+
+def measure_import(runs: int) -> Dict:
+    """Time `import main` in fresh interpreters (in-process and whole-process wall time)"""
+    import_ms, process_ms = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        )
+        process_ms.append((time.perf_counter() - started) * 1000)
+        import_ms.append(float(out.stdout.strip().splitlines()[-1]))
+    return {"import_main": summarize(import_ms), "process_total": summarize(process_ms)}
+
+
+def measure_serve(runs: int, port: int, timeout: float = 60.0) -> Dict:
+    """Time from spawning uvicorn until GET /health returns 200"""
+    samples = []
+    url = f"http://127.0.0.1:{port}/health"
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while time.perf_counter() - started < timeout:
+                try:
+                    with urllib.request.urlopen(url, timeout=1) as resp:
+                        if resp.status == 200:
+                            samples.append((time.perf_counter() - started) * 1000)
+                            break
+                except OSError:
+                    time.sleep(0.02)
+            else:
+                raise RuntimeError(f"uvicorn did not serve /health within {timeout}s")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+    return {"time_to_health": summarize(samples)}
+
+
+def profile_imports(top: int) -> Optional[Dict]:
+    """One run with the startup profiler enabled; returns the slowest imports"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        path = tmp.name
+    env = dict(os.environ, STARTUP_PROFILE="1", STARTUP_PROFILE_OUTPUT=path)
+    snippet = "import main, startup_profiler; startup_profiler.write_report()"
+    try:
+        subprocess.run([sys.executable, "-c", snippet], cwd=BACKEND_DIR, env=env,
+                       capture_output=True, check=True)
+        with open(path) as f:
+            report = json.load(f)
+    except (subprocess.CalledProcessError, OSError, json.JSONDecodeError) as e:
+        print(f"⚠️  Profiling run failed: {e}")
+        return None
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+    report["imports"] = report["imports"][:top]
+    return report
+
+
+def compare(results: Dict, baseline_path: str, threshold: float) -> List[str]:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for key in ("import_main", "time_to_health"):
+        current = results.get(key, {}).get("median_ms")
+        previous = baseline.get(key, {}).get("median_ms")
+        if current is None or previous is None:
+            continue
+        change = (current - previous) / previous
+        status = "REGRESSION" if change > threshold else "ok"
+        print(f"   {key:<16} baseline {previous:>8.1f} ms  now {current:>8.1f} ms  ({change:+.1%}) {status}")
+        if change > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--serve", action="store_true", help="Also time uvicorn until /health answers")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to keep in the report")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed median regression (0.20 = 20%%)")
+    parser.add_argument("--output", default=f"startup_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    args = parser.parse_args()
+
+    print(f"🚀 Cold start: {args.runs} fresh interpreters importing main...")
+    results = {"timestamp": datetime.now().isoformat(), "python": sys.version.split()[0]}
+    measured = measure_import(args.runs)
+    results.update(measured)
+    if args.serve:
+        print(f"🌐 Timing uvicorn main:app until /health answers ({args.runs} runs)...")
+        results.update(measure_serve(args.runs, args.port))
+    results["profile"] = profile_imports(args.top)
+
+    print(f"\n{'measure':<16} | {'min ms':>8} | {'median ms':>9} | {'p95 ms':>8} | {'max ms':>8}")
+    print("-" * 62)
+    for key in ("import_main", "process_total", "time_to_health"):
+        if key in results:
+            s = results[key]
+            print(f"{key:<16} | {s['min_ms']:>8} | {s['median_ms']:>9} | {s['p95_ms']:>8} | {s['max_ms']:>8}")
+
+    if results["profile"]:
+        print("\nSlowest imports (cumulative ms):")
+        for entry in results["profile"]["imports"]:
+            print(f"   {entry['module']:<40} {entry['cumulative_ms']:>8.1f}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        print(f"\nComparing with {args.baseline} (threshold {args.threshold:.0%}):")
+        if compare(results, args.baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
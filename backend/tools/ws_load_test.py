@@ -0,0 +1,333 @@
+"""
+WebSocket Load Generator
+
+Opens N concurrent chat sessions against /ws and measures how many users one
+API instance sustains. Each session is a closed loop: send a tagged message
+({"type": "message", "id": ..., "text": ...}), wait until its answer is
+complete, think, repeat. Questions are drawn from a weighted mix of
+categories:
+
+- pattern: matched by a pre-compiled query pattern (no Cypher generation)
+- llm:     needs a generated Cypher query
+- chat:    small talk answered in pig latin
+
+A turn ends with the tagged final answer ("server" frame), a "cancelled" or
+"warming_up" frame, an error frame followed by --error-grace seconds of
+silence, or --timeout. Reported per category and overall: throughput,
+p50/p95/p99 latency, time to first frame, and error rates by outcome.
+
+Results are saved as JSON. Pass --baseline with a previous results file to
+fail (exit code 1) when a p95 grows or throughput drops by more than
+--threshold.
+
+For a CPU-only run, start the API against tools/ollama_standin.py
+(OLLAMA_HOST=http://localhost:11434).
+
+Usage:
+    python tools/ws_load_test.py [--url ws://localhost:8000/ws] [--sessions 20] [--duration 60]
+        [--mix pattern=0.5,llm=0.4,chat=0.1] [--think-time exp:2000] [--baseline ws_load_baseline.json]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+QUESTIONS: Dict[str, List[str]] = {
+    "pattern": [
+        "who's on the mobile team?",
+        "find Sarah's manager",
+        "show me all engineers",
+        "who are the team leads?",
+        "who owns security policy?",
+        "members of the engineering team",
+        "how many people in engineering?",
+        "find people in engineering department",
+    ],
+    "llm": [
+        "who reports to the CTO?",
+        "which department has the most team leads?",
+        "which teams are responsible for compliance policies?",
+        "what teams work on mobile apps and have more than 5 members?",
+        "who works on mobile?",
+        "which offices have people with AWS certifications?",
+    ],
+    "chat": [
+        "hello there",
+        "good morning everyone",
+        "thanks for the help today",
+    ],
+}
+
+# Outcomes that count as failures in the error rate
+FAILURES = ("error", "timeout", "disconnected", "connect_error")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in QUESTIONS:
+            raise ValueError(f"Unknown category {name!r}; choose from {', '.join(QUESTIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+@dataclass
+class ThinkTime:
+    """Pause between a session's turns: none, fixed:MS, uniform:LO:HI or exp:MEAN"""
+    kind: str = "none"
+    params: Tuple[float, ...] = ()
+
+    @classmethod
+    def parse(cls, spec: str) -> "ThinkTime":
+        name, *values = spec.split(":")
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "exp": 1}
+        if name not in expected or len(values) != expected[name]:
+            raise ValueError(f"Bad think time {spec!r}; use none, fixed:MS, uniform:LO:HI or exp:MEAN")
+        return cls(name, tuple(float(v) for v in values))
+
+    def seconds(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0] / 1000
+        if self.kind == "uniform":
+            return rng.uniform(*self.params) / 1000
+        if self.kind == "exp":
+            return rng.expovariate(1000 / self.params[0]) if self.params[0] > 0 else 0.0
+        return 0.0
+
+
+@dataclass
+class TurnResult:
+    session: int
+    category: str
+    question: str
+    outcome: str
+    started: float
+    ttff_ms: Optional[float] = None
+    total_ms: float = 0.0
+    frames: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def report(self) -> Dict[str, Any]:
+        """Turn as saved with --keep-turns; timings are kept exact and rounded only here"""
+        data = asdict(self)
+        for key in ("ttff_ms", "total_ms"):
+            if data[key] is not None:
+                data[key] = round(data[key], 1)
+        return data
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(ordered[-1], 1)}
+
+
+async def run_turn(ws, session: int, category: str, question: str, timeout: float,
+                   error_grace: float) -> TurnResult:
+    """Send one tagged chat message and read frames until its answer is complete"""
+    request_id = uuid.uuid4().hex[:10]
+    started = time.perf_counter()
+    result = TurnResult(session, category, question, "timeout", started)
+    await ws.send(json.dumps({"type": "message", "id": request_id, "text": question}))
+    deadline = started + timeout
+    errored = False
+
+    while True:
+        remaining = deadline - time.perf_counter()
+        if errored:
+            remaining = min(remaining, error_grace)
+        if remaining <= 0:
+            break
+        try:
+            raw = await asyncio.wait_for(ws.recv(), timeout=remaining)
+        except asyncio.TimeoutError:
+            break
+        try:
+            frame = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if not isinstance(frame, dict):
+            continue
+        if frame.get("type") == "ping":
+            await ws.send(json.dumps({"type": "pong"}))
+            continue
+        if frame.get("id") != request_id:
+            continue
+
+        elapsed = (time.perf_counter() - started) * 1000
+        frame_type = frame.get("type", "unknown")
+        result.frames[frame_type] = result.frames.get(frame_type, 0) + 1
+        if result.ttff_ms is None:
+            result.ttff_ms = elapsed
+        if frame_type == "server":
+            result.outcome = "warming_up" if frame.get("status") == "warming_up" else ("error" if errored else "ok")
+            result.total_ms = elapsed
+            return result
+        if frame_type == "cancelled":
+            result.outcome = "cancelled"
+            result.total_ms = elapsed
+            return result
+        if frame_type == "error":
+            # Failed turns end with error frames and no final answer; wait briefly for more
+            errored = True
+            result.error = str(frame.get("message"))[:200]
+            result.total_ms = elapsed
+
+    if errored:
+        result.outcome = "error"
+    else:
+        result.total_ms = (time.perf_counter() - started) * 1000
+    return result
+
+
+async def run_session(index: int, args, mix: Dict[str, float], think: ThinkTime, stop_at: float,
+                      results: List[TurnResult]):
+    import websockets
+
+    rng = random.Random(None if args.seed is None else args.seed + index)
+    # Spread session starts over the ramp-up period
+    await asyncio.sleep(args.ramp_up * index / max(1, args.sessions))
+    categories, weights = list(mix), list(mix.values())
+    sent = 0
+    try:
+        async with websockets.connect(f"{args.url}?user=load-{index}", max_size=None,
+                                      open_timeout=args.timeout) as ws:
+            while time.perf_counter() < stop_at and (not args.messages or sent < args.messages):
+                category = rng.choices(categories, weights)[0]
+                question = rng.choice(QUESTIONS[category])
+                result = await run_turn(ws, index, category, question, args.timeout, args.error_grace)
+                results.append(result)
+                sent += 1
+                await asyncio.sleep(think.seconds(rng))
+    except Exception as e:
+        outcome = "disconnected" if sent else "connect_error"
+        results.append(TurnResult(index, "connection", "", outcome, time.perf_counter(), error=str(e)[:200]))
+
+
+def summarize(results: List[TurnResult], elapsed: float) -> Dict:
+    def block(turns: List[TurnResult]) -> Dict:
+        outcomes: Dict[str, int] = {}
+        for turn in turns:
+            outcomes[turn.outcome] = outcomes.get(turn.outcome, 0) + 1
+        done = [t for t in turns if t.outcome == "ok"]
+        failed = sum(outcomes.get(name, 0) for name in FAILURES)
+        return {
+            "turns": len(turns),
+            "completed": len(done),
+            "throughput_per_s": round(len(done) / elapsed, 3) if elapsed else 0,
+            "error_rate": round(failed / len(turns), 4) if turns else 0,
+            "outcomes": outcomes,
+            "latency": percentiles([t.total_ms for t in done]),
+            "time_to_first_frame": percentiles([t.ttff_ms for t in turns if t.ttff_ms is not None]),
+        }
+
+    categories = sorted({t.category for t in results})
+    return {
+        "overall": block(results),
+        "categories": {name: block([t for t in results if t.category == name]) for name in categories},
+    }
+
+
+def compare(results: Dict, baseline_path: str, threshold: float) -> List[str]:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, current in {"overall": results["overall"], **results["categories"]}.items():
+        previous = baseline["overall"] if name == "overall" else baseline.get("categories", {}).get(name)
+        if not previous:
+            continue
+        now_p95, then_p95 = current["latency"]["p95_ms"], previous["latency"]["p95_ms"]
+        if now_p95 is not None and then_p95:
+            change = (now_p95 - then_p95) / then_p95
+            status = "REGRESSION" if change > threshold else "ok"
+            print(f"   {name:<12} p95 baseline {then_p95:>9.1f} ms  now {now_p95:>9.1f} ms  ({change:+.1%}) {status}")
+            if change > threshold:
+                regressions.append(f"{name}.p95")
+        if name == "overall" and previous["throughput_per_s"]:
+            change = (current["throughput_per_s"] - previous["throughput_per_s"]) / previous["throughput_per_s"]
+            status = "REGRESSION" if change < -threshold else "ok"
+            print(f"   {'throughput':<12} baseline {previous['throughput_per_s']:>9.3f}/s  "
+                  f"now {current['throughput_per_s']:>9.3f}/s  ({change:+.1%}) {status}")
+            if change < -threshold:
+                regressions.append("throughput")
+    return regressions
+
+
+async def run(args) -> Dict:
+    mix = parse_mix(args.mix)
+    think = ThinkTime.parse(args.think_time)
+    results: List[TurnResult] = []
+    started = time.perf_counter()
+    stop_at = started + args.duration
+    await asyncio.gather(*(run_session(i, args, mix, think, stop_at, results) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "url": args.url, "sessions": args.sessions, "duration_s": args.duration,
+            "messages_per_session": args.messages, "mix": mix, "think_time": args.think_time,
+            "ramp_up_s": args.ramp_up, "timeout_s": args.timeout, "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 2),
+        **summarize(results, elapsed),
+        "turns": [t.report() for t in results] if args.keep_turns else [],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000/ws")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent WebSocket sessions")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to keep starting new turns")
+    parser.add_argument("--messages", type=int, default=0, help="Turns per session (0 = until --duration)")
+    parser.add_argument("--mix", default="pattern=0.5,llm=0.4,chat=0.1")
+    parser.add_argument("--think-time", default="exp:2000", help="none, fixed:MS, uniform:LO:HI or exp:MEAN")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds over which sessions connect")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before a turn counts as timed out")
+    parser.add_argument("--error-grace", type=float, default=2, help="Seconds to wait for more frames after an error")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--keep-turns", action="store_true", help="Include every turn in the JSON output")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed p95 growth / throughput drop (0.20 = 20%%)")
+    parser.add_argument("--output", default=f"ws_load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    args = parser.parse_args()
+
+    print(f"🚀 {args.sessions} sessions against {args.url} for {args.duration:.0f}s (mix {args.mix}, think {args.think_time})")
+    results = asyncio.run(run(args))
+
+    print(f"\n{'category':<12} | {'turns':>6} | {'ok':>5} | {'err %':>6} | {'tput/s':>7} | "
+          f"{'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'ttff p50':>8}")
+    print("-" * 92)
+    for name, block in {**results["categories"], "overall": results["overall"]}.items():
+        latency, ttff = block["latency"], block["time_to_first_frame"]
+        print(f"{name:<12} | {block['turns']:>6} | {block['completed']:>5} | {block['error_rate'] * 100:>6.1f} | "
+              f"{block['throughput_per_s']:>7.3f} | {latency['p50_ms'] or '-':>8} | {latency['p95_ms'] or '-':>8} | "
+              f"{latency['p99_ms'] or '-':>8} | {ttff['p50_ms'] or '-':>8}")
+    print(f"\nOutcomes: {results['overall']['outcomes']}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        print(f"\nComparing with {args.baseline} (threshold {args.threshold:.0%}):")
+        if compare(results, args.baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Cross-worker WebSocket broadcast over Redis pub/sub
+
+WebSocket connections live in the memory of the uvicorn worker that accepted
+them, so a broadcast produced in one worker has to be relayed to the others.
+Every worker subscribes to the broadcast channels on the shared Redis service
+and fans received messages out to its own sockets. Publishing goes through a
+single writer task per worker and delivery (including to the publishing worker
+itself) goes through Redis, so all workers see messages of a channel in the
+same order.
+
+When Redis is unavailable the broker degrades to local-only delivery, which is
+exactly the single-worker behaviour.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Redis connection, same service the dashboard cache uses
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6380))
+CHANNEL_PREFIX = "ws:broadcast:"
+# Seconds to wait before retrying a lost Redis subscription
+RECONNECT_DELAY = 2.0
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class RedisBroadcastBroker:
+    """Relays broadcast messages between uvicorn workers through Redis pub/sub"""
+
+    def __init__(self, host: str = REDIS_HOST, port: int = REDIS_PORT, prefix: str = CHANNEL_PREFIX):
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.handlers: Dict[str, Handler] = {}
+        self.connected = False
+
+        self._redis = None  # redis.asyncio.Redis, created in start()
+        self._outbox: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+        self._seq = 0
+        # origin worker -> last sequence number seen, for gap detection
+        self._last_seq: Dict[str, int] = {}
+
+        # Metrics
+        self.published = 0
+        self.received = 0
+        self.local_fallbacks = 0
+
+    def register(self, channel: str, handler: Handler):
+        """Register the local fan-out for a channel; call before start()"""
+        self.handlers[channel] = handler
+
+    async def start(self):
+        self._outbox = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._publisher()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception:
+                pass
+            self._redis = None
+        self.connected = False
+
+    async def publish(self, channel: str, payload: Dict[str, Any]):
+        """Broadcast a payload to the channel's handler on every worker"""
+        if not self.connected or self._outbox is None:
+            # Single-worker fallback: deliver straight to local sockets
+            self.local_fallbacks += 1
+            await self._dispatch(channel, payload)
+            return
+        self._seq += 1
+        envelope = {"origin": self.worker_id, "seq": self._seq, "payload": payload}
+        await self._outbox.put((channel, json.dumps(envelope, default=str)))
+
+    async def _publisher(self):
+        """Single writer so messages from this worker reach Redis in publish order"""
+        while True:
+            channel, data = await self._outbox.get()
+            try:
+                await self._redis.publish(self.prefix + channel, data)
+                self.published += 1
+            except Exception as e:
+                logger.warning(f"Redis publish failed, delivering locally: {e}")
+                self.local_fallbacks += 1
+                await self._dispatch(channel, json.loads(data)["payload"])
+
+    async def _listen(self):
+        while True:
+            try:
+                if self._redis is not None:
+                    await self._redis.aclose()
+                import redis.asyncio as aioredis  # Imported on first use to keep cold start fast
+                self._redis = aioredis.Redis(host=self.host, port=self.port, decode_responses=True)
+                await self._redis.ping()
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(*(self.prefix + channel for channel in self.handlers))
+                self.connected = True
+                logger.info(f"WebSocket broker {self.worker_id} subscribed to {sorted(self.handlers)}")
+
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    await self._on_message(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.connected:
+                    logger.warning(f"WebSocket broker lost Redis connection: {e}")
+                else:
+                    logger.info(f"Redis unavailable, WebSocket broadcasts stay local to this worker: {e}")
+                self.connected = False
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _on_message(self, redis_channel: str, data: str):
+        channel = redis_channel[len(self.prefix):]
+        try:
+            envelope = json.loads(data)
+        except json.JSONDecodeError:
+            logger.warning(f"Dropping malformed broadcast on {redis_channel}")
+            return
+        self.received += 1
+
+        origin, seq = envelope.get("origin"), envelope.get("seq", 0)
+        last = self._last_seq.get(origin)
+        if last is not None and seq != last + 1:
+            logger.warning(f"Broadcast gap from worker {origin}: expected seq {last + 1}, got {seq}")
+        self._last_seq[origin] = seq
+
+        await self._dispatch(channel, envelope.get("payload", {}))
+
+    async def _dispatch(self, channel: str, payload: Dict[str, Any]):
+        handler = self.handlers.get(channel)
+        if handler is None:
+            return
+        try:
+            await handler(payload)
+        except Exception as e:
+            logger.error(f"Broadcast handler for '{channel}' failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "connected": self.connected,
+            "channels": sorted(self.handlers),
+            "published": self.published,
+            "received": self.received,
+            "local_fallbacks": self.local_fallbacks,
+        }